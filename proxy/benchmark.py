@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Load-test and regression benchmark for the proxy.
+
+Starts proxy/server.py against a Powerwall or the pwsimulator (or targets an
+already running proxy with --url) and drives it from N concurrent clients with
+the production route mix (perf_test.TEST_ROUTES) for a fixed duration. Reports:
+  - throughput and p50/p95/p99 latency, overall and per route
+  - CPU and RSS of the proxy process sampled over the run (Linux /proc)
+  - performance and degradation cache hit ratios (from /metrics)
+
+--save FILE writes the run as a JSON baseline; --baseline FILE compares the run
+against one and exits 1 when a metric regresses by more than --threshold percent.
+Proxy settings are taken from the environment (e.g. PW_PREFETCH=yes).
+
+Usage (with the simulator running on https://localhost):
+    python proxy/benchmark.py --clients 16 --duration 30 --save baseline.json
+    # ... change server.py ...
+    python proxy/benchmark.py --clients 16 --duration 30 --baseline baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import sys
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from engine_compare import start_proxy, weighted_routes  # noqa: E402
+
+METRIC_LINE = re.compile(r'^pypowerwall_proxy_cache_lookups_total\{cache="(\w+)",result="(\w+)"\} (\d+)$')
+MIN_ROUTE_REQUESTS = 20  # routes with fewer samples are reported but not compared
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of an already sorted list (0 if empty)."""
+    if not values:
+        return 0
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def summarize(latencies, duration, errors):
+    """Request count, req/s and p50/p95/p99 (ms) for a list of latencies."""
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / duration if duration else 0,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "errors": errors,
+    }
+
+
+def load_phase(base_url, clients, duration):
+    """
+    Request the weighted route mix from `clients` threads for `duration` seconds.
+
+    Returns:
+        (route -> list of latencies in ms, route -> error count)
+    """
+    routes, weights = weighted_routes()
+    latencies = {route: [] for route in routes}
+    errors = {route: 0 for route in routes}
+    lock = threading.Lock()
+    stop = time.time() + duration
+
+    def client():
+        session = requests.Session()
+        local = {route: [] for route in routes}
+        local_errors = {route: 0 for route in routes}
+        while time.time() < stop:
+            route = random.choices(routes, weights)[0]
+            start = time.perf_counter()
+            try:
+                response = session.get(base_url + route, timeout=10)
+                if response.status_code >= 500:
+                    local_errors[route] += 1
+            except requests.exceptions.RequestException:
+                local_errors[route] += 1
+            local[route].append((time.perf_counter() - start) * 1000)
+        with lock:
+            for route in routes:
+                latencies[route].extend(local[route])
+                errors[route] += local_errors[route]
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, errors
+
+
+class ResourceSampler(threading.Thread):
+    """Sample CPU percent and RSS of a process from /proc every `interval` seconds."""
+
+    def __init__(self, pid, interval=1.0):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.samples = []  # (seconds since start, cpu percent, rss MB)
+        self._stop_event = threading.Event()
+        self._ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def read(self):
+        """Return (cpu seconds, rss MB) for the process, None if /proc is unavailable."""
+        try:
+            with open(f"/proc/{self.pid}/stat") as f:
+                # Fields after the parenthesised command name; utime and stime are 14 and 15
+                fields = f.read().rsplit(")", 1)[1].split()
+            with open(f"/proc/{self.pid}/status") as f:
+                rss_kb = next(int(line.split()[1]) for line in f if line.startswith("VmRSS:"))
+        except (OSError, StopIteration, IndexError, ValueError):
+            return None
+        return (int(fields[11]) + int(fields[12])) / self._ticks, rss_kb / 1024
+
+    def run(self):
+        start = time.time()
+        last = self.read()
+        last_time = start
+        while last is not None and not self._stop_event.wait(self.interval):
+            current = self.read()
+            if current is None:
+                break
+            now = time.time()
+            cpu = (current[0] - last[0]) / (now - last_time) * 100
+            self.samples.append((round(now - start, 1), round(cpu, 1), round(current[1], 1)))
+            last, last_time = current, now
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+    def summary(self):
+        if not self.samples:
+            return {}
+        cpu = [s[1] for s in self.samples]
+        rss = [s[2] for s in self.samples]
+        return {
+            "cpu_avg": round(sum(cpu) / len(cpu), 1),
+            "cpu_max": max(cpu),
+            "rss_start_mb": rss[0],
+            "rss_max_mb": max(rss),
+            "rss_end_mb": rss[-1],
+            "samples": self.samples,
+        }
+
+
+def cache_lookups(base_url):
+    """Cache lookup counters from /metrics: {"performance": {"hit": n, "miss": n}, ...}."""
+    counters = {}
+    try:
+        text = requests.get(base_url + "/metrics", timeout=10).text
+    except requests.exceptions.RequestException:
+        return counters
+    for line in text.splitlines():
+        match = METRIC_LINE.match(line)
+        if match:
+            cache, result, value = match.groups()
+            counters.setdefault(cache, {})[result] = int(value)
+    return counters
+
+
+def hit_ratios(before, after):
+    """Hit ratio per cache for the lookups made between two cache_lookups() calls."""
+    ratios = {}
+    for cache, counts in after.items():
+        hits = counts.get("hit", 0) - before.get(cache, {}).get("hit", 0)
+        misses = counts.get("miss", 0) - before.get(cache, {}).get("miss", 0)
+        ratios[cache] = {
+            "hits": hits,
+            "misses": misses,
+            "ratio": round(hits / (hits + misses), 4) if hits + misses else None,
+        }
+    return ratios
+
+
+def compare(result, baseline, threshold, min_delta_ms=1.0):
+    """
+    Compare a run with a baseline.
+
+    Latency regresses when it rises by more than threshold percent and min_delta_ms
+    (p50/p95/p99 overall, p50/p95 per route - a route's p99 rests on a handful of
+    samples); throughput when it drops by more than threshold percent; CPU and
+    peak RSS when they rise by more than threshold percent.
+
+    Returns:
+        List of human readable regressions (empty if none)
+    """
+    regressions = []
+    limit = 1 + threshold / 100
+
+    def latency(label, now, then, keys):
+        for key in keys:
+            if now[key] > then[key] * limit and now[key] - then[key] > min_delta_ms:
+                regressions.append(f"{label} {key} {then[key]:.2f} -> {now[key]:.2f} ms")
+
+    overall, base_overall = result["overall"], baseline["overall"]
+    if overall["rps"] < base_overall["rps"] / limit:
+        regressions.append(f"overall req/s {base_overall['rps']:.0f} -> {overall['rps']:.0f}")
+    latency("overall", overall, base_overall, ("p50", "p95", "p99"))
+    for route, stats in result["routes"].items():
+        base = baseline["routes"].get(route)
+        if base and min(stats["requests"], base["requests"]) >= MIN_ROUTE_REQUESTS:
+            latency(route, stats, base, ("p50", "p95"))
+
+    resources, base_resources = result.get("resources", {}), baseline.get("resources", {})
+    for key, unit in (("cpu_avg", "%"), ("rss_max_mb", " MB")):
+        if key in resources and key in base_resources and resources[key] > base_resources[key] * limit:
+            regressions.append(f"{key} {base_resources[key]}{unit} -> {resources[key]}{unit}")
+    return regressions
+
+
+def print_report(result):
+    print(f"\n{'Route':<36}{'Requests':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'Errors':>8}")
+    print("-" * 94)
+    rows = sorted(result["routes"].items(), key=lambda item: item[1]["p95"], reverse=True)
+    for route, s in rows + [("OVERALL", result["overall"])]:
+        print(f"{route:<36}{s['requests']:>10}{s['rps']:>10.1f}{s['p50']:>10.2f}"
+              f"{s['p95']:>10.2f}{s['p99']:>10.2f}{s['errors']:>8}")
+
+    resources = result["resources"]
+    if resources:
+        print(f"\nCPU avg {resources['cpu_avg']}% (max {resources['cpu_max']}%), "
+              f"RSS {resources['rss_start_mb']} -> {resources['rss_end_mb']} MB "
+              f"(max {resources['rss_max_mb']} MB)")
+    for cache, counts in result["cache"].items():
+        ratio = "n/a" if counts["ratio"] is None else f"{counts['ratio'] * 100:.1f}%"
+        print(f"{cache} cache hit ratio: {ratio} ({counts['hits']} hits, {counts['misses']} misses)")
+
+
+def run(base_url, pid, args):
+    """Warm up, then run the load phase while sampling the proxy process."""
+    if args.warmup:
+        print(f"Warm-up: {args.clients} clients x {args.warmup}s ...")
+        load_phase(base_url, args.clients, args.warmup)
+    before = cache_lookups(base_url)
+    sampler = ResourceSampler(pid, args.sample_interval) if pid else None
+    if sampler:
+        sampler.start()
+    print(f"Load: {args.clients} clients x {args.duration}s ...")
+    latencies, errors = load_phase(base_url, args.clients, args.duration)
+    if sampler:
+        sampler.stop()
+
+    all_latencies = [ms for values in latencies.values() for ms in values]
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "url": base_url,
+            "clients": args.clients,
+            "duration": args.duration,
+            "engine": None if args.url else args.engine,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "overall": summarize(all_latencies, args.duration, sum(errors.values())),
+        "routes": {
+            route: summarize(values, args.duration, errors[route])
+            for route, values in latencies.items() if values or errors[route]
+        },
+        "resources": sampler.summary() if sampler else {},
+        "cache": hit_ratios(before, cache_lookups(base_url)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the proxy and check for regressions")
+    parser.add_argument("--host", default="localhost", help="Powerwall / simulator host")
+    parser.add_argument("--password", default="password", help="Powerwall password")
+    parser.add_argument("--email", default="me@example.com", help="Powerwall email")
+    parser.add_argument("--port", type=int, default=18675, help="Port for the started proxy (default: 18675)")
+    parser.add_argument("--engine", default="threaded", help="PW_ENGINE for the started proxy (default: threaded)")
+    parser.add_argument("--workers", type=int, default=0, help="PW_MAX_WORKERS for the started proxy")
+    parser.add_argument("--url", help="Benchmark an already running proxy instead (e.g. http://localhost:8675)")
+    parser.add_argument("--pid", type=int, help="Process id of the --url proxy, for CPU/RSS sampling")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent clients (default: 16)")
+    parser.add_argument("--duration", type=int, default=30, help="Measured seconds (default: 30)")
+    parser.add_argument("--warmup", type=int, default=5, help="Unmeasured warm-up seconds (default: 5)")
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="CPU/RSS sample seconds (default: 1)")
+    parser.add_argument("--save", help="Write the results to this JSON baseline file")
+    parser.add_argument("--baseline", help="Compare against this JSON baseline file")
+    parser.add_argument("--threshold", type=float, default=15.0,
+                        help="Allowed regression in percent before failing (default: 15)")
+    args = parser.parse_args()
+
+    proc = None
+    if args.url:
+        base_url, pid = args.url.rstrip("/"), args.pid
+    else:
+        print(f"Starting proxy (PW_ENGINE={args.engine}) on port {args.port} ...")
+        proc = start_proxy(args.engine, args.port, args)
+        base_url, pid = f"http://localhost:{args.port}", proc.pid
+    try:
+        result = run(base_url, pid, args)
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait(10)
+
+    print_report(result)
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"\nSaved baseline to {args.save}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(result, baseline, args.threshold)
+        if regressions:
+            print(f"\nREGRESSIONS vs {args.baseline} (threshold {args.threshold}%):")
+            for regression in regressions:
+                print(f"  - {regression}")
+            sys.exit(1)
+        print(f"\nNo regressions vs {args.baseline} (threshold {args.threshold}%)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Side-by-side comparison of the proxy serving engines (PW_ENGINE=threaded vs async).
+
+Starts one proxy per engine against the same Powerwall (or pwsimulator), then for
+each engine runs:
+  1. perf_test.RoutePerformanceTester - sequential per-route latency
+  2. a concurrent phase - N client threads requesting the production route mix
+     (perf_test.TEST_ROUTES) for a fixed duration, reporting req/s and p50/p95/p99
+
+Usage (with the simulator running on https://localhost):
+    python proxy/engine_compare.py --host localhost --password password \\
+        --email me@example.com --clients 16 --duration 10
+"""
+
+import argparse
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from perf_test import TEST_ROUTES, RoutePerformanceTester  # noqa: E402
+
+ENGINES = ("threaded", "async")
+
+
+def start_proxy(engine, port, args):
+    """Launch proxy/server.py with the given engine and wait until it answers."""
+    env = dict(
+        os.environ,
+        PW_ENGINE=engine,
+        PW_PORT=str(port),
+        PW_HOST=args.host,
+        PW_PASSWORD=args.password,
+        PW_EMAIL=args.email,
+        PW_KEEPALIVE="yes",
+    )
+    if args.workers:
+        env["PW_MAX_WORKERS"] = str(args.workers)
+    proc = subprocess.Popen(
+        [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "server.py")],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            if requests.get(f"http://localhost:{port}/version", timeout=2).ok:
+                return proc
+        except requests.exceptions.RequestException:
+            time.sleep(0.5)
+    proc.kill()
+    raise RuntimeError(f"{engine} proxy did not start on port {port}")
+
+
+def weighted_routes():
+    """Production route mix weighted by request counts."""
+    routes = list(TEST_ROUTES)
+    weights = [TEST_ROUTES[r] for r in routes]
+    return routes, weights
+
+
+def concurrent_phase(port, clients, duration):
+    """Hammer the proxy from `clients` threads for `duration` seconds."""
+    routes, weights = weighted_routes()
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop = time.time() + duration
+
+    def client():
+        session = requests.Session()
+        local = []
+        local_errors = 0
+        while time.time() < stop:
+            route = random.choices(routes, weights)[0]
+            start = time.perf_counter()
+            try:
+                response = session.get(f"http://localhost:{port}{route}", timeout=10)
+                if response.status_code >= 500:
+                    local_errors += 1
+            except requests.exceptions.RequestException:
+                local_errors += 1
+            local.append((time.perf_counter() - start) * 1000)
+        with lock:
+            latencies.extend(local)
+            errors[0] += local_errors
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] if latencies else 0
+    return {
+        "requests": len(latencies),
+        "rps": len(latencies) / duration,
+        "p50": pct(0.50),
+        "p95": pct(0.95),
+        "p99": pct(0.99),
+        "errors": errors[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare PW_ENGINE=threaded vs async")
+    parser.add_argument("--host", default="localhost", help="Powerwall / simulator host")
+    parser.add_argument("--password", default="password", help="Powerwall password")
+    parser.add_argument("--email", default="me@example.com", help="Powerwall email")
+    parser.add_argument("--port", type=int, default=18675, help="First proxy port (default: 18675)")
+    parser.add_argument("--requests", type=int, default=5, help="Sequential requests per route (default: 5)")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent clients (default: 16)")
+    parser.add_argument("--duration", type=int, default=10, help="Concurrent phase seconds (default: 10)")
+    parser.add_argument("--workers", type=int, default=0, help="PW_MAX_WORKERS for both engines")
+    args = parser.parse_args()
+
+    summary = {}
+    for offset, engine in enumerate(ENGINES):
+        port = args.port + offset
+        print(f"\n=== PW_ENGINE={engine} (port {port}) ===")
+        proc = start_proxy(engine, port, args)
+        try:
+            tester = RoutePerformanceTester("localhost", port)
+            results = tester.run_all_tests(args.requests)
+            avg = statistics.mean(r["stats"]["avg_ms"] for r in results if r["stats"])
+            print(f"Concurrent phase: {args.clients} clients x {args.duration}s ...")
+            summary[engine] = dict(concurrent_phase(port, args.clients, args.duration),
+                                   sequential_avg=avg)
+        finally:
+            proc.terminate()
+            proc.wait(10)
+
+    print(f"\n{'':<24}" + "".join(f"{e:>14}" for e in ENGINES))
+    rows = [
+        ("sequential avg (ms)", "sequential_avg", "{:.2f}"),
+        ("concurrent req/s", "rps", "{:.0f}"),
+        ("concurrent p50 (ms)", "p50", "{:.2f}"),
+        ("concurrent p95 (ms)", "p95", "{:.2f}"),
+        ("concurrent p99 (ms)", "p99", "{:.2f}"),
+        ("errors", "errors", "{}"),
+    ]
+    for label, key, fmt in rows:
+        print(f"{label:<24}" + "".join(f"{fmt.format(summary[e][key]):>14}" for e in ENGINES))
+
+
+if __name__ == "__main__":
+    main()
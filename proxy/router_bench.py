@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for proxy GET routing cost.
+
+Compares the route registry in server.py (dict lookup + longest-first prefix
+table) against a replica of the linear if/elif chain it replaced, using the
+production route mix from perf_test.TEST_ROUTES plus static web assets.
+Only route resolution is timed - no handler runs and the gateway is never
+called.
+
+Note: importing proxy.server initializes pypowerwall from the usual PW_*
+environment variables. An unconfigured environment works fine (the connection
+simply fails), it only adds a few log lines at startup.
+
+Usage:
+    python -m proxy.router_bench [--iterations N]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+from urllib.parse import urlparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from proxy.perf_test import TEST_ROUTES  # noqa: E402
+from proxy.server import ALLOWLIST, DISABLED, resolve_request  # noqa: E402
+
+STATIC_ROUTES = [
+    "/",
+    "/index.html",
+    "/viz-static/app.js",
+    "/viz-static/vendor.js",
+    "/viz-static/app.css",
+    "/favicon-32x32.png",
+]
+
+
+def legacy_match(request_path):
+    """Replica of the pre-registry do_GET if/elif chain (match order and urlparse calls)."""
+    if request_path == "/aggregates" or request_path == "/api/meters/aggregates":
+        return "aggregates"
+    elif request_path == "/soe":
+        return "soe"
+    elif request_path == "/api/system_status/soe":
+        return "api_soe"
+    elif request_path == "/api/system_status/grid_status":
+        return "grid_status"
+    elif request_path.startswith("/csv") or request_path.startswith("/csv/v2"):
+        return "csv"
+    elif request_path == "/vitals":
+        return "vitals"
+    elif request_path == "/strings":
+        return "strings"
+    elif request_path == "/stats":
+        return "stats"
+    elif request_path == "/stats/clear":
+        return "stats_clear"
+    elif request_path == "/health":
+        return "health"
+    elif request_path == "/health/reset":
+        return "health_reset"
+    elif request_path == "/temps":
+        return "temps"
+    elif request_path == "/temps/pw":
+        return "temps_pw"
+    elif request_path == "/alerts":
+        return "alerts"
+    elif request_path == "/alerts/pw":
+        return "alerts_pw"
+    elif request_path == "/freq":
+        return "freq"
+    elif request_path == "/pod":
+        return "pod"
+    elif request_path == "/json":
+        return "json"
+    elif request_path == "/version":
+        return "version"
+    elif request_path == "/help":
+        return "help"
+    elif request_path == "/api/troubleshooting/problems":
+        return "problems"
+    elif request_path.startswith("/tedapi"):
+        return "tedapi"
+    elif request_path.startswith("/cloud"):
+        return "cloud"
+    elif request_path.startswith("/fleetapi"):
+        return "fleetapi"
+    elif urlparse(request_path).path in DISABLED:
+        return "disabled"
+    elif urlparse(request_path).path in ALLOWLIST:
+        return "allowlist"
+    elif request_path.startswith("/control/reserve"):
+        return "control_reserve"
+    elif request_path.startswith("/control/mode"):
+        return "control_mode"
+    elif request_path.startswith("/control/grid_charging"):
+        return "control_grid_charging"
+    elif request_path.startswith("/control/grid_export"):
+        return "control_grid_export"
+    elif request_path.startswith("/control/max_backup"):
+        return "control_max_backup"
+    elif request_path == "/fans":
+        return "fans"
+    elif request_path.startswith("/fans/pw"):
+        return "fans_pw"
+    elif request_path.startswith("/pw/"):
+        return "pw"
+    # Static branch re-parsed the path once more before serving
+    urlparse(request_path)
+    return None
+
+
+def registry_match(request_path):
+    """Route resolution as done by Handler.do_GET (one urlparse + registry lookup)."""
+    return resolve_request(request_path, request_path)[0]
+
+
+def weighted_mix():
+    """Request paths weighted by production usage (scaled down), plus static assets."""
+    paths = []
+    for path, count in TEST_ROUTES.items():
+        paths.extend([path] * max(1, count // 500))
+    paths.extend(STATIC_ROUTES * 4)
+    return paths
+
+
+def bench(label, func, paths, iterations):
+    """Time func over every path and return nanoseconds per request."""
+    elapsed = timeit.timeit(lambda: [func(p) for p in paths], number=iterations)
+    per_request = elapsed / (iterations * len(paths)) * 1e9
+    print(f"  {label:<28} {per_request:8.0f} ns/request")
+    return per_request
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark proxy GET routing cost")
+    parser.add_argument("--iterations", type=int, default=2000,
+                        help="Passes over each route mix (default: 2000)")
+    args = parser.parse_args()
+
+    mixes = {
+        "production mix": weighted_mix(),
+        "static assets": STATIC_ROUTES,
+        "ALLOWLIST passthrough": ["/api/sitemaster", "/api/powerwalls", "/api/site_info"],
+    }
+    print(f"Routing cost per request ({args.iterations} iterations)")
+    for name, paths in mixes.items():
+        print(f"\n{name} ({len(paths)} paths)")
+        legacy = bench("legacy if/elif chain", legacy_match, paths, args.iterations)
+        registry = bench("route registry", registry_match, paths, args.iterations)
+        print(f"  {'speedup':<28} {legacy / registry:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -56,6 +56,8 @@
       automatic degraded mode detection (default: yes)
     - PW_CACHE_TTL=N to set maximum age in seconds for cached data before
       returning null instead of stale data (default: 30)
+    - PW_CACHE_MAX_BYTES=N to cap the memory held by cached data, least
+      recently refreshed endpoints evicted first (default: 4194304)
     - Consider reducing PW_TIMEOUT to fail faster (e.g., PW_TIMEOUT=3)
 
  TEDAPI SolarOnly Fallback Recovery (PW3/TEDAPI modes)
@@ -72,6 +74,31 @@
     - /health - returns connection health status and feature configuration
     - /health/reset - resets health counters and clears cache
     - /stats - includes connection health metrics when enabled
+    - /metrics - Prometheus text format: request latency histograms per route,
+      pypowerwall call latency histograms per call (poll() split by URI) and
+      performance/degradation cache hit and miss counters. These are never
+      reset by /stats/clear or /health/reset.
+
+ Batch Requests
+    /batch?routes=/aggregates,/soe,/strings,/vitals returns several JSON routes
+    in one response: {"timestamp": ..., "routes": {route: payload}, "errors":
+    {route: reason}}. All routes in a batch are resolved in one pass (entries
+    cached before the current tick are refreshed, entries refreshed in it are
+    reused by every batch), and clients asking for the same route list within
+    PW_CACHE_EXPIRE share one cached snapshot. Up to 20
+    routes per request; /stats/clear, /health/reset and non-JSON routes are
+    rejected.
+
+ Server-Sent Events
+    /stream/aggregates and /stream/vitals push the route's JSON as an SSE
+    event (EventSource in the browser) whenever the snapshot changes, instead
+    of dashboards polling every second. A "stream" thread refreshes routes
+    that have subscribers once per PW_CACHE_EXPIRE, serializes each changed
+    snapshot once and hands the same bytes to every subscriber; a keep-alive
+    comment is sent every 15s when nothing changed. PW_STREAM_MAX_CLIENTS
+    (default 16) caps concurrent subscribers (503 beyond). Each threaded-engine
+    subscriber holds one thread (or PW_MAX_WORKERS worker); PW_ENGINE=async
+    serves streams on the event loop.
 
  Data Freshness & Cache Behavior
     The proxy prioritizes data freshness over availability. When fresh data
@@ -81,6 +108,102 @@
     values and missing/stale data, preventing false alerts and misleading
     metrics.
 
+ Background Prefetch
+    With PW_PREFETCH=yes a background thread refreshes the performance-cached
+    routes (/aggregates, /csv, /vitals, /strings, /pod, /freq, /json, ...)
+    every PW_CACHE_EXPIRE seconds. Request threads serve the latest snapshot
+    (stale-while-revalidate, up to PW_CACHE_TTL old) instead of calling the
+    gateway, so load on the gateway is one fetch per route per tick no matter
+    how many clients scrape. Routes are refreshed only after they have been
+    requested once, and dropped after 5 minutes without a request.
+
+ Response Compression
+    API responses of at least PW_COMPRESS_MIN_BYTES (default 1024) are gzip or
+    deflate compressed for clients that send Accept-Encoding (Grafana, browsers,
+    curl --compressed). Performance-cached routes keep the compressed body next
+    to the plain one, so each payload is compressed at most once per cache tick.
+    Set PW_COMPRESS=no to disable.
+
+ Keep-Alive Connections
+    With PW_KEEPALIVE=yes the proxy speaks HTTP/1.1 persistent connections, so
+    Telegraf and dashboards scraping many routes reuse one TCP connection (and
+    one server thread) instead of connecting per request. Idle connections are
+    closed after PW_KEEPALIVE_TIMEOUT seconds (default 15) and every connection
+    after PW_KEEPALIVE_MAX_REQUESTS requests (default 100). Connection reuse
+    counters are shown in /stats under "keepalive".
+
+ Worker Pool & Overload Shedding
+    By default every connection gets its own thread. With PW_MAX_WORKERS=N a
+    fixed pool of N worker threads serves connections from a queue of up to
+    PW_MAX_QUEUE (default 32) waiting connections; when the queue is full new
+    connections are answered immediately with 503 and Retry-After instead of
+    piling up blocked threads during a gateway outage. Queue depth, busy
+    workers and shed counts are shown in /stats and /health under
+    "worker_pool". With PW_KEEPALIVE=yes an idle connection holds its worker
+    until PW_KEEPALIVE_TIMEOUT, so size the pool for the number of scrapers.
+
+ Async Engine
+    PW_ENGINE=async serves the same routes from a single asyncio event loop
+    instead of a thread per connection (HTTP/1.1 keep-alive, same idle timeout
+    and request cap as PW_KEEPALIVE). Requests that can be answered from memory
+    - fresh performance-cache hits, static web assets, /health - run directly
+    on the loop; anything that may call the gateway runs in a thread pool of
+    PW_MAX_WORKERS threads (default 8). Counters are shown in /stats under
+    "async_engine".
+
+ Gateway Request Budget
+    PW_RATE_LIMIT=N caps requests to the gateway (local API and TEDAPI requests
+    pypowerwall sends on a cache miss, and gateway web assets) at N per second
+    across all routes with a token bucket PW_RATE_BURST deep (default 10).
+    Answers pypowerwall serves from its own cache are free. The last
+    PW_RATE_RESERVE tokens (default 5) are kept for /control/* and the routes
+    dashboards scrape (/aggregates, /soe, /strings, /temps/pw, /alerts/pw, /pod,
+    /freq, /influx, /csv, /json, /vitals), which may also wait up to PW_TIMEOUT
+    for a token. Other routes are refused a call instead and
+    answered with their last good response (up to PW_CACHE_TTL old), so a
+    dashboard reload cannot trip the gateway's 429/503 cooldown. Counters are
+    shown in /stats and /health under "rate_limit".
+
+ Warm Restart
+    With PW_WARM_RESTART=yes the degradation and performance caches, plus the
+    TEDAPI DIN and config, are written every PW_WARM_RESTART_INTERVAL seconds
+    (default 10) and on shutdown to PW_WARM_RESTART_FILE (gzipped JSON,
+    default .powerwall.warm under PW_AUTH_PATH) with an atomic rename. At
+    startup a snapshot younger than PW_CACHE_TTL is restored and served while
+    the Powerwall connection is made in the background, so the first scrapes
+    after a container restart or upgrade are answered at once. Entries keep
+    their original timestamps and expire as if the proxy had not restarted.
+    Restored data is served for at most PW_WARM_RESTART_MAX_AGE seconds after
+    the snapshot was saved (default PW_CACHE_TTL); if the Powerwall is still
+    not connected by then, routes return no data as on any other outage.
+    Responses answered while serving restored data carry an X-Warm-Restart
+    header with the snapshot age, and are counted in /stats under
+    "warm_restart" ("served", "serving", "expired").
+
+ Worker Processes
+    PW_WORKERS=N (Linux/macOS) runs N HTTP worker processes that accept on
+    PW_PORT through SO_REUSEPORT, so busy installs are no longer limited to
+    one core by the GIL. The original process becomes the poller: it keeps
+    the only gateway connection and publishes the performance-cached routes
+    (/aggregates, /vitals, /strings, /pod, /freq, /json, /influx, ...) to
+    shared memory after every refresh. Workers answer those routes from
+    shared memory while they are younger than PW_CACHE_EXPIRE and relay
+    everything else - /control/*, other routes, web assets and streams - to
+    the poller over loopback, so the gateway still sees exactly one client.
+    The workers are forked by a small launcher process that is started before
+    any thread and replaces a worker that exits. Counters are shown in /stats
+    and /health under "workers"; requests the workers answered themselves are
+    added to "gets" and "uri" in /stats, the other counters are the poller's.
+    The poller logs relayed requests with the client address the worker saw.
+
+ Static Asset Cache
+    Files under proxy/web are loaded into memory at startup, with gzip (and
+    brotli, if the brotli package is installed) variants compressed once at
+    COMPRESS_LEVEL, and revalidated by mtime on each request. PW_STATIC_CACHE_MB
+    caps the memory used (assets past the cap load on first request and least
+    recently used assets are evicted first, default 0 = no cap). Set
+    PW_STATIC_CACHE=no to read every asset from disk.
+
  Telegraf Compatibility
     Key endpoints return null when no fresh or reasonably recent cached
     data is available, allowing telegraf to handle missing data appropriately:
@@ -90,20 +213,38 @@
     - CSV endpoints continue to return zero values for backwards compatibility
 
 """
+import asyncio
+import bisect
 import datetime
+import gzip
+import hashlib
 import hmac
 import html
+import http.client
+import io
 import json
 import logging
+import math
+import mmap
 import os
+import queue
 import resource
+import select
 import signal
+import socket
 import ssl
+import struct
 import sys
 import time
 import threading
+import zlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+from http import HTTPStatus
 from http.server import BaseHTTPRequestHandler, HTTPServer
 from socketserver import ThreadingMixIn
+from time import perf_counter
 from typing import Optional
 from urllib.parse import urlparse, parse_qs
 
@@ -115,14 +256,15 @@ import urllib3
 # 2. python proxy/server.py from project root (absolute package import works)
 # 3. Executing from within the proxy directory (plain module import)
 try:  # Prefer relative when executed as a package module
-    from .transform import get_static, inject_js  # type: ignore
+    from .transform import StaticAssetCache, get_static, inject_js  # type: ignore
 except ImportError:  # noqa: BLE001 - fall back to other strategies
     try:
-        from proxy.transform import get_static, inject_js  # type: ignore
+        from proxy.transform import StaticAssetCache, get_static, inject_js  # type: ignore
     except ImportError:  # noqa: BLE001
-        from transform import get_static, inject_js  # type: ignore  # Last resort
+        from transform import StaticAssetCache, get_static, inject_js  # type: ignore  # Last resort
 import pypowerwall
 from pypowerwall import parse_version
+from pypowerwall.local.pypowerwall_local import PyPowerwallLocal
 from pypowerwall.exceptions import (
     PyPowerwallInvalidConfigurationParameter,
     InvalidBatteryReserveLevelException,
@@ -140,7 +282,7 @@ from pypowerwall.fleetapi.exceptions import (
     PyPowerwallFleetAPIInvalidPayload,
 )
 
-BUILD = "t97"
+BUILD = "t98"
 ALLOWLIST = [
     "/api/status",
     "/api/site_info/site_name",
@@ -185,6 +327,23 @@ host = os.getenv("PW_HOST", "")
 timezone = os.getenv("PW_TIMEZONE", "America/Los_Angeles")
 debugmode = os.getenv("PW_DEBUG", "no").lower() == "yes"
 cache_expire = int(os.getenv("PW_CACHE_EXPIRE", "5"))
+
+
+def parse_cache_ttls(value):
+    """Parse PW_CACHE_EXPIRE_API ("/api/status=300,/api/solars=3600") into {api: seconds}."""
+    ttls = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        api, _, seconds = item.partition("=")
+        try:
+            ttls[api.strip()] = int(seconds)
+        except ValueError:
+            print(f"WARNING: PW_CACHE_EXPIRE_API entry '{item}' must be api=seconds, ignoring")
+    return ttls
+
+
+cache_expire_api = parse_cache_ttls(
+    os.getenv("PW_CACHE_EXPIRE_API", "")
+)  # Per-API pypowerwall cache expiry overriding PW_CACHE_EXPIRE and the slow-API defaults
 browser_cache = int(os.getenv("PW_BROWSER_CACHE", "0"))
 timeout = int(os.getenv("PW_TIMEOUT", "5"))
 pool_maxsize = int(os.getenv("PW_POOL_MAXSIZE", "15"))
@@ -232,6 +391,9 @@ health_check_enabled = (
 degradation_cache_ttl_seconds = int(
     os.getenv("PW_CACHE_TTL", "30")
 )  # Maximum age for cached data before returning None
+cache_max_bytes = int(
+    os.getenv("PW_CACHE_MAX_BYTES", "4194304")
+)  # Memory budget for the graceful degradation cache (0 = no cap)
 tedapi_recovery_enabled = (
     os.getenv("PW_TEDAPI_RECOVERY", "yes").lower() == "yes"
 )  # Auto-recover TEDAPI connection when proxy falls back to SolarOnly mode
@@ -242,6 +404,86 @@ except (ValueError, TypeError):
 TEDAPI_FALLBACK_THRESHOLD = 3  # consecutive probe failures before entering fallback mode
 TEDAPI_RECOVERY_INITIAL_INTERVAL = 60   # initial recovery retry interval (seconds)
 TEDAPI_RECOVERY_MAX_INTERVAL = 300      # cap on retry interval (seconds)
+prefetch_enabled = (
+    os.getenv("PW_PREFETCH", "no").lower() == "yes"
+)  # Refresh hot route snapshots in a background thread every PW_CACHE_EXPIRE seconds
+PREFETCH_IDLE_SECONDS = 300  # stop refreshing a route nobody has requested for this long
+compress_enabled = (
+    os.getenv("PW_COMPRESS", "yes").lower() == "yes"
+)  # gzip/deflate API responses for clients sending Accept-Encoding
+compress_min_bytes = int(
+    os.getenv("PW_COMPRESS_MIN_BYTES", "1024")
+)  # Smaller bodies (e.g. /soe) are sent uncompressed
+COMPRESS_LEVEL = 6  # zlib level - good ratio for JSON at a fraction of the level 9 CPU cost
+keepalive_enabled = (
+    os.getenv("PW_KEEPALIVE", "no").lower() == "yes"
+)  # HTTP/1.1 persistent connections - reuse one connection/thread for many requests
+keepalive_timeout = int(
+    os.getenv("PW_KEEPALIVE_TIMEOUT", "15")
+)  # Close idle keep-alive connections after this many seconds
+keepalive_max_requests = int(
+    os.getenv("PW_KEEPALIVE_MAX_REQUESTS", "100")
+)  # Close a keep-alive connection after this many requests (0 = no limit)
+engine = os.getenv("PW_ENGINE", "threaded").lower()  # "threaded" or "async"
+max_workers = int(
+    os.getenv("PW_MAX_WORKERS", "0")
+)  # Fixed request worker pool size (0 = one thread per connection)
+max_queue = int(
+    os.getenv("PW_MAX_QUEUE", "32")
+)  # Connections waiting for a worker before new ones are shed with 503
+SHED_RETRY_AFTER = 1  # seconds clients are asked to wait after a 503 shed
+BATCH_MAX_ROUTES = 20  # routes accepted in one /batch request
+BATCH_MAX_SNAPSHOTS = 16  # distinct /batch route lists kept in the performance cache
+BATCH_EXCLUDED = ("/batch", "/stats/clear", "/health/reset")  # GET routes with side effects
+ASYNC_DEFAULT_WORKERS = 8  # PW_ENGINE=async executor size when PW_MAX_WORKERS is not set
+ASYNC_INLINE_MARGIN = 1.0  # only serve cached routes on the event loop if fresh for this long
+stream_max_clients = int(
+    os.getenv("PW_STREAM_MAX_CLIENTS", "16")
+)  # Concurrent /stream/* subscribers before new ones get 503
+STREAM_HEARTBEAT = 15  # seconds between SSE keep-alive comments when nothing changed
+STREAM_RETRY_MS = 3000  # reconnect delay suggested to EventSource clients
+static_cache_enabled = (
+    os.getenv("PW_STATIC_CACHE", "yes").lower() == "yes"
+)  # Serve web UI assets from memory with precompressed variants
+static_cache_max_mb = int(
+    os.getenv("PW_STATIC_CACHE_MB", "0")
+)  # Memory cap for cached web assets, least recently used evicted first (0 = no cap)
+rate_limit = float(
+    os.getenv("PW_RATE_LIMIT", "0")
+)  # Gateway-wide budget of upstream calls per second across all routes (0 = no limit)
+rate_burst = int(
+    os.getenv("PW_RATE_BURST", "10")
+)  # Upstream calls allowed back to back before PW_RATE_LIMIT paces them
+rate_reserve = int(
+    os.getenv("PW_RATE_RESERVE", "5")
+)  # Tokens only priority routes may spend - other routes are served from cache instead
+# Routes allowed to spend the PW_RATE_RESERVE tokens and to wait (up to PW_TIMEOUT) for
+# the next one: control commands and the routes Telegraf and dashboards scrape
+RATE_PRIORITY_ROUTES = frozenset((
+    "/aggregates", "/api/meters/aggregates", "/soe", "/api/system_status/soe",
+    "/strings", "/temps/pw", "/alerts/pw", "/pod", "/freq", "/influx",
+    "/csv", "/json", "/vitals",
+))
+RATE_PRIORITY_PREFIXES = ("/control/",)
+warm_restart = (
+    os.getenv("PW_WARM_RESTART", "no").lower() == "yes"
+)  # Persist the proxy caches so a restart serves scrapes at once while it reconnects
+warm_restart_interval = int(
+    os.getenv("PW_WARM_RESTART_INTERVAL", "10")
+)  # Seconds between warm restart snapshots (also written on shutdown)
+warm_restart_file = os.getenv(
+    "PW_WARM_RESTART_FILE", os.path.join(authpath, ".powerwall.warm") if authpath else ".powerwall.warm"
+)
+warm_restart_max_age = int(
+    os.getenv("PW_WARM_RESTART_MAX_AGE", str(degradation_cache_ttl_seconds))
+)  # Seconds since it was saved that restored data is served while still connecting
+WARM_RESTART_VERSION = 1  # snapshot file format - files with another version are ignored
+workers = int(
+    os.getenv("PW_WORKERS", "0")
+)  # HTTP worker processes sharing one gateway poller process (0 = single process)
+WORKER_SHARED_BYTES = 8 * 1024 * 1024  # shared memory for the route snapshots published to workers
+WORKER_RELAY_TIMEOUT = 60  # seconds a worker waits on the poller for a relayed request
+WORKER_RESTART_DELAY = 1  # seconds before a worker process that exited is replaced
 
 # Global Stats
 proxystats = {
@@ -275,6 +517,7 @@ proxystats = {
         "PW_TIMEZONE": timezone,
         "PW_DEBUG": debugmode,
         "PW_CACHE_EXPIRE": cache_expire,
+        "PW_CACHE_EXPIRE_API": cache_expire_api,
         "PW_BROWSER_CACHE": browser_cache,
         "PW_TIMEOUT": timeout,
         "PW_POOL_MAXSIZE": pool_maxsize,
@@ -297,8 +540,29 @@ proxystats = {
         "PW_GRACEFUL_DEGRADATION": graceful_degradation,
         "PW_HEALTH_CHECK": health_check_enabled,
         "PW_CACHE_TTL": degradation_cache_ttl_seconds,
+        "PW_CACHE_MAX_BYTES": cache_max_bytes,
         "PW_TEDAPI_RECOVERY": tedapi_recovery_enabled,
         "PW_TEDAPI_PROBE_INTERVAL": TEDAPI_PROBE_INTERVAL,
+        "PW_PREFETCH": prefetch_enabled,
+        "PW_COMPRESS": compress_enabled,
+        "PW_COMPRESS_MIN_BYTES": compress_min_bytes,
+        "PW_KEEPALIVE": keepalive_enabled,
+        "PW_KEEPALIVE_TIMEOUT": keepalive_timeout,
+        "PW_KEEPALIVE_MAX_REQUESTS": keepalive_max_requests,
+        "PW_ENGINE": engine,
+        "PW_MAX_WORKERS": max_workers,
+        "PW_MAX_QUEUE": max_queue,
+        "PW_STREAM_MAX_CLIENTS": stream_max_clients,
+        "PW_STATIC_CACHE": static_cache_enabled,
+        "PW_STATIC_CACHE_MB": static_cache_max_mb,
+        "PW_RATE_LIMIT": rate_limit,
+        "PW_RATE_BURST": rate_burst,
+        "PW_RATE_RESERVE": rate_reserve,
+        "PW_WARM_RESTART": warm_restart,
+        "PW_WARM_RESTART_INTERVAL": warm_restart_interval,
+        "PW_WARM_RESTART_FILE": warm_restart_file,
+        "PW_WARM_RESTART_MAX_AGE": warm_restart_max_age,
+        "PW_WORKERS": workers,
     },
 }
 proxystats_lock = threading.RLock()
@@ -358,6 +622,15 @@ if graceful_degradation:
     )
 if health_check_enabled:
     log.info("Connection health monitoring enabled (PW_HEALTH_CHECK=yes)")
+if rate_limit > 0:
+    log.info(
+        f"Gateway request budget enabled (PW_RATE_LIMIT={rate_limit}/s, burst {rate_burst}, "
+        f"{rate_reserve} reserved for priority routes)"
+    )
+if prefetch_enabled:
+    log.info(
+        f"Background prefetch enabled (PW_PREFETCH=yes) - hot routes refreshed every {cache_expire}s"
+    )
 
 # Rate limiter for network error logging to prevent spam
 _error_counts = {}
@@ -440,18 +713,128 @@ _fallback_mode = {
 _fallback_mode_lock = threading.RLock()
 _fallback_recovery_lock = threading.Lock()  # serializes pw.connect() calls from recovery thread
 
-# Cache for last known good responses (graceful degradation)
-_last_good_responses = {}
+# Cache for last known good responses (graceful degradation): endpoint ->
+# (response, timestamp, nbytes) in refresh order, oldest first, so expired entries
+# and entries over PW_CACHE_MAX_BYTES are both popped from the front in O(1)
+_last_good_responses = OrderedDict()
+_degradation_cache_stats = {"bytes": 0, "evictions": 0, "expired": 0}
 _last_good_responses_lock = threading.RLock()
 
 # Performance cache for frequently-hit endpoints (separate from degradation cache)
 _performance_cache = {}
 _performance_cache_lock = threading.RLock()
 
+# Response compression counters - compressions run at most once per cached payload per
+# coding, "responses" counts every compressed body sent (cached or not)
+_compress_stats = {"compressions": 0, "responses": 0, "bytes_in": 0, "bytes_out": 0}
+_compress_stats_lock = threading.Lock()
+
+# Performance cache entry behind the response being built by this request thread
+# (set by cached_route_handler, read by Handler.do_GET to reuse body bytes and ETag).
+# "refresh" is set to the batch's tick start while /batch builds its snapshot, so routes
+# cached before that tick are fetched again and the batch reflects one pass.
+# "priority" / "throttled" carry the PW_RATE_LIMIT class of the route being served and
+# whether one of its upstream calls was refused (see call_route). "degraded" marks a
+# TickSnapshot field that must not be memoized (see TickSnapshot.get).
+_response_local = threading.local()
+
+# Active WorkerPoolHTTPServer (PW_MAX_WORKERS > 0), set by create_server()
+worker_pool = None
+
+# PW_WORKERS: route snapshots shared with the worker processes (SharedSnapshots) and the
+# processes themselves (WorkerProcesses), set by serve_workers(). _worker_publish wakes
+# the publisher thread after a performance cache fill; _worker_slot is set in a worker.
+shared_snapshots = None
+worker_processes = None
+_worker_publish = threading.Event()
+_worker_slot = None
+_poller_port = None
+
+# PW_ENGINE=async counters - "inline" requests ran on the event loop, "offloaded" in the executor
+_async_stats = {"connections": 0, "requests": 0, "inline": 0, "offloaded": 0, "executor_workers": 0}
+_async_stats_lock = threading.Lock()
+
+# Keep-alive connection counters (PW_KEEPALIVE=yes) - "reused" counts requests served
+# on an already open connection, "capped" connections closed at PW_KEEPALIVE_MAX_REQUESTS
+_keepalive_stats = {"connections": 0, "requests": 0, "reused": 0, "capped": 0}
+_keepalive_stats_lock = threading.Lock()
+
+# Rendered Power Flow index.html, memoized on its inputs (see render_index_page)
+_index_page = {"key": None, "content": None, "renders": 0, "hits": 0}
+_index_page_lock = threading.Lock()
+
+# Set once connect_backend() has connected pw - until then a warm restart serves the
+# caches restored from PW_WARM_RESTART_FILE (see WarmStartPowerwall), saved at _warm_saved
+_backend_ready = threading.Event()
+_warm_saved = None
+
+# Warm restart snapshot counters (PW_WARM_RESTART=yes) - "served" counts responses sent
+# with X-Warm-Restart, "expired" is set once PW_WARM_RESTART_MAX_AGE passed unconnected
+_warm_stats = {"restored_entries": 0, "restored_age": None, "saves": 0, "failures": 0,
+               "last_save_time": None, "last_save_bytes": 0, "served": 0, "expired": False}
+_warm_stats_lock = threading.Lock()
+
+# Per-tick gateway snapshot shared by /pod, /freq, /json and /csv (see tick_snapshot).
+# "snapshots" counts ticks started, "shared" renders served from an existing snapshot.
+_tick = {"snapshot": None}
+_tick_stats = {"snapshots": 0, "shared": 0, "retried": 0}
+_tick_lock = threading.Lock()
+
+# In-memory web UI asset cache (PW_STATIC_CACHE=yes) - assets loaded and compressed at startup
+static_assets = (
+    StaticAssetCache(web_root, static_cache_max_mb * 1024 * 1024, COMPRESS_LEVEL)
+    if static_cache_enabled else None
+)
+
+# Background prefetch (PW_PREFETCH=yes): cache_key -> generator / last request time.
+# Routes register themselves on first request and are dropped after PREFETCH_IDLE_SECONDS
+# without a request, so the refresher only polls what clients actually scrape.
+_prefetch_routes = {}
+_prefetch_stats = {
+    "refreshes": 0,
+    "failures": 0,
+    "snapshot_hits": 0,
+    "last_refresh_time": None,
+    "last_refresh_duration": None,
+}
+_prefetch_lock = threading.RLock()
+
+# Single-flight request coalescing: cache_key -> _Flight for the data_generator()
+# call currently in progress. "coalesced" counts gateway calls saved.
+_inflight = {}
+_coalesce_stats = {"leaders": 0, "coalesced": 0, "timeouts": 0}
+_inflight_lock = threading.Lock()
+
+# Server-Sent Events: stream path -> performance-cached route it publishes. The
+# stream thread re-runs each route with subscribers once per tick and, when the
+# ETag changes, serializes one event that every subscriber writes as-is.
+STREAM_ROUTES = {"/stream/aggregates": "/aggregates", "/stream/vitals": "/vitals"}
+_streams = {
+    route_path: {"seq": 0, "id": None, "event": None, "subscribers": 0}
+    for route_path in STREAM_ROUTES.values()
+}
+_stream_stats = {"events": 0, "unchanged": 0, "rejected": 0}
+_stream_async_waiters = set()  # (event loop, asyncio.Event) of PW_ENGINE=async subscribers
+_stream_cond = threading.Condition()
+_stream_thread = None
+
 # Endpoint call tracking for success/failure statistics
 _endpoint_stats = {}
 _endpoint_stats_lock = threading.RLock()
 
+# Prometheus /metrics: latency histograms per route and per gateway call, plus
+# cache lookup counters. Recording does the bucket search outside the lock and
+# only two integer updates inside it.
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+METRICS_MAX_SERIES = 100  # distinct labels per histogram - new ones beyond are counted as "other"
+_request_latency = {}  # route path -> _Histogram
+_upstream_latency = {}  # pypowerwall call -> _Histogram
+_cache_lookups = {
+    "performance": {"hit": 0, "miss": 0},
+    "degradation": {"hit": 0, "miss": 0},
+}
+_metrics_lock = threading.Lock()
+
 # Health thresholds
 HEALTH_FAILURE_THRESHOLD = 5  # consecutive failures before degraded mode
 HEALTH_RECOVERY_THRESHOLD = 3  # consecutive successes to exit degraded mode
@@ -602,6 +985,7 @@ def _tedapi_probe_and_recover():
                 with _fallback_recovery_lock:
                     try:
                         if pw.connect(retry=False):
+                            budget_gateway_requests(pw)
                             # Verify data flows after reconnect
                             version = pw.version()
                             if version is not None:
@@ -634,11 +1018,12 @@ def get_cached_response(endpoint):
 
     with _last_good_responses_lock:
         if endpoint in _last_good_responses:
-            cached_data, timestamp = _last_good_responses[endpoint]
+            cached_data, timestamp, _ = _last_good_responses[endpoint]
             age = time.time() - timestamp
             if age < degradation_cache_ttl_seconds:
                 if debugmode:
                     log.debug(f"Using cached response for {endpoint} (age: {age:.1f}s)")
+                count_cache_lookup("degradation", True)
                 return cached_data
             else:
                 # Cache expired - remove entry and return None
@@ -646,25 +1031,90 @@ def get_cached_response(endpoint):
                     log.debug(
                         f"Cache expired for {endpoint} (age: {age:.1f}s > {degradation_cache_ttl_seconds}s)"
                     )
-                del _last_good_responses[endpoint]
+                _degradation_cache_stats["bytes"] -= _last_good_responses.pop(endpoint)[2]
+                _degradation_cache_stats["expired"] += 1
+    count_cache_lookup("degradation", False)
     return None
 
 
+def payload_size(payload):
+    """Approximate memory used by a cached response (str, bytes, or parsed JSON) in bytes."""
+    size = sys.getsizeof(payload)
+    if isinstance(payload, dict):
+        size += sum(payload_size(k) + payload_size(v) for k, v in payload.items())
+    elif isinstance(payload, (list, tuple)):
+        size += sum(payload_size(v) for v in payload)
+    return size
+
+
 def cache_response(endpoint, response):
     """Cache successful response for graceful degradation."""
     if not graceful_degradation or response is None:
         return
 
+    nbytes = payload_size(response)
+    now = time.time()
     with _last_good_responses_lock:
-        _last_good_responses[endpoint] = (response, time.time())
-
-        # Limit cache size to prevent memory growth
-        if len(_last_good_responses) > 50:
-            # Remove oldest entries
-            oldest_key = min(
-                _last_good_responses.keys(), key=lambda k: _last_good_responses[k][1]
-            )
-            del _last_good_responses[oldest_key]
+        old = _last_good_responses.pop(endpoint, None)
+        if old is not None:
+            _degradation_cache_stats["bytes"] -= old[2]
+        if cache_max_bytes and nbytes > cache_max_bytes:
+            log.debug(f"Response for {endpoint} ({nbytes} bytes) exceeds PW_CACHE_MAX_BYTES - not cached")
+            return
+        # Re-inserting moves the endpoint to the back (most recently refreshed)
+        _last_good_responses[endpoint] = (response, now, nbytes)
+        _degradation_cache_stats["bytes"] += nbytes
+
+        # Sweep expired entries, then evict least recently refreshed ones over budget
+        while _last_good_responses:
+            oldest, (_, timestamp, size) = next(iter(_last_good_responses.items()))
+            if now - timestamp < degradation_cache_ttl_seconds:
+                break
+            del _last_good_responses[oldest]
+            _degradation_cache_stats["bytes"] -= size
+            _degradation_cache_stats["expired"] += 1
+        while cache_max_bytes and _degradation_cache_stats["bytes"] > cache_max_bytes:
+            _, (_, _, size) = _last_good_responses.popitem(last=False)
+            _degradation_cache_stats["bytes"] -= size
+            _degradation_cache_stats["evictions"] += 1
+
+
+class _CacheEntry:
+    """A performance cache entry: the response string plus its body bytes and ETag."""
+
+    __slots__ = ("data", "timestamp", "body", "etag", "variants")
+
+    def __init__(self, data, timestamp):
+        self.data = data
+        self.timestamp = timestamp
+        # Encode and hash once at fill time instead of on every hit
+        self.body = data.encode("utf8")
+        self.etag = '"{}"'.format(hashlib.sha1(self.body).hexdigest())
+        self.variants = {}  # content-coding -> compressed body, filled on first request
+
+    def representation(self, encoding):
+        """
+        Return the body and ETag for a content-coding, compressing on first use.
+
+        Args:
+            encoding: "gzip", "deflate" or None for the plain body
+
+        Returns:
+            Tuple of (body bytes, ETag) - each coding gets its own strong ETag
+        """
+        if encoding is None:
+            return self.body, self.etag
+        body = self.variants.get(encoding)
+        if body is None:
+            # Two threads racing here both compress once; the result is identical
+            body = self.variants[encoding] = compress_body(self.body, encoding)
+        return body, '{}-{}"'.format(self.etag[:-1], encoding)
+
+    def size(self):
+        """Approximate memory used by the entry in bytes."""
+        return (sys.getsizeof(self) + sys.getsizeof(self.data) + sys.getsizeof(self.body)
+                + sys.getsizeof(self.etag)
+                + sum(sys.getsizeof(v) for v in self.variants.values()))
 
 
 def get_performance_cached(cache_key):
@@ -679,19 +1129,22 @@ def get_performance_cached(cache_key):
         Cached response string if available and fresh, None otherwise
     """
     with _performance_cache_lock:
-        if cache_key not in _performance_cache:
-            return None
+        entry = _performance_cache.get(cache_key)
+    if entry is None:
+        count_cache_lookup("performance", False)
+        return None
 
-        data, timestamp = _performance_cache[cache_key]
-        age = time.time() - timestamp
+    age = time.time() - entry.timestamp
 
-        # Use standard cache_expire (same as pypowerwall's internal cache)
-        if age < cache_expire:
-            log.debug(f"Performance cache hit for {cache_key} (age: {age:.2f}s)")
-            return data
-        else:
-            log.debug(f"Performance cache expired for {cache_key} (age: {age:.2f}s)")
-            return None
+    # Use standard cache_expire (same as pypowerwall's internal cache)
+    if age < cache_expire:
+        log.debug(f"Performance cache hit for {cache_key} (age: {age:.2f}s)")
+        count_cache_lookup("performance", True)
+        return entry.data
+    else:
+        log.debug(f"Performance cache expired for {cache_key} (age: {age:.2f}s)")
+        count_cache_lookup("performance", False)
+        return None
 
 
 def cache_performance_response(cache_key, data):
@@ -702,9 +1155,309 @@ def cache_performance_response(cache_key, data):
         cache_key: The cache key (e.g., '/csv/v2', '/json', '/freq', '/pod')
         data: The response string to cache
     """
+    entry = _CacheEntry(data, time.time())
     with _performance_cache_lock:
-        _performance_cache[cache_key] = (data, time.time())
+        _performance_cache[cache_key] = entry
         log.debug(f"Cached performance response for {cache_key}")
+    if shared_snapshots is not None:
+        _worker_publish.set()
+
+
+def get_last_performance_value(cache_key, max_age):
+    """
+    Get the last cached response for cache_key regardless of cache_expire.
+
+    Args:
+        cache_key: The cache key (e.g., '/csv/v2', '/json', '/freq', '/pod')
+        max_age: Oldest entry (seconds) still worth serving
+
+    Returns:
+        Cached response string if younger than max_age, None otherwise
+    """
+    with _performance_cache_lock:
+        entry = _performance_cache.get(cache_key)
+    if entry is None:
+        return None
+    age = time.time() - entry.timestamp
+    if age >= max_age:
+        log.debug(f"Last performance value too old for {cache_key} (age: {age:.2f}s)")
+        return None
+    return entry.data
+
+
+def get_response_entry(message):
+    """
+    Return the performance cache entry this request thread served message from.
+
+    Args:
+        message: The response string about to be sent
+
+    Returns:
+        The _CacheEntry holding message (with pre-encoded body and ETag), None if
+        the response was not served from the performance cache
+    """
+    entry = getattr(_response_local, "entry", None)
+    if entry is not None and entry.data is message:
+        return entry
+    return None
+
+
+class SharedSnapshots:
+    """
+    Route snapshots the poller process publishes to its PW_WORKERS worker processes.
+
+    An anonymous shared mmap, inherited by the workers when they are forked, holds a
+    header - generation counter and payload length - followed by the JSON payload
+    {cache_key: [data, timestamp]}. The poller makes the generation odd while it copies
+    a payload in and even again when done (a seqlock): a worker that sees an odd or a
+    changed generation retries, so readers never wait on a lock a writer could hold.
+    """
+
+    HEADER = struct.Struct("<QQ")
+    READ_ATTEMPTS = 5
+
+    def __init__(self, size):
+        self.size = size
+        self._map = mmap.mmap(-1, size)
+        self._generation = 0
+        self._stats = {"publishes": 0, "bytes": 0, "oversize": 0}
+        # Worker side: entries decoded from generation _read_generation
+        self._read_generation = 0
+        self._entries = {}
+
+    def publish(self, snapshots):
+        """
+        Replace the published snapshots.
+
+        Args:
+            snapshots: Dict of cache_key -> (data, timestamp)
+
+        Returns:
+            Payload size in bytes, None if it does not fit in shared memory
+        """
+        payload = json.dumps(snapshots).encode("utf8")
+        if self.HEADER.size + len(payload) > self.size:
+            self._stats["oversize"] += 1
+            return None
+        writing = self._generation + 1
+        self.HEADER.pack_into(self._map, 0, writing, 0)
+        self._map[self.HEADER.size:self.HEADER.size + len(payload)] = payload
+        self.HEADER.pack_into(self._map, 0, writing + 1, len(payload))
+        self._generation = writing + 1
+        self._stats["publishes"] += 1
+        self._stats["bytes"] = len(payload)
+        return len(payload)
+
+    def entries(self):
+        """Return {cache_key: _CacheEntry} for the latest completely published generation."""
+        for _ in range(self.READ_ATTEMPTS):
+            generation, length = self.HEADER.unpack_from(self._map, 0)
+            if generation == self._read_generation:
+                return self._entries
+            if generation % 2 == 0:
+                payload = self._map[self.HEADER.size:self.HEADER.size + length]
+                if self.HEADER.unpack_from(self._map, 0)[0] == generation:
+                    previous = self._entries
+                    entries = {}
+                    for cache_key, (data, timestamp) in json.loads(payload).items():
+                        entry = previous.get(cache_key)
+                        if entry is None or entry.timestamp != timestamp:
+                            # Unchanged entries keep their compressed variants
+                            entry = _CacheEntry(data, timestamp)
+                        entries[cache_key] = entry
+                    self._entries, self._read_generation = entries, generation
+                    return entries
+            time.sleep(0)
+        # The poller is mid-publish - the previous generation is still consistent
+        return self._entries
+
+    def get(self, cache_key, max_age):
+        """Return the published _CacheEntry for cache_key if younger than max_age, else None."""
+        entry = self.entries().get(cache_key)
+        if entry is None or time.time() - entry.timestamp >= max_age:
+            return None
+        return entry
+
+    def status(self):
+        """Publish counters and the current generation for /stats."""
+        return dict(self._stats, generation=self._generation)
+
+
+def publish_worker_snapshots():
+    """
+    Copy the fresh performance cache entries of registered routes to shared memory.
+
+    Only entries younger than PW_CACHE_EXPIRE are published - older ones are relayed
+    to the poller by the workers, which refreshes (or degrades) them as usual.
+    """
+    keys = {r.cache_key for r in list(_routes.values()) + _prefix_routes if r.cache_key}
+    now = time.time()
+    with _performance_cache_lock:
+        snapshots = {
+            cache_key: (entry.data, entry.timestamp)
+            for cache_key, entry in _performance_cache.items()
+            if cache_key in keys and now - entry.timestamp < cache_expire
+        }
+    if shared_snapshots.publish(snapshots) is None and shared_snapshots.status()["oversize"] == 1:
+        log.warning(f"Route snapshots do not fit in {WORKER_SHARED_BYTES} bytes of shared memory - "
+                    "workers relay those requests to the poller")
+
+
+def _publish_loop():
+    """Background thread: publish route snapshots to the workers after each cache fill."""
+    while True:
+        try:
+            _worker_publish.wait()
+            _worker_publish.clear()
+            publish_worker_snapshots()
+        except (KeyboardInterrupt, SystemExit):
+            break
+        except Exception as exc:
+            log.error(f"Worker snapshot publish error: {exc}")
+            time.sleep(1)
+
+
+def negotiate_encoding(accept_encoding, codings=("gzip", "deflate")):
+    """
+    Pick a response content-coding from an Accept-Encoding request header.
+
+    Args:
+        accept_encoding: The Accept-Encoding header value (None if absent)
+        codings: Codings available for the response, most preferred first
+
+    Returns:
+        The accepted coding with the highest q-value (earlier codings win ties),
+        None for identity
+    """
+    if not accept_encoding:
+        return None
+    qvalues = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        qvalues[coding.strip().lower()] = q
+    wildcard = qvalues.get("*", 0.0)
+    best, best_q = None, 0.0
+    for coding in codings:
+        q = qvalues.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress_body(body, encoding):
+    """
+    Compress a response body for the given content-coding.
+
+    Args:
+        body: Encoded response bytes
+        encoding: "gzip" or "deflate" (zlib format, as HTTP defines it)
+
+    Returns:
+        Compressed bytes
+    """
+    if encoding == "gzip":
+        # mtime=0 keeps the output (and its ETag) identical across compressions
+        compressed = gzip.compress(body, compresslevel=COMPRESS_LEVEL, mtime=0)
+    else:
+        compressed = zlib.compress(body, COMPRESS_LEVEL)
+    with _compress_stats_lock:
+        _compress_stats["compressions"] += 1
+        _compress_stats["bytes_in"] += len(body)
+        _compress_stats["bytes_out"] += len(compressed)
+    return compressed
+
+
+def etag_matches(if_none_match, etag):
+    """
+    Check an If-None-Match request header against an ETag (weak comparison).
+
+    Args:
+        if_none_match: The If-None-Match header value (None if absent)
+        etag: The quoted ETag of the current response
+
+    Returns:
+        True if the client already holds the current response
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+class _Flight:
+    """A data_generator() call in progress, shared by all threads asking for the same key."""
+
+    __slots__ = ("done", "result", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.waiters = 0
+
+
+def single_flight(cache_key, data_generator):
+    """
+    Run data_generator() at most once at a time per cache key and cache the result.
+
+    The first thread to miss becomes the leader and calls the gateway; concurrent
+    threads for the same key wait for the leader's result instead of issuing their
+    own calls. A waiter that times out after PW_TIMEOUT seconds falls back to the
+    last cached value (if younger than PW_CACHE_TTL).
+
+    Args:
+        cache_key: The cache key to use for this route
+        data_generator: Function that generates the response data
+
+    Returns:
+        Fresh (or coalesced) response data, None if no data is available
+    """
+    with _inflight_lock:
+        flight = _inflight.get(cache_key)
+        leader = flight is None
+        if leader:
+            flight = _inflight[cache_key] = _Flight()
+            _coalesce_stats["leaders"] += 1
+        else:
+            flight.waiters += 1
+            _coalesce_stats["coalesced"] += 1
+
+    if leader:
+        was_throttled = getattr(_response_local, "throttled", False)
+        _response_local.throttled = False
+        try:
+            result = data_generator()
+            # Only cache non-None results built without a call refused by PW_RATE_LIMIT,
+            # so the entry stays the last complete response
+            if result is not None and not _response_local.throttled:
+                cache_performance_response(cache_key, result)
+            flight.result = result
+            return result
+        finally:
+            _response_local.throttled = was_throttled or _response_local.throttled
+            with _inflight_lock:
+                del _inflight[cache_key]
+            flight.done.set()
+
+    if flight.done.wait(timeout):
+        return flight.result
+    with _inflight_lock:
+        _coalesce_stats["timeouts"] += 1
+    log.debug(f"Timed out waiting for in-flight {cache_key} - serving last value")
+    return get_last_performance_value(cache_key, degradation_cache_ttl_seconds)
 
 
 def performance_cached(cache_key):
@@ -719,19 +1472,7 @@ def performance_cached(cache_key):
     """
     def decorator(func):
         def wrapper(*args, **kwargs):
-            # Try cache first
-            cached_response = get_performance_cached(cache_key)
-            if cached_response is not None:
-                return cached_response
-
-            # Cache miss - generate fresh data
-            result = func(*args, **kwargs)
-
-            # Only cache non-None results
-            if result is not None:
-                cache_performance_response(cache_key, result)
-
-            return result
+            return cached_route_handler(cache_key, lambda: func(*args, **kwargs))
 
         return wrapper
     return decorator
@@ -748,19 +1489,259 @@ def cached_route_handler(cache_key, data_generator):
     Returns:
         Cached response if available, otherwise fresh data (and caches it)
     """
+    refresh_since = getattr(_response_local, "refresh", None)
+    if refresh_since is not None:
+        # Building a /batch snapshot - skip entries cached before the batch's tick so all
+        # routes in the batch come from the same pass (still coalesced and cached)
+        with _performance_cache_lock:
+            entry = _performance_cache.get(cache_key)
+        if entry is not None and entry.timestamp >= refresh_since:
+            count_cache_lookup("performance", True)
+            return _note_response_entry(cache_key, entry.data)
+        fresh = single_flight(cache_key, data_generator)
+        if fresh is None:
+            # Gateway unavailable - the entry that is still within cache_expire beats null
+            fresh = get_last_performance_value(cache_key, cache_expire)
+        return _note_response_entry(cache_key, fresh)
+
+    if warm_restart_age() is not None:
+        # Warm restart still connecting - serve the snapshot restored from disk
+        snapshot = get_last_performance_value(cache_key, degradation_cache_ttl_seconds)
+        if snapshot is not None:
+            return _note_response_entry(cache_key, snapshot)
+
+    if prefetch_enabled:
+        # Stale-while-revalidate: serve the latest background snapshot (up to
+        # PW_CACHE_TTL old) and leave the refresh to the prefetch thread
+        snapshot = get_prefetch_snapshot(cache_key, data_generator)
+        if snapshot is not None:
+            return _note_response_entry(cache_key, snapshot)
+
     # Try cache first
     cached_response = get_performance_cached(cache_key)
-    if cached_response is not None:
-        return cached_response
+    if cached_response is None:
+        # Cache miss - generate fresh data (coalesced with concurrent misses)
+        cached_response = single_flight(cache_key, data_generator)
+    return _note_response_entry(cache_key, cached_response)
 
-    # Cache miss - generate fresh data
-    result = data_generator()
 
-    # Only cache non-None results
-    if result is not None:
-        cache_performance_response(cache_key, result)
+def _note_response_entry(cache_key, data):
+    """Remember the cache entry behind data so do_GET can reuse its body and ETag."""
+    with _performance_cache_lock:
+        _response_local.entry = _performance_cache.get(cache_key)
+    return data
 
-    return result
+
+def get_prefetch_snapshot(cache_key, data_generator):
+    """
+    Register a route with the background refresher and return its latest snapshot.
+
+    Args:
+        cache_key: The performance cache key for the route
+        data_generator: Function the refresher calls to rebuild the snapshot
+
+    Returns:
+        Snapshot string if one exists and is younger than PW_CACHE_TTL, None otherwise
+    """
+    with _prefetch_lock:
+        _prefetch_routes[cache_key] = (data_generator, time.time())
+
+    data = get_last_performance_value(cache_key, degradation_cache_ttl_seconds)
+    if data is not None:
+        with _prefetch_lock:
+            _prefetch_stats["snapshot_hits"] += 1
+        count_cache_lookup("performance", True)
+    return data
+
+
+def refresh_prefetch_routes():
+    """
+    Rebuild the snapshot of every registered prefetch route once.
+
+    Routes that have not been requested within PREFETCH_IDLE_SECONDS are dropped.
+    A generator returning None (gateway unavailable) leaves the previous snapshot
+    in place so request threads keep serving it until it ages past PW_CACHE_TTL.
+    """
+    start = time.time()
+    with _prefetch_lock:
+        for key in [k for k, (_, seen) in _prefetch_routes.items() if start - seen > PREFETCH_IDLE_SECONDS]:
+            log.debug(f"Prefetch route idle, no longer refreshed: {key}")
+            del _prefetch_routes[key]
+        routes = [(k, gen) for k, (gen, _) in _prefetch_routes.items()]
+
+    failures = 0
+    for cache_key, data_generator in routes:
+        _response_local.priority = is_priority_route(cache_key)
+        try:
+            # Shares the in-flight call with any request thread that missed
+            result = single_flight(cache_key, data_generator)
+        except Exception as exc:
+            log.debug(f"Prefetch refresh failed for {cache_key}: {exc}")
+            result = None
+        if result is None:
+            failures += 1
+
+    with _prefetch_lock:
+        _prefetch_stats["refreshes"] += 1
+        _prefetch_stats["failures"] += failures
+        _prefetch_stats["last_refresh_time"] = time.time()
+        _prefetch_stats["last_refresh_duration"] = round(time.time() - start, 3)
+
+
+def _prefetch_loop():
+    """
+    Background thread: refresh hot route snapshots every PW_CACHE_EXPIRE seconds.
+
+    Request threads only read the snapshots (see get_prefetch_snapshot), so the gateway
+    sees at most one fetch per route per tick no matter how many clients scrape.
+    """
+    while True:
+        try:
+            start = time.time()
+            refresh_prefetch_routes()
+            # Keep a steady cadence - a slow gateway shortens the sleep instead of
+            # stretching the tick
+            time.sleep(max(1.0, cache_expire - (time.time() - start)))
+        except (KeyboardInterrupt, SystemExit):
+            break
+        except Exception as exc:
+            log.debug(f"Prefetch thread unexpected error: {exc}")
+            time.sleep(cache_expire)
+
+
+def format_stream_event(route_path, entry):
+    """Serialize a performance cache entry as one SSE event (bytes)."""
+    event_id = entry.etag.strip('"')
+    lines = b"".join(b"data: " + line + b"\n" for line in entry.body.split(b"\n"))
+    return event_id, b"event: %s\nid: %s\n%s\n" % (
+        route_path.strip("/").encode(), event_id.encode(), lines
+    )
+
+
+def publish_stream_event(route_path, entry):
+    """
+    Publish a new snapshot to the subscribers of route_path if it changed.
+
+    Args:
+        route_path: Streamed route, e.g. "/aggregates"
+        entry: _CacheEntry holding the snapshot body and ETag
+
+    Returns:
+        True if subscribers were woken, False if the snapshot was unchanged
+    """
+    with _stream_cond:
+        stream = _streams[route_path]
+        if stream["id"] == entry.etag.strip('"'):
+            _stream_stats["unchanged"] += 1
+            return False
+        # Serialized once here - every subscriber writes the same bytes
+        stream["id"], stream["event"] = format_stream_event(route_path, entry)
+        stream["seq"] += 1
+        _stream_stats["events"] += 1
+        _stream_cond.notify_all()
+        waiters = list(_stream_async_waiters)
+    for loop, waiter in waiters:
+        try:
+            loop.call_soon_threadsafe(waiter.set)
+        except RuntimeError:
+            # Event loop already closed (shutdown) - drop its subscriber
+            with _stream_cond:
+                _stream_async_waiters.discard((loop, waiter))
+    return True
+
+
+def refresh_streams():
+    """Run every streamed route that has subscribers once and publish changes."""
+    with _stream_cond:
+        active = [r for r, stream in _streams.items() if stream["subscribers"] > 0]
+    for route_path in active:
+        get_route = resolve_route(route_path)
+        try:
+            result = call_route(get_route, route_path, "")
+        except Exception as exc:
+            log.debug(f"Stream refresh failed for {route_path}: {exc}")
+            result = None
+        if result is None:
+            # Gateway unavailable - subscribers keep the last event
+            continue
+        with _performance_cache_lock:
+            entry = _performance_cache.get(get_route.cache_key)
+        if entry is None or entry.data is not result:
+            entry = _CacheEntry(result, time.time())
+        publish_stream_event(route_path, entry)
+
+
+def _stream_loop():
+    """
+    Background thread: refresh streamed routes every PW_CACHE_EXPIRE seconds.
+
+    Sleeps while nobody is subscribed; a new subscriber wakes it so the first
+    event is sent right away instead of on the next tick.
+    """
+    while True:
+        try:
+            with _stream_cond:
+                _stream_cond.wait_for(
+                    lambda: any(stream["subscribers"] for stream in _streams.values())
+                )
+            start = time.time()
+            refresh_streams()
+            with _stream_cond:
+                _stream_cond.wait(max(1.0, cache_expire - (time.time() - start)))
+        except (KeyboardInterrupt, SystemExit):
+            break
+        except Exception as exc:
+            log.debug(f"Stream thread unexpected error: {exc}")
+            time.sleep(cache_expire)
+
+
+def subscribe_stream(route_path):
+    """
+    Register a subscriber for route_path and start the stream thread if needed.
+
+    Returns:
+        False if PW_STREAM_MAX_CLIENTS subscribers are already connected
+    """
+    global _stream_thread
+    with _stream_cond:
+        if sum(stream["subscribers"] for stream in _streams.values()) >= stream_max_clients:
+            _stream_stats["rejected"] += 1
+            return False
+        _streams[route_path]["subscribers"] += 1
+        if _stream_thread is None:
+            _stream_thread = threading.Thread(target=_stream_loop, name="stream", daemon=True)
+            _stream_thread.start()
+        _stream_cond.notify_all()
+    return True
+
+
+def unsubscribe_stream(route_path):
+    """Drop a subscriber registered with subscribe_stream()."""
+    with _stream_cond:
+        _streams[route_path]["subscribers"] -= 1
+
+
+def wait_stream_event(route_path, seq, wait):
+    """
+    Wait up to wait seconds for an event newer than seq.
+
+    Returns:
+        Tuple of (latest seq, event bytes) - event is None if nothing new arrived
+    """
+    with _stream_cond:
+        stream = _streams[route_path]
+        if not _stream_cond.wait_for(lambda: stream["seq"] != seq, wait):
+            return seq, None
+        return stream["seq"], stream["event"]
+
+
+def stream_start_seq(route_path, last_event_id):
+    """Sequence a new subscriber starts from - skips the current event if it already has it."""
+    with _stream_cond:
+        stream = _streams[route_path]
+        if last_event_id and last_event_id == stream["id"]:
+            return stream["seq"]
+    return 0
 
 
 def track_endpoint_call(endpoint, success=True):
@@ -798,6 +1779,213 @@ def track_endpoint_call(endpoint, success=True):
             del _endpoint_stats[oldest_endpoint]
 
 
+class _Histogram:
+    """Fixed-bucket latency histogram (per-bucket counts, cumulated when rendered)."""
+
+    __slots__ = ("counts", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)  # last slot is +Inf
+        self.sum = 0.0
+
+
+def observe_latency(histograms, label, seconds):
+    """
+    Record a latency sample for /metrics.
+
+    Args:
+        histograms: _request_latency or _upstream_latency
+        label: Route path or pypowerwall call name
+        seconds: Elapsed time in seconds
+    """
+    index = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+    with _metrics_lock:
+        histogram = histograms.get(label)
+        if histogram is None:
+            if len(histograms) >= METRICS_MAX_SERIES:
+                # Cap reached - aggregate new labels under "other"
+                label = "other"
+                histogram = histograms.get(label)
+            if histogram is None:
+                histogram = histograms[label] = _Histogram()
+        histogram.counts[index] += 1
+        histogram.sum += seconds
+
+
+def count_cache_lookup(cache, hit):
+    """Count a "performance" or "degradation" cache lookup for /metrics."""
+    with _metrics_lock:
+        _cache_lookups[cache]["hit" if hit else "miss"] += 1
+
+
+def _metric_label(value):
+    """Escape a Prometheus label value."""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def render_metrics():
+    """Render latency histograms and cache counters in Prometheus text format."""
+    # Copy under the lock, format outside it
+    with _metrics_lock:
+        histograms = [
+            ("pypowerwall_proxy_request_duration_seconds", "route",
+             "Time to serve a GET request by route",
+             [(k, list(h.counts), h.sum) for k, h in _request_latency.items()]),
+            ("pypowerwall_proxy_upstream_duration_seconds", "call",
+             "Time spent in pypowerwall calls to the gateway or cloud",
+             [(k, list(h.counts), h.sum) for k, h in _upstream_latency.items()]),
+        ]
+        lookups = {cache: dict(counts) for cache, counts in _cache_lookups.items()}
+
+    lines = [
+        "# HELP pypowerwall_proxy_info pyPowerwall proxy version",
+        "# TYPE pypowerwall_proxy_info gauge",
+        'pypowerwall_proxy_info{version="%s",build="%s"} 1' % (
+            _metric_label(pypowerwall.version), _metric_label(BUILD)),
+    ]
+    for name, label_name, help_text, series in histograms:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} histogram")
+        for label, counts, total in sorted(series):
+            label = f'{label_name}="{_metric_label(label)}"'
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{label}}} {total:.6f}")
+            lines.append(f"{name}_count{{{label}}} {cumulative}")
+    lines.append("# HELP pypowerwall_proxy_cache_lookups_total Cache lookups by cache and result")
+    lines.append("# TYPE pypowerwall_proxy_cache_lookups_total counter")
+    for cache, counts in lookups.items():
+        for result, count in counts.items():
+            lines.append(
+                f'pypowerwall_proxy_cache_lookups_total{{cache="{cache}",result="{result}"}} {count}'
+            )
+    return "\n".join(lines) + "\n"
+
+
+def _upstream_label(pw_func, args):
+    """Histogram label for a pypowerwall call - poll() is split by URI."""
+    func_name = getattr(pw_func, "__name__", str(pw_func))
+    if func_name == "poll" and args and args[0]:
+        return f"poll {args[0]}"
+    return func_name
+
+
+class TokenBucket:
+    """
+    Gateway-wide budget of upstream calls (PW_RATE_LIMIT per second, PW_RATE_BURST deep).
+
+    Priority calls may spend every token and wait for the next one; other calls only
+    take tokens above the PW_RATE_RESERVE floor and are refused at once, so they are
+    answered from cache instead of spending the budget Telegraf and control need.
+    """
+
+    def __init__(self, rate, burst, reserve):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.reserve = min(max(0, reserve), self.burst - 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+        self._stats = {"priority_calls": 0, "other_calls": 0, "throttled": 0,
+                       "waits": 0, "wait_seconds": 0.0}
+
+    def acquire(self, priority, max_wait):
+        """
+        Take one token for an upstream call.
+
+        Args:
+            priority: True for RATE_PRIORITY_ROUTES and /control/* calls
+            max_wait: Longest a priority call may wait for a token (seconds)
+
+        Returns:
+            True if the call may go ahead, False if it should be served from cache
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            wait = 0.0
+            if self.tokens - 1 < (0 if priority else self.reserve):
+                wait = (1 - self.tokens) / self.rate
+                if not priority or wait > max_wait:
+                    self._stats["throttled"] += 1
+                    return False
+                # Book the token now (tokens go negative) so concurrent priority
+                # calls queue up behind this one instead of all waking together
+                self._stats["waits"] += 1
+                self._stats["wait_seconds"] += wait
+            self.tokens -= 1
+            self._stats["priority_calls" if priority else "other_calls"] += 1
+        if wait:
+            time.sleep(wait)
+        return True
+
+    def status(self):
+        """Budget settings, remaining tokens and counters for /stats and /health."""
+        with self._lock:
+            return dict(self._stats, rate=self.rate, burst=self.burst, reserve=self.reserve,
+                        tokens=round(self.tokens, 2), wait_seconds=round(self._stats["wait_seconds"], 3))
+
+
+# Gateway-wide request budget (PW_RATE_LIMIT > 0)
+upstream_budget = TokenBucket(rate_limit, rate_burst, rate_reserve) if rate_limit > 0 else None
+
+
+def is_priority_route(path):
+    """True if path may spend the PW_RATE_RESERVE tokens (RATE_PRIORITY_ROUTES, /control/*)."""
+    return path in RATE_PRIORITY_ROUTES or path.startswith(RATE_PRIORITY_PREFIXES)
+
+
+def spend_upstream_budget():
+    """
+    Take a PW_RATE_LIMIT token for an upstream call made by this thread.
+
+    Uses the priority of the route being served (threads outside a request, e.g.
+    startup, count as priority). A refused call is flagged on the thread so
+    call_route() can answer from cache.
+
+    Returns:
+        True if the call may reach the gateway
+    """
+    if upstream_budget is None:
+        return True
+    if upstream_budget.acquire(getattr(_response_local, "priority", True), timeout):
+        return True
+    _response_local.throttled = True
+    return False
+
+
+def _budgeted(request_func):
+    """Wrap a pypowerwall request method so each call spends a PW_RATE_LIMIT token first."""
+    @wraps(request_func)
+    def request(*args, **kwargs):
+        if not spend_upstream_budget():
+            # Over the gateway-wide budget - answer like a failed request,
+            # call_route() falls back to cached data
+            return None
+        return request_func(*args, **kwargs)
+    request.budgeted = True
+    return request
+
+
+def budget_gateway_requests(powerwall):
+    """
+    Charge the PW_RATE_LIMIT budget where requests actually leave for the gateway.
+
+    Wraps the local client's _fetch() and TEDAPI's _post_tedapi() on this connection,
+    so answers pypowerwall serves from its own cache are free. Called after every
+    (re)connect since pw.connect() builds new client objects.
+    """
+    if upstream_budget is None or powerwall is None:
+        return
+    for backend, name in ((powerwall.client, "_fetch"), (powerwall.tedapi, "_post_tedapi")):
+        request_func = getattr(backend, name, None) if backend else None
+        if request_func is not None and not getattr(request_func, "budgeted", False):
+            setattr(backend, name, _budgeted(request_func))
+
+
 # Global wrapper for pypowerwall function calls
 def safe_pw_call(pw_func, *args, **kwargs):
     """
@@ -827,6 +2015,7 @@ def safe_pw_call(pw_func, *args, **kwargs):
             if _connection_health["is_degraded"]:
                 return None
 
+    call_start = perf_counter()
     try:
         result = pw_func(*args, **kwargs)
 
@@ -908,6 +2097,9 @@ def safe_pw_call(pw_func, *args, **kwargs):
         with proxystats_lock:
             proxystats["errors"] = proxystats["errors"] + 1
         return None
+    finally:
+        observe_latency(_upstream_latency, _upstream_label(pw_func, args),
+                        perf_counter() - call_start)
 
 
 def safe_endpoint_call(endpoint_name, pw_func, *args, jsonformat=True, **kwargs):
@@ -930,10 +2122,18 @@ def safe_endpoint_call(endpoint_name, pw_func, *args, jsonformat=True, **kwargs)
     cache_key = f"{endpoint_name}:json" if jsonformat else endpoint_name
 
     # Try to get fresh data
+    was_throttled = getattr(_response_local, "throttled", False)
+    _response_local.throttled = False
     if jsonformat:
         result = safe_pw_call(pw_func, *args, jsonformat=True, **kwargs)
     else:
         result = safe_pw_call(pw_func, *args, **kwargs)
+    throttled = _response_local.throttled
+    _response_local.throttled = was_throttled or throttled
+
+    # Powerwall.poll(jsonformat=True) dumps a failed call as the string "null"
+    if jsonformat and result == "null":
+        result = None
 
     # Only treat as a true success if result is not None and is not a cached response
     if result is not None:
@@ -941,13 +2141,15 @@ def safe_endpoint_call(endpoint_name, pw_func, *args, jsonformat=True, **kwargs)
         track_endpoint_call(endpoint_name, success=True)
         return result
 
-    # Failed to get fresh data - track failure
-    track_endpoint_call(endpoint_name, success=False)
+    # Failed to get fresh data - track failure (a call refused by PW_RATE_LIMIT is not one)
+    if not throttled:
+        track_endpoint_call(endpoint_name, success=False)
 
     # Try cached response (do NOT reset consecutive_failures if using cache)
     cached_result = get_cached_response(cache_key)
     if cached_result is not None:
         # Do not call update_connection_health(success=True) here
+        _response_local.degraded = True  # not fresh - TickSnapshot does not memoize it
         return cached_result
 
     # No fresh or cached data available
@@ -983,9 +2185,9 @@ signal.signal(signal.SIGTERM, sig_term_handle)
 # handles reaping automatically; this handler is kept as a safety net for bare
 # invocations where the server itself is PID 1.
 #
-# This server currently spawns no child processes of its own. The WNOHANG flag
-# ensures only already-exited children are collected; if subprocess use is added
-# later, review whether a shared SIGCHLD handler remains appropriate.
+# The only child process of the server itself is the PW_WORKERS launcher, which
+# collects its worker processes itself (WorkerProcesses).
+# The WNOHANG flag ensures only already-exited children are collected.
 # A targeted waitpid(WNOHANG) loop is preferred over signal.SIG_IGN so that
 # exit status is not silently discarded.
 # noinspection PyUnusedLocal
@@ -1016,136 +2218,593 @@ def get_value(a, key):
         return None
 
 
-# Connect to Powerwall
-# TODO: Add support for multiple Powerwalls
-try:
-    pw = pypowerwall.Powerwall(
-        host=host,
-        password=password,
-        email=email,
-        timezone=timezone,
-        pwcacheexpire=cache_expire,
-        timeout=timeout,
-        poolmaxsize=pool_maxsize,
-        siteid=siteid,
-        authpath=authpath,
-        authmode=authmode,
-        cachefile=cachefile,
-        auto_select=True,
-        retry_modes=True,
-        gw_pwd=gw_pwd,
-        rsa_key_path=rsa_key_path,
-        wifi_host=wifi_host,
-        tedapi_api_version=tedapi_api_version,
-    )
-except Exception as e:
-    log.error(f"Powerwall Connection Error: {str(e)}")
-    log.error("Fatal Error: Unable to connect. Please fix config and restart.")
-    while True:
-        try:
-            time.sleep(5)  # Infinite loop to keep container running
-        except (KeyboardInterrupt, SystemExit):
-            sys.exit(0)
+# battery_blocks fields read by /pod and /freq
+BLOCK_KEYS = (
+    "PackagePartNumber", "PackageSerialNumber", "nominal_energy_remaining",
+    "nominal_full_pack_energy", "pinv_state", "pinv_grid_state", "p_out", "q_out",
+    "v_out", "f_out", "i_out", "energy_charged", "energy_discharged", "off_grid",
+    "vf_mode", "wobble_detected", "charge_power_clamped", "backup_ready",
+    "OpSeqState", "version",
+)
 
-site_name = safe_pw_call(pw.site_name) or "Unknown"
-if pw.cloudmode or pw.fleetapi:
-    if pw.fleetapi:
-        proxystats["mode"] = "FleetAPI"
-        log.info("pyPowerwall Proxy Server - FleetAPI Mode")
-    else:
-        proxystats["mode"] = "Cloud"
-        log.info("pyPowerwall Proxy Server - Cloud Mode")
-    log.info("Connected to Site ID %s (%s)" % (pw.client.siteid, site_name.strip()))
-    if siteid is not None and siteid != str(pw.client.siteid):
-        log.info("Switch to Site ID %s" % siteid)
-        if not pw.client.change_site(siteid):
-            log.error("Fatal Error: Unable to connect. Please fix config and restart.")
-            while True:
-                try:
-                    time.sleep(5)  # Infinite loop to keep container running
-                except (KeyboardInterrupt, SystemExit):
-                    sys.exit(0)
-else:
-    log.info("pyPowerwall Proxy Server - Local Mode")
-    log.info("Connected to Energy Gateway %s (%s)" % (host, site_name.strip()))
-    if pw.tedapi:
-        proxystats["tedapi"] = True
-        proxystats["tedapi_mode"] = pw.tedapi_mode
-        proxystats["tedapi_api_version"] = pw.tedapi_api_version
-        proxystats["pw3"] = pw.tedapi.pw3
-        log.info(f"TEDAPI Mode Enabled for Device Vitals ({pw.tedapi_mode}, queries={pw.tedapi_api_version})")
-    # Set mode string with transport detail
-    def build_mode_string(control=False):
-        """Build mode display string from active transports."""
-        if not pw.tedapi:
-            return "Local"
-        parts = [pw.tedapi_mode]
-        tedapi = pw.tedapi
-        if getattr(tedapi, 'v1r', False) and getattr(tedapi, 'wifi_session', None):
-            parts.append("wifi")
-        if control:
-            parts.append("control")
-        return f"Local ({'+'.join(parts)})"
-    proxystats["mode"] = build_mode_string()
 
-pw_control = None
-if control_secret:
-    log.info("Control Commands Activating - WARNING: Use with caution!")
-    try:
-        if pw.cloudmode or pw.fleetapi:
-            pw_control = pw
-        elif pw.tedapi and pw.tedapi.v1r:
-            pw_control = pw
-            log.info("Control Mode: Using TEDapi LAN control (v1r filestore)")
-        else:
-            pw_control = pypowerwall.Powerwall(
-                "",
-                password,
-                email,
-                siteid=siteid,
-                authpath=authpath,
-                authmode=authmode,
-                cachefile=cachefile,
-                auto_select=True,
-            )
-    except Exception as e:
-        log.error("Control Mode Failed: Unable to connect to cloud - Run Setup")
-        control_secret = ""
-    if pw_control:
-        if pw.tedapi and pw.tedapi.v1r and not pw.cloudmode and not pw.fleetapi:
-            log.info(f"Control Mode Enabled: LAN Mode ({pw.tedapi_mode}+control)")
-        else:
-            log.info(f"Control Mode Enabled: Cloud Mode ({pw_control.mode}) Connected")
-        # Update mode string to include control transport
-        if not pw.cloudmode and not pw.fleetapi and pw.tedapi:
-            proxystats["mode"] = build_mode_string(control=True)
+def snapshot_power(snapshot):
+    """Grid, home, solar and battery power from aggregates, corrected as configured."""
+    aggregates = snapshot.get("aggregates")
+    if aggregates:
+        grid = (aggregates.get('site') or {}).get('instant_power', 0)
+        solar = (aggregates.get('solar') or {}).get('instant_power', 0)
+        battery = (aggregates.get('battery') or {}).get('instant_power', 0)
+        home = (aggregates.get('load') or {}).get('instant_power', 0)
     else:
-        log.error("Control Mode Failed: Unable to connect to cloud - Run Setup")
-        control_secret = None
+        grid = solar = battery = home = 0
 
+    # Convert None to 0 for output BEFORE any comparisons below
+    # (None = data gap, output as 0; comparing None crashes)
+    grid = grid or 0
+    solar = solar or 0
+    battery = battery or 0
+    home = home or 0
 
-# Start background TEDAPI probe/recovery thread (TEDAPI modes only)
-if tedapi_recovery_enabled and pw.tedapi:
-    _recovery_thread = threading.Thread(
-        target=_tedapi_probe_and_recover, name="tedapi-recovery", daemon=True
-    )
-    _recovery_thread.start()
-    log.info(
-        "TEDAPI probe/recovery thread started (interval=%ds, threshold=%d)",
-        TEDAPI_PROBE_INTERVAL, TEDAPI_FALLBACK_THRESHOLD
-    )
+    # Apply negative solar correction if configured
+    if not neg_solar and solar < 0:
+        # Shift energy from solar to load
+        home -= solar
+        solar = 0
 
+    # Apply site zero threshold - suppress phantom grid noise
+    if site_zero_threshold > 0 and abs(grid) <= site_zero_threshold:
+        grid = 0
+    return {"grid": grid, "home": home, "solar": solar, "battery": battery}
 
-def get_transport_health():
-    """Build transport health status dict for /health endpoint."""
-    transports = {}
-    tedapi = getattr(pw, 'tedapi', None)
-    if tedapi and hasattr(tedapi, 'v1r') and tedapi.v1r:
-        # v1r LAN transport
-        v1r_info = {
-            "active": True,
-            "status": "ok" if tedapi.din else "unavailable",
-            "host": tedapi.gw_ip,
+
+class TickSnapshot:
+    """
+    Gateway data behind /pod, /freq, /json and /csv for one cache interval.
+
+    Fields are fetched on first use and memoized, so the four routes share one
+    set of pypowerwall calls and get_value walks per tick and always render the
+    same values. A scraper that only reads /csv never pays for vitals. A field
+    that failed, was refused by PW_RATE_LIMIT or came from the degradation cache
+    (or was derived from one that did) is not memoized - the next reader retries.
+    """
+
+    FIELDS = {
+        "aggregates": lambda snapshot: safe_endpoint_call(
+            "/aggregates", pw.poll, "/api/meters/aggregates", jsonformat=False
+        ),
+        "power": snapshot_power,
+        "level": lambda snapshot: safe_pw_call(pw.level),
+        "grid_status": lambda snapshot: safe_pw_call(pw.grid_status),
+        "grid_status_numeric": lambda snapshot: safe_pw_call(pw.grid_status, "numeric"),
+        "reserve": lambda snapshot: safe_pw_call(pw.get_reserve),
+        "time_remaining": lambda snapshot: safe_pw_call(pw.get_time_remaining),
+        "system_status": lambda snapshot: safe_pw_call(pw.system_status),
+        "blocks": lambda snapshot: [
+            {key: get_value(block, key) for key in BLOCK_KEYS}
+            for block in snapshot.get("system_status").get("battery_blocks") or []
+        ],
+        "vitals": lambda snapshot: safe_pw_call(pw.vitals),
+        "strings": lambda snapshot: safe_pw_call(pw.strings, jsonformat=False),
+    }
+    # Fields rendered as empty dicts while no data is available (any falsy result)
+    EMPTY_FIELDS = frozenset(("system_status", "vitals", "strings"))
+
+    def __init__(self):
+        self.timestamp = time.time()
+        self.rendered = set()
+        self._values = {}
+        self._locks = {name: threading.Lock() for name in self.FIELDS}
+
+    def get(self, name):
+        """Return field name, fetching it once per snapshot (concurrent readers wait)."""
+        try:
+            return self._values[name]
+        except KeyError:
+            pass
+        with self._locks[name]:
+            if name in self._values:
+                return self._values[name]
+            outer = getattr(_response_local, "degraded", False)
+            _response_local.degraded = False
+            try:
+                value = self.FIELDS[name](self)
+                if not value and name in self.EMPTY_FIELDS:
+                    value = None  # no data
+                degraded = _response_local.degraded or value is None
+            finally:
+                _response_local.degraded = outer
+            if not degraded:
+                self._values[name] = value
+                return value
+        with _tick_lock:
+            _tick_stats["retried"] += 1
+        _response_local.degraded = True  # fields derived from this one are not memoized either
+        if value is None and name in self.EMPTY_FIELDS:
+            return {}
+        return value
+
+
+def tick_snapshot(cache_key):
+    """
+    Return the TickSnapshot to render cache_key from, starting a new tick when needed.
+
+    A snapshot is shared while it is younger than PW_CACHE_EXPIRE and cache_key
+    has not been rendered from it yet - a second render of the same route means
+    its cached response expired or was refreshed, so that starts the next tick.
+    """
+    with _tick_lock:
+        snapshot = _tick["snapshot"]
+        if (
+            snapshot is None
+            or cache_key in snapshot.rendered
+            or time.time() - snapshot.timestamp >= cache_expire
+        ):
+            snapshot = _tick["snapshot"] = TickSnapshot()
+            _tick_stats["snapshots"] += 1
+        else:
+            _tick_stats["shared"] += 1
+        snapshot.rendered.add(cache_key)
+        return snapshot
+
+
+class _Unavailable:
+    """Base for warm restart stand-ins: any method not defined returns None (no data)."""
+
+    def __getattr__(self, name):
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return lambda *args, **kwargs: None
+
+
+class WarmStartTEDAPI(_Unavailable):
+    """pw.tedapi stand-in during a warm restart - DIN and config from the snapshot."""
+
+    def __init__(self, saved):
+        self._din = saved.get("din")
+        self.pw3 = saved.get("pw3", False)
+        self.gw_ip = host
+        self.v1r = False
+        self.wifi_session = None
+        self._config = saved.get("config")
+
+    @property
+    def din(self):
+        return self._din if warm_restart_age() is not None else None
+
+    def get_config(self, *args, **kwargs):
+        return self._config if warm_restart_age() is not None else None
+
+
+class WarmStartPowerwall(_Unavailable):
+    """
+    Stand-in for pw while a warm restart connects to the Powerwall in the background.
+
+    Every pypowerwall call returns None, so routes answer from the caches restored
+    from PW_WARM_RESTART_FILE (safe_endpoint_call falls back to the degradation
+    cache, cached_route_handler serves the restored snapshots). The DIN and TEDAPI
+    config are answered from the snapshot until PW_WARM_RESTART_MAX_AGE.
+    """
+
+    def __init__(self, snapshot):
+        saved = snapshot.get("tedapi")
+        self.host = host
+        self.authmode = authmode
+        self.timeout = timeout
+        self.auth = {}
+        self.client = None
+        self.cloudmode = False
+        self.fleetapi = False
+        self.tedapi = WarmStartTEDAPI(saved) if saved else None
+        self.tedapi_mode = snapshot.get("tedapi_mode", "off")
+
+    def din(self):
+        return self.tedapi.din if self.tedapi else None
+
+
+def build_warm_snapshot():
+    """
+    Collect the caches worth restoring after a restart.
+
+    Returns:
+        Dict with the degradation and performance cache entries (with their original
+        timestamps) younger than PW_CACHE_TTL, plus the TEDAPI DIN and config
+    """
+    now = time.time()
+    with _last_good_responses_lock:
+        degradation = [
+            [endpoint, response, timestamp]
+            for endpoint, (response, timestamp, _) in _last_good_responses.items()
+            if now - timestamp < degradation_cache_ttl_seconds
+        ]
+    with _performance_cache_lock:
+        performance = [
+            [cache_key, entry.data, entry.timestamp]
+            for cache_key, entry in _performance_cache.items()
+            if now - entry.timestamp < degradation_cache_ttl_seconds
+        ]
+    tedapi = getattr(pw, "tedapi", None)
+    saved_tedapi = None
+    if isinstance(tedapi, WarmStartTEDAPI):
+        saved_tedapi = {"din": tedapi.din, "pw3": tedapi.pw3, "config": tedapi._config}
+    elif tedapi:
+        saved_tedapi = {"din": tedapi.din, "pw3": tedapi.pw3, "config": tedapi.pwcache.get("config")}
+    return {
+        "version": WARM_RESTART_VERSION,
+        "saved": now,
+        "mode": proxystats["mode"],
+        "tedapi_mode": proxystats["tedapi_mode"],
+        "degradation": degradation,
+        "performance": performance,
+        "tedapi": saved_tedapi,
+    }
+
+
+def save_warm_snapshot(path=None):
+    """
+    Write build_warm_snapshot() to PW_WARM_RESTART_FILE as gzipped JSON.
+
+    The file is written next to the target and renamed over it, so a crash mid-write
+    never leaves a truncated snapshot. Entries that are not JSON serializable are
+    skipped.
+
+    Returns:
+        Bytes written, None if the snapshot could not be written
+    """
+    path = path or warm_restart_file
+    snapshot = build_warm_snapshot()
+    for section in ("degradation", "performance"):
+        entries = []
+        for item in snapshot[section]:
+            try:
+                json.dumps(item[1])
+            except (TypeError, ValueError):
+                continue
+            entries.append(item)
+        snapshot[section] = entries
+    data = gzip.compress(
+        json.dumps(snapshot, separators=(",", ":")).encode("utf8"), compresslevel=COMPRESS_LEVEL
+    )
+    tmp_path = path + ".tmp"
+    try:
+        # Owner-only - the snapshot holds gateway config and site details
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except OSError as exc:
+        log.warning(f"Unable to write warm restart file {path}: {exc}")
+        with _warm_stats_lock:
+            _warm_stats["failures"] += 1
+        return None
+    with _warm_stats_lock:
+        _warm_stats["saves"] += 1
+        _warm_stats["last_save_time"] = snapshot["saved"]
+        _warm_stats["last_save_bytes"] = len(data)
+    return len(data)
+
+
+def load_warm_snapshot(path=None):
+    """
+    Read a snapshot written by save_warm_snapshot().
+
+    Returns:
+        The snapshot dict, None if the file is missing, unreadable, from another
+        format version or older than PW_CACHE_TTL
+    """
+    path = path or warm_restart_file
+    try:
+        with open(path, "rb") as f:
+            snapshot = json.loads(gzip.decompress(f.read()))
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, EOFError) as exc:
+        log.warning(f"Ignoring unreadable warm restart file {path}: {exc}")
+        return None
+    if not isinstance(snapshot, dict) or snapshot.get("version") != WARM_RESTART_VERSION:
+        log.info(f"Ignoring warm restart file {path} - unknown format version")
+        return None
+    age = time.time() - snapshot.get("saved", 0)
+    if age >= degradation_cache_ttl_seconds:
+        log.info(f"Ignoring warm restart file {path} - {age:.0f}s old (PW_CACHE_TTL={degradation_cache_ttl_seconds})")
+        return None
+    return snapshot
+
+
+def restore_warm_snapshot(snapshot):
+    """
+    Fill the degradation and performance caches from a snapshot.
+
+    Entries keep their original timestamps, so they expire (PW_CACHE_TTL) exactly as
+    if the proxy had never restarted.
+
+    Returns:
+        Number of cache entries restored
+    """
+    now = time.time()
+    restored = 0
+    for endpoint, response, timestamp in snapshot.get("degradation", []):
+        if now - timestamp >= degradation_cache_ttl_seconds:
+            continue
+        nbytes = payload_size(response)
+        with _last_good_responses_lock:
+            if cache_max_bytes and _degradation_cache_stats["bytes"] + nbytes > cache_max_bytes:
+                continue
+            old = _last_good_responses.pop(endpoint, None)
+            if old is not None:
+                _degradation_cache_stats["bytes"] -= old[2]
+            _last_good_responses[endpoint] = (response, timestamp, nbytes)
+            _degradation_cache_stats["bytes"] += nbytes
+        restored += 1
+    for cache_key, data, timestamp in snapshot.get("performance", []):
+        if now - timestamp >= degradation_cache_ttl_seconds:
+            continue
+        with _performance_cache_lock:
+            _performance_cache[cache_key] = _CacheEntry(data, timestamp)
+        restored += 1
+    with _warm_stats_lock:
+        _warm_stats["restored_entries"] = restored
+        _warm_stats["restored_age"] = round(now - snapshot.get("saved", now), 1)
+    return restored
+
+
+def warm_restart_age():
+    """
+    Age in seconds of the warm restart snapshot being served, None when not serving one.
+
+    Restored data is served until the Powerwall is connected, for at most
+    PW_WARM_RESTART_MAX_AGE seconds after the snapshot was saved.
+    """
+    if _warm_saved is None or _backend_ready.is_set() or _worker_slot is not None:
+        return None  # PW_WORKERS processes never connect - the poller's /stats has the state
+    age = time.time() - _warm_saved
+    return age if age < warm_restart_max_age else None
+
+
+def expire_warm_restart():
+    """
+    PW_WARM_RESTART_MAX_AGE timer: if the Powerwall is still not connected, drop the
+    entries restored from the snapshot so routes take the normal no-data path.
+    """
+    if _backend_ready.is_set():
+        return
+    dropped = 0
+    with _last_good_responses_lock:
+        for endpoint in [k for k, v in _last_good_responses.items() if v[1] <= _warm_saved]:
+            _degradation_cache_stats["bytes"] -= _last_good_responses.pop(endpoint)[2]
+            dropped += 1
+    with _performance_cache_lock:
+        for cache_key in [k for k, v in _performance_cache.items() if v.timestamp <= _warm_saved]:
+            del _performance_cache[cache_key]
+            dropped += 1
+    with _warm_stats_lock:
+        _warm_stats["expired"] = True
+    log.warning(
+        f"Warm restart: still not connected after PW_WARM_RESTART_MAX_AGE={warm_restart_max_age}s - "
+        f"dropped {dropped} restored responses"
+    )
+
+
+def _warm_restart_loop():
+    """Background thread: write a warm restart snapshot every PW_WARM_RESTART_INTERVAL seconds."""
+    while True:
+        try:
+            time.sleep(warm_restart_interval)
+            if _backend_ready.is_set():
+                save_warm_snapshot()
+        except (KeyboardInterrupt, SystemExit):
+            break
+        except Exception as exc:
+            log.debug(f"Warm restart thread unexpected error: {exc}")
+
+
+# Connect to Powerwall
+# TODO: Add support for multiple Powerwalls
+def connect_backend():
+    """
+    Connect to the Powerwall (and the control backend).
+
+    Runs at startup, or in a background "connect" thread after a warm restart while
+    requests are answered from the restored caches. Sets _backend_ready when done.
+    """
+    global pw, site_name, pw_control, control_secret
+    try:
+        pw = pypowerwall.Powerwall(
+            host=host,
+            password=password,
+            email=email,
+            timezone=timezone,
+            pwcacheexpire=cache_expire,
+            timeout=timeout,
+            poolmaxsize=pool_maxsize,
+            siteid=siteid,
+            authpath=authpath,
+            authmode=authmode,
+            cachefile=cachefile,
+            auto_select=True,
+            retry_modes=True,
+            gw_pwd=gw_pwd,
+            rsa_key_path=rsa_key_path,
+            wifi_host=wifi_host,
+            tedapi_api_version=tedapi_api_version,
+            pwcachettl=cache_expire_api,
+        )
+    except Exception as e:
+        log.error(f"Powerwall Connection Error: {str(e)}")
+        log.error("Fatal Error: Unable to connect. Please fix config and restart.")
+        while True:
+            try:
+                time.sleep(5)  # Infinite loop to keep container running
+            except (KeyboardInterrupt, SystemExit):
+                sys.exit(0)
+
+    budget_gateway_requests(pw)
+    site_name = safe_pw_call(pw.site_name) or "Unknown"
+    if pw.cloudmode or pw.fleetapi:
+        if pw.fleetapi:
+            proxystats["mode"] = "FleetAPI"
+            log.info("pyPowerwall Proxy Server - FleetAPI Mode")
+        else:
+            proxystats["mode"] = "Cloud"
+            log.info("pyPowerwall Proxy Server - Cloud Mode")
+        log.info("Connected to Site ID %s (%s)" % (pw.client.siteid, site_name.strip()))
+        if siteid is not None and siteid != str(pw.client.siteid):
+            log.info("Switch to Site ID %s" % siteid)
+            if not pw.client.change_site(siteid):
+                log.error("Fatal Error: Unable to connect. Please fix config and restart.")
+                while True:
+                    try:
+                        time.sleep(5)  # Infinite loop to keep container running
+                    except (KeyboardInterrupt, SystemExit):
+                        sys.exit(0)
+    else:
+        log.info("pyPowerwall Proxy Server - Local Mode")
+        log.info("Connected to Energy Gateway %s (%s)" % (host, site_name.strip()))
+        if pw.tedapi:
+            proxystats["tedapi"] = True
+            proxystats["tedapi_mode"] = pw.tedapi_mode
+            proxystats["tedapi_api_version"] = pw.tedapi_api_version
+            proxystats["pw3"] = pw.tedapi.pw3
+            log.info(f"TEDAPI Mode Enabled for Device Vitals ({pw.tedapi_mode}, queries={pw.tedapi_api_version})")
+        # Set mode string with transport detail
+        def build_mode_string(control=False):
+            """Build mode display string from active transports."""
+            if not pw.tedapi:
+                return "Local"
+            parts = [pw.tedapi_mode]
+            tedapi = pw.tedapi
+            if getattr(tedapi, 'v1r', False) and getattr(tedapi, 'wifi_session', None):
+                parts.append("wifi")
+            if control:
+                parts.append("control")
+            return f"Local ({'+'.join(parts)})"
+        proxystats["mode"] = build_mode_string()
+
+    pw_control = None
+    if control_secret:
+        log.info("Control Commands Activating - WARNING: Use with caution!")
+        try:
+            if pw.cloudmode or pw.fleetapi:
+                pw_control = pw
+            elif pw.tedapi and pw.tedapi.v1r:
+                pw_control = pw
+                log.info("Control Mode: Using TEDapi LAN control (v1r filestore)")
+            else:
+                pw_control = pypowerwall.Powerwall(
+                    "",
+                    password,
+                    email,
+                    siteid=siteid,
+                    authpath=authpath,
+                    authmode=authmode,
+                    cachefile=cachefile,
+                    auto_select=True,
+                )
+        except Exception as e:
+            log.error("Control Mode Failed: Unable to connect to cloud - Run Setup")
+            control_secret = ""
+        if pw_control:
+            if pw.tedapi and pw.tedapi.v1r and not pw.cloudmode and not pw.fleetapi:
+                log.info(f"Control Mode Enabled: LAN Mode ({pw.tedapi_mode}+control)")
+            else:
+                log.info(f"Control Mode Enabled: Cloud Mode ({pw_control.mode}) Connected")
+            # Update mode string to include control transport
+            if not pw.cloudmode and not pw.fleetapi and pw.tedapi:
+                proxystats["mode"] = build_mode_string(control=True)
+        else:
+            log.error("Control Mode Failed: Unable to connect to cloud - Run Setup")
+            control_secret = None
+
+    _backend_ready.set()
+
+
+def start_recovery_thread():
+    """Start the background TEDAPI probe/recovery thread (TEDAPI modes only)."""
+    global _recovery_thread
+    if tedapi_recovery_enabled and pw.tedapi:
+        _recovery_thread = threading.Thread(
+            target=_tedapi_probe_and_recover, name="tedapi-recovery", daemon=True
+        )
+        _recovery_thread.start()
+        log.info(
+            "TEDAPI probe/recovery thread started (interval=%ds, threshold=%d)",
+            TEDAPI_PROBE_INTERVAL, TEDAPI_FALLBACK_THRESHOLD
+        )
+
+
+def _connect_in_background():
+    connect_backend()
+    start_recovery_thread()
+
+
+def start_background_threads():
+    """
+    Start the connect (after a warm restart), TEDAPI recovery, warm restart and prefetch threads.
+
+    Called by main() once the process is set up to serve - after forking the PW_WORKERS
+    launcher, which must happen while this process has no other threads.
+    """
+    global _warm_restart_thread, _prefetch_thread
+    if _backend_ready.is_set():
+        start_recovery_thread()
+    else:
+        threading.Thread(target=_connect_in_background, name="connect", daemon=True).start()
+        # Stop serving the restored snapshot after PW_WARM_RESTART_MAX_AGE
+        expire = threading.Timer(_warm_saved + warm_restart_max_age - time.time(), expire_warm_restart)
+        expire.name = "warm-expire"
+        expire.daemon = True
+        expire.start()
+
+    # Start background warm restart snapshot thread (PW_WARM_RESTART=yes)
+    if warm_restart:
+        _warm_restart_thread = threading.Thread(
+            target=_warm_restart_loop, name="warm-restart", daemon=True
+        )
+        _warm_restart_thread.start()
+        log.info("Warm restart snapshots enabled (interval=%ds, file=%s)", warm_restart_interval, warm_restart_file)
+
+    # Start background prefetch thread for hot route snapshots (PW_PREFETCH=yes)
+    if prefetch_enabled:
+        _prefetch_thread = threading.Thread(
+            target=_prefetch_loop, name="prefetch", daemon=True
+        )
+        _prefetch_thread.start()
+        log.info("Prefetch thread started (interval=%ds)", cache_expire)
+
+
+pw = None
+pw_control = None
+site_name = "Unknown"
+_recovery_thread = None
+_warm_restart_thread = None
+_prefetch_thread = None
+_warm_snapshot = load_warm_snapshot() if warm_restart else None
+if _warm_snapshot:
+    # Serve the restored caches right away and connect in the background
+    # (start_background_threads)
+    log.info(
+        "Warm restart: restored %d cached responses from %s - connecting in the background",
+        restore_warm_snapshot(_warm_snapshot), warm_restart_file,
+    )
+    proxystats["mode"] = _warm_snapshot.get("mode", proxystats["mode"])
+    pw = WarmStartPowerwall(_warm_snapshot)
+    _warm_saved = _warm_snapshot["saved"]
+else:
+    connect_backend()
+
+
+def get_transport_health():
+    """Build transport health status dict for /health endpoint."""
+    transports = {}
+    tedapi = getattr(pw, 'tedapi', None)
+    if tedapi and hasattr(tedapi, 'v1r') and tedapi.v1r:
+        # v1r LAN transport
+        v1r_info = {
+            "active": True,
+            "status": "ok" if tedapi.din else "unavailable",
+            "host": tedapi.gw_ip,
             "leader_din": tedapi.din,
         }
         if tedapi.lan_last_success:
@@ -1195,13 +2854,1588 @@ def get_transport_health():
     return transports
 
 
-class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
-    daemon_threads = True
+def render_index_page(status):
+    """
+    Render the Power Flow index.html with {VARS} replaced and the style script injected.
+
+    The rendered page only depends on the template file, PW_STYLE, PW_EMAIL, the base
+    URL and the gateway firmware version/git hash, so it is memoized on those inputs
+    and the substitutions and BeautifulSoup pass run once instead of on every page view.
+
+    Args:
+        status: pw.status() payload (version and git_hash are used)
+
+    Returns:
+        Tuple of (page bytes, content type), (None, None) if index.html is missing
+    """
+    template = os.path.join(web_root, "index.html")
+    try:
+        mtime = os.stat(template).st_mtime_ns
+    except OSError:
+        return None, None
+    # fix the following variables that if they are None, return ""
+    version = status.get("version", "") or ""
+    git_hash = status.get("git_hash", "") or ""
+    key = (mtime, style, email, api_base_url, version, git_hash)
+    with _index_page_lock:
+        if _index_page["key"] == key:
+            _index_page["hits"] += 1
+            return _index_page["content"], "text/html"
+
+    fcontent, _ = get_static(web_root, "/index.html")
+    if fcontent is None:
+        return None, None
+    # Replace {VARS} with current data
+    fcontent = fcontent.decode("utf-8")
+    fcontent = fcontent.replace("{VERSION}", version)
+    fcontent = fcontent.replace("{HASH}", git_hash)
+    fcontent = fcontent.replace("{EMAIL}", email)
+
+    static_asset_prefix = (
+        api_base_url + "viz-static/"
+    )  # prefix for static files so they can be detected by a reverse proxy easily
+    fcontent = fcontent.replace("{STYLE}", static_asset_prefix + style)
+    fcontent = fcontent.replace("{ASSET_PREFIX}", static_asset_prefix)
+
+    fcontent = fcontent.replace("{API_BASE_URL}", api_base_url + "api")
+    # convert fcontent back to bytes
+    fcontent = bytes(fcontent, "utf-8")
+
+    # Inject transformations
+    if os.path.exists(os.path.join(web_root, style)):
+        fcontent = bytes(inject_js(fcontent, style), "utf-8")
+
+    with _index_page_lock:
+        _index_page["key"] = key
+        _index_page["content"] = fcontent
+        _index_page["renders"] += 1
+    return fcontent, "text/html"
+
+
+# GET route registry - exact paths dispatch through a dict lookup, prefix routes
+# (/csv, /tedapi, /cloud, /fleetapi, /control/*, /fans/pw, /pw/) are checked
+# longest-first. Anything unmatched falls through to the static web root and the
+# gateway web-asset passthrough in Handler.do_GET. Matching follows the former
+# do_GET if/elif chain: with a query string only ALLOWLIST, DISABLED and exact
+# routes declared query=True (/batch) match, on the query-stripped path.
+_routes = {}
+_query_routes = {}  # exact routes that also match with a query string
+_prefix_routes = []
+
+
+class Route:
+    """A registered GET route: the handler function plus its declared options."""
+
+    __slots__ = ("path", "func", "prefix", "content_type", "blocking", "cache_key", "query",
+                 "base_url")
+
+    def __init__(self, path, func, prefix=False, content_type="application/json",
+                 blocking=True, cache_key=None, query=False, base_url=True):
+        self.path = path
+        self.func = func
+        self.prefix = prefix
+        self.content_type = content_type
+        self.blocking = blocking  # False = never waits on the gateway
+        self.cache_key = cache_key  # performance cache key the route is served from
+        self.query = query  # handler reads the query string
+        self.base_url = base_url  # False = prefix matched before api_base_url is stripped
+
+
+def register_route(get_route, with_query=False):
+    """
+    Add a Route to the registry, replacing any route already on the same path.
+
+    Exact routes also match requests with a query string if they read it (query=True)
+    or with_query is set. Otherwise the route only replaces the match without a query
+    string - e.g. ALLOWLIST still serves its path with one, as the old chain did.
+    """
+    if get_route.prefix:
+        _prefix_routes[:] = [r for r in _prefix_routes if r.path != get_route.path]
+        _prefix_routes.append(get_route)
+        _prefix_routes.sort(key=lambda r: len(r.path), reverse=True)
+    else:
+        _routes[get_route.path] = get_route
+        if get_route.query or with_query:
+            _query_routes[get_route.path] = get_route
+
+
+def route(*paths, prefix=False, content_type="application/json", blocking=True, cache_key=None,
+          query=False, base_url=True):
+    """
+    Decorator registering a function as the GET handler for one or more paths.
+
+    The handler is called as func(path, query) with the query-stripped request path
+    and the raw query string, and returns the response body string (None = no data).
+
+    Args:
+        paths: Request paths served by the handler
+        prefix: Match any request path starting with the given paths
+        content_type: Content-type header for the response
+        blocking: False if the handler never calls the gateway (PW_ENGINE=async
+            runs it on the event loop)
+        cache_key: Performance cache key the handler serves from - while that entry
+            is fresh PW_ENGINE=async also runs the handler on the event loop
+        query: The handler reads the query string - an exact route then also serves
+            requests with one (otherwise those fall through to the static web root /
+            gateway passthrough) and PW_RATE_LIMIT keeps its last good response per query
+        base_url: False to match the prefix against the request target before
+            api_base_url is stripped
+    """
+    def decorator(func):
+        for path in paths:
+            register_route(Route(path, func, prefix, content_type, blocking, cache_key,
+                                 query, base_url))
+        return func
+    return decorator
+
+
+def resolve_request(request_path, target=None):
+    """
+    Return (Route, path, query) for a GET request, Route None for static/passthrough.
+
+    Args:
+        request_path: Request target with api_base_url stripped, query string included
+        target: Raw request target, for prefix routes declared base_url=False
+            (None = match them against request_path)
+    """
+    parsed = urlparse(request_path)
+    path, query = parsed.path, parsed.query
+    get_route = (_query_routes if "?" in request_path else _routes).get(path)
+    if get_route is None:
+        for candidate in _prefix_routes:
+            if path.startswith(candidate.path) and (
+                    candidate.base_url or target is None or target.startswith(candidate.path)):
+                return candidate, path, query
+    return get_route, path, query
+
+
+def resolve_route(path):
+    """Return the Route serving a request path without query string, None for static/passthrough."""
+    return resolve_request(path)[0]
+
+
+def call_route(get_route, path, query):
+    """
+    Run a route handler, spending the gateway-wide budget (PW_RATE_LIMIT) in its class.
+
+    Priority routes (RATE_PRIORITY_ROUTES, /control/*) may use the reserved tokens;
+    other routes may not. If any upstream call of the handler was refused, the last
+    complete response for the request (up to PW_CACHE_TTL old) is served instead of
+    a partial or null one - from the performance cache for routes with a cache_key,
+    otherwise from a copy kept in the degradation cache per path (and per query for
+    routes that read it).
+
+    Args:
+        get_route: The Route resolved for path
+        path: Query-stripped request path
+        query: Raw query string
+
+    Returns:
+        The response body string (None = no data)
+    """
+    if upstream_budget is None or not get_route.blocking:
+        return get_route.func(path, query)
+    cache_key = "route:" + (path + "?" + query if get_route.query and query else path)
+    saved = (getattr(_response_local, "priority", True), getattr(_response_local, "throttled", False))
+    _response_local.priority = is_priority_route(path)
+    _response_local.throttled = False
+    try:
+        message = get_route.func(path, query)
+        if not _response_local.throttled:
+            if get_route.cache_key is None:
+                cache_response(cache_key, message)
+            return message
+        if get_route.cache_key is not None:
+            stale = get_last_performance_value(get_route.cache_key, degradation_cache_ttl_seconds)
+        else:
+            stale = get_cached_response(cache_key)
+        return message if stale is None else stale
+    finally:
+        _response_local.priority, _response_local.throttled = saved
+
+
+def route_disabled(path, query):
+    """Disabled API Calls"""
+    return '{"status": "404 Response - API Disabled"}'
+
+
+def route_allowlist(path, query):
+    """Allowed API Calls - Proxy to Powerwall (query string stripped)"""
+    return safe_pw_call(pw.poll, path, jsonformat=True)
+
+
+# ALLOWLIST endpoints are proxied to the gateway; DISABLED overrides ALLOWLIST.
+# Registered first so the explicit routes below can override individual entries.
+for _path in ALLOWLIST:
+    register_route(Route(_path, route_allowlist), with_query=True)
+for _path in DISABLED:
+    register_route(Route(_path, route_disabled, blocking=False), with_query=True)
+
+
+@route("/aggregates", "/api/meters/aggregates", cache_key="/aggregates")
+def route_aggregates(path, query):
+    """Meters - JSON"""
+    def generate_aggregates():
+        # Both routes deliver same payload, use shared cache key
+        aggregates = safe_endpoint_call(
+            "/aggregates", pw.poll, "/api/meters/aggregates"
+        )
+
+        # Parse aggregates if it's a JSON string
+        if isinstance(aggregates, str):
+            try:
+                aggregates = json.loads(aggregates)
+            except (json.JSONDecodeError, TypeError):
+                aggregates = None
+
+        # Apply site zero threshold - suppress phantom grid noise
+        # Pass through None values - they indicate a data gap, not zero
+        if (
+            site_zero_threshold > 0
+            and aggregates
+            and "site" in aggregates
+            and "instant_power" in aggregates["site"]
+            and aggregates["site"]["instant_power"] is not None
+            and abs(aggregates["site"]["instant_power"]) <= site_zero_threshold
+        ):
+            aggregates["site"]["instant_power"] = 0
+
+        if aggregates and not neg_solar and "solar" in aggregates:
+            solar = aggregates["solar"]
+            if solar and solar.get("instant_power") is not None and solar["instant_power"] < 0:
+                # Shift energy from solar to load
+                if "load" in aggregates and (aggregates["load"] or {}).get("instant_power") is not None:
+                    aggregates["load"]["instant_power"] -= solar["instant_power"]
+                # Finally, clamp solar to 0
+                solar["instant_power"] = 0
+
+        try:
+            if aggregates:
+                return json.dumps(aggregates)
+            else:
+                # No data available - return None to indicate stale/missing data
+                return None
+        except:
+            log.error(f"JSON encoding error in payload: {aggregates}")
+            return None
+
+    return cached_route_handler("/aggregates", generate_aggregates)
+
+
+def parse_batch_routes(query):
+    """
+    Parse the route list of a /batch request.
+
+    Args:
+        query: Raw query string, e.g. "routes=/aggregates,/soe,/vitals"
+
+    Returns:
+        Sorted list of distinct route paths (a leading / is added if missing)
+    """
+    names = set()
+    for value in parse_qs(query).get("routes", []):
+        for name in value.split(","):
+            name = name.strip()
+            if name:
+                names.add(name if name.startswith("/") else "/" + name)
+    return sorted(names)
+
+
+def batch_tick_start():
+    """
+    Start time of the current tick - the TickSnapshot /pod, /freq, /json and /csv render
+    from - starting a new one if it expired, so /batch requests in one tick share a pass.
+    """
+    with _tick_lock:
+        snapshot = _tick["snapshot"]
+        if snapshot is None or time.time() - snapshot.timestamp >= cache_expire:
+            snapshot = _tick["snapshot"] = TickSnapshot()
+            _tick_stats["snapshots"] += 1
+        return snapshot.timestamp
+
+
+def build_batch(names):
+    """
+    Resolve each route in names and combine the results into one JSON object.
+
+    Route bodies are spliced in as-is (they are already JSON) instead of being
+    parsed and re-serialized. Unless prefetch snapshots are in use, per-route
+    cache entries from before the current tick (see batch_tick_start) are bypassed
+    so the whole batch reflects one pass over the gateway; entries already
+    refreshed in this tick are reused.
+
+    Args:
+        names: Route paths, optionally with their own query string
+
+    Returns:
+        '{"timestamp": ..., "routes": {route: payload}, "errors": {route: reason}}'
+    """
+    parts = []
+    errors = {}
+    _response_local.refresh = None if prefetch_enabled else batch_tick_start()
+    try:
+        for name in names:
+            get_route, path, query = resolve_request(name)
+            if (get_route is None or get_route.content_type != "application/json"
+                    or path in BATCH_EXCLUDED):
+                errors[name] = "Unknown or unsupported route"
+                continue
+            result = call_route(get_route, path, query)
+            parts.append("%s: %s" % (json.dumps(name), "null" if result is None else result))
+    finally:
+        _response_local.refresh = None
+    return '{"timestamp": %s, "routes": {%s}, "errors": %s}' % (
+        round(time.time(), 3), ", ".join(parts), json.dumps(errors)
+    )
+
+
+@route("/batch", query=True)
+def route_batch(path, query):
+    """Several Routes in One Response - /batch?routes=/aggregates,/soe,/vitals"""
+    names = parse_batch_routes(query)
+    if not names:
+        return '{"error": "No routes requested - use /batch?routes=/aggregates,/soe"}'
+    if len(names) > BATCH_MAX_ROUTES:
+        return '{"error": "Too many routes - limit is %d"}' % BATCH_MAX_ROUTES
+
+    # Clients requesting the same route list within a tick share one snapshot. The
+    # number of distinct lists cached is capped - extra ones are built per request
+    cache_key = "/batch?routes=" + ",".join(names)
+    with _performance_cache_lock:
+        cacheable = cache_key in _performance_cache or sum(
+            1 for k in _performance_cache if k.startswith("/batch?")
+        ) < BATCH_MAX_SNAPSHOTS
+    if cacheable:
+        return cached_route_handler(cache_key, lambda: build_batch(names))
+    return build_batch(names)
+
+
+# /influx measurements, named as Powerwall-Dashboard's Telegraf inputs store them
+INFLUX_MEASUREMENTS = (
+    ("http", ("/aggregates", "/api/system_status/soe")),
+    ("strings", ("/strings",)),
+    ("temp_battery", ("/temps/pw",)),
+    ("pod", ("/pod",)),
+    ("freq", ("/freq",)),
+    ("alerts", ("/alerts/pw",)),
+)
+
+
+def influx_fields(payload, prefix="", fields=None):
+    """
+    Flatten parsed JSON into line protocol fields the way Telegraf's json parser does.
+
+    Nested keys are joined with "_" and list items get their index. Numbers become
+    float fields (as the json parser stores them); strings, booleans and nulls are
+    skipped, so series written via /influx match those written from the JSON routes.
+    """
+    if fields is None:
+        fields = {}
+    if isinstance(payload, dict):
+        items = payload.items()
+    elif isinstance(payload, list):
+        items = enumerate(payload)
+    else:
+        items = ()
+    for key, value in items:
+        name = f"{prefix}_{key}" if prefix else str(key)
+        if isinstance(value, (dict, list)):
+            influx_fields(value, name, fields)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value):
+            fields[name] = float(value)
+    return fields
+
+
+def influx_line(measurement, fields):
+    """One line protocol point without a timestamp (Telegraf stamps it on collection)."""
+    escape = lambda name: name.replace(",", "\\,").replace("=", "\\=").replace(" ", "\\ ")
+    return "%s %s\n" % (
+        escape(measurement),
+        ",".join("%s=%r" % (escape(name), value) for name, value in fields.items()),
+    )
+
+
+def build_influx():
+    """Render each INFLUX_MEASUREMENTS entry from its routes' current (cached) JSON."""
+    lines = []
+    for measurement, paths in INFLUX_MEASUREMENTS:
+        fields = {}
+        for path in paths:
+            result = call_route(resolve_route(path), path, "")
+            if result is not None:
+                influx_fields(json.loads(result), fields=fields)
+        if fields:
+            lines.append(influx_line(measurement, fields))
+    return "".join(lines)
+
+
+@route("/influx", content_type="text/plain; charset=utf-8", cache_key="/influx")
+def route_influx(path, query):
+    """InfluxDB Line Protocol - aggregates, strings, temps, pod, freq and alerts"""
+    return cached_route_handler("/influx", build_influx)
+
+
+@route("/soe")
+def route_soe(path, query):
+    """Battery Level - JSON"""
+    message: str = safe_endpoint_call(
+        "/soe", pw.poll, "/api/system_status/soe", jsonformat=True
+    )
+    # Return None if no current data available (better than fake 0%)
+    return message
+
+
+@route("/api/system_status/soe")
+def route_api_soe(path, query):
+    """Battery Level - JSON (force 95% scale)"""
+    level = safe_pw_call(pw.level, scale=True)
+    message: str = (
+        json.dumps({"percentage": level}) if level is not None else None
+    )
+    return message
+
+
+@route("/api/system_status/grid_status")
+def route_api_grid_status(path, query):
+    """Grid Status - JSON"""
+    message: str = safe_pw_call(
+        pw.poll, "/api/system_status/grid_status", jsonformat=True
+    )
+    return message
+
+
+@route("/csv", prefix=True, content_type="text/plain; charset=utf-8", query=True)
+def route_csv(path, query):
+    """CSV Output - Grid,Home,Solar,Battery,Level"""
+    # CSV2 Output (/csv/v2) - Grid,Home,Solar,Battery,Level,GridStatus,Reserve
+    # Add ?headers to include CSV headers, e.g. http://localhost:8675/csv?headers
+    # None values are treated as 0 in CSV output (use JSON endpoints to see data gaps as nulls)
+
+    # Determine endpoint and whether to include headers
+    is_v2 = path.startswith("/csv/v2")
+    include_headers = "headers" in query
+    cache_key = f"/csv/v2{'_headers' if include_headers else ''}" if is_v2 else f"/csv{'_headers' if include_headers else ''}"
+
+    def generate_csv():
+        snapshot = tick_snapshot(cache_key)
+        power = snapshot.get("power")
+        grid, home, solar, battery = power["grid"], power["home"], power["solar"], power["battery"]
+        batterylevel = snapshot.get("level") or 0
+
+        if is_v2:
+            gridstatus = 1 if snapshot.get("grid_status") == "UP" else 0
+            reserve = snapshot.get("reserve") or 0
+
+        # Build CSV response
+        if is_v2:
+            result = ""
+            if include_headers:
+                result += (
+                    "Grid,Home,Solar,Battery,BatteryLevel,GridStatus,Reserve\n"
+                )
+            result += "%0.2f,%0.2f,%0.2f,%0.2f,%0.2f,%d,%d\n" % (
+                grid,
+                home,
+                solar,
+                battery,
+                batterylevel,
+                gridstatus,
+                reserve,
+            )
+        else:
+            result = ""
+            if include_headers:
+                result += "Grid,Home,Solar,Battery,BatteryLevel\n"
+            result += "%0.2f,%0.2f,%0.2f,%0.2f,%0.2f\n" % (
+                grid,
+                home,
+                solar,
+                battery,
+                batterylevel,
+            )
+        return result
+
+    return cached_route_handler(cache_key, generate_csv)
+
+
+@route("/vitals", cache_key="/vitals")
+def route_vitals(path, query):
+    """Vitals Data - JSON"""
+    return cached_route_handler(
+        "/vitals",
+        lambda: safe_endpoint_call("/vitals", pw.vitals, jsonformat=True)
+    )
+
+
+@route("/strings", cache_key="/strings")
+def route_strings(path, query):
+    """Strings Data - JSON"""
+    return cached_route_handler(
+        "/strings",
+        lambda: safe_endpoint_call("/strings", pw.strings, jsonformat=True)
+    )
+
+
+@route("/stats")
+def route_stats(path, query):
+    """Give Internal Stats"""
+    # Do the slow work (network call, rusage) BEFORE taking the lock -
+    # holding proxystats_lock across a gateway call would serialize
+    # every other request thread for up to the pw timeout during outages
+    stats_site_name = safe_pw_call(pw.site_name)
+    stats_mem = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with proxystats_lock:
+        proxystats["ts"] = int(time.time())
+        delta = proxystats["ts"] - proxystats["start"]
+        proxystats["uptime"] = str(datetime.timedelta(seconds=delta))
+        proxystats["mem"] = stats_mem
+        proxystats["site_name"] = stats_site_name
+        proxystats["cloudmode"] = pw.cloudmode
+        proxystats["fleetapi"] = pw.fleetapi
+        if (pw.cloudmode or pw.fleetapi) and pw.client is not None:
+            proxystats["siteid"] = pw.client.siteid
+            proxystats["counter"] = pw.client.counter
+
+        # Add pypowerwall local cache counters (gateway requests per URI, coalesced waits)
+        if isinstance(pw.client, PyPowerwallLocal):
+            proxystats["local_cache"] = pw.client.get_poll_stats()
+
+        # Add connection health stats if enabled
+        if health_check_enabled:
+            with _connection_health_lock:
+                proxystats["connection_health"] = {
+                    "consecutive_failures": _connection_health[
+                        "consecutive_failures"
+                    ],
+                    "total_failures": _connection_health["total_failures"],
+                    "total_successes": _connection_health["total_successes"],
+                    "is_degraded": _connection_health["is_degraded"],
+                    "last_success_time": _connection_health[
+                        "last_success_time"
+                    ],
+                    "cache_size": len(_last_good_responses)
+                    if graceful_degradation
+                    else 0,
+                }
+
+        # Add SolarOnly fallback mode state
+        with _fallback_mode_lock:
+            fm_snap = dict(_fallback_mode)
+        proxystats["fallback_mode"] = {
+            "is_fallback_mode": fm_snap["is_fallback_mode"],
+            "fallback_since": fm_snap["fallback_since"],
+            "fallback_duration_seconds": (
+                round(time.time() - fm_snap["fallback_since"], 1)
+                if fm_snap["fallback_since"] else None
+            ),
+            "recovery_attempts": fm_snap["recovery_attempts"],
+            "last_recovery_attempt": fm_snap["last_recovery_attempt"],
+            "recovery_enabled": tedapi_recovery_enabled,
+        }
+
+        # Add background prefetch state
+        with _prefetch_lock:
+            proxystats["prefetch"] = dict(
+                _prefetch_stats,
+                enabled=prefetch_enabled,
+                routes=sorted(_prefetch_routes.keys()),
+            )
+
+        # Add single-flight coalescing counters
+        with _inflight_lock:
+            proxystats["coalescing"] = dict(
+                _coalesce_stats, in_flight=len(_inflight)
+            )
+
+        # Add shared /pod, /freq, /json and /csv snapshot counters
+        with _tick_lock:
+            proxystats["tick_snapshot"] = dict(_tick_stats)
+
+        # Add worker pool occupancy and shed counters
+        if worker_pool is not None:
+            proxystats["worker_pool"] = worker_pool.pool_status()
+
+        # Add worker process counters (PW_WORKERS)
+        if worker_processes is not None:
+            proxystats["workers"] = worker_processes.status()
+
+        # Add warm restart snapshot state
+        if warm_restart:
+            with _warm_stats_lock:
+                proxystats["warm_restart"] = dict(
+                    _warm_stats, file=warm_restart_file, connected=_backend_ready.is_set(),
+                    serving=warm_restart_age() is not None, max_age=warm_restart_max_age,
+                )
+
+        # Add gateway-wide request budget counters
+        if upstream_budget is not None:
+            proxystats["rate_limit"] = upstream_budget.status()
+
+        # Add SSE stream subscribers and event counters
+        with _stream_cond:
+            proxystats["streams"] = dict(
+                _stream_stats,
+                max_clients=stream_max_clients,
+                subscribers={
+                    stream_path: _streams[route_path]["subscribers"]
+                    for stream_path, route_path in STREAM_ROUTES.items()
+                },
+            )
+
+        # Add async engine counters
+        if engine == "async":
+            with _async_stats_lock:
+                proxystats["async_engine"] = dict(_async_stats)
+
+        # Add keep-alive connection reuse counters
+        with _keepalive_stats_lock:
+            proxystats["keepalive"] = dict(
+                _keepalive_stats,
+                enabled=keepalive_enabled,
+                timeout=keepalive_timeout,
+                max_requests=keepalive_max_requests,
+            )
+
+        # Add static asset cache state
+        if static_assets is not None:
+            proxystats["static_cache"] = static_assets.stats()
+        with _index_page_lock:
+            proxystats["index_page"] = {
+                "renders": _index_page["renders"],
+                "hits": _index_page["hits"],
+            }
+
+        # Add response compression counters
+        with _compress_stats_lock:
+            proxystats["compression"] = dict(
+                _compress_stats,
+                enabled=compress_enabled,
+                min_bytes=compress_min_bytes,
+            )
+
+        # Add cache memory usage statistics
+        proxystats["mem_cache"] = {}
+
+        with _error_counts_lock:
+            proxystats["mem_cache"]["error_counts"] = {
+                "entries": len(_error_counts),
+                "size_bytes": sys.getsizeof(_error_counts) + sum(
+                    sys.getsizeof(k) + sys.getsizeof(v)
+                    for k, v in _error_counts.items()
+                ),
+            }
+            proxystats["mem_cache"]["network_error_summary"] = {
+                "entries": len(_network_error_summary),
+                "size_bytes": sys.getsizeof(_network_error_summary) + sum(
+                    sys.getsizeof(k) + sys.getsizeof(v) + sum(
+                        sys.getsizeof(ek) + sys.getsizeof(ev)
+                        for ek, ev in v.items()
+                    ) for k, v in _network_error_summary.items()
+                ),
+            }
+
+        with _last_good_responses_lock:
+            proxystats["mem_cache"]["degradation_cache"] = {
+                "entries": len(_last_good_responses),
+                "size_bytes": sys.getsizeof(_last_good_responses) + _degradation_cache_stats["bytes"],
+                "max_bytes": cache_max_bytes,
+                "evictions": _degradation_cache_stats["evictions"],
+            }
+
+        with _performance_cache_lock:
+            proxystats["mem_cache"]["performance_cache"] = {
+                "entries": len(_performance_cache),
+                "size_bytes": sys.getsizeof(_performance_cache) + sum(
+                    sys.getsizeof(k) + v.size() for k, v in _performance_cache.items()
+                ),
+            }
+
+        with _endpoint_stats_lock:
+            proxystats["mem_cache"]["endpoint_stats"] = {
+                "entries": len(_endpoint_stats),
+                "size_bytes": sys.getsizeof(_endpoint_stats) + sum(
+                    sys.getsizeof(k) + sys.getsizeof(v) + sum(
+                        sys.getsizeof(ek) + sys.getsizeof(ev)
+                        for ek, ev in v.items()
+                    ) for k, v in _endpoint_stats.items()
+                ),
+            }
+
+        # Add total cache memory usage
+        total_cache_bytes = sum(
+            cache_info["size_bytes"] for cache_info in proxystats["mem_cache"].values()
+        )
+        proxystats["mem_cache"]["total_cache_bytes"] = total_cache_bytes
+        proxystats["mem_cache"]["total_cache_mb"] = round(total_cache_bytes / 1024 / 1024, 2)
+
+        message: str = json.dumps(proxystats_with_workers())
+    return message
+
+
+def proxystats_with_workers():
+    """
+    proxystats with the requests PW_WORKERS processes served from shared snapshots
+    added to "gets" and "uri" - those never reach this process.
+    """
+    if worker_processes is None:
+        return proxystats
+    with proxystats_lock:
+        stats = dict(proxystats, uri=dict(proxystats["uri"]))
+    for uri, hits in worker_processes.uri_counts().items():
+        stats["gets"] += hits
+        stats["uri"][uri] = stats["uri"].get(uri, 0) + hits
+    return stats
+
+
+@route("/stats/clear", blocking=False)
+def route_stats_clear(path, query):
+    """Clear Internal Stats"""
+    log.debug("Clear internal stats")
+    with proxystats_lock:
+        proxystats["gets"] = 0
+        proxystats["errors"] = 0
+        proxystats["uri"] = {}
+        proxystats["clear"] = int(time.time())
+    if worker_processes is not None:
+        worker_processes.clear_uri_counts()
+    message: str = json.dumps(proxystats)
+    return message
+
+
+@route("/metrics", content_type="text/plain; version=0.0.4; charset=utf-8", blocking=False)
+def route_metrics(path, query):
+    """Prometheus Latency Histograms and Cache Counters"""
+    return render_metrics()
+
+
+@route("/health", blocking=False)
+def route_health(path, query):
+    """Connection Health and Cache Status"""
+    health_info = {
+        "pypowerwall": "%s Proxy %s" % (pypowerwall.version, BUILD),
+        "mode": proxystats.get("mode", "Unknown"),
+        "tedapi_mode": proxystats.get("tedapi_mode", "off"),
+        "pypowerwall_cache_expire": cache_expire,
+        "degradation_cache_ttl_seconds": degradation_cache_ttl_seconds,
+        "graceful_degradation": graceful_degradation,
+        "fail_fast_mode": fail_fast_mode,
+        "health_check_enabled": health_check_enabled,
+        "startup_time": datetime.datetime.fromtimestamp(
+            proxystats["start"]
+        ).isoformat(),
+        "current_time": datetime.datetime.now().isoformat(),
+    }
+
+    # Add transport status for v1r/hybrid modes
+    health_info["transports"] = get_transport_health()
+
+    # Add overall proxy response counters
+    with proxystats_lock:
+        health_info["proxy_stats"] = {
+            "total_gets": proxystats["gets"],
+            "total_posts": proxystats["posts"],
+            "total_errors": proxystats["errors"],
+            "total_timeouts": proxystats["timeout"],
+        }
+
+    if health_check_enabled:
+        with _connection_health_lock:
+            health_info["connection_health"] = {
+                "consecutive_failures": _connection_health[
+                    "consecutive_failures"
+                ],
+                "total_failures": _connection_health["total_failures"],
+                "total_successes": _connection_health["total_successes"],
+                "is_degraded": _connection_health["is_degraded"],
+                "last_success_time": _connection_health["last_success_time"],
+                "last_success_age_seconds": time.time()
+                - _connection_health["last_success_time"],
+            }
+
+    # SolarOnly fallback mode state (separate from connection_health degradation)
+    with _fallback_mode_lock:
+        fm = dict(_fallback_mode)
+    health_info["fallback_mode"] = {
+        "is_fallback_mode": fm["is_fallback_mode"],
+        "fallback_since": fm["fallback_since"],
+        "fallback_duration_seconds": (
+            round(time.time() - fm["fallback_since"], 1)
+            if fm["fallback_since"] else None
+        ),
+        "recovery_attempts": fm["recovery_attempts"],
+        "last_recovery_attempt": fm["last_recovery_attempt"],
+        "recovery_enabled": tedapi_recovery_enabled,
+    }
+
+    if worker_pool is not None:
+        health_info["worker_pool"] = worker_pool.pool_status()
+
+    if worker_processes is not None:
+        health_info["workers"] = worker_processes.status()
+
+    if upstream_budget is not None:
+        health_info["rate_limit"] = upstream_budget.status()
+
+    if warm_restart:
+        with _warm_stats_lock:
+            health_info["warm_restart"] = dict(
+                _warm_stats, connected=_backend_ready.is_set(), serving=warm_restart_age() is not None
+            )
+
+    if graceful_degradation:
+        with _last_good_responses_lock:
+            cached_endpoints = {}
+            current_time = time.time()
+            for endpoint, (data, timestamp, nbytes) in _last_good_responses.items():
+                age = current_time - timestamp
+                cached_endpoints[endpoint] = {
+                    "age_seconds": age,
+                    "is_expired": age >= degradation_cache_ttl_seconds,
+                    "size_bytes": nbytes,
+                }
+            health_info["cached_data"] = {
+                "cache_size": len(_last_good_responses),
+                "size_bytes": _degradation_cache_stats["bytes"],
+                "max_bytes": cache_max_bytes,
+                "evictions": _degradation_cache_stats["evictions"],
+                "expired": _degradation_cache_stats["expired"],
+                "endpoints": cached_endpoints,
+            }
+
+    # Add endpoint call statistics
+    with _endpoint_stats_lock:
+        endpoint_stats = {}
+        current_time = time.time()
+        for endpoint, stats in _endpoint_stats.items():
+            success_rate = (
+                (stats["successful_calls"] / stats["total_calls"] * 100)
+                if stats["total_calls"] > 0
+                else 0
+            )
+            endpoint_info = {
+                "total_calls": stats["total_calls"],
+                "successful_calls": stats["successful_calls"],
+                "failed_calls": stats["failed_calls"],
+                "success_rate_percent": round(success_rate, 2),
+            }
+
+            if stats["last_success_time"]:
+                endpoint_info["last_success_age_seconds"] = (
+                    current_time - stats["last_success_time"]
+                )
+            if stats["last_failure_time"]:
+                endpoint_info["last_failure_age_seconds"] = (
+                    current_time - stats["last_failure_time"]
+                )
+
+            endpoint_stats[endpoint] = endpoint_info
+
+        if endpoint_stats:
+            health_info["endpoint_statistics"] = endpoint_stats
+
+    message: str = json.dumps(health_info)
+    return message
+
+
+@route("/health/reset", blocking=False)
+def route_health_reset(path, query):
+    """Reset Health Counters and Clear Cache"""
+    cache_size_before = 0
+
+    if health_check_enabled:
+        with _connection_health_lock:
+            _connection_health["consecutive_failures"] = 0
+            _connection_health["total_failures"] = 0
+            _connection_health["total_successes"] = 0
+            _connection_health["is_degraded"] = False
+            _connection_health["last_success_time"] = time.time()
+
+    # Reset SolarOnly fallback mode state
+    with _fallback_mode_lock:
+        _fallback_mode["is_fallback_mode"] = False
+        _fallback_mode["fallback_since"] = None
+        _fallback_mode["recovery_attempts"] = 0
+        _fallback_mode["last_recovery_attempt"] = None
+
+    if graceful_degradation:
+        with _last_good_responses_lock:
+            cache_size_before = len(_last_good_responses)
+            _last_good_responses.clear()
+            _degradation_cache_stats["bytes"] = 0
+
+    # Reset endpoint statistics
+    endpoint_stats_count = 0
+    with _endpoint_stats_lock:
+        endpoint_stats_count = len(_endpoint_stats)
+        _endpoint_stats.clear()
+
+    log.info(
+        "Health counters, cache, and endpoint statistics reset via /health/reset endpoint"
+    )
+    message: str = json.dumps(
+        {
+            "status": "reset_complete",
+            "health_counters_reset": health_check_enabled,
+            "cache_cleared": graceful_degradation,
+            "cache_entries_removed": cache_size_before
+            if graceful_degradation
+            else 0,
+            "endpoint_stats_cleared": endpoint_stats_count,
+        }
+    )
+    return message
+
+
+@route("/temps")
+def route_temps(path, query):
+    """Temps of Powerwalls"""
+    message: str = safe_pw_call(pw.temps, jsonformat=True) or json.dumps({})
+    return message
+
+
+@route("/temps/pw", cache_key="/temps/pw")
+def route_temps_pw(path, query):
+    """Temps of Powerwalls with Simple Keys"""
+    def generate_temps_pw():
+        pwtemp = {}
+        idx = 1
+        temps = safe_pw_call(pw.temps)
+        if temps:
+            for i in temps:
+                key = "PW%d_temp" % idx
+                pwtemp[key] = temps[i]
+                idx = idx + 1
+        return json.dumps(pwtemp)
+
+    return cached_route_handler("/temps/pw", generate_temps_pw)
+
+
+@route("/alerts")
+def route_alerts(path, query):
+    """Alerts"""
+    message: str = safe_pw_call(pw.alerts, jsonformat=True) or json.dumps([])
+    return message
+
+
+@route("/alerts/pw", cache_key="/alerts/pw")
+def route_alerts_pw(path, query):
+    """Alerts in dictionary/object format"""
+    def generate_alerts_pw():
+        pwalerts = {}
+        alerts = safe_pw_call(pw.alerts)
+        if alerts is None:
+            return None
+        else:
+            for alert in alerts:
+                pwalerts[alert] = 1
+            return json.dumps(pwalerts) or json.dumps({})
+
+    return cached_route_handler("/alerts/pw", generate_alerts_pw)
+
+
+@route("/freq", cache_key="/freq")
+def route_freq(path, query):
+    """Frequency, Current, Voltage and Grid Status"""
+    def generate_freq():
+        snapshot = tick_snapshot("/freq")
+        fcv = {}
+        # Pull freq, current, voltage of each Powerwall via system_status
+        for idx, block in enumerate(snapshot.get("blocks"), 1):
+            fcv["PW%d_name" % idx] = None  # Placeholder for vitals
+            fcv["PW%d_PINV_Fout" % idx] = block["f_out"]
+            fcv["PW%d_PINV_VSplit1" % idx] = None  # Placeholder for vitals
+            fcv["PW%d_PINV_VSplit2" % idx] = None  # Placeholder for vitals
+            fcv["PW%d_PackagePartNumber" % idx] = block["PackagePartNumber"]
+            fcv["PW%d_PackageSerialNumber" % idx] = block["PackageSerialNumber"]
+            fcv["PW%d_p_out" % idx] = block["p_out"]
+            fcv["PW%d_q_out" % idx] = block["q_out"]
+            fcv["PW%d_v_out" % idx] = block["v_out"]
+            fcv["PW%d_f_out" % idx] = block["f_out"]
+            fcv["PW%d_i_out" % idx] = block["i_out"]
+        # Pull freq, current, voltage of each Powerwall via vitals if available
+        vitals = snapshot.get("vitals")
+        idx = 1
+        for device in vitals:
+            d = vitals[device]
+            if device.startswith("TEPINV"):
+                # PW freq
+                fcv["PW%d_name" % idx] = device
+                fcv["PW%d_PINV_Fout" % idx] = get_value(d, "PINV_Fout")
+                fcv["PW%d_PINV_VSplit1" % idx] = get_value(d, "PINV_VSplit1")
+                fcv["PW%d_PINV_VSplit2" % idx] = get_value(d, "PINV_VSplit2")
+                idx = idx + 1
+            if device.startswith("TESYNC") or device.startswith("TEMSA"):
+                # Island and Meter Metrics from Backup Gateway or Backup Switch
+                for i in d:
+                    if i.startswith("ISLAND") or i.startswith("METER"):
+                        fcv[i] = d[i]
+        fcv["grid_status"] = snapshot.get("grid_status_numeric")
+        return json.dumps(fcv)
+
+    return cached_route_handler("/freq", generate_freq)
+
+
+@route("/pod", cache_key="/pod")
+def route_pod(path, query):
+    """Powerwall Battery Data"""
+    def generate_pod():
+        snapshot = tick_snapshot("/pod")
+        pod = {}
+        # Get Individual Powerwall Battery Data
+        for idx, block in enumerate(snapshot.get("blocks"), 1):
+            # Vital Placeholders
+            pod["PW%d_name" % idx] = None
+            pod["PW%d_POD_ActiveHeating" % idx] = None
+            pod["PW%d_POD_ChargeComplete" % idx] = None
+            pod["PW%d_POD_ChargeRequest" % idx] = None
+            pod["PW%d_POD_DischargeComplete" % idx] = None
+            pod["PW%d_POD_PermanentlyFaulted" % idx] = None
+            pod["PW%d_POD_PersistentlyFaulted" % idx] = None
+            pod["PW%d_POD_enable_line" % idx] = None
+            pod["PW%d_POD_available_charge_power" % idx] = None
+            pod["PW%d_POD_available_dischg_power" % idx] = None
+            pod["PW%d_POD_nom_energy_remaining" % idx] = None
+            pod["PW%d_POD_nom_energy_to_be_charged" % idx] = None
+            pod["PW%d_POD_nom_full_pack_energy" % idx] = None
+            # Additional System Status Data
+            pod["PW%d_POD_nom_energy_remaining" % idx] = block["nominal_energy_remaining"]  # map
+            pod["PW%d_POD_nom_full_pack_energy" % idx] = block["nominal_full_pack_energy"]  # map
+            pod["PW%d_PackagePartNumber" % idx] = block["PackagePartNumber"]
+            pod["PW%d_PackageSerialNumber" % idx] = block["PackageSerialNumber"]
+            pod["PW%d_pinv_state" % idx] = block["pinv_state"]
+            pod["PW%d_pinv_grid_state" % idx] = block["pinv_grid_state"]
+            pod["PW%d_p_out" % idx] = block["p_out"]
+            pod["PW%d_q_out" % idx] = block["q_out"]
+            pod["PW%d_v_out" % idx] = block["v_out"]
+            pod["PW%d_f_out" % idx] = block["f_out"]
+            pod["PW%d_i_out" % idx] = block["i_out"]
+            pod["PW%d_energy_charged" % idx] = block["energy_charged"]
+            pod["PW%d_energy_discharged" % idx] = block["energy_discharged"]
+            pod["PW%d_off_grid" % idx] = int(block["off_grid"] or 0)
+            pod["PW%d_vf_mode" % idx] = int(block["vf_mode"] or 0)
+            pod["PW%d_wobble_detected" % idx] = int(block["wobble_detected"] or 0)
+            pod["PW%d_charge_power_clamped" % idx] = int(block["charge_power_clamped"] or 0)
+            pod["PW%d_backup_ready" % idx] = int(block["backup_ready"] or 0)
+            pod["PW%d_OpSeqState" % idx] = block["OpSeqState"]
+            pod["PW%d_version" % idx] = block["version"]
+        # Augment with Vitals Data if available
+        vitals = snapshot.get("vitals")
+        idx = 1
+        for device in vitals:
+            v = vitals[device]
+            if device.startswith("TEPOD"):
+                pod["PW%d_name" % idx] = device
+                pod["PW%d_POD_ActiveHeating" % idx] = int(
+                    get_value(v, "POD_ActiveHeating") or 0
+                )
+                pod["PW%d_POD_ChargeComplete" % idx] = int(
+                    get_value(v, "POD_ChargeComplete") or 0
+                )
+                pod["PW%d_POD_ChargeRequest" % idx] = int(
+                    get_value(v, "POD_ChargeRequest") or 0
+                )
+                pod["PW%d_POD_DischargeComplete" % idx] = int(
+                    get_value(v, "POD_DischargeComplete") or 0
+                )
+                pod["PW%d_POD_PermanentlyFaulted" % idx] = int(
+                    get_value(v, "POD_PermanentlyFaulted") or 0
+                )
+                pod["PW%d_POD_PersistentlyFaulted" % idx] = int(
+                    get_value(v, "POD_PersistentlyFaulted") or 0
+                )
+                pod["PW%d_POD_enable_line" % idx] = int(
+                    get_value(v, "POD_enable_line") or 0
+                )
+                pod["PW%d_POD_available_charge_power" % idx] = get_value(
+                    v, "POD_available_charge_power"
+                )
+                pod["PW%d_POD_available_dischg_power" % idx] = get_value(
+                    v, "POD_available_dischg_power"
+                )
+                pod["PW%d_POD_nom_energy_remaining" % idx] = get_value(
+                    v, "POD_nom_energy_remaining"
+                )
+                pod["PW%d_POD_nom_energy_to_be_charged" % idx] = get_value(
+                    v, "POD_nom_energy_to_be_charged"
+                )
+                pod["PW%d_POD_nom_full_pack_energy" % idx] = get_value(
+                    v, "POD_nom_full_pack_energy"
+                )
+                idx = idx + 1
+        # Note: Expansion packs are now included in vitals() as TEPOD entries,
+        # so they're automatically picked up by the loop above.
+        # Aggregate data
+        d = snapshot.get("system_status")
+        pod["nominal_full_pack_energy"] = get_value(d, "nominal_full_pack_energy")
+        pod["nominal_energy_remaining"] = get_value(d, "nominal_energy_remaining")
+        pod["time_remaining_hours"] = snapshot.get("time_remaining")
+        pod["backup_reserve_percent"] = snapshot.get("reserve")
+        return json.dumps(pod)
+
+    return cached_route_handler("/pod", generate_pod)
+
+
+@route("/json", cache_key="/json")
+def route_json(path, query):
+    """JSON - Grid,Home,Solar,Battery,Level,GridStatus,Reserve,TimeRemaining,FullEnergy,RemainingEnergy,Strings"""
+    def generate_json():
+        snapshot = tick_snapshot("/json")
+        d = snapshot.get("system_status")
+        values = dict(
+            snapshot.get("power"),
+            soe=snapshot.get("level") or 0,
+            grid_status=int(snapshot.get("grid_status") == "UP"),
+            reserve=snapshot.get("reserve") or 0,
+            time_remaining_hours=snapshot.get("time_remaining") or 0,
+            full_pack_energy=get_value(d, "nominal_full_pack_energy") or 0,
+            energy_remaining=get_value(d, "nominal_energy_remaining") or 0,
+            strings=snapshot.get("strings"),
+        )
+        return json.dumps(values)
+
+    return cached_route_handler("/json", generate_json)
+
+
+@route("/version")
+def route_version(path, query):
+    """Firmware Version"""
+    version = safe_pw_call(pw.version)
+    v = {}
+    if version is None:
+        v["version"] = "SolarOnly"
+        v["vint"] = 0
+        message: str = json.dumps(v)
+    else:
+        v["version"] = version
+        v["vint"] = parse_version(version)
+        message: str = json.dumps(v)
+    return message
+
+
+@route("/help", content_type="text/html")
+def route_help(path, query):
+    """Display friendly help screen link and stats"""
+    # Slow work (network call, rusage) happens before taking the lock
+    help_site_name = safe_pw_call(pw.site_name)
+    help_mem = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with proxystats_lock:
+        proxystats["ts"] = int(time.time())
+        delta = proxystats["ts"] - proxystats["start"]
+        proxystats["uptime"] = str(datetime.timedelta(seconds=delta))
+        proxystats["mem"] = help_mem
+        proxystats["site_name"] = help_site_name
+        proxystats["cloudmode"] = pw.cloudmode
+        proxystats["fleetapi"] = pw.fleetapi
+        if (pw.cloudmode or pw.fleetapi) and pw.client is not None:
+            proxystats["siteid"] = pw.client.siteid
+            proxystats["counter"] = pw.client.counter
+        proxystats["authmode"] = pw.authmode
+    message: str = """
+    <html>\n<head><meta http-equiv="refresh" content="5" />\n
+    <style>p, td, th { font-family: Helvetica, Arial, sans-serif; font-size: 10px;}</style>\n
+    <style>h1 { font-family: Helvetica, Arial, sans-serif; font-size: 20px;}</style>\n
+    </head>\n<body>\n<h1>pyPowerwall [%VER%] Proxy [%BUILD%] </h1>\n\n
+    <p><a href="https://github.com/jasonacox/pypowerwall/blob/main/proxy/HELP.md">
+    Click here for API help.</a></p>\n\n
+    <table>\n<tr><th align ="left">Stat</th><th align ="left">Value</th></tr>
+    """
+    message = message.replace("%VER%", pypowerwall.version).replace(
+        "%BUILD%", BUILD
+    )
+    with proxystats_lock:
+        stats = proxystats_with_workers()
+        # html.escape() everything interpolated into the page - URI keys
+        # are attacker-controlled request paths (stored XSS vector)
+        for i in stats:
+            if i != "uri" and i != "config":
+                message += f'<tr><td align="left">{html.escape(str(i))}</td><td align ="left">{html.escape(str(stats[i]))}</td></tr>\n'
+        for i in stats["uri"]:
+            message += f'<tr><td align="left">URI: {html.escape(str(i))}</td><td align ="left">{html.escape(str(stats["uri"][i]))}</td></tr>\n'
+    message += """
+    <tr>
+        <td align="left">Config:</td>
+        <td align="left">
+            <details id="config-details">
+                <summary>Click to view</summary>
+                <table>
+    """
+    with proxystats_lock:
+        for i in proxystats["config"]:
+            message += f'<tr><td align="left">{html.escape(str(i))}</td><td align ="left">{html.escape(str(proxystats["config"][i]))}</td></tr>\n'
+    message += """
+                </table>
+            </details>
+        </td>
+    </tr>
+    <script>
+        document.addEventListener("DOMContentLoaded", function() {
+            var details = document.getElementById("config-details");
+            if (localStorage.getItem("config-details-open") === "true") {
+                details.setAttribute("open", "open");
+            }
+            details.addEventListener("toggle", function() {
+                localStorage.setItem("config-details-open", details.open);
+            });
+        });
+    </script>
+    """
+    message += "</table>\n"
+    message += f"\n<p>Page refresh: {str(datetime.datetime.fromtimestamp(time.time()))}</p>\n</body>\n</html>"
+    return message
+
+
+@route("/api/troubleshooting/problems")
+def route_troubleshooting_problems(path, query):
+    """Simulate old API call and respond with empty list"""
+    message = '{"problems": []}'
+    # message = pw.poll('/api/troubleshooting/problems') or '{"problems": []}'
+    return message
+
+
+@route("/tedapi", prefix=True)
+def route_tedapi(path, query):
+    """TEDAPI Specific Calls"""
+    if pw.tedapi:
+        message = '{"error": "Use /tedapi/config, /tedapi/status, /tedapi/components, /tedapi/battery, /tedapi/controller"}'
+        if query:
+            path = None  # Sub-routes only match without a query string
+        if path == "/tedapi/config":
+            message = json.dumps(safe_pw_call(pw.tedapi.get_config))
+        if path == "/tedapi/status":
+            message = json.dumps(safe_pw_call(pw.tedapi.get_status))
+        if path == "/tedapi/components":
+            message = json.dumps(safe_pw_call(pw.tedapi.get_components))
+        if path == "/tedapi/battery":
+            message = json.dumps(safe_pw_call(pw.tedapi.get_battery_blocks))
+        if path == "/tedapi/controller":
+            message = json.dumps(safe_pw_call(pw.tedapi.get_device_controller))
+    else:
+        message = '{"error": "TEDAPI not enabled"}'
+    return message
+
+
+@route("/cloud", prefix=True)
+def route_cloud(path, query):
+    """Cloud API Specific Calls"""
+    # pw.client can be None if connect() failed, so guard before
+    # dereferencing (safe_pw_call can't catch that)
+    if pw.cloudmode and not pw.fleetapi and pw.client is not None:
+        message = '{"error": "Use /cloud/battery, /cloud/power, /cloud/config"}'
+        if query:
+            path = None  # Sub-routes only match without a query string
+        if path == "/cloud/battery":
+            message = json.dumps(safe_pw_call(pw.client.get_battery))
+        if path == "/cloud/power":
+            message = json.dumps(safe_pw_call(pw.client.get_site_power))
+        if path == "/cloud/config":
+            message = json.dumps(safe_pw_call(pw.client.get_site_config))
+    else:
+        message = '{"error": "Cloud API not enabled"}'
+    return message
+
+
+@route("/fleetapi", prefix=True)
+def route_fleetapi(path, query):
+    """FleetAPI Specific Calls - guard pw.client like the /cloud routes"""
+    if pw.fleetapi and pw.client is not None:
+        message = '{"error": "Use /fleetapi/info, /fleetapi/status"}'
+        if query:
+            path = None  # Sub-routes only match without a query string
+        if path == "/fleetapi/info":
+            message = json.dumps(safe_pw_call(pw.client.get_site_info))
+        if path == "/fleetapi/status":
+            message = json.dumps(safe_pw_call(pw.client.get_live_status))
+    else:
+        message = '{"error": "FleetAPI not enabled"}'
+    return message
+
+
+@route("/control/reserve", prefix=True)
+def route_control_reserve(path, query):
+    """Current battery reserve level"""
+    if not pw_control:
+        message = '{"error": "Control Commands Disabled - Set PW_CONTROL_SECRET to enable"}'
+    else:
+        message = '{"reserve": %s}' % (
+            safe_pw_call(pw_control.get_reserve) or 0
+        )
+    return message
+
+
+@route("/control/mode", prefix=True)
+def route_control_mode(path, query):
+    """Current operating mode"""
+    if not pw_control:
+        message = '{"error": "Control Commands Disabled - Set PW_CONTROL_SECRET to enable"}'
+    else:
+        message = '{"mode": "%s"}' % (
+            safe_pw_call(pw_control.get_mode) or "unknown"
+        )
+    return message
+
+
+@route("/control/grid_charging", prefix=True)
+def route_control_grid_charging(path, query):
+    """Current grid charging state"""
+    if not pw_control:
+        message = '{"error": "Control Commands Disabled - Set PW_CONTROL_SECRET to enable"}'
+    else:
+        message = '{"grid_charging": %s}' % (
+            "true" if safe_pw_call(pw_control.get_grid_charging) else "false"
+        )
+    return message
+
+
+@route("/control/grid_export", prefix=True)
+def route_control_grid_export(path, query):
+    """Current grid export state"""
+    if not pw_control:
+        message = '{"error": "Control Commands Disabled - Set PW_CONTROL_SECRET to enable"}'
+    else:
+        # battery_ok, pv_only, and never
+        message = '{"grid_export": "%s"}' % (
+            safe_pw_call(pw_control.get_grid_export) or "unknown"
+        )
+    return message
+
+
+@route("/control/max_backup", prefix=True)
+def route_control_max_backup(path, query):
+    """Current backup events (requires v1r)"""
+    if not pw_control:
+        message = '{"error": "Control Commands Disabled - Set PW_CONTROL_SECRET to enable"}'
+    elif not pw.tedapi or not pw.tedapi.v1r:
+        message = '{"error": "max_backup requires v1r LAN transport"}'
+    else:
+        result = safe_pw_call(pw.tedapi.get_backup_events)
+        if result is not None:
+            # Auto-cancel expired events (gateway leaves them lingering).
+            # Cancel is a *write*, so it requires a valid control token
+            # (?token=<PW_CONTROL_SECRET>); a plain GET stays read-only.
+            mb = result.get('manual_backup')
+            if mb and not mb.get('active'):
+                token = parse_qs(query).get("token", [""])[0]
+                if token and control_secret and hmac.compare_digest(token, control_secret):
+                    safe_pw_call(pw.tedapi.cancel_max_backup)
+                    result['manual_backup'] = None
+            message = json.dumps(result)
+        else:
+            message = '{"error": "Failed to get backup events"}'
+    return message
+
+
+@route("/fans")
+def route_fans(path, query):
+    """Fan speeds in raw format"""
+    message = json.dumps(
+        safe_pw_call(pw.tedapi.get_fan_speeds) if pw.tedapi else {}
+    )
+    return message
+
+
+@route("/fans/pw", prefix=True)
+def route_fans_pw(path, query):
+    """Fan speeds in simplified format (e.g. FAN1_actual, FAN1_target)"""
+    if pw.tedapi:
+        fans = {}
+        fan_speeds = safe_pw_call(pw.tedapi.get_fan_speeds) or {}
+        for i, (_, value) in enumerate(sorted(fan_speeds.items())):
+            key = f"FAN{i+1}"
+            fans[f"{key}_actual"] = value.get("PVAC_Fan_Speed_Actual_RPM")
+            fans[f"{key}_target"] = value.get("PVAC_Fan_Speed_Target_RPM")
+        message = json.dumps(fans)
+    else:
+        message = "{}"
+    return message
+
+
+# Map library functions into /pw/ API calls
+PW_FUNCTIONS = {
+    "level": lambda: {"level": safe_pw_call(pw.level)},
+    "power": lambda: safe_pw_call(pw.power),
+    "site": lambda: safe_pw_call(pw.site, True),
+    "solar": lambda: safe_pw_call(pw.solar, True),
+    "battery": lambda: safe_pw_call(pw.battery, True),
+    "battery_blocks": lambda: safe_pw_call(pw.battery_blocks),
+    "load": lambda: safe_pw_call(pw.load, True),
+    "grid": lambda: safe_pw_call(pw.grid, True),
+    "home": lambda: safe_pw_call(pw.home, True),
+    "vitals": lambda: safe_pw_call(pw.vitals),
+    "temps": lambda: safe_pw_call(pw.temps),
+    "strings": lambda: safe_pw_call(pw.strings, False, True),
+    "din": lambda: {"din": safe_pw_call(pw.din)},
+    "uptime": lambda: {"uptime": safe_pw_call(pw.uptime)},
+    "version": lambda: {"version": safe_pw_call(pw.version)},
+    "status": lambda: safe_pw_call(pw.status),
+    "system_status": lambda: safe_pw_call(pw.system_status, False),
+    "grid_status": lambda: json.loads(
+        safe_pw_call(pw.grid_status, "json") or "{}"
+    ),
+    "aggregates": lambda: safe_pw_call(
+        pw.poll, "/api/meters/aggregates", False
+    ),
+    "site_name": lambda: {"site_name": safe_pw_call(pw.site_name)},
+    "alerts": lambda: {"alerts": safe_pw_call(pw.alerts)},
+    "is_connected": lambda: {"is_connected": safe_pw_call(pw.is_connected)},
+    "get_reserve": lambda: {"reserve": safe_pw_call(pw.get_reserve)},
+    "get_mode": lambda: {"mode": safe_pw_call(pw.get_mode)},
+    "get_time_remaining": lambda: {
+        "time_remaining": safe_pw_call(pw.get_time_remaining)
+    },
+}
+
+
+@route("/pw/", prefix=True, base_url=False)
+def route_pw(path, query):
+    """Map library functions into /pw/ API calls"""
+    func = None if query else PW_FUNCTIONS.get(path[4:])  # Remove '/pw/' prefix
+    if func is not None:
+        result = func()
+    else:
+        result = {"error": "Invalid Request"}
+    return json.dumps(result)
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class WorkerPoolHTTPServer(HTTPServer):
+    """
+    HTTPServer serving connections from a fixed pool of worker threads (PW_MAX_WORKERS).
+
+    Accepted connections wait in a bounded queue; when it is full the connection is
+    answered with 503 + Retry-After from the accept thread and closed, so thread count
+    and memory stay flat under bursts instead of growing with every blocked request.
+    """
+
+    def __init__(self, server_address, handler_class, workers, queue_size):
+        super().__init__(server_address, handler_class)
+        self._requests = queue.Queue(maxsize=queue_size)
+        self._stats = {"workers": workers, "max_queue": queue_size, "busy": 0,
+                       "handled": 0, "shed": 0, "peak_queue_depth": 0}
+        self._stats_lock = threading.Lock()
+        self._workers = [
+            threading.Thread(target=self._worker, name=f"worker-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def process_request(self, request, client_address):
+        try:
+            self._requests.put_nowait((request, client_address))
+        except queue.Full:
+            self.shed_request(request)
+            return
+        depth = self._requests.qsize()
+        with self._stats_lock:
+            if depth > self._stats["peak_queue_depth"]:
+                self._stats["peak_queue_depth"] = depth
+
+    def shed_request(self, request):
+        """Answer a connection with 503 Service Unavailable without queueing it."""
+        body = b'{"error": "Proxy overloaded - retry later"}'
+        response = (
+            "HTTP/1.1 503 Service Unavailable\r\n"
+            f"Retry-After: {SHED_RETRY_AFTER}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n"
+        ).encode("ascii") + body
+        try:
+            request.sendall(response)
+        except OSError as exc:
+            log.debug(f"Unable to send 503 to shed connection: {exc}")
+        self.shutdown_request(request)
+        with self._stats_lock:
+            self._stats["shed"] += 1
+
+    def _worker(self):
+        while True:
+            item = self._requests.get()
+            if item is None:
+                return
+            request, client_address = item
+            with self._stats_lock:
+                self._stats["busy"] += 1
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+                with self._stats_lock:
+                    self._stats["busy"] -= 1
+                    self._stats["handled"] += 1
+
+    def pool_status(self):
+        """Worker pool occupancy and shed counters for /stats and /health."""
+        with self._stats_lock:
+            return dict(self._stats, queue_depth=self._requests.qsize())
+
+    def server_close(self):
+        super().server_close()
+        for _ in self._workers:
+            self._requests.put(None)
+
+
+class ReusePortMixIn:
+    """Bind with SO_REUSEPORT so every PW_WORKERS process accepts on the same port."""
+
+    def server_bind(self):
+        self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        super().server_bind()
+
+
+class ReusePortHTTPServer(ReusePortMixIn, ThreadingHTTPServer):
+    pass
+
+
+class ReusePortWorkerPoolHTTPServer(ReusePortMixIn, WorkerPoolHTTPServer):
+    pass
 
 
 # pylint: disable=arguments-differ,global-variable-not-assigned
 # noinspection PyPep8Naming
 class Handler(BaseHTTPRequestHandler):
+    if keepalive_enabled:
+        # Persistent connections - every response must carry Content-Length
+        protocol_version = "HTTP/1.1"
+        timeout = keepalive_timeout  # idle timeout between requests on a connection
+        # Headers and body are separate writes - without TCP_NODELAY, Nagle + delayed
+        # ACK add ~40ms to every response on a reused connection
+        disable_nagle_algorithm = True
+    connection_requests = 0  # requests served on this connection
+    metrics_route = "static"  # /metrics latency label - the matched route path
+
+    def setup(self):
+        super().setup()
+        if keepalive_enabled:
+            with _keepalive_stats_lock:
+                _keepalive_stats["connections"] += 1
+
+    def parse_request(self):
+        if not super().parse_request():
+            return False
+        if keepalive_enabled:
+            self.connection_requests += 1
+            with _keepalive_stats_lock:
+                _keepalive_stats["requests"] += 1
+                if self.connection_requests > 1:
+                    _keepalive_stats["reused"] += 1
+        return True
+
+    def send_response(self, code, message=None):
+        super().send_response(code, message)
+        if (keepalive_max_requests and self.protocol_version == "HTTP/1.1"
+                and self.connection_requests >= keepalive_max_requests
+                and not self.close_connection):
+            # Request cap reached - tell the client and close after this response
+            self.send_header("Connection", "close")
+            with _keepalive_stats_lock:
+                _keepalive_stats["capped"] += 1
+
     def log_message(self, log_format, *args):
         if debugmode:
             log.debug("%s %s" % (self.address_string(), log_format % args))
@@ -1211,12 +4445,18 @@ class Handler(BaseHTTPRequestHandler):
     def address_string(self):
         # replace function to avoid lookup delays
         hostaddr, hostport = self.client_address[:2]
+        if _poller_port is not None and _worker_slot is None and hostaddr == "127.0.0.1":
+            # PW_WORKERS poller - the request was relayed by a worker for this client
+            headers = getattr(self, "headers", None)
+            return (headers and headers.get("X-Forwarded-For")) or hostaddr
         return hostaddr
 
     def do_POST(self):
         global proxystats
         contenttype = "application/json"
         message = '{"error": "Invalid Request"}'
+        body_read = False
+        _response_local.priority = True  # control commands always get the gateway budget
 
         # If set, remove the api_base_url from the requested path. This allows installing the
         # the proxy on a path without impacting the use of Telegraf or other integrations. Python 3.9+
@@ -1231,6 +4471,8 @@ class Handler(BaseHTTPRequestHandler):
             message = None
             if not control_secret:
                 message = '{"error": "Control Commands Disabled - Set PW_CONTROL_SECRET to enable"}'
+            elif not _backend_ready.is_set():
+                message = '{"error": "Control Command Error: Still connecting to Powerwall - retry later"}'
             else:
                 value = token = ""
                 try:
@@ -1243,6 +4485,7 @@ class Handler(BaseHTTPRequestHandler):
                         log.error(f"Control Command Error: POST body too large ({content_length} bytes)")
                     else:
                         post_data = self.rfile.read(content_length)
+                        body_read = True
                         query_params = parse_qs(post_data.decode("utf-8"))
                         value = query_params.get("value", [""])[0]
                         token = query_params.get("token", [""])[0]
@@ -1454,13 +4697,28 @@ class Handler(BaseHTTPRequestHandler):
         self.send_header("Content-type", contenttype)
         self.send_header("Content-Length", str(len(body)))
         self.send_header("Access-Control-Allow-Origin", "*")
+        if keepalive_enabled and not body_read and self.headers.get("Content-Length", "0") != "0":
+            # An unread request body would be parsed as the next request - close instead
+            self.send_header("Connection", "close")
         self.end_headers()
         self.wfile.write(body)
 
     def do_GET(self):
+        start = perf_counter()
+        # Reset per request - keep-alive connections reuse the Handler instance
+        self.metrics_route = "static"
+        try:
+            self.serve_get()
+        finally:
+            if self.metrics_route is not None:
+                observe_latency(_request_latency, self.metrics_route, perf_counter() - start)
+
+    def serve_get(self):
         global proxystats
-        self.send_response(200)
         contenttype = "application/json"
+        _response_local.entry = None
+        # Work outside a route (index page, web assets) is not priority for PW_RATE_LIMIT
+        _response_local.priority = False
 
         # If set, remove the api_base_url from the requested path. This allows installing the
         # the proxy on a path without impacting the use of Telegraf or other integrations. Python 3.9+
@@ -1469,919 +4727,18 @@ class Handler(BaseHTTPRequestHandler):
         if new_path is not request_path:
             request_path = "/" + new_path
 
-        if request_path == "/aggregates" or request_path == "/api/meters/aggregates":
-            # Meters - JSON
-            def generate_aggregates():
-                # Both routes deliver same payload, use shared cache key
-                aggregates = safe_endpoint_call(
-                    "/aggregates", pw.poll, "/api/meters/aggregates"
-                )
-
-                # Parse aggregates if it's a JSON string
-                if isinstance(aggregates, str):
-                    try:
-                        aggregates = json.loads(aggregates)
-                    except (json.JSONDecodeError, TypeError):
-                        aggregates = None
-
-                # Apply site zero threshold - suppress phantom grid noise
-                # Pass through None values - they indicate a data gap, not zero
-                if (
-                    site_zero_threshold > 0
-                    and aggregates
-                    and "site" in aggregates
-                    and "instant_power" in aggregates["site"]
-                    and aggregates["site"]["instant_power"] is not None
-                    and abs(aggregates["site"]["instant_power"]) <= site_zero_threshold
-                ):
-                    aggregates["site"]["instant_power"] = 0
-
-                if aggregates and not neg_solar and "solar" in aggregates:
-                    solar = aggregates["solar"]
-                    if solar and solar.get("instant_power") is not None and solar["instant_power"] < 0:
-                        # Shift energy from solar to load
-                        if "load" in aggregates and (aggregates["load"] or {}).get("instant_power") is not None:
-                            aggregates["load"]["instant_power"] -= solar["instant_power"]
-                        # Finally, clamp solar to 0
-                        solar["instant_power"] = 0
-
-                try:
-                    if aggregates:
-                        return json.dumps(aggregates)
-                    else:
-                        # No data available - return None to indicate stale/missing data
-                        return None
-                except:
-                    log.error(f"JSON encoding error in payload: {aggregates}")
-                    return None
-
-            message = cached_route_handler("/aggregates", generate_aggregates)
-        elif request_path == "/soe":
-            # Battery Level - JSON
-            message: str = safe_endpoint_call(
-                "/soe", pw.poll, "/api/system_status/soe", jsonformat=True
-            )
-            # Return None if no current data available (better than fake 0%)
-        elif request_path == "/api/system_status/soe":
-            # Force 95% Scale
-            level = safe_pw_call(pw.level, scale=True)
-            message: str = (
-                json.dumps({"percentage": level}) if level is not None else None
-            )
-        elif request_path == "/api/system_status/grid_status":
-            # Grid Status - JSON
-            message: str = safe_pw_call(
-                pw.poll, "/api/system_status/grid_status", jsonformat=True
-            )
-        elif request_path.startswith("/csv") or request_path.startswith("/csv/v2"):
-            # CSV Output - Grid,Home,Solar,Battery,Level
-            # CSV2 Output - Grid,Home,Solar,Battery,Level,GridStatus,Reserve
-            # Add ?headers to include CSV headers, e.g. http://localhost:8675/csv?headers
-            # None values are treated as 0 in CSV output (use JSON endpoints to see data gaps as nulls)
-            contenttype = "text/plain; charset=utf-8"
-
-            # Determine endpoint and whether to include headers
-            is_v2 = request_path.startswith("/csv/v2")
-            include_headers = "headers" in request_path
-            cache_key = f"/csv/v2{'_headers' if include_headers else ''}" if is_v2 else f"/csv{'_headers' if include_headers else ''}"
-
-            def generate_csv():
-                # Optimization: Use single aggregates call for all power values
-                aggregates = safe_endpoint_call("/aggregates", pw.poll, "/api/meters/aggregates", jsonformat=False)
-                if aggregates:
-                    grid = (aggregates.get('site') or {}).get('instant_power', 0)
-                    solar = (aggregates.get('solar') or {}).get('instant_power', 0)
-                    battery = (aggregates.get('battery') or {}).get('instant_power', 0)
-                    home = (aggregates.get('load') or {}).get('instant_power', 0)
-                else:
-                    grid = solar = battery = home = 0
-
-                # Convert None to 0 for output BEFORE any comparisons below
-                # (None = data gap, output as 0; comparing None crashes)
-                grid = grid or 0
-                solar = solar or 0
-                battery = battery or 0
-                home = home or 0
-
-                # Apply negative solar correction if configured
-                if not neg_solar and solar < 0:
-                    # Shift energy from solar to load
-                    home -= solar
-                    solar = 0
-
-                # Apply site zero threshold - suppress phantom grid noise
-                if site_zero_threshold > 0 and abs(grid) <= site_zero_threshold:
-                    grid = 0
-
-                # Get battery level - poll() handles caching internally
-                batterylevel = safe_pw_call(pw.level) or 0
-
-                if is_v2:
-                    # Get grid status and reserve - these use cached data internally
-                    gridstatus = 1 if safe_pw_call(pw.grid_status) == "UP" else 0
-                    reserve = safe_pw_call(pw.get_reserve) or 0
-
-                # Build CSV response
-                if is_v2:
-                    result = ""
-                    if include_headers:
-                        result += (
-                            "Grid,Home,Solar,Battery,BatteryLevel,GridStatus,Reserve\n"
-                        )
-                    result += "%0.2f,%0.2f,%0.2f,%0.2f,%0.2f,%d,%d\n" % (
-                        grid,
-                        home,
-                        solar,
-                        battery,
-                        batterylevel,
-                        gridstatus,
-                        reserve,
-                    )
-                else:
-                    result = ""
-                    if include_headers:
-                        result += "Grid,Home,Solar,Battery,BatteryLevel\n"
-                    result += "%0.2f,%0.2f,%0.2f,%0.2f,%0.2f\n" % (
-                        grid,
-                        home,
-                        solar,
-                        battery,
-                        batterylevel,
-                    )
-                return result
-
-            message = cached_route_handler(cache_key, generate_csv)
-        elif request_path == "/vitals":
-            # Vitals Data - JSON
-            message = cached_route_handler(
-                "/vitals",
-                lambda: safe_endpoint_call("/vitals", pw.vitals, jsonformat=True)
-            )
-        elif request_path == "/strings":
-            # Strings Data - JSON
-            message = cached_route_handler(
-                "/strings",
-                lambda: safe_endpoint_call("/strings", pw.strings, jsonformat=True)
-            )
-        elif request_path == "/stats":
-            # Give Internal Stats
-            # Do the slow work (network call, rusage) BEFORE taking the lock -
-            # holding proxystats_lock across a gateway call would serialize
-            # every other request thread for up to the pw timeout during outages
-            stats_site_name = safe_pw_call(pw.site_name)
-            stats_mem = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
-            with proxystats_lock:
-                proxystats["ts"] = int(time.time())
-                delta = proxystats["ts"] - proxystats["start"]
-                proxystats["uptime"] = str(datetime.timedelta(seconds=delta))
-                proxystats["mem"] = stats_mem
-                proxystats["site_name"] = stats_site_name
-                proxystats["cloudmode"] = pw.cloudmode
-                proxystats["fleetapi"] = pw.fleetapi
-                if (pw.cloudmode or pw.fleetapi) and pw.client is not None:
-                    proxystats["siteid"] = pw.client.siteid
-                    proxystats["counter"] = pw.client.counter
-
-                # Add connection health stats if enabled
-                if health_check_enabled:
-                    with _connection_health_lock:
-                        proxystats["connection_health"] = {
-                            "consecutive_failures": _connection_health[
-                                "consecutive_failures"
-                            ],
-                            "total_failures": _connection_health["total_failures"],
-                            "total_successes": _connection_health["total_successes"],
-                            "is_degraded": _connection_health["is_degraded"],
-                            "last_success_time": _connection_health[
-                                "last_success_time"
-                            ],
-                            "cache_size": len(_last_good_responses)
-                            if graceful_degradation
-                            else 0,
-                        }
-
-                # Add SolarOnly fallback mode state
-                with _fallback_mode_lock:
-                    fm_snap = dict(_fallback_mode)
-                proxystats["fallback_mode"] = {
-                    "is_fallback_mode": fm_snap["is_fallback_mode"],
-                    "fallback_since": fm_snap["fallback_since"],
-                    "fallback_duration_seconds": (
-                        round(time.time() - fm_snap["fallback_since"], 1)
-                        if fm_snap["fallback_since"] else None
-                    ),
-                    "recovery_attempts": fm_snap["recovery_attempts"],
-                    "last_recovery_attempt": fm_snap["last_recovery_attempt"],
-                    "recovery_enabled": tedapi_recovery_enabled,
-                }
-
-                # Add cache memory usage statistics
-                proxystats["mem_cache"] = {}
-
-                with _error_counts_lock:
-                    proxystats["mem_cache"]["error_counts"] = {
-                        "entries": len(_error_counts),
-                        "size_bytes": sys.getsizeof(_error_counts) + sum(
-                            sys.getsizeof(k) + sys.getsizeof(v)
-                            for k, v in _error_counts.items()
-                        ),
-                    }
-                    proxystats["mem_cache"]["network_error_summary"] = {
-                        "entries": len(_network_error_summary),
-                        "size_bytes": sys.getsizeof(_network_error_summary) + sum(
-                            sys.getsizeof(k) + sys.getsizeof(v) + sum(
-                                sys.getsizeof(ek) + sys.getsizeof(ev)
-                                for ek, ev in v.items()
-                            ) for k, v in _network_error_summary.items()
-                        ),
-                    }
-
-                with _last_good_responses_lock:
-                    proxystats["mem_cache"]["degradation_cache"] = {
-                        "entries": len(_last_good_responses),
-                        "size_bytes": sys.getsizeof(_last_good_responses) + sum(
-                            sys.getsizeof(k) + sys.getsizeof(v) + sys.getsizeof(v[0]) + sys.getsizeof(v[1])
-                            for k, v in _last_good_responses.items()
-                        ),
-                    }
-
-                with _performance_cache_lock:
-                    proxystats["mem_cache"]["performance_cache"] = {
-                        "entries": len(_performance_cache),
-                        "size_bytes": sys.getsizeof(_performance_cache) + sum(
-                            sys.getsizeof(k) + sys.getsizeof(v) + sys.getsizeof(v[0]) + sys.getsizeof(v[1])
-                            for k, v in _performance_cache.items()
-                        ),
-                    }
-
-                with _endpoint_stats_lock:
-                    proxystats["mem_cache"]["endpoint_stats"] = {
-                        "entries": len(_endpoint_stats),
-                        "size_bytes": sys.getsizeof(_endpoint_stats) + sum(
-                            sys.getsizeof(k) + sys.getsizeof(v) + sum(
-                                sys.getsizeof(ek) + sys.getsizeof(ev)
-                                for ek, ev in v.items()
-                            ) for k, v in _endpoint_stats.items()
-                        ),
-                    }
-
-                # Add total cache memory usage
-                total_cache_bytes = sum(
-                    cache_info["size_bytes"] for cache_info in proxystats["mem_cache"].values()
-                )
-                proxystats["mem_cache"]["total_cache_bytes"] = total_cache_bytes
-                proxystats["mem_cache"]["total_cache_mb"] = round(total_cache_bytes / 1024 / 1024, 2)
-
-                message: str = json.dumps(proxystats)
-        elif request_path == "/stats/clear":
-            # Clear Internal Stats
-            log.debug("Clear internal stats")
-            with proxystats_lock:
-                proxystats["gets"] = 0
-                proxystats["errors"] = 0
-                proxystats["uri"] = {}
-                proxystats["clear"] = int(time.time())
-            message: str = json.dumps(proxystats)
-        elif request_path == "/health":
-            # Connection Health and Cache Status
-            health_info = {
-                "pypowerwall": "%s Proxy %s" % (pypowerwall.version, BUILD),
-                "mode": proxystats.get("mode", "Unknown"),
-                "tedapi_mode": proxystats.get("tedapi_mode", "off"),
-                "pypowerwall_cache_expire": cache_expire,
-                "degradation_cache_ttl_seconds": degradation_cache_ttl_seconds,
-                "graceful_degradation": graceful_degradation,
-                "fail_fast_mode": fail_fast_mode,
-                "health_check_enabled": health_check_enabled,
-                "startup_time": datetime.datetime.fromtimestamp(
-                    proxystats["start"]
-                ).isoformat(),
-                "current_time": datetime.datetime.now().isoformat(),
-            }
-
-            # Add transport status for v1r/hybrid modes
-            health_info["transports"] = get_transport_health()
-
-            # Add overall proxy response counters
-            with proxystats_lock:
-                health_info["proxy_stats"] = {
-                    "total_gets": proxystats["gets"],
-                    "total_posts": proxystats["posts"],
-                    "total_errors": proxystats["errors"],
-                    "total_timeouts": proxystats["timeout"],
-                }
-
-            if health_check_enabled:
-                with _connection_health_lock:
-                    health_info["connection_health"] = {
-                        "consecutive_failures": _connection_health[
-                            "consecutive_failures"
-                        ],
-                        "total_failures": _connection_health["total_failures"],
-                        "total_successes": _connection_health["total_successes"],
-                        "is_degraded": _connection_health["is_degraded"],
-                        "last_success_time": _connection_health["last_success_time"],
-                        "last_success_age_seconds": time.time()
-                        - _connection_health["last_success_time"],
-                    }
-
-            # SolarOnly fallback mode state (separate from connection_health degradation)
-            with _fallback_mode_lock:
-                fm = dict(_fallback_mode)
-            health_info["fallback_mode"] = {
-                "is_fallback_mode": fm["is_fallback_mode"],
-                "fallback_since": fm["fallback_since"],
-                "fallback_duration_seconds": (
-                    round(time.time() - fm["fallback_since"], 1)
-                    if fm["fallback_since"] else None
-                ),
-                "recovery_attempts": fm["recovery_attempts"],
-                "last_recovery_attempt": fm["last_recovery_attempt"],
-                "recovery_enabled": tedapi_recovery_enabled,
-            }
-
-            if graceful_degradation:
-                with _last_good_responses_lock:
-                    cached_endpoints = {}
-                    current_time = time.time()
-                    for endpoint, (data, timestamp) in _last_good_responses.items():
-                        age = current_time - timestamp
-                        cached_endpoints[endpoint] = {
-                            "age_seconds": age,
-                            "is_expired": age >= degradation_cache_ttl_seconds,
-                        }
-                    health_info["cached_data"] = {
-                        "cache_size": len(_last_good_responses),
-                        "endpoints": cached_endpoints,
-                    }
-
-            # Add endpoint call statistics
-            with _endpoint_stats_lock:
-                endpoint_stats = {}
-                current_time = time.time()
-                for endpoint, stats in _endpoint_stats.items():
-                    success_rate = (
-                        (stats["successful_calls"] / stats["total_calls"] * 100)
-                        if stats["total_calls"] > 0
-                        else 0
-                    )
-                    endpoint_info = {
-                        "total_calls": stats["total_calls"],
-                        "successful_calls": stats["successful_calls"],
-                        "failed_calls": stats["failed_calls"],
-                        "success_rate_percent": round(success_rate, 2),
-                    }
-
-                    if stats["last_success_time"]:
-                        endpoint_info["last_success_age_seconds"] = (
-                            current_time - stats["last_success_time"]
-                        )
-                    if stats["last_failure_time"]:
-                        endpoint_info["last_failure_age_seconds"] = (
-                            current_time - stats["last_failure_time"]
-                        )
-
-                    endpoint_stats[endpoint] = endpoint_info
-
-                if endpoint_stats:
-                    health_info["endpoint_statistics"] = endpoint_stats
-
-            message: str = json.dumps(health_info)
-        elif request_path == "/health/reset":
-            # Reset Health Counters and Clear Cache
-            cache_size_before = 0
-
-            if health_check_enabled:
-                with _connection_health_lock:
-                    _connection_health["consecutive_failures"] = 0
-                    _connection_health["total_failures"] = 0
-                    _connection_health["total_successes"] = 0
-                    _connection_health["is_degraded"] = False
-                    _connection_health["last_success_time"] = time.time()
-
-            # Reset SolarOnly fallback mode state
-            with _fallback_mode_lock:
-                _fallback_mode["is_fallback_mode"] = False
-                _fallback_mode["fallback_since"] = None
-                _fallback_mode["recovery_attempts"] = 0
-                _fallback_mode["last_recovery_attempt"] = None
-
-            if graceful_degradation:
-                with _last_good_responses_lock:
-                    cache_size_before = len(_last_good_responses)
-                    _last_good_responses.clear()
-
-            # Reset endpoint statistics
-            endpoint_stats_count = 0
-            with _endpoint_stats_lock:
-                endpoint_stats_count = len(_endpoint_stats)
-                _endpoint_stats.clear()
-
-            log.info(
-                "Health counters, cache, and endpoint statistics reset via /health/reset endpoint"
-            )
-            message: str = json.dumps(
-                {
-                    "status": "reset_complete",
-                    "health_counters_reset": health_check_enabled,
-                    "cache_cleared": graceful_degradation,
-                    "cache_entries_removed": cache_size_before
-                    if graceful_degradation
-                    else 0,
-                    "endpoint_stats_cleared": endpoint_stats_count,
-                }
-            )
-        elif request_path == "/temps":
-            # Temps of Powerwalls
-            message: str = safe_pw_call(pw.temps, jsonformat=True) or json.dumps({})
-        elif request_path == "/temps/pw":
-            # Temps of Powerwalls with Simple Keys
-            def generate_temps_pw():
-                pwtemp = {}
-                idx = 1
-                temps = safe_pw_call(pw.temps)
-                if temps:
-                    for i in temps:
-                        key = "PW%d_temp" % idx
-                        pwtemp[key] = temps[i]
-                        idx = idx + 1
-                return json.dumps(pwtemp)
-
-            message = cached_route_handler("/temps/pw", generate_temps_pw)
-        elif request_path == "/alerts":
-            # Alerts
-            message: str = safe_pw_call(pw.alerts, jsonformat=True) or json.dumps([])
-        elif request_path == "/alerts/pw":
-            # Alerts in dictionary/object format
-            def generate_alerts_pw():
-                pwalerts = {}
-                alerts = safe_pw_call(pw.alerts)
-                if alerts is None:
-                    return None
-                else:
-                    for alert in alerts:
-                        pwalerts[alert] = 1
-                    return json.dumps(pwalerts) or json.dumps({})
-
-            message = cached_route_handler("/alerts/pw", generate_alerts_pw)
-        elif request_path == "/freq":
-            # Frequency, Current, Voltage and Grid Status
-            def generate_freq():
-                fcv = {}
-                idx = 1
-                # Pull freq, current, voltage of each Powerwall via system_status
-                d = safe_pw_call(pw.system_status) or {}
-                if "battery_blocks" in d:
-                    for block in d["battery_blocks"]:
-                        fcv["PW%d_name" % idx] = None  # Placeholder for vitals
-                        fcv["PW%d_PINV_Fout" % idx] = get_value(block, "f_out")
-                        fcv["PW%d_PINV_VSplit1" % idx] = None  # Placeholder for vitals
-                        fcv["PW%d_PINV_VSplit2" % idx] = None  # Placeholder for vitals
-                        fcv["PW%d_PackagePartNumber" % idx] = get_value(
-                            block, "PackagePartNumber"
-                        )
-                        fcv["PW%d_PackageSerialNumber" % idx] = get_value(
-                            block, "PackageSerialNumber"
-                        )
-                        fcv["PW%d_p_out" % idx] = get_value(block, "p_out")
-                        fcv["PW%d_q_out" % idx] = get_value(block, "q_out")
-                        fcv["PW%d_v_out" % idx] = get_value(block, "v_out")
-                        fcv["PW%d_f_out" % idx] = get_value(block, "f_out")
-                        fcv["PW%d_i_out" % idx] = get_value(block, "i_out")
-                        idx = idx + 1
-                # Pull freq, current, voltage of each Powerwall via vitals if available
-                vitals = safe_pw_call(pw.vitals) or {}
-                idx = 1
-                for device in vitals:
-                    d = vitals[device]
-                    if device.startswith("TEPINV"):
-                        # PW freq
-                        fcv["PW%d_name" % idx] = device
-                        fcv["PW%d_PINV_Fout" % idx] = get_value(d, "PINV_Fout")
-                        fcv["PW%d_PINV_VSplit1" % idx] = get_value(d, "PINV_VSplit1")
-                        fcv["PW%d_PINV_VSplit2" % idx] = get_value(d, "PINV_VSplit2")
-                        idx = idx + 1
-                    if device.startswith("TESYNC") or device.startswith("TEMSA"):
-                        # Island and Meter Metrics from Backup Gateway or Backup Switch
-                        for i in d:
-                            if i.startswith("ISLAND") or i.startswith("METER"):
-                                fcv[i] = d[i]
-                fcv["grid_status"] = safe_pw_call(pw.grid_status, "numeric")
-                return json.dumps(fcv)
-
-            message = cached_route_handler("/freq", generate_freq)
-        elif request_path == "/pod":
-            # Powerwall Battery Data
-            def generate_pod():
-                pod = {}
-                # Get Individual Powerwall Battery Data
-                d = safe_pw_call(pw.system_status) or {}
-                if "battery_blocks" in d:
-                    idx = 1
-                    for block in d["battery_blocks"]:
-                        # Vital Placeholders
-                        pod["PW%d_name" % idx] = None
-                        pod["PW%d_POD_ActiveHeating" % idx] = None
-                        pod["PW%d_POD_ChargeComplete" % idx] = None
-                        pod["PW%d_POD_ChargeRequest" % idx] = None
-                        pod["PW%d_POD_DischargeComplete" % idx] = None
-                        pod["PW%d_POD_PermanentlyFaulted" % idx] = None
-                        pod["PW%d_POD_PersistentlyFaulted" % idx] = None
-                        pod["PW%d_POD_enable_line" % idx] = None
-                        pod["PW%d_POD_available_charge_power" % idx] = None
-                        pod["PW%d_POD_available_dischg_power" % idx] = None
-                        pod["PW%d_POD_nom_energy_remaining" % idx] = None
-                        pod["PW%d_POD_nom_energy_to_be_charged" % idx] = None
-                        pod["PW%d_POD_nom_full_pack_energy" % idx] = None
-                        # Additional System Status Data
-                        pod["PW%d_POD_nom_energy_remaining" % idx] = get_value(
-                            block, "nominal_energy_remaining"
-                        )  # map
-                        pod["PW%d_POD_nom_full_pack_energy" % idx] = get_value(
-                            block, "nominal_full_pack_energy"
-                        )  # map
-                        pod["PW%d_PackagePartNumber" % idx] = get_value(
-                            block, "PackagePartNumber"
-                        )
-                        pod["PW%d_PackageSerialNumber" % idx] = get_value(
-                            block, "PackageSerialNumber"
-                        )
-                        pod["PW%d_pinv_state" % idx] = get_value(block, "pinv_state")
-                        pod["PW%d_pinv_grid_state" % idx] = get_value(
-                            block, "pinv_grid_state"
-                        )
-                        pod["PW%d_p_out" % idx] = get_value(block, "p_out")
-                        pod["PW%d_q_out" % idx] = get_value(block, "q_out")
-                        pod["PW%d_v_out" % idx] = get_value(block, "v_out")
-                        pod["PW%d_f_out" % idx] = get_value(block, "f_out")
-                        pod["PW%d_i_out" % idx] = get_value(block, "i_out")
-                        pod["PW%d_energy_charged" % idx] = get_value(
-                            block, "energy_charged"
-                        )
-                        pod["PW%d_energy_discharged" % idx] = get_value(
-                            block, "energy_discharged"
-                        )
-                        pod["PW%d_off_grid" % idx] = int(get_value(block, "off_grid") or 0)
-                        pod["PW%d_vf_mode" % idx] = int(get_value(block, "vf_mode") or 0)
-                        pod["PW%d_wobble_detected" % idx] = int(
-                            get_value(block, "wobble_detected") or 0
-                        )
-                        pod["PW%d_charge_power_clamped" % idx] = int(
-                            get_value(block, "charge_power_clamped") or 0
-                        )
-                        pod["PW%d_backup_ready" % idx] = int(
-                            get_value(block, "backup_ready") or 0
-                        )
-                        pod["PW%d_OpSeqState" % idx] = get_value(block, "OpSeqState")
-                        pod["PW%d_version" % idx] = get_value(block, "version")
-                        idx = idx + 1
-                # Augment with Vitals Data if available
-                vitals = safe_pw_call(pw.vitals) or {}
-                idx = 1
-                for device in vitals:
-                    v = vitals[device]
-                    if device.startswith("TEPOD"):
-                        pod["PW%d_name" % idx] = device
-                        pod["PW%d_POD_ActiveHeating" % idx] = int(
-                            get_value(v, "POD_ActiveHeating") or 0
-                        )
-                        pod["PW%d_POD_ChargeComplete" % idx] = int(
-                            get_value(v, "POD_ChargeComplete") or 0
-                        )
-                        pod["PW%d_POD_ChargeRequest" % idx] = int(
-                            get_value(v, "POD_ChargeRequest") or 0
-                        )
-                        pod["PW%d_POD_DischargeComplete" % idx] = int(
-                            get_value(v, "POD_DischargeComplete") or 0
-                        )
-                        pod["PW%d_POD_PermanentlyFaulted" % idx] = int(
-                            get_value(v, "POD_PermanentlyFaulted") or 0
-                        )
-                        pod["PW%d_POD_PersistentlyFaulted" % idx] = int(
-                            get_value(v, "POD_PersistentlyFaulted") or 0
-                        )
-                        pod["PW%d_POD_enable_line" % idx] = int(
-                            get_value(v, "POD_enable_line") or 0
-                        )
-                        pod["PW%d_POD_available_charge_power" % idx] = get_value(
-                            v, "POD_available_charge_power"
-                        )
-                        pod["PW%d_POD_available_dischg_power" % idx] = get_value(
-                            v, "POD_available_dischg_power"
-                        )
-                        pod["PW%d_POD_nom_energy_remaining" % idx] = get_value(
-                            v, "POD_nom_energy_remaining"
-                        )
-                        pod["PW%d_POD_nom_energy_to_be_charged" % idx] = get_value(
-                            v, "POD_nom_energy_to_be_charged"
-                        )
-                        pod["PW%d_POD_nom_full_pack_energy" % idx] = get_value(
-                            v, "POD_nom_full_pack_energy"
-                        )
-                        idx = idx + 1
-                # Note: Expansion packs are now included in vitals() as TEPOD entries,
-                # so they're automatically picked up by the loop above.
-                # Aggregate data
-                pod["nominal_full_pack_energy"] = get_value(d, "nominal_full_pack_energy")
-                pod["nominal_energy_remaining"] = get_value(d, "nominal_energy_remaining")
-                pod["time_remaining_hours"] = safe_pw_call(pw.get_time_remaining)
-                pod["backup_reserve_percent"] = safe_pw_call(pw.get_reserve)
-                return json.dumps(pod)
-
-            message = cached_route_handler("/pod", generate_pod)
-        elif request_path == "/json":
-            # JSON - Grid,Home,Solar,Battery,Level,GridStatus,Reserve,TimeRemaining,FullEnergy,RemainingEnergy,Strings
-            def generate_json():
-                # Optimization: Use single aggregates call for all power values (like CSV endpoint)
-                aggregates = safe_endpoint_call("/aggregates", pw.poll, "/api/meters/aggregates", jsonformat=False)
-                if aggregates:
-                    grid = aggregates.get('site', {}).get('instant_power', 0)
-                    solar = aggregates.get('solar', {}).get('instant_power', 0)
-                    battery = aggregates.get('battery', {}).get('instant_power', 0)
-                    home = aggregates.get('load', {}).get('instant_power', 0)
-                else:
-                    grid = solar = battery = home = None
-
-                # Apply negative solar correction if configured
-                if not neg_solar and solar is not None and solar < 0:
-                    # Shift energy from solar to load
-                    home -= solar
-                    solar = 0
-
-                # Apply site zero threshold - suppress phantom grid noise
-                # Pass through None values — they indicate a data gap, not zero
-                if site_zero_threshold > 0 and grid is not None and abs(grid) <= site_zero_threshold:
-                    grid = 0
-
-                # Convert None to 0 for output (None = data gap, output as 0)
-                grid = grid or 0
-                solar = solar or 0
-                battery = battery or 0
-                home = home or 0
-
-                # Get remaining data
-                d = safe_pw_call(pw.system_status) or {}
-                values = {
-                    "grid": grid,
-                    "home": home,
-                    "solar": solar,
-                    "battery": battery,
-                    "soe": safe_pw_call(pw.level) or 0,
-                    "grid_status": int(safe_pw_call(pw.grid_status) == "UP"),
-                    "reserve": safe_pw_call(pw.get_reserve) or 0,
-                    "time_remaining_hours": safe_pw_call(pw.get_time_remaining) or 0,
-                    "full_pack_energy": get_value(d, "nominal_full_pack_energy") or 0,
-                    "energy_remaining": get_value(d, "nominal_energy_remaining") or 0,
-                    "strings": safe_pw_call(pw.strings, jsonformat=False) or {},
-                }
-                return json.dumps(values)
-
-            message = cached_route_handler("/json", generate_json)
-        elif request_path == "/version":
-            # Firmware Version
-            version = safe_pw_call(pw.version)
-            v = {}
-            if version is None:
-                v["version"] = "SolarOnly"
-                v["vint"] = 0
-                message: str = json.dumps(v)
-            else:
-                v["version"] = version
-                v["vint"] = parse_version(version)
-                message: str = json.dumps(v)
-        elif request_path == "/help":
-            # Display friendly help screen link and stats
-            # Slow work (network call, rusage) happens before taking the lock
-            help_site_name = safe_pw_call(pw.site_name)
-            help_mem = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
-            with proxystats_lock:
-                proxystats["ts"] = int(time.time())
-                delta = proxystats["ts"] - proxystats["start"]
-                proxystats["uptime"] = str(datetime.timedelta(seconds=delta))
-                proxystats["mem"] = help_mem
-                proxystats["site_name"] = help_site_name
-                proxystats["cloudmode"] = pw.cloudmode
-                proxystats["fleetapi"] = pw.fleetapi
-                if (pw.cloudmode or pw.fleetapi) and pw.client is not None:
-                    proxystats["siteid"] = pw.client.siteid
-                    proxystats["counter"] = pw.client.counter
-                proxystats["authmode"] = pw.authmode
-            contenttype = "text/html"
-            message: str = """
-            <html>\n<head><meta http-equiv="refresh" content="5" />\n
-            <style>p, td, th { font-family: Helvetica, Arial, sans-serif; font-size: 10px;}</style>\n
-            <style>h1 { font-family: Helvetica, Arial, sans-serif; font-size: 20px;}</style>\n
-            </head>\n<body>\n<h1>pyPowerwall [%VER%] Proxy [%BUILD%] </h1>\n\n
-            <p><a href="https://github.com/jasonacox/pypowerwall/blob/main/proxy/HELP.md">
-            Click here for API help.</a></p>\n\n
-            <table>\n<tr><th align ="left">Stat</th><th align ="left">Value</th></tr>
-            """
-            message = message.replace("%VER%", pypowerwall.version).replace(
-                "%BUILD%", BUILD
-            )
-            with proxystats_lock:
-                # html.escape() everything interpolated into the page - URI keys
-                # are attacker-controlled request paths (stored XSS vector)
-                for i in proxystats:
-                    if i != "uri" and i != "config":
-                        message += f'<tr><td align="left">{html.escape(str(i))}</td><td align ="left">{html.escape(str(proxystats[i]))}</td></tr>\n'
-                for i in proxystats["uri"]:
-                    message += f'<tr><td align="left">URI: {html.escape(str(i))}</td><td align ="left">{html.escape(str(proxystats["uri"][i]))}</td></tr>\n'
-            message += """
-            <tr>
-                <td align="left">Config:</td>
-                <td align="left">
-                    <details id="config-details">
-                        <summary>Click to view</summary>
-                        <table>
-            """
-            with proxystats_lock:
-                for i in proxystats["config"]:
-                    message += f'<tr><td align="left">{html.escape(str(i))}</td><td align ="left">{html.escape(str(proxystats["config"][i]))}</td></tr>\n'
-            message += """
-                        </table>
-                    </details>
-                </td>
-            </tr>
-            <script>
-                document.addEventListener("DOMContentLoaded", function() {
-                    var details = document.getElementById("config-details");
-                    if (localStorage.getItem("config-details-open") === "true") {
-                        details.setAttribute("open", "open");
-                    }
-                    details.addEventListener("toggle", function() {
-                        localStorage.setItem("config-details-open", details.open);
-                    });
-                });
-            </script>
-            """
-            message += "</table>\n"
-            message += f"\n<p>Page refresh: {str(datetime.datetime.fromtimestamp(time.time()))}</p>\n</body>\n</html>"
-        elif request_path == "/api/troubleshooting/problems":
-            # Simulate old API call and respond with empty list
-            message = '{"problems": []}'
-            # message = pw.poll('/api/troubleshooting/problems') or '{"problems": []}'
-        elif request_path.startswith("/tedapi"):
-            # TEDAPI Specific Calls
-            if pw.tedapi:
-                message = '{"error": "Use /tedapi/config, /tedapi/status, /tedapi/components, /tedapi/battery, /tedapi/controller"}'
-                if request_path == "/tedapi/config":
-                    message = json.dumps(safe_pw_call(pw.tedapi.get_config))
-                if request_path == "/tedapi/status":
-                    message = json.dumps(safe_pw_call(pw.tedapi.get_status))
-                if request_path == "/tedapi/components":
-                    message = json.dumps(safe_pw_call(pw.tedapi.get_components))
-                if request_path == "/tedapi/battery":
-                    message = json.dumps(safe_pw_call(pw.tedapi.get_battery_blocks))
-                if request_path == "/tedapi/controller":
-                    message = json.dumps(safe_pw_call(pw.tedapi.get_device_controller))
-            else:
-                message = '{"error": "TEDAPI not enabled"}'
-        elif request_path.startswith("/cloud"):
-            # Cloud API Specific Calls - pw.client can be None if connect() failed,
-            # so guard before dereferencing (safe_pw_call can't catch that)
-            if pw.cloudmode and not pw.fleetapi and pw.client is not None:
-                message = '{"error": "Use /cloud/battery, /cloud/power, /cloud/config"}'
-                if request_path == "/cloud/battery":
-                    message = json.dumps(safe_pw_call(pw.client.get_battery))
-                if request_path == "/cloud/power":
-                    message = json.dumps(safe_pw_call(pw.client.get_site_power))
-                if request_path == "/cloud/config":
-                    message = json.dumps(safe_pw_call(pw.client.get_site_config))
-            else:
-                message = '{"error": "Cloud API not enabled"}'
-        elif request_path.startswith("/fleetapi"):
-            # FleetAPI Specific Calls - guard pw.client like the /cloud routes
-            if pw.fleetapi and pw.client is not None:
-                message = '{"error": "Use /fleetapi/info, /fleetapi/status"}'
-                if request_path == "/fleetapi/info":
-                    message = json.dumps(safe_pw_call(pw.client.get_site_info))
-                if request_path == "/fleetapi/status":
-                    message = json.dumps(safe_pw_call(pw.client.get_live_status))
-            else:
-                message = '{"error": "FleetAPI not enabled"}'
-        elif urlparse(request_path).path in DISABLED:
-            # Disabled API Calls - match on path only so a query string
-            # (e.g. ?x=1) cannot be used to bypass the block
-            message = '{"status": "404 Response - API Disabled"}'
-        elif urlparse(request_path).path in ALLOWLIST:
-            # Allowed API Calls - Proxy to Powerwall (query string stripped)
-            message: str = safe_pw_call(pw.poll, urlparse(request_path).path, jsonformat=True)
-        elif request_path.startswith("/control/reserve"):
-            # Current battery reserve level
-            if not pw_control:
-                message = '{"error": "Control Commands Disabled - Set PW_CONTROL_SECRET to enable"}'
-            else:
-                message = '{"reserve": %s}' % (
-                    safe_pw_call(pw_control.get_reserve) or 0
-                )
-        elif request_path.startswith("/control/mode"):
-            # Current operating mode
-            if not pw_control:
-                message = '{"error": "Control Commands Disabled - Set PW_CONTROL_SECRET to enable"}'
-            else:
-                message = '{"mode": "%s"}' % (
-                    safe_pw_call(pw_control.get_mode) or "unknown"
-                )
-        elif request_path.startswith("/control/grid_charging"):
-            # Current grid charging state
-            if not pw_control:
-                message = '{"error": "Control Commands Disabled - Set PW_CONTROL_SECRET to enable"}'
-            else:
-                message = '{"grid_charging": %s}' % (
-                    "true" if safe_pw_call(pw_control.get_grid_charging) else "false"
-                )
-        elif request_path.startswith("/control/grid_export"):
-            # Current grid export state
-            if not pw_control:
-                message = '{"error": "Control Commands Disabled - Set PW_CONTROL_SECRET to enable"}'
-            else:
-                # battery_ok, pv_only, and never
-                message = '{"grid_export": "%s"}' % (
-                    safe_pw_call(pw_control.get_grid_export) or "unknown"
-                )
-        elif request_path.startswith("/control/max_backup"):
-            # Current backup events (requires v1r)
-            if not pw_control:
-                message = '{"error": "Control Commands Disabled - Set PW_CONTROL_SECRET to enable"}'
-            elif not pw.tedapi or not pw.tedapi.v1r:
-                message = '{"error": "max_backup requires v1r LAN transport"}'
-            else:
-                result = safe_pw_call(pw.tedapi.get_backup_events)
-                if result is not None:
-                    # Auto-cancel expired events (gateway leaves them lingering).
-                    # Cancel is a *write*, so it requires a valid control token
-                    # (?token=<PW_CONTROL_SECRET>); a plain GET stays read-only.
-                    mb = result.get('manual_backup')
-                    if mb and not mb.get('active'):
-                        token = parse_qs(urlparse(request_path).query).get("token", [""])[0]
-                        if token and control_secret and hmac.compare_digest(token, control_secret):
-                            safe_pw_call(pw.tedapi.cancel_max_backup)
-                            result['manual_backup'] = None
-                    message = json.dumps(result)
-                else:
-                    message = '{"error": "Failed to get backup events"}'
-        elif request_path == "/fans":
-            # Fan speeds in raw format
-            message = json.dumps(
-                safe_pw_call(pw.tedapi.get_fan_speeds) if pw.tedapi else {}
-            )
-        elif request_path.startswith("/fans/pw"):
-            # Fan speeds in simplified format (e.g. FAN1_actual, FAN1_target)
-            if pw.tedapi:
-                fans = {}
-                fan_speeds = safe_pw_call(pw.tedapi.get_fan_speeds) or {}
-                for i, (_, value) in enumerate(sorted(fan_speeds.items())):
-                    key = f"FAN{i+1}"
-                    fans[f"{key}_actual"] = value.get("PVAC_Fan_Speed_Actual_RPM")
-                    fans[f"{key}_target"] = value.get("PVAC_Fan_Speed_Target_RPM")
-                message = json.dumps(fans)
-            else:
-                message = "{}"
-        elif self.path.startswith("/pw/"):
-            # Map library functions into /pw/ API calls
-            path = self.path[4:]  # Remove '/pw/' prefix
-            simple_mappings = {
-                "level": lambda: {"level": safe_pw_call(pw.level)},
-                "power": lambda: safe_pw_call(pw.power),
-                "site": lambda: safe_pw_call(pw.site, True),
-                "solar": lambda: safe_pw_call(pw.solar, True),
-                "battery": lambda: safe_pw_call(pw.battery, True),
-                "battery_blocks": lambda: safe_pw_call(pw.battery_blocks),
-                "load": lambda: safe_pw_call(pw.load, True),
-                "grid": lambda: safe_pw_call(pw.grid, True),
-                "home": lambda: safe_pw_call(pw.home, True),
-                "vitals": lambda: safe_pw_call(pw.vitals),
-                "temps": lambda: safe_pw_call(pw.temps),
-                "strings": lambda: safe_pw_call(pw.strings, False, True),
-                "din": lambda: {"din": safe_pw_call(pw.din)},
-                "uptime": lambda: {"uptime": safe_pw_call(pw.uptime)},
-                "version": lambda: {"version": safe_pw_call(pw.version)},
-                "status": lambda: safe_pw_call(pw.status),
-                "system_status": lambda: safe_pw_call(pw.system_status, False),
-                "grid_status": lambda: json.loads(
-                    safe_pw_call(pw.grid_status, "json") or "{}"
-                ),
-                "aggregates": lambda: safe_pw_call(
-                    pw.poll, "/api/meters/aggregates", False
-                ),
-                "site_name": lambda: {"site_name": safe_pw_call(pw.site_name)},
-                "alerts": lambda: {"alerts": safe_pw_call(pw.alerts)},
-                "is_connected": lambda: {"is_connected": safe_pw_call(pw.is_connected)},
-                "get_reserve": lambda: {"reserve": safe_pw_call(pw.get_reserve)},
-                "get_mode": lambda: {"mode": safe_pw_call(pw.get_mode)},
-                "get_time_remaining": lambda: {
-                    "time_remaining": safe_pw_call(pw.get_time_remaining)
-                },
-            }
-            # Check if the path is in the simple mappings
-            if path in simple_mappings:
-                result = simple_mappings[path]()
-            else:
-                result = {"error": "Invalid Request"}
-            message = json.dumps(result)
+        get_route, path, query = resolve_request(request_path, self.path)
+        if path in STREAM_ROUTES:
+            self.metrics_route = None  # open for minutes - not a request latency
+            self.serve_stream(STREAM_ROUTES[path])
+            return
+        if get_route is not None:
+            self.metrics_route = get_route.path
+            contenttype = get_route.content_type
+            message = call_route(get_route, path, query)
         else:
             # Everything else - Set auth headers required for web application
+            self.send_response(200)
             proxystats["gets"] = proxystats["gets"] + 1
             if pw.authmode == "token":
                 # Create bogus cookies
@@ -2410,31 +4767,28 @@ class Handler(BaseHTTPRequestHandler):
 
             # Serve static assets from web root first, if found.
             # pylint: disable=attribute-defined-outside-init
-            if request_path == "/" or request_path == "":
+            asset = None
+            static_encoding = None
+            if path == "/" or path == "":
                 request_path = "/index.html"
-                fcontent, ftype = get_static(web_root, request_path)
-                # Replace {VARS} with current data
+                self.metrics_route = "/"
+                # Rendered page is memoized until version/hash, style or base URL change
                 status = safe_pw_call(pw.status) or {}
-                # convert fcontent to string
-                fcontent = fcontent.decode("utf-8")
-                # fix the following variables that if they are None, return ""
-                fcontent = fcontent.replace(
-                    "{VERSION}", status.get("version", "") or ""
-                )
-                fcontent = fcontent.replace("{HASH}", status.get("git_hash", "") or "")
-                fcontent = fcontent.replace("{EMAIL}", email)
-
-                static_asset_prefix = (
-                    api_base_url + "viz-static/"
-                )  # prefix for static files so they can be detected by a reverse proxy easily
-                fcontent = fcontent.replace("{STYLE}", static_asset_prefix + style)
-                fcontent = fcontent.replace("{ASSET_PREFIX}", static_asset_prefix)
-
-                fcontent = fcontent.replace("{API_BASE_URL}", api_base_url + "api")
-                # convert fcontent back to bytes
-                fcontent = bytes(fcontent, "utf-8")
+                fcontent, ftype = render_index_page(status)
             else:
-                fcontent, ftype = get_static(web_root, request_path)
+                asset = static_assets.get(request_path) if static_assets else None
+                if asset is not None:
+                    # Served from memory - pick a precompressed variant if accepted
+                    ftype = asset.ftype
+                    fcontent = asset.content
+                    if asset.variants:
+                        static_encoding = negotiate_encoding(
+                            self.headers.get("Accept-Encoding"), tuple(asset.variants)
+                        )
+                        if static_encoding:
+                            fcontent = asset.variants[static_encoding]
+                else:
+                    fcontent, ftype = get_static(web_root, request_path)
             if fcontent:
                 log.debug(
                     "Served from local web root: {} type {}".format(request_path, ftype)
@@ -2459,6 +4813,10 @@ class Handler(BaseHTTPRequestHandler):
                 pw_url = "https://{}/{}".format(pw.host, proxy_path)
                 log.debug("Proxy request to: {}".format(pw_url))
                 try:
+                    if not spend_upstream_budget():
+                        # Over the gateway budget (PW_RATE_LIMIT) - web assets never
+                        # spend the tokens reserved for Telegraf and control
+                        raise requests.exceptions.RequestException("request budget exhausted")
                     if pw.authmode == "token":
                         r = pw.client.session.get(
                             url=pw_url,
@@ -2494,12 +4852,12 @@ class Handler(BaseHTTPRequestHandler):
             else:
                 self.send_header("Cache-Control", "no-cache, no-store")
 
-                # Inject transformations
-            if request_path.split("?")[0] == "/":
-                if os.path.exists(os.path.join(web_root, style)):
-                    fcontent = bytes(inject_js(fcontent, style), "utf-8")
-
             self.send_header("Content-type", "{}".format(ftype))
+            self.send_header("Content-Length", str(len(fcontent)))
+            if asset is not None and asset.variants:
+                if static_encoding:
+                    self.send_header("Content-Encoding", static_encoding)
+                self.send_header("Vary", "Accept-Encoding")
             self.end_headers()
             try:
                 self.wfile.write(fcontent)
@@ -2517,7 +4875,7 @@ class Handler(BaseHTTPRequestHandler):
             with proxystats_lock:
                 proxystats["timeout"] = proxystats["timeout"] + 1
             # Return null/empty response instead of timeout message for API endpoints
-            if request_path.startswith("/api/") or request_path in [
+            if path.startswith("/api/") or path in [
                 "/aggregates",
                 "/soe",
                 "/vitals",
@@ -2533,7 +4891,7 @@ class Handler(BaseHTTPRequestHandler):
         else:
             # Count by query-stripped path so unique querystring URLs cannot
             # grow proxystats["uri"] without bound
-            uri_key = urlparse(request_path).path
+            uri_key = path
             with proxystats_lock:
                 proxystats["gets"] = proxystats["gets"] + 1
                 if uri_key not in proxystats["uri"] and len(proxystats["uri"]) >= URI_STATS_MAX:
@@ -2541,30 +4899,662 @@ class Handler(BaseHTTPRequestHandler):
                     uri_key = "other"
                 proxystats["uri"][uri_key] = proxystats["uri"].get(uri_key, 0) + 1
 
-        # Send headers and payload
+        self.send_api_response(message, contenttype)
+
+    def send_api_response(self, message, contenttype):
+        """Send a route response, negotiating compression and answering If-None-Match."""
+        # Send headers and payload - performance cached responses reuse the body
+        # bytes and ETag computed when the cache entry was filled
+        entry = get_response_entry(message)
         try:
             # Encode once - Content-Length must count bytes, not characters
-            body = message.encode("utf8")
+            body = entry.body if entry is not None else message.encode("utf8")
+            compressible = compress_enabled and len(body) >= compress_min_bytes
+            encoding = None
+            if compressible:
+                encoding = negotiate_encoding(self.headers.get("Accept-Encoding"))
+            etag = None
+            if entry is not None:
+                body, etag = entry.representation(encoding)
+            elif encoding:
+                body = compress_body(body, encoding)
+            if etag is not None and etag_matches(self.headers.get("If-None-Match"), etag):
+                # Client already holds this payload - skip the transfer
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                if compressible:
+                    self.send_header("Vary", "Accept-Encoding")
+                self.send_header("Access-Control-Allow-Origin", "*")
+                self.end_headers()
+                return
+            if encoding:
+                with _compress_stats_lock:
+                    _compress_stats["responses"] += 1
+            self.send_response(200)
             self.send_header("Content-type", contenttype)
             self.send_header("Content-Length", str(len(body)))
+            if encoding:
+                self.send_header("Content-Encoding", encoding)
+            if compressible:
+                self.send_header("Vary", "Accept-Encoding")
+            if etag is not None:
+                self.send_header("ETag", etag)
+            warm_age = warm_restart_age()
+            if warm_age is not None:
+                # Answered from the warm restart snapshot - the Powerwall is not connected yet
+                self.send_header("X-Warm-Restart", str(round(warm_age)))
+                with _warm_stats_lock:
+                    _warm_stats["served"] += 1
             self.send_header("Access-Control-Allow-Origin", "*")
             self.end_headers()
             self.wfile.write(body)
         except Exception as exc:
             log.debug(f"Socket broken sending API response to client [doGET]: {exc}")
 
+    def serve_stream(self, route_path):
+        """Send Server-Sent Events for route_path until the client disconnects."""
+        if not subscribe_stream(route_path):
+            self.send_response(503)
+            self.send_header("Retry-After", str(STREAM_RETRY_MS // 1000))
+            self.send_header("Content-type", "application/json")
+            body = b'{"error": "Too many stream clients"}'
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        try:
+            self.send_response(200)
+            for header, value in stream_headers():
+                self.send_header(header, value)
+            self.end_headers()
+            self.close_connection = True  # body ends when the connection closes
+            self.wfile.write(b"retry: %d\n\n" % STREAM_RETRY_MS)
+            seq = stream_start_seq(route_path, self.headers.get("Last-Event-ID"))
+            while True:
+                seq, event = wait_stream_event(route_path, seq, STREAM_HEARTBEAT)
+                # Nothing new - a comment line keeps proxies from timing out the connection
+                self.wfile.write(event or b": keepalive\n\n")
+                self.wfile.flush()
+        except (OSError, ValueError) as exc:
+            log.debug(f"Stream client disconnected [{route_path}]: {exc}")
+        finally:
+            unsubscribe_stream(route_path)
+
+
+# Hop-by-hop headers a worker must not copy between the client and the poller
+RELAY_SKIP_HEADERS = frozenset(("connection", "keep-alive", "transfer-encoding", "server", "date"))
+
+
+# noinspection PyPep8Naming
+class WorkerHandler(Handler):
+    """
+    Request handler of a PW_WORKERS worker process.
+
+    Performance-cached routes are answered from the snapshots the poller published to
+    shared memory while they are younger than PW_CACHE_EXPIRE; everything else (POST
+    /control/*, other routes, web assets, streams) is relayed to the poller, so the
+    gateway still sees a single client.
+    """
+
+    def do_GET(self):
+        request_path = self.path
+        new_path = request_path.removeprefix(api_base_url)
+        if new_path is not request_path:
+            request_path = "/" + new_path
+        get_route = resolve_request(request_path, self.path)[0]
+        entry = None
+        if get_route is not None and get_route.cache_key is not None:
+            entry = shared_snapshots.get(get_route.cache_key, cache_expire)
+        if entry is None:
+            worker_processes.count_request(_worker_slot, relayed=True)
+            self.relay_to_poller()
+            return
+        worker_processes.count_request(_worker_slot, relayed=False, uri=get_route.path)
+        _response_local.entry = entry
+        self.send_api_response(entry.data, get_route.content_type)
+
+    def do_POST(self):
+        worker_processes.count_request(_worker_slot, relayed=True)
+        self.relay_to_poller()
+
+    def relay_to_poller(self):
+        """Forward the request to the poller process and copy its response back."""
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0 or length > MAX_POST_BODY:
+            self.send_error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+            return
+        body = self.rfile.read(length) if length else None
+        headers = {k: v for k, v in self.headers.items() if k.lower() not in RELAY_SKIP_HEADERS}
+        headers["X-Forwarded-For"] = self.address_string()
+        conn = http.client.HTTPConnection("127.0.0.1", _poller_port, timeout=WORKER_RELAY_TIMEOUT)
+        try:
+            conn.request(self.command, self.path, body=body, headers=headers)
+            response = conn.getresponse()
+        except (OSError, http.client.HTTPException) as exc:
+            log.debug(f"Unable to relay {self.command} {self.path} to the poller: {exc}")
+            conn.close()
+            self.send_error(HTTPStatus.BAD_GATEWAY, "Poller unavailable")
+            return
+        try:
+            self.send_response(response.status, response.reason)
+            for name, value in response.getheaders():
+                if name.lower() not in RELAY_SKIP_HEADERS:
+                    self.send_header(name, value)
+            if response.getheader("Content-Length") is None:
+                # Streams and close-delimited bodies - copy until the poller closes
+                self.send_header("Connection", "close")
+                self.close_connection = True
+                self.end_headers()
+                while True:
+                    chunk = response.read1(65536)
+                    if not chunk:
+                        break
+                    self.wfile.write(chunk)
+                    self.wfile.flush()
+            else:
+                self.end_headers()
+                self.wfile.write(response.read())
+        except (OSError, http.client.HTTPException) as exc:
+            log.debug(f"Relay of {self.command} {self.path} interrupted: {exc}")
+            self.close_connection = True
+        finally:
+            conn.close()
+
+
+def stream_headers():
+    """Response headers for a /stream/* event stream."""
+    return (
+        ("Content-type", "text/event-stream"),
+        ("Cache-Control", "no-cache"),
+        ("Connection", "close"),
+        ("X-Accel-Buffering", "no"),  # ask nginx not to buffer the stream
+        ("Access-Control-Allow-Origin", "*"),
+    )
+
+
 # noinspection PyTypeChecker
+def _run_handler(method, target, version, headers, body, client_address, connection_requests):
+    """
+    Run one request through Handler without a socket (PW_ENGINE=async).
+
+    Returns:
+        Tuple of (raw HTTP response bytes, close connection flag)
+    """
+    handler = Handler.__new__(Handler)
+    handler.rfile = io.BytesIO(body)
+    handler.wfile = io.BytesIO()
+    handler.client_address = client_address
+    handler.server = None
+    handler.command = method
+    handler.path = target
+    handler.request_version = version
+    handler.requestline = f"{method} {target} {version}"
+    handler.headers = headers
+    handler.protocol_version = "HTTP/1.1"
+    handler.connection_requests = connection_requests
+    connection = (headers.get("Connection") or "").lower()
+    handler.close_connection = connection == "close" or (
+        version != "HTTP/1.1" and connection != "keep-alive"
+    )
+    do_method = getattr(handler, "do_" + method, None)
+    try:
+        if do_method is None:
+            handler.send_error(HTTPStatus.NOT_IMPLEMENTED, f"Unsupported method ({method})")
+        else:
+            do_method()
+    except Exception as exc:
+        log.error(f"Unhandled error serving {method} {target} [async]: {exc}")
+        return _plain_response(HTTPStatus.INTERNAL_SERVER_ERROR), True
+    return handler.wfile.getvalue(), handler.close_connection
+
+
+def _plain_response(status):
+    """Minimal response with Connection: close for errors raised outside Handler."""
+    body = status.phrase.encode("ascii")
+    return (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        "Content-Type: text/plain\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n"
+    ).encode("ascii") + body
+
+
+def serves_inline(method, target):
+    """
+    Decide whether a request can run on the event loop (PW_ENGINE=async).
+
+    True for routes that never call the gateway, cached routes whose performance
+    cache entry is fresh, and static web assets already held in memory.
+    """
+    if method != "GET":
+        return False
+    request_path = target
+    new_target = target.removeprefix(api_base_url)
+    if new_target is not target:
+        request_path = "/" + new_target
+    get_route, path, _query = resolve_request(request_path, target)
+    if get_route is None:
+        return path not in ("", "/") and static_assets is not None and static_assets.cached(path)
+    if not get_route.blocking:
+        return True
+    if get_route.cache_key is None:
+        return False
+    # Prefetch mode serves snapshots up to PW_CACHE_TTL old without calling the gateway
+    max_age = degradation_cache_ttl_seconds if prefetch_enabled else cache_expire
+    return get_last_performance_value(get_route.cache_key, max_age - ASYNC_INLINE_MARGIN) is not None
+
+
+async def _serve_connection(reader, writer, executor):
+    """Serve HTTP/1.1 requests on one connection until close, idle timeout or request cap."""
+    loop = asyncio.get_running_loop()
+    client_address = writer.get_extra_info("peername") or ("", 0)
+    connection_requests = 0
+    with _async_stats_lock:
+        _async_stats["connections"] += 1
+    try:
+        while True:
+            try:
+                head = await asyncio.wait_for(
+                    reader.readuntil(b"\r\n\r\n"), keepalive_timeout
+                )
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                    asyncio.TimeoutError, ConnectionError):
+                break
+            request_line, _, raw_headers = head.partition(b"\r\n")
+            parts = request_line.decode("latin-1").split()
+            if len(parts) != 3:
+                writer.write(_plain_response(HTTPStatus.BAD_REQUEST))
+                break
+            method, target, version = parts
+            headers = http.client.parse_headers(io.BytesIO(raw_headers))
+            try:
+                content_length = int(headers.get("Content-Length") or 0)
+            except ValueError:
+                content_length = -1
+            if content_length < 0 or content_length > MAX_POST_BODY:
+                writer.write(_plain_response(HTTPStatus.REQUEST_ENTITY_TOO_LARGE))
+                break
+            body = await reader.readexactly(content_length) if content_length else b""
+
+            connection_requests += 1
+            stream_path = target.removeprefix(api_base_url)
+            stream_path = urlparse(target if stream_path is target else "/" + stream_path).path
+            if method == "GET" and stream_path in STREAM_ROUTES:
+                # Streams hold the connection - served on the loop, no executor thread
+                await _serve_stream_async(writer, STREAM_ROUTES[stream_path], headers)
+                break
+            args = (method, target, version, headers, body, client_address, connection_requests)
+            inline = serves_inline(method, target)
+            with _async_stats_lock:
+                _async_stats["requests"] += 1
+                _async_stats["inline" if inline else "offloaded"] += 1
+            if inline:
+                response, close = _run_handler(*args)
+            else:
+                response, close = await loop.run_in_executor(executor, _run_handler, *args)
+            writer.write(response)
+            await writer.drain()
+            if close:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError) as exc:
+        log.debug(f"Client connection lost [async]: {exc}")
+    finally:
+        writer.close()
+
+
+async def _serve_stream_async(writer, route_path, headers):
+    """Send Server-Sent Events for route_path on the event loop (PW_ENGINE=async)."""
+    if not subscribe_stream(route_path):
+        body = b'{"error": "Too many stream clients"}'
+        writer.write(
+            b"HTTP/1.1 503 Service Unavailable\r\nContent-Type: application/json\r\n"
+            b"Retry-After: %d\r\nContent-Length: %d\r\nConnection: close\r\n\r\n%s"
+            % (STREAM_RETRY_MS // 1000, len(body), body)
+        )
+        await writer.drain()
+        return
+    waiter = (asyncio.get_running_loop(), asyncio.Event())
+    with _stream_cond:
+        _stream_async_waiters.add(waiter)
+    try:
+        head = "HTTP/1.1 200 OK\r\n" + "".join(f"{k}: {v}\r\n" for k, v in stream_headers())
+        writer.write(head.encode("latin-1") + b"\r\n" + b"retry: %d\n\n" % STREAM_RETRY_MS)
+        seq = stream_start_seq(route_path, headers.get("Last-Event-ID"))
+        while True:
+            # Clear before checking so a publish in between still wakes the wait below
+            waiter[1].clear()
+            seq, event = wait_stream_event(route_path, seq, 0)
+            if event is None:
+                try:
+                    await asyncio.wait_for(waiter[1].wait(), STREAM_HEARTBEAT)
+                    continue
+                except asyncio.TimeoutError:
+                    event = b": keepalive\n\n"
+            writer.write(event)
+            await writer.drain()
+    finally:
+        with _stream_cond:
+            _stream_async_waiters.discard(waiter)
+        unsubscribe_stream(route_path)
+
+
+async def start_async_server(host, listen_port, executor, ssl_context=None):
+    """Start listening with the asyncio engine; returns the asyncio Server."""
+    return await asyncio.start_server(
+        lambda reader, writer: _serve_connection(reader, writer, executor),
+        host,
+        listen_port,
+        ssl=ssl_context,
+        reuse_address=True,
+    )
+
+
+def serve_async():
+    """Run the proxy on a single asyncio event loop (PW_ENGINE=async)."""
+    workers = max_workers if max_workers > 0 else ASYNC_DEFAULT_WORKERS
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pw-call")
+    with _async_stats_lock:
+        _async_stats["executor_workers"] = workers
+    ssl_context = _ssl_context() if https_mode == "yes" else None
+
+    async def run():
+        async_server = await start_async_server(bind_address or None, port, executor, ssl_context)
+        log.info(f"Async engine enabled (PW_ENGINE=async) - {workers} executor threads")
+        async with async_server:
+            await async_server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    finally:
+        executor.shutdown(wait=False)
+
+
+def _ssl_context():
+    """TLS context for PW_HTTPS=yes using the bundled self-signed certificate."""
+    # ssl.wrap_socket() was removed in Python 3.12 - use SSLContext instead
+    ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    ctx.load_cert_chain(
+        os.path.join(os.path.dirname(__file__), "localhost.pem")
+    )
+    return ctx
+
+
+def create_server(address=None, handler=Handler, reuse_port=False):
+    """
+    Build the HTTP server - a fixed worker pool with PW_MAX_WORKERS, else thread per connection.
+
+    Args:
+        address: (host, port) to listen on, default (PW_BIND_ADDRESS, PW_PORT)
+        handler: Request handler class
+        reuse_port: Share the port with the other PW_WORKERS processes (SO_REUSEPORT)
+    """
+    global worker_pool
+    address = address or (bind_address, port)
+    if max_workers > 0:
+        pool_class = ReusePortWorkerPoolHTTPServer if reuse_port else WorkerPoolHTTPServer
+        worker_pool = pool_class(address, handler, max_workers, max_queue)
+        log.info(f"Worker pool enabled (PW_MAX_WORKERS={max_workers}, PW_MAX_QUEUE={max_queue})")
+        return worker_pool
+    return (ReusePortHTTPServer if reuse_port else ThreadingHTTPServer)(address, handler)
+
+
+class WorkerProcesses:
+    """
+    The PW_WORKERS HTTP worker processes, forked and replaced by a launcher process.
+
+    The launcher is forked from the poller before any thread starts and stays single
+    threaded, so every worker - replacements included - is forked from a process
+    without threads (a child forked from a threaded process can hang on a lock that
+    another thread held). Each worker counts the requests it served from shared
+    snapshots (also per URI) and relayed to the poller in its own slot of a shared
+    counter array, so /stats on the poller reports all of them without any locking
+    between processes.
+    """
+
+    HEADER = struct.Struct("<Q")  # restarts
+
+    def __init__(self, count, target, uris=()):
+        self.count = count
+        self._target = target  # run in the forked worker as target(slot, poller_port)
+        self.uris = list(uris)  # routes the workers serve from shared snapshots
+        self._uri_index = {uri: i for i, uri in enumerate(self.uris)}
+        self._uri_baseline = {}  # totals at the last /stats/clear
+        self._slot = struct.Struct("<%dQ" % (3 + len(self.uris)))  # pid, served, relayed, per URI
+        self._counters = mmap.mmap(-1, self.HEADER.size + self._slot.size * count)
+        self._counters_lock = threading.Lock()
+        self.launcher = None
+        self._launch_pipe = None  # write end - the poller port to serve, closed to stop
+        self.stopping = False
+
+    def start(self):
+        """Fork the launcher - call while this process has no other threads."""
+        read_end, self._launch_pipe = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                os.close(self._launch_pipe)
+                self._launch(read_end)
+            except BaseException as exc:
+                log.error(f"Worker launcher failed: {exc}")
+                code = 1
+            finally:
+                # Never return into the poller's code (threads, atexit handlers) in a child
+                os._exit(code)
+        os.close(read_end)
+        self.launcher = pid
+
+    def serve(self, poller_port):
+        """Have the launcher fork the workers, relaying to the poller on poller_port."""
+        os.write(self._launch_pipe, struct.pack("<H", poller_port))
+
+    def _launch(self, pipe):
+        # Launcher process: fork the workers, replace any that exit, and stop them all
+        # once the poller closes the pipe (stop() or the poller exited)
+        signal.signal(signal.SIGCHLD, signal.SIG_DFL)  # workers are collected here, not by reap_children
+        self.launcher = os.getpid()  # for the workers to watch
+        data = os.read(pipe, 2)
+        if len(data) < 2:
+            return
+        poller_port = struct.unpack("<H", data)[0]
+        pids = [self._spawn(slot, poller_port) for slot in range(self.count)]
+        respawn = {}  # slot -> time its replacement is due
+        try:
+            while not select.select([pipe], [], [], WORKER_RESTART_DELAY)[0]:
+                while True:
+                    try:
+                        pid, _ = os.waitpid(-1, os.WNOHANG)
+                    except ChildProcessError:
+                        break
+                    if pid == 0:
+                        break
+                    if pid in pids:
+                        log.warning(f"Worker process {pid} exited - restarting in {WORKER_RESTART_DELAY}s")
+                        respawn[pids.index(pid)] = time.monotonic() + WORKER_RESTART_DELAY
+                        with self._counters_lock:
+                            self.HEADER.pack_into(self._counters, 0, self.HEADER.unpack_from(self._counters)[0] + 1)
+                for slot, due in list(respawn.items()):
+                    if due <= time.monotonic():
+                        del respawn[slot]
+                        pids[slot] = self._spawn(slot, poller_port)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            for pid in pids:
+                try:
+                    os.kill(pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+
+    def _spawn(self, slot, poller_port):
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._target(slot, poller_port)
+            except BaseException as exc:
+                log.error(f"Worker process {slot} failed: {exc}")
+                code = 1
+            finally:
+                os._exit(code)
+        struct.pack_into("<Q", self._counters, self._slot_offset(slot), pid)
+        return pid
+
+    def _slot_offset(self, slot):
+        return self.HEADER.size + slot * self._slot.size
+
+    def count_request(self, slot, relayed, uri=None):
+        """Count one request of the worker in slot (called in the worker process)."""
+        fields = [2 if relayed else 1]
+        if uri in self._uri_index:
+            fields.append(3 + self._uri_index[uri])
+        with self._counters_lock:
+            for field in fields:
+                offset = self._slot_offset(slot) + 8 * field
+                value = struct.unpack_from("<Q", self._counters, offset)[0]
+                struct.pack_into("<Q", self._counters, offset, value + 1)
+
+    def _uri_totals(self):
+        totals = dict.fromkeys(self.uris, 0)
+        for slot in range(self.count):
+            counts = self._slot.unpack_from(self._counters, self._slot_offset(slot))[3:]
+            for uri, hits in zip(self.uris, counts):
+                totals[uri] += hits
+        return totals
+
+    def uri_counts(self):
+        """Requests the workers served from shared snapshots per URI since the last clear_uri_counts()."""
+        counts = {}
+        for uri, hits in self._uri_totals().items():
+            hits -= self._uri_baseline.get(uri, 0)
+            if hits:
+                counts[uri] = hits
+        return counts
+
+    def clear_uri_counts(self):
+        """Start uri_counts() over (/stats/clear)."""
+        self._uri_baseline = self._uri_totals()
+
+    def status(self):
+        """Per-process and total request counters for /stats and /health."""
+        processes = []
+        for slot in range(self.count):
+            pid, served, relayed = self._slot.unpack_from(self._counters, self._slot_offset(slot))[:3]
+            processes.append({"pid": pid or None, "served": served, "relayed": relayed})
+        return {
+            "workers": self.count,
+            "launcher": self.launcher,
+            "restarts": self.HEADER.unpack_from(self._counters)[0],
+            "served": sum(p["served"] for p in processes),
+            "relayed": sum(p["relayed"] for p in processes),
+            "processes": processes,
+            "snapshots": shared_snapshots.status() if shared_snapshots is not None else None,
+        }
+
+    def stop(self):
+        """Close the launcher's pipe - it stops the workers and exits."""
+        self.stopping = True
+        if self._launch_pipe is not None:
+            os.close(self._launch_pipe)
+            self._launch_pipe = None
+        if self.launcher is not None:
+            try:
+                os.waitpid(self.launcher, 0)
+            except ChildProcessError:
+                pass  # already collected by reap_children
+
+
+def run_worker(slot, poller_port):
+    """Serve client connections in a forked PW_WORKERS process until SIGTERM or the launcher exits."""
+    global _worker_slot, _poller_port
+    _worker_slot = slot
+    _poller_port = poller_port
+    # Watch the launcher as well as waiting for SIGTERM - a signal that arrives while
+    # the worker is being forked is lost
+    launcher_pid = worker_processes.launcher
+    with create_server(handler=WorkerHandler, reuse_port=True) as server:
+        if https_mode == "yes":
+            server.socket = _ssl_context().wrap_socket(server.socket, server_side=True)
+
+        def watch_launcher():
+            while os.getppid() == launcher_pid:
+                time.sleep(1)
+            server.shutdown()  # orphaned - the next poller starts its own workers
+
+        threading.Thread(target=watch_launcher, name="launcher-watch", daemon=True).start()
+        try:
+            server.serve_forever()
+        except (KeyboardInterrupt, SystemExit):
+            pass
+
+
+def serve_workers():
+    """
+    Run as the poller of PW_WORKERS worker processes (see WorkerHandler).
+
+    This process keeps the only gateway connection and serves the requests the workers
+    relay on a loopback port; the workers accept client connections on PW_PORT.
+    """
+    global shared_snapshots, worker_processes, _poller_port
+    shared_snapshots = SharedSnapshots(WORKER_SHARED_BYTES)
+    snapshot_routes = [path for path, get_route in _routes.items() if get_route.cache_key]
+    worker_processes = WorkerProcesses(workers, run_worker, snapshot_routes)
+    worker_processes.start()  # before any thread of this process starts
+    start_background_threads()
+    try:
+        with create_server(("127.0.0.1", 0)) as server:
+            _poller_port = server.server_address[1]
+            threading.Thread(target=_publish_loop, name="publish", daemon=True).start()
+            _worker_publish.set()  # publish what warm restart or startup already cached
+            worker_processes.serve(_poller_port)
+            log.info(f"Worker processes enabled (PW_WORKERS={workers}) - relay port {_poller_port}")
+            try:
+                server.serve_forever()
+            except (Exception, KeyboardInterrupt, SystemExit):
+                print(" CANCEL \n")
+    finally:
+        worker_processes.stop()
+
+
+def save_warm_snapshot_on_exit():
+    """Write a final warm restart snapshot on shutdown (PW_WARM_RESTART=yes)."""
+    if warm_restart and _backend_ready.is_set():
+        nbytes = save_warm_snapshot()
+        if nbytes is not None:
+            log.info(f"Warm restart snapshot written to {warm_restart_file} ({nbytes} bytes)")
+
+
 def main() -> None:
-    with ThreadingHTTPServer((bind_address, port), Handler) as server:
+    if workers > 0:
+        if hasattr(os, "fork") and hasattr(socket, "SO_REUSEPORT"):
+            if engine == "async":
+                log.info("PW_ENGINE=async is not used with PW_WORKERS - workers are threaded")
+            serve_workers()
+            save_warm_snapshot_on_exit()
+            log.info("pyPowerwall Proxy Stopped")
+            sys.exit(0)
+        log.warning("PW_WORKERS needs os.fork() and SO_REUSEPORT - serving from a single process")
+
+    start_background_threads()
+    if engine == "async":
+        # noinspection PyBroadException
+        try:
+            serve_async()
+        except (Exception, KeyboardInterrupt, SystemExit):
+            print(" CANCEL \n")
+
+        save_warm_snapshot_on_exit()
+        log.info("pyPowerwall Proxy Stopped")
+        sys.exit(0)
+
+    with create_server() as server:
         if https_mode == "yes":
             # Activate HTTPS
             log.debug("Activating HTTPS")
-            # ssl.wrap_socket() was removed in Python 3.12 - use SSLContext instead
-            ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
-            ctx.load_cert_chain(
-                os.path.join(os.path.dirname(__file__), "localhost.pem")
-            )
-            server.socket = ctx.wrap_socket(server.socket, server_side=True)
+            server.socket = _ssl_context().wrap_socket(server.socket, server_side=True)
 
         # noinspection PyBroadException
         try:
@@ -2572,6 +5562,7 @@ def main() -> None:
         except (Exception, KeyboardInterrupt, SystemExit):
             print(" CANCEL \n")
 
+        save_warm_snapshot_on_exit()
         log.info("pyPowerwall Proxy Stopped")
         sys.exit(0)
 
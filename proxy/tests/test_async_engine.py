@@ -0,0 +1,122 @@
+"""Tests for the asyncio serving engine (PW_ENGINE=async).
+
+Covers:
+- routes are served over persistent HTTP/1.1 connections
+- gateway-bound routes run in the executor, memory-only routes on the loop
+- fresh performance cache hits are served on the loop
+- POST and unsupported methods go through the same Handler code
+"""
+import asyncio
+import http.client
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import proxy.server as server
+from proxy.server import serves_inline, start_async_server
+
+EMPTY_STATS = {"connections": 0, "requests": 0, "inline": 0, "offloaded": 0, "executor_workers": 0}
+
+
+class TestAsyncEngine(unittest.TestCase):
+    """Real sockets against the asyncio engine on an ephemeral port."""
+
+    def setUp(self):
+        self.patches = [
+            patch('proxy.server.api_base_url', ''),
+            patch('proxy.server.prefetch_enabled', False),
+            patch('proxy.server.keepalive_max_requests', 100),
+            patch.dict('proxy.server._async_stats', EMPTY_STATS),
+            patch.dict('proxy.server._performance_cache', {}, clear=True),
+            patch.object(server.resolve_route("/version"), 'func',
+                         return_value='{"version": "25.10.1"}'),
+        ]
+        for p in self.patches:
+            p.start()
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.async_server = asyncio.run_coroutine_threadsafe(
+            start_async_server("127.0.0.1", 0, self.executor), self.loop
+        ).result(5)
+        port = self.async_server.sockets[0].getsockname()[1]
+        self.conn = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+
+    def tearDown(self):
+        self.conn.close()
+        self.async_server.close()
+        asyncio.run_coroutine_threadsafe(self.async_server.wait_closed(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+        self.loop.close()
+        self.executor.shutdown()
+        for p in reversed(self.patches):
+            p.stop()
+
+    def request(self, method, path, body=None, headers=None):
+        self.conn.request(method, path, body=body, headers=headers or {})
+        response = self.conn.getresponse()
+        return response, response.read()
+
+    def test_keepalive_and_offload(self):
+        for _ in range(3):
+            response, body = self.request("GET", "/version")
+            self.assertEqual(response.status, 200)
+            self.assertEqual(body, b'{"version": "25.10.1"}')
+        self.assertEqual(server._async_stats["connections"], 1)
+        self.assertEqual(server._async_stats["requests"], 3)
+        self.assertEqual(server._async_stats["offloaded"], 3)
+
+    def test_memory_only_route_inline(self):
+        with patch.object(server.resolve_route("/stats/clear"), 'func',
+                          return_value='{"cleared": true}'):
+            response, body = self.request("GET", "/stats/clear")
+        self.assertEqual(body, b'{"cleared": true}')
+        self.assertEqual(server._async_stats["inline"], 1)
+
+    def test_fresh_cache_hit_inline(self):
+        server.cache_performance_response("/freq", '{"freq": 60}')
+        with patch('proxy.server.cache_expire', 5):
+            response, body = self.request("GET", "/freq", headers={"Accept-Encoding": "identity"})
+        self.assertEqual(body, b'{"freq": 60}')
+        self.assertIsNotNone(response.getheader("ETag"))
+        self.assertEqual(server._async_stats["inline"], 1)
+
+    def test_post_control_disabled(self):
+        with patch('proxy.server.control_secret', ''):
+            response, body = self.request("POST", "/control/reserve", body="value=20&token=x",
+                                          headers={"Content-Type": "application/x-www-form-urlencoded"})
+        self.assertEqual(response.status, 400)
+        self.assertIn(b"Control Commands Disabled", body)
+        # Connection stays usable after a POST
+        self.assertEqual(self.request("GET", "/version")[1], b'{"version": "25.10.1"}')
+
+    def test_unsupported_method(self):
+        response, _ = self.request("DELETE", "/version")
+        self.assertEqual(response.status, 501)
+
+
+class TestServesInline(unittest.TestCase):
+
+    def test_decisions(self):
+        with patch('proxy.server.api_base_url', ''), \
+             patch('proxy.server.prefetch_enabled', False), \
+             patch('proxy.server.cache_expire', 5), \
+             patch.dict('proxy.server._performance_cache', {}, clear=True):
+            self.assertTrue(serves_inline("GET", "/health"))
+            self.assertFalse(serves_inline("GET", "/version"))
+            self.assertFalse(serves_inline("POST", "/health"))
+            self.assertFalse(serves_inline("GET", "/vitals"))
+            server._performance_cache["/vitals"] = server._CacheEntry("{}", time.time())
+            self.assertTrue(serves_inline("GET", "/vitals"))
+            # About to expire - may block, so offload
+            server._performance_cache["/vitals"] = server._CacheEntry("{}", time.time() - 4.5)
+            self.assertFalse(serves_inline("GET", "/vitals"))
+            self.assertFalse(serves_inline("GET", "/"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+"""Tests for the /batch endpoint.
+
+Covers:
+- several routes combined into one JSON object keyed by route
+- unknown, non-JSON and side-effecting routes are reported under "errors"
+- identical route lists within a tick share one cached snapshot
+- routes in a batch skip per-route entries cached before the batch's tick and
+  reuse the ones refreshed in it
+"""
+import json
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+import proxy.server as server
+from proxy.server import cached_route_handler, parse_batch_routes, route_batch
+from proxy.tests.test_csv_endpoints import BaseDoGetTest, common_patches
+
+
+class BatchTestBase(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.patches = [
+            patch('proxy.server.prefetch_enabled', False),
+            patch('proxy.server.cache_expire', 5),
+            patch.dict('proxy.server._performance_cache', {}, clear=True),
+            patch.dict('proxy.server._tick', {"snapshot": None}),
+            patch.dict('proxy.server._tick_stats', {"snapshots": 0, "shared": 0, "retried": 0}),
+            patch.object(server.resolve_route("/soe"), 'func',
+                         return_value='{"percentage": 50.0}'),
+            patch.object(server.resolve_route("/freq"), 'func',
+                         return_value='{"grid_freq": 60.0}'),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        super().tearDown()
+
+
+class TestBatch(BatchTestBase):
+
+    def test_parse_routes(self):
+        self.assertEqual(
+            parse_batch_routes("routes=/soe,freq,,/soe&routes=/vitals"),
+            ["/freq", "/soe", "/vitals"],
+        )
+        self.assertEqual(parse_batch_routes(""), [])
+
+    def test_routes_combined(self):
+        result = json.loads(route_batch("/batch", "routes=/soe,/freq"))
+        self.assertEqual(result["routes"], {"/freq": {"grid_freq": 60.0}, "/soe": {"percentage": 50.0}})
+        self.assertEqual(result["errors"], {})
+        self.assertIsInstance(result["timestamp"], float)
+
+    def test_no_data_is_null(self):
+        with patch.object(server.resolve_route("/vitals"), 'func', return_value=None):
+            result = json.loads(route_batch("/batch", "routes=/vitals"))
+        self.assertIsNone(result["routes"]["/vitals"])
+
+    def test_unsupported_routes(self):
+        result = json.loads(route_batch("/batch", "routes=/soe,/nope,/help,/stats/clear,/batch"))
+        self.assertEqual(list(result["routes"]), ["/soe"])
+        self.assertEqual(sorted(result["errors"]), ["/batch", "/help", "/nope", "/stats/clear"])
+
+    def test_errors(self):
+        self.assertIn("error", json.loads(route_batch("/batch", "")))
+        too_many = ",".join(f"/r{i}" for i in range(server.BATCH_MAX_ROUTES + 1))
+        self.assertIn("Too many", json.loads(route_batch("/batch", "routes=" + too_many))["error"])
+
+    def test_snapshot_shared_within_tick(self):
+        first = route_batch("/batch", "routes=/soe,/freq")
+        # Same routes in a different order hit the same snapshot
+        self.assertIs(route_batch("/batch", "routes=/freq,/soe"), first)
+        self.assertEqual(server.resolve_route("/soe").func.call_count, 1)
+
+    def test_snapshot_cap(self):
+        with patch('proxy.server.BATCH_MAX_SNAPSHOTS', 1):
+            route_batch("/batch", "routes=/soe")
+            route_batch("/batch", "routes=/freq")
+            route_batch("/batch", "routes=/freq")
+        self.assertEqual([k for k in server._performance_cache if k.startswith("/batch?")],
+                         ["/batch?routes=/soe"])
+        self.assertEqual(server.resolve_route("/freq").func.call_count, 2)
+
+    def test_batches_in_one_tick_share_its_start(self):
+        start = server.batch_tick_start()
+        self.assertEqual(server.batch_tick_start(), start)
+        # /pod, /freq, /json and /csv renders join the same tick
+        self.assertEqual(server.tick_snapshot("/pod").timestamp, start)
+        server._tick["snapshot"].timestamp -= 5
+        self.assertGreater(server.batch_tick_start(), start)
+        self.assertEqual(server._tick_stats["snapshots"], 2)
+
+
+class TestBatchRefresh(unittest.TestCase):
+    """cached_route_handler skips entries from before the batch's tick while a batch is built."""
+
+    def test_refresh_bypasses_fresh_entry(self):
+        with patch('proxy.server.prefetch_enabled', False), \
+             patch('proxy.server.cache_expire', 5), \
+             patch.dict('proxy.server._performance_cache', {}, clear=True):
+            server.cache_performance_response("/pod", '{"old": 1}')
+            generator = Mock(return_value='{"new": 1}')
+            self.assertEqual(cached_route_handler("/pod", generator), '{"old": 1}')
+            server._response_local.refresh = time.time() + 1
+            try:
+                self.assertEqual(cached_route_handler("/pod", generator), '{"new": 1}')
+            finally:
+                server._response_local.refresh = None
+            # The refreshed value is cached for ordinary requests
+            self.assertEqual(cached_route_handler("/pod", generator), '{"new": 1}')
+            generator.assert_called_once()
+
+    def test_refresh_failure_keeps_fresh_entry(self):
+        with patch('proxy.server.prefetch_enabled', False), \
+             patch('proxy.server.cache_expire', 5), \
+             patch.dict('proxy.server._performance_cache', {}, clear=True):
+            server.cache_performance_response("/pod", '{"old": 1}')
+            server._response_local.refresh = time.time() + 1
+            try:
+                self.assertEqual(cached_route_handler("/pod", Mock(return_value=None)), '{"old": 1}')
+            finally:
+                server._response_local.refresh = None
+
+    def test_entry_from_batch_tick_reused(self):
+        with patch('proxy.server.prefetch_enabled', False), \
+             patch('proxy.server.cache_expire', 5), \
+             patch.dict('proxy.server._performance_cache', {}, clear=True):
+            server._response_local.refresh = time.time()
+            try:
+                server.cache_performance_response("/pod", '{"now": 1}')
+                generator = Mock(return_value='{"new": 1}')
+                self.assertEqual(cached_route_handler("/pod", generator), '{"now": 1}')
+                generator.assert_not_called()
+            finally:
+                server._response_local.refresh = None
+
+
+class TestBatchDoGet(BatchTestBase, BaseDoGetTest):
+
+    @common_patches
+    def test_do_get_sends_etag(self, _proxystats_lock):
+        self.handler.path = "/batch?routes=/soe,/freq"
+        self.handler.do_GET()
+        result = self.get_written_json()
+        self.assertEqual(result["routes"]["/soe"], {"percentage": 50.0})
+        headers = {c[0][0]: c[0][1] for c in self.handler.send_header.call_args_list}
+        self.assertIn("ETag", headers)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+"""Tests for the regression checks in proxy/benchmark.py (no proxy is started)."""
+import unittest
+
+from proxy.benchmark import compare, hit_ratios, percentile, summarize
+
+
+def run(rps=500, p50=10.0, p95=20.0, p99=40.0, routes=None, resources=None):
+    return {
+        "overall": {"requests": 5000, "rps": rps, "p50": p50, "p95": p95, "p99": p99, "errors": 0},
+        "routes": routes or {},
+        "resources": resources or {},
+    }
+
+
+def route(requests=200, p50=10.0, p95=20.0, p99=40.0):
+    return {"requests": requests, "rps": 10, "p50": p50, "p95": p95, "p99": p99, "errors": 0}
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_summarize(self):
+        stats = summarize([float(ms) for ms in range(100, 0, -1)], 10, 2)
+        self.assertEqual(stats["requests"], 100)
+        self.assertEqual(stats["rps"], 10)
+        self.assertEqual((stats["p50"], stats["p95"], stats["p99"]), (51.0, 96.0, 100.0))
+        self.assertEqual(percentile([], 0.5), 0)
+
+    def test_no_regression_within_threshold(self):
+        self.assertEqual(compare(run(rps=450, p95=22.0), run(), threshold=15), [])
+
+    def test_overall_regressions(self):
+        regressions = compare(run(rps=400, p99=60.0), run(), threshold=15)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(regressions[0].startswith("overall req/s 500 -> 400"))
+
+    def test_small_absolute_change_ignored(self):
+        # +100% but only 0.5 ms - noise on sub-millisecond cache hits
+        self.assertEqual(compare(run(p50=1.0), run(p50=0.5), threshold=15), [])
+
+    def test_route_regressions(self):
+        base = run(routes={"/vitals": route(), "/rare": route(requests=5)})
+        current = run(routes={"/vitals": route(p95=30.0, p99=400.0), "/rare": route(requests=5, p95=90.0)})
+        # Rare routes and per-route p99 are too noisy to gate on
+        self.assertEqual(compare(current, base, threshold=15), ["/vitals p95 20.00 -> 30.00 ms"])
+
+    def test_resource_regressions(self):
+        base = run(resources={"cpu_avg": 20.0, "rss_max_mb": 60.0})
+        current = run(resources={"cpu_avg": 30.0, "rss_max_mb": 61.0})
+        self.assertEqual(compare(current, base, threshold=15), ["cpu_avg 20.0% -> 30.0%"])
+
+    def test_hit_ratios(self):
+        before = {"performance": {"hit": 10, "miss": 5}}
+        after = {"performance": {"hit": 100, "miss": 15}, "degradation": {"hit": 0, "miss": 0}}
+        ratios = hit_ratios(before, after)
+        self.assertEqual(ratios["performance"], {"hits": 90, "misses": 10, "ratio": 0.9})
+        self.assertIsNone(ratios["degradation"]["ratio"])
+
+
+if __name__ == "__main__":
+    unittest.main()
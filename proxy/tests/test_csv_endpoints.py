@@ -103,6 +103,11 @@ class BaseDoGetTest(unittest.TestCase):
         self.handler.wfile = Mock()
         self.handler.wfile.write = Mock()
 
+        # Start every test on a fresh tick so route data never leaks between tests
+        tick = patch.dict('proxy.server._tick', {"snapshot": None})
+        tick.start()
+        self.addCleanup(tick.stop)
+
     def get_written_json(self):
         """Helper to extract and parse JSON from written response"""
         written_data = self.handler.wfile.write.call_args[0][0]
@@ -0,0 +1,109 @@
+"""Tests for the graceful degradation cache (_last_good_responses).
+
+Covers:
+- entries are kept in refresh order and evicted oldest-first over PW_CACHE_MAX_BYTES
+- a response larger than the whole budget is not cached
+- expired entries are swept on insert and on lookup
+- /health reports occupancy, /health/reset clears it
+"""
+import json
+import time
+import unittest
+from collections import OrderedDict
+from unittest.mock import patch
+
+import proxy.server as server
+from proxy.server import cache_response, get_cached_response, payload_size
+
+
+class DegradationCacheTestBase(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.patches = [
+            patch('proxy.server.graceful_degradation', True),
+            patch('proxy.server.degradation_cache_ttl_seconds', 30),
+            patch('proxy.server.cache_max_bytes', 0),
+            patch('proxy.server._last_good_responses', OrderedDict()),
+            patch.dict('proxy.server._degradation_cache_stats',
+                       {"bytes": 0, "evictions": 0, "expired": 0}),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        super().tearDown()
+
+
+class TestDegradationCache(DegradationCacheTestBase):
+
+    def test_bytes_tracked(self):
+        cache_response("/soe:json", '{"percentage": 50}')
+        cache_response("/aggregates", {"site": {"instant_power": 100}})
+        expected = payload_size('{"percentage": 50}') + payload_size({"site": {"instant_power": 100}})
+        self.assertEqual(server._degradation_cache_stats["bytes"], expected)
+        # Replacing an entry swaps its size rather than adding to it
+        cache_response("/soe:json", '{"percentage": 50}')
+        self.assertEqual(server._degradation_cache_stats["bytes"], expected)
+
+    def test_evicts_least_recently_refreshed(self):
+        body = "x" * 1000
+        with patch('proxy.server.cache_max_bytes', payload_size(body) * 2):
+            cache_response("/a", body)
+            cache_response("/b", body)
+            cache_response("/a", body)  # refreshed - /b is now the oldest
+            cache_response("/c", body)
+        self.assertEqual(list(server._last_good_responses), ["/a", "/c"])
+        self.assertEqual(server._degradation_cache_stats["evictions"], 1)
+
+    def test_oversized_not_cached(self):
+        cache_response("/vitals:json", "small")
+        with patch('proxy.server.cache_max_bytes', 100):
+            cache_response("/vitals:json", "x" * 1000)
+        # The stale smaller entry is dropped too - never serve an older payload
+        self.assertNotIn("/vitals:json", server._last_good_responses)
+        self.assertEqual(server._degradation_cache_stats["bytes"], 0)
+
+    def test_expired_swept_on_insert(self):
+        cache_response("/a", "1")
+        response, _, nbytes = server._last_good_responses["/a"]
+        server._last_good_responses["/a"] = (response, time.time() - 60, nbytes)
+        cache_response("/b", "2")
+        self.assertEqual(list(server._last_good_responses), ["/b"])
+        self.assertEqual(server._degradation_cache_stats["expired"], 1)
+        self.assertEqual(server._degradation_cache_stats["bytes"], payload_size("2"))
+
+    def test_expired_removed_on_lookup(self):
+        cache_response("/a", "1")
+        self.assertEqual(get_cached_response("/a"), "1")
+        response, _, nbytes = server._last_good_responses["/a"]
+        server._last_good_responses["/a"] = (response, time.time() - 60, nbytes)
+        self.assertIsNone(get_cached_response("/a"))
+        self.assertEqual(server._degradation_cache_stats["bytes"], 0)
+
+
+class TestDegradationCacheHealth(DegradationCacheTestBase):
+
+    def test_health_reports_occupancy(self):
+        cache_response("/soe:json", '{"percentage": 50}')
+        with patch('proxy.server.cache_max_bytes', 4096), \
+             patch('proxy.server.health_check_enabled', False):
+            health = json.loads(server.route_health("/health", ""))
+        cached = health["cached_data"]
+        self.assertEqual(cached["cache_size"], 1)
+        self.assertEqual(cached["size_bytes"], payload_size('{"percentage": 50}'))
+        self.assertEqual(cached["max_bytes"], 4096)
+        self.assertEqual(cached["endpoints"]["/soe:json"]["size_bytes"], cached["size_bytes"])
+
+    def test_reset_clears_bytes(self):
+        cache_response("/soe:json", '{"percentage": 50}')
+        with patch('proxy.server.health_check_enabled', False):
+            server.route_health_reset("/health/reset", "")
+        self.assertEqual(len(server._last_good_responses), 0)
+        self.assertEqual(server._degradation_cache_stats["bytes"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+"""Tests for the /influx line protocol endpoint.
+
+Covers:
+- JSON is flattened like Telegraf's json parser (nested keys, float fields only)
+- measurement names follow the Powerwall-Dashboard schema
+- the rendered body is cached once per tick
+"""
+import unittest
+from unittest.mock import patch
+
+import proxy.server as server
+from proxy.server import build_influx, influx_fields, influx_line
+from proxy.tests.test_csv_endpoints import BaseDoGetTest, common_patches
+
+ROUTES = {
+    "/aggregates": '{"site": {"instant_power": -2100, "last_communication_time": "2026-10-16"}}',
+    "/api/system_status/soe": '{"percentage": 55.5}',
+    "/strings": '{"A": {"Voltage": 300.5, "Connected": true, "State": "PV_Active"}}',
+    "/temps/pw": '{"PW1_temp": 15.6}',
+    "/pod": '{"PW1_POD_enable_line": 1, "PW1_name": "TEPOD--1"}',
+    "/freq": '{"PW1_PINV_Fout": 60.02, "grid_status": 1}',
+    "/alerts/pw": '{}',
+}
+
+
+class InfluxTestBase(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.patches = [
+            patch('proxy.server.prefetch_enabled', False),
+            patch('proxy.server.cache_expire', 5),
+            patch.dict('proxy.server._performance_cache', {}, clear=True),
+        ] + [
+            patch.object(server.resolve_route(path), 'func', return_value=body)
+            for path, body in ROUTES.items()
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        super().tearDown()
+
+
+class TestInflux(InfluxTestBase):
+
+    def test_fields_flattened_like_telegraf(self):
+        fields = influx_fields({"a": {"b": 1, "c": "text", "d": True, "e": None}, "f": [2, 3.5]})
+        self.assertEqual(fields, {"a_b": 1.0, "f_0": 2.0, "f_1": 3.5})
+        self.assertEqual(influx_fields({"nan": float("nan")}), {})
+
+    def test_line_escaping(self):
+        self.assertEqual(influx_line("http", {"a b,c=d": 1.0}), "http a\\ b\\,c\\=d=1.0\n")
+
+    def test_measurements(self):
+        self.assertEqual(build_influx(), (
+            "http site_instant_power=-2100.0,percentage=55.5\n"
+            "strings A_Voltage=300.5\n"
+            "temp_battery PW1_temp=15.6\n"
+            "pod PW1_POD_enable_line=1.0\n"
+            "freq PW1_PINV_Fout=60.02,grid_status=1.0\n"
+        ))
+
+    def test_missing_route_skipped(self):
+        with patch.object(server.resolve_route("/strings"), 'func', return_value=None):
+            self.assertNotIn("strings", build_influx())
+
+
+class TestInfluxDoGet(InfluxTestBase, BaseDoGetTest):
+
+    @common_patches
+    def test_cached_per_tick(self, _proxystats_lock):
+        self.handler.path = "/influx"
+        self.handler.do_GET()
+        first = self.get_written_text()
+        self.handler.do_GET()
+        self.assertEqual(self.get_written_text(), first)
+        self.assertEqual(server.resolve_route("/pod").func.call_count, 1)
+        headers = {c[0][0]: c[0][1] for c in self.handler.send_header.call_args_list}
+        self.assertEqual(headers["Content-type"], "text/plain; charset=utf-8")
+        self.assertIn("ETag", headers)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+"""Tests for HTTP/1.1 keep-alive connections (PW_KEEPALIVE=yes).
+
+Covers:
+- several requests are served over one persistent connection
+- the per-connection request cap closes the connection with "Connection: close"
+- static responses carry Content-Length
+- reuse counters are kept in _keepalive_stats
+- /metrics latency labels are not carried over between requests on a connection
+"""
+import http.client
+import threading
+import unittest
+from unittest.mock import patch
+
+import proxy.server as server
+from proxy.server import Handler, ThreadingHTTPServer
+
+
+class TestKeepAlive(unittest.TestCase):
+    """Real sockets against a ThreadingHTTPServer on an ephemeral port."""
+
+    def setUp(self):
+        self.patches = [
+            patch('proxy.server.keepalive_enabled', True),
+            patch('proxy.server.keepalive_max_requests', 3),
+            patch.object(Handler, 'protocol_version', "HTTP/1.1"),
+            patch.object(Handler, 'timeout', 5),
+            patch.dict('proxy.server._request_latency', {}, clear=True),
+            patch.dict('proxy.server._keepalive_stats',
+                       {"connections": 0, "requests": 0, "reused": 0, "capped": 0}),
+            patch.object(server.resolve_route("/version"), 'func',
+                         return_value='{"version": "25.10.1"}'),
+        ]
+        for p in self.patches:
+            p.start()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        self.conn = http.client.HTTPConnection("127.0.0.1", self.httpd.server_address[1], timeout=5)
+
+    def tearDown(self):
+        self.conn.close()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        for p in reversed(self.patches):
+            p.stop()
+
+    def get(self, path):
+        self.conn.request("GET", path)
+        response = self.conn.getresponse()
+        return response, response.read()
+
+    def test_requests_share_connection(self):
+        for _ in range(2):
+            response, body = self.get("/version")
+            self.assertEqual(body, b'{"version": "25.10.1"}')
+            self.assertEqual(response.getheader("Content-Length"), str(len(body)))
+            self.assertIsNone(response.getheader("Connection"))
+        self.assertEqual(server._keepalive_stats["connections"], 1)
+        self.assertEqual(server._keepalive_stats["requests"], 2)
+        self.assertEqual(server._keepalive_stats["reused"], 1)
+
+    def test_request_cap_closes_connection(self):
+        for _ in range(2):
+            self.get("/version")
+        response, _ = self.get("/version")
+        self.assertEqual(response.getheader("Connection"), "close")
+        self.assertEqual(server._keepalive_stats["capped"], 1)
+        # Client reconnects transparently on the next request
+        self.get("/version")
+        self.assertEqual(server._keepalive_stats["connections"], 2)
+
+    def test_static_content_length(self):
+        response, body = self.get("/favicon-16x16.png")
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader("Content-Length"), str(len(body)))
+        # Connection still usable after a static response
+        _, body = self.get("/version")
+        self.assertEqual(body, b'{"version": "25.10.1"}')
+
+    def test_latency_label_reset_per_request(self):
+        self.get("/version")
+        for _ in range(2):
+            self.get("/favicon-16x16.png")
+        self.assertEqual(sum(server._request_latency["/version"].counts), 1)
+        self.assertEqual(sum(server._request_latency["static"].counts), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
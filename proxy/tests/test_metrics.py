@@ -0,0 +1,131 @@
+"""Tests for the Prometheus /metrics endpoint.
+
+Covers:
+- samples land in the right fixed bucket, rendered cumulatively
+- label cardinality is capped under "other"
+- do_GET records latency by route path, safe_pw_call by pypowerwall call
+- performance and degradation cache hits/misses are counted
+"""
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+import proxy.server as server
+from proxy.server import (
+    METRICS_MAX_SERIES,
+    get_cached_response,
+    get_performance_cached,
+    observe_latency,
+    render_metrics,
+    safe_pw_call,
+)
+from proxy.tests.test_csv_endpoints import BaseDoGetTest, common_patches
+
+EMPTY_LOOKUPS = {"performance": {"hit": 0, "miss": 0}, "degradation": {"hit": 0, "miss": 0}}
+
+
+def metrics_patches():
+    return [
+        patch.dict('proxy.server._request_latency', {}, clear=True),
+        patch.dict('proxy.server._upstream_latency', {}, clear=True),
+        patch.dict('proxy.server._cache_lookups',
+                   {k: dict(v) for k, v in EMPTY_LOOKUPS.items()}),
+    ]
+
+
+class MetricsTestBase(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.metric_patches = metrics_patches()
+        for p in self.metric_patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.metric_patches):
+            p.stop()
+        super().tearDown()
+
+
+class TestHistogram(MetricsTestBase):
+
+    def test_buckets_rendered_cumulative(self):
+        observe_latency(server._request_latency, "/vitals", 0.003)
+        observe_latency(server._request_latency, "/vitals", 0.005)  # le is inclusive
+        observe_latency(server._request_latency, "/vitals", 30)
+        text = render_metrics()
+        name = "pypowerwall_proxy_request_duration_seconds"
+        self.assertIn(f'{name}_bucket{{route="/vitals",le="0.001"}} 0\n', text)
+        self.assertIn(f'{name}_bucket{{route="/vitals",le="0.005"}} 2\n', text)
+        self.assertIn(f'{name}_bucket{{route="/vitals",le="10.0"}} 2\n', text)
+        self.assertIn(f'{name}_bucket{{route="/vitals",le="+Inf"}} 3\n', text)
+        self.assertIn(f'{name}_count{{route="/vitals"}} 3\n', text)
+        self.assertIn(f'{name}_sum{{route="/vitals"}} 30.008000\n', text)
+        self.assertIn(f"# TYPE {name} histogram\n", text)
+
+    def test_label_cap(self):
+        for i in range(METRICS_MAX_SERIES + 5):
+            observe_latency(server._upstream_latency, f"call{i}", 0.01)
+        self.assertEqual(len(server._upstream_latency), METRICS_MAX_SERIES + 1)
+        self.assertEqual(sum(server._upstream_latency["other"].counts), 5)
+
+    def test_label_escaping(self):
+        observe_latency(server._upstream_latency, 'poll "/api"\\', 0.01)
+        self.assertIn('call="poll \\"/api\\"\\\\"', render_metrics())
+
+
+class TestLatencyRecording(MetricsTestBase, BaseDoGetTest):
+
+    @common_patches
+    def test_route_latency_by_route_path(self, _proxystats_lock):
+        with patch.object(server.resolve_route("/soe"), 'func', return_value='{"percentage": 50}'):
+            self.handler.path = "/soe"
+            self.handler.do_GET()
+        self.assertEqual(list(server._request_latency), ["/soe"])
+        # Prefix routes are labelled by their prefix, not the full request path
+        with patch.object(server.resolve_route("/csv"), 'func', return_value="1,2"):
+            self.handler.path = "/csv/v2"
+            self.handler.do_GET()
+        self.assertIn("/csv", server._request_latency)
+
+    def test_upstream_latency_recorded_on_error(self):
+        poll = Mock(side_effect=TimeoutError, __name__="poll")
+        with patch('proxy.server.health_check_enabled', False), \
+             patch('proxy.server.proxystats_lock'):
+            self.assertIsNone(safe_pw_call(poll, "/api/status"))
+        self.assertEqual(sum(server._upstream_latency["poll /api/status"].counts), 1)
+
+    @common_patches
+    def test_metrics_endpoint(self, _proxystats_lock):
+        self.handler.path = "/metrics"
+        self.handler.do_GET()
+        self.assertIn("# TYPE pypowerwall_proxy_cache_lookups_total counter", self.get_written_text())
+        headers = {c[0][0]: c[0][1] for c in self.handler.send_header.call_args_list}
+        self.assertTrue(headers["Content-type"].startswith("text/plain; version=0.0.4"))
+
+
+class TestCacheLookups(MetricsTestBase):
+
+    def test_performance_cache(self):
+        with patch.dict('proxy.server._performance_cache', {}, clear=True), \
+             patch('proxy.server.cache_expire', 5):
+            get_performance_cached("/vitals")
+            server.cache_performance_response("/vitals", "{}")
+            get_performance_cached("/vitals")
+            server._performance_cache["/vitals"].timestamp = time.time() - 10
+            get_performance_cached("/vitals")
+        self.assertEqual(server._cache_lookups["performance"], {"hit": 1, "miss": 2})
+
+    def test_degradation_cache(self):
+        with patch.dict('proxy.server._last_good_responses', {}, clear=True), \
+             patch('proxy.server.graceful_degradation', True):
+            server.cache_response("/aggregates:json", "{}")
+            get_cached_response("/aggregates:json")
+            get_cached_response("/soe:json")
+        self.assertEqual(server._cache_lookups["degradation"], {"hit": 1, "miss": 1})
+        text = render_metrics()
+        self.assertIn('pypowerwall_proxy_cache_lookups_total{cache="degradation",result="hit"} 1', text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,281 @@
+"""Tests for the proxy performance cache (_performance_cache).
+
+Covers:
+- single_flight() coalesces concurrent cache misses onto one data_generator() call
+- waiters that time out fall back to the last cached value
+- coalescing counters are reported in /stats
+- cached responses carry a pre-computed ETag and honour If-None-Match (304)
+- Accept-Encoding negotiation compresses each cached payload at most once
+- PW_CACHE_EXPIRE_API parsing for the per-API pypowerwall cache expiry
+"""
+import gzip
+import threading
+import time
+import unittest
+import zlib
+from unittest.mock import Mock, patch
+
+import proxy.server as server
+from proxy.server import (
+    _CacheEntry,
+    cached_route_handler,
+    etag_matches,
+    negotiate_encoding,
+    parse_cache_ttls,
+    single_flight,
+)
+from proxy.tests.test_csv_endpoints import BaseDoGetTest, standard_test_patches
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Concurrent misses for the same cache key share one gateway call."""
+
+    def setUp(self):
+        self.patches = [
+            patch('proxy.server.prefetch_enabled', False),
+            patch('proxy.server.degradation_cache_ttl_seconds', 30),
+            patch.dict('proxy.server._performance_cache', {}, clear=True),
+            patch.dict('proxy.server._inflight', {}, clear=True),
+            patch.dict('proxy.server._coalesce_stats',
+                       {"leaders": 0, "coalesced": 0, "timeouts": 0}),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+
+    def test_concurrent_misses_call_generator_once(self):
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def generator():
+            calls.append(1)
+            release.wait(2)
+            return '{"site": 1}'
+
+        def request():
+            results.append(cached_route_handler("/aggregates", generator))
+
+        threads = [threading.Thread(target=request) for _ in range(5)]
+        for t in threads:
+            t.start()
+        # Let every thread reach the in-flight wait before the leader returns
+        deadline = time.time() + 2
+        while server._coalesce_stats["coalesced"] < 4 and time.time() < deadline:
+            time.sleep(0.01)
+        release.set()
+        for t in threads:
+            t.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['{"site": 1}'] * 5)
+        self.assertEqual(server._coalesce_stats["leaders"], 1)
+        self.assertEqual(server._coalesce_stats["coalesced"], 4)
+        self.assertEqual(server._inflight, {})
+
+    def test_waiter_timeout_falls_back_to_last_value(self):
+        server._performance_cache["/csv"] = _CacheEntry("1,2,3\n", time.time() - 10)
+        release = threading.Event()
+        leader = threading.Thread(
+            target=single_flight, args=("/csv", lambda: release.wait(2) and "4,5,6\n")
+        )
+        leader.start()
+        while "/csv" not in server._inflight:
+            time.sleep(0.01)
+
+        with patch('proxy.server.timeout', 0.05):
+            result = single_flight("/csv", Mock(return_value="never"))
+        release.set()
+        leader.join(5)
+
+        self.assertEqual(result, "1,2,3\n")
+        self.assertEqual(server._coalesce_stats["timeouts"], 1)
+
+    def test_generator_exception_releases_waiters(self):
+        def generator():
+            raise RuntimeError("gateway down")
+
+        with self.assertRaises(RuntimeError):
+            single_flight("/pod", generator)
+        self.assertEqual(server._inflight, {})
+        # A later call becomes leader again
+        self.assertEqual(single_flight("/pod", Mock(return_value="ok")), "ok")
+
+
+class TestStatsCoalescing(BaseDoGetTest):
+    """/stats reports single-flight coalescing counters."""
+
+    def test_stats_includes_coalescing(self):
+        with standard_test_patches(), \
+             patch('proxy.server.pw') as mock_pw, \
+             patch('proxy.server.health_check_enabled', False), \
+             patch('proxy.server.safe_pw_call', return_value="Test Site"), \
+             patch.dict('proxy.server._coalesce_stats',
+                        {"leaders": 3, "coalesced": 7, "timeouts": 1}):
+            mock_pw.cloudmode = False
+            mock_pw.fleetapi = False
+            self.handler.path = "/stats"
+            self.handler.do_GET()
+
+        data = self.get_written_json()
+        self.assertEqual(data["coalescing"]["coalesced"], 7)
+        self.assertEqual(data["coalescing"]["leaders"], 3)
+        self.assertEqual(data["coalescing"]["in_flight"], 0)
+
+
+class CachedRouteTestBase(BaseDoGetTest):
+    """do_GET against a performance cached route (/vitals) with a fresh cache."""
+
+    def setUp(self):
+        super().setUp()
+        self.patches = [
+            standard_test_patches(),
+            patch('proxy.server.prefetch_enabled', False),
+            patch.dict('proxy.server._performance_cache', {}, clear=True),
+            patch('proxy.server.safe_endpoint_call', return_value='{"vitals": 1}'),
+        ]
+        for p in self.patches:
+            p.__enter__()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.__exit__(None, None, None)
+
+    def get_sent_headers(self):
+        return {c[0][0]: c[0][1] for c in self.handler.send_header.call_args_list}
+
+    def request(self, path, if_none_match=None, accept_encoding=None):
+        self.handler.send_response.reset_mock()
+        self.handler.send_header.reset_mock()
+        self.handler.wfile.write.reset_mock()
+        self.handler.headers = {}
+        if if_none_match:
+            self.handler.headers["If-None-Match"] = if_none_match
+        if accept_encoding:
+            self.handler.headers["Accept-Encoding"] = accept_encoding
+        self.handler.path = path
+        self.handler.do_GET()
+
+
+class TestETag(CachedRouteTestBase):
+    """Performance cached responses are sent with an ETag and revalidated with 304."""
+
+    def test_etag_from_cache_entry(self):
+        self.request("/vitals")
+        self.handler.send_response.assert_called_with(200)
+        headers = self.get_sent_headers()
+        self.assertEqual(headers["ETag"], server._performance_cache["/vitals"].etag)
+        self.assertEqual(self.get_written_json(), {"vitals": 1})
+
+    def test_if_none_match_returns_304(self):
+        self.request("/vitals")
+        etag = self.get_sent_headers()["ETag"]
+        self.request("/vitals", if_none_match=etag)
+        self.handler.send_response.assert_called_with(304)
+        self.assertEqual(self.get_sent_headers()["ETag"], etag)
+        self.handler.wfile.write.assert_not_called()
+
+    def test_changed_payload_returns_200(self):
+        self.request("/vitals", if_none_match='"stale"')
+        self.handler.send_response.assert_called_with(200)
+        self.assertEqual(self.get_written_json(), {"vitals": 1})
+
+    def test_uncached_route_has_no_etag(self):
+        with patch('proxy.server.pw') as mock_pw:
+            mock_pw.version.return_value = "25.10.1"
+            mock_pw.git_hash.return_value = "abc"
+            self.request("/version")
+        self.assertNotIn("ETag", self.get_sent_headers())
+
+    def test_etag_matches(self):
+        self.assertTrue(etag_matches('"abc"', '"abc"'))
+        self.assertTrue(etag_matches('W/"abc"', '"abc"'))
+        self.assertTrue(etag_matches('"x", "abc"', '"abc"'))
+        self.assertTrue(etag_matches('*', '"abc"'))
+        self.assertFalse(etag_matches('"x"', '"abc"'))
+        self.assertFalse(etag_matches(None, '"abc"'))
+
+
+class TestCompression(CachedRouteTestBase):
+    """Accept-Encoding negotiation with compressed variants stored in the cache entry."""
+
+    LARGE = '{"vitals": "%s"}' % ("x" * 2000)
+
+    def setUp(self):
+        super().setUp()
+        self.patches += [
+            patch('proxy.server.compress_enabled', True),
+            patch('proxy.server.compress_min_bytes', 1024),
+            patch.dict('proxy.server._compress_stats',
+                       {"compressions": 0, "responses": 0, "bytes_in": 0, "bytes_out": 0}),
+        ]
+        for p in self.patches[-3:]:
+            p.__enter__()
+        server.safe_endpoint_call.return_value = self.LARGE
+
+    def get_written_body(self):
+        return self.handler.wfile.write.call_args[0][0]
+
+    def test_gzip_compressed_once_per_entry(self):
+        for _ in range(3):
+            self.request("/vitals", accept_encoding="gzip, deflate, br")
+            headers = self.get_sent_headers()
+            self.assertEqual(headers["Content-Encoding"], "gzip")
+            self.assertEqual(headers["Vary"], "Accept-Encoding")
+            body = self.get_written_body()
+            self.assertEqual(headers["Content-Length"], str(len(body)))
+            self.assertEqual(gzip.decompress(body).decode("utf8"), self.LARGE)
+        self.assertEqual(server._compress_stats["compressions"], 1)
+        self.assertEqual(set(server._performance_cache["/vitals"].variants), {"gzip"})
+
+    def test_deflate_preferred_by_qvalue(self):
+        self.request("/vitals", accept_encoding="gzip;q=0.5, deflate")
+        self.assertEqual(self.get_sent_headers()["Content-Encoding"], "deflate")
+        self.assertEqual(zlib.decompress(self.get_written_body()).decode("utf8"), self.LARGE)
+
+    def test_small_body_not_compressed(self):
+        server.safe_endpoint_call.return_value = '{"percentage": 50}'
+        self.request("/vitals", accept_encoding="gzip")
+        headers = self.get_sent_headers()
+        self.assertNotIn("Content-Encoding", headers)
+        self.assertNotIn("Vary", headers)
+
+    def test_compressed_variant_has_own_etag(self):
+        self.request("/vitals")
+        plain_etag = self.get_sent_headers()["ETag"]
+        self.request("/vitals", accept_encoding="gzip")
+        gzip_etag = self.get_sent_headers()["ETag"]
+        self.assertNotEqual(plain_etag, gzip_etag)
+        self.request("/vitals", if_none_match=gzip_etag, accept_encoding="gzip")
+        self.handler.send_response.assert_called_with(304)
+
+    def test_disabled(self):
+        with patch('proxy.server.compress_enabled', False):
+            self.request("/vitals", accept_encoding="gzip")
+        self.assertNotIn("Content-Encoding", self.get_sent_headers())
+
+    def test_negotiate_encoding(self):
+        self.assertEqual(negotiate_encoding("gzip, deflate"), "gzip")
+        self.assertEqual(negotiate_encoding("deflate"), "deflate")
+        self.assertEqual(negotiate_encoding("*"), "gzip")
+        self.assertIsNone(negotiate_encoding("br"))
+        self.assertIsNone(negotiate_encoding("gzip;q=0, deflate;q=0"))
+        self.assertIsNone(negotiate_encoding(None))
+
+
+class TestCacheExpireApi(unittest.TestCase):
+
+    def test_parse(self):
+        self.assertEqual(parse_cache_ttls(" /api/status=300, /api/solars=3600,"),
+                         {"/api/status": 300, "/api/solars": 3600})
+        self.assertEqual(parse_cache_ttls(""), {})
+
+    def test_invalid_entries_ignored(self):
+        self.assertEqual(parse_cache_ttls("/api/status=5m,/api/solars=60"), {"/api/solars": 60})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+"""Tests for the background prefetch mode (PW_PREFETCH=yes).
+
+Covers:
+- cached_route_handler() serves the latest snapshot past PW_CACHE_EXPIRE
+- snapshots older than PW_CACHE_TTL are not served
+- refresh_prefetch_routes() rebuilds registered routes and drops idle ones
+- a failed refresh keeps the previous snapshot
+"""
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+import proxy.server as server
+from proxy.server import _CacheEntry, cached_route_handler, refresh_prefetch_routes
+
+
+class TestPrefetchSnapshots(unittest.TestCase):
+    """cached_route_handler() / refresh_prefetch_routes() with prefetch enabled."""
+
+    def setUp(self):
+        self.patches = [
+            patch('proxy.server.prefetch_enabled', True),
+            patch('proxy.server.cache_expire', 5),
+            patch('proxy.server.degradation_cache_ttl_seconds', 30),
+            patch.dict('proxy.server._performance_cache', {}, clear=True),
+            patch.dict('proxy.server._prefetch_routes', {}, clear=True),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+
+    def test_first_request_generates_and_registers(self):
+        generator = Mock(return_value='{"a": 1}')
+        self.assertEqual(cached_route_handler("/pod", generator), '{"a": 1}')
+        generator.assert_called_once()
+        self.assertIn("/pod", server._prefetch_routes)
+
+    def test_stale_snapshot_served_without_generating(self):
+        server._performance_cache["/pod"] = _CacheEntry('{"old": 1}', time.time() - 10)
+        generator = Mock(return_value='{"new": 1}')
+        # Older than PW_CACHE_EXPIRE but within PW_CACHE_TTL - served as-is
+        self.assertEqual(cached_route_handler("/pod", generator), '{"old": 1}')
+        generator.assert_not_called()
+
+    def test_snapshot_older_than_ttl_regenerates(self):
+        server._performance_cache["/pod"] = _CacheEntry('{"old": 1}', time.time() - 60)
+        generator = Mock(return_value='{"new": 1}')
+        self.assertEqual(cached_route_handler("/pod", generator), '{"new": 1}')
+        generator.assert_called_once()
+
+    def test_refresh_updates_registered_routes(self):
+        server._prefetch_routes["/freq"] = (Mock(return_value='{"f": 60}'), time.time())
+        refresh_prefetch_routes()
+        data = server._performance_cache["/freq"].data
+        self.assertEqual(data, '{"f": 60}')
+
+    def test_refresh_drops_idle_routes(self):
+        generator = Mock(return_value="x")
+        idle = time.time() - server.PREFETCH_IDLE_SECONDS - 1
+        server._prefetch_routes["/json"] = (generator, idle)
+        refresh_prefetch_routes()
+        self.assertNotIn("/json", server._prefetch_routes)
+        generator.assert_not_called()
+
+    def test_failed_refresh_keeps_previous_snapshot(self):
+        server._performance_cache["/vitals"] = _CacheEntry('{"v": 1}', time.time() - 8)
+        server._prefetch_routes["/vitals"] = (Mock(side_effect=ValueError("boom")), time.time())
+        refresh_prefetch_routes()
+        data = server._performance_cache["/vitals"].data
+        self.assertEqual(data, '{"v": 1}')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,215 @@
+"""Tests for the gateway-wide request budget (PW_RATE_LIMIT).
+
+Covers:
+- TokenBucket keeps PW_RATE_RESERVE tokens for priority calls
+- priority calls wait for the next token, up to max_wait
+- gateway requests (not cache hits) spend the budget and are skipped when it is spent
+- call_route() serves the last good response when a call was refused, keyed by
+  path (and query only for routes that read it), from the performance cache for
+  routes with a cache_key
+"""
+import time
+import unittest
+from collections import OrderedDict
+from unittest.mock import Mock, patch
+
+import proxy.server as server
+from proxy.server import (
+    Route, TokenBucket, budget_gateway_requests, cached_route_handler, call_route,
+    is_priority_route, safe_pw_call,
+)
+
+
+class TestTokenBucket(unittest.TestCase):
+
+    def test_other_calls_stop_at_reserve(self):
+        bucket = TokenBucket(rate=0.001, burst=4, reserve=2)
+        self.assertTrue(bucket.acquire(False, 0))
+        self.assertTrue(bucket.acquire(False, 0))
+        self.assertFalse(bucket.acquire(False, 0))
+        # The reserved tokens are still there for priority calls
+        self.assertTrue(bucket.acquire(True, 0))
+        self.assertTrue(bucket.acquire(True, 0))
+        status = bucket.status()
+        self.assertEqual(status["other_calls"], 2)
+        self.assertEqual(status["priority_calls"], 2)
+        self.assertEqual(status["throttled"], 1)
+
+    def test_reserve_capped_below_burst(self):
+        bucket = TokenBucket(rate=1, burst=3, reserve=10)
+        self.assertEqual(bucket.reserve, 2)
+
+    @patch('proxy.server.time.sleep')
+    def test_priority_waits_for_next_token(self, mock_sleep):
+        bucket = TokenBucket(rate=10, burst=1, reserve=0)
+        self.assertTrue(bucket.acquire(True, 5))
+        self.assertTrue(bucket.acquire(True, 5))
+        mock_sleep.assert_called_once()
+        self.assertAlmostEqual(mock_sleep.call_args[0][0], 0.1, delta=0.01)
+        self.assertEqual(bucket.status()["waits"], 1)
+
+    @patch('proxy.server.time.sleep')
+    def test_priority_refused_past_max_wait(self, mock_sleep):
+        bucket = TokenBucket(rate=0.1, burst=1, reserve=0)
+        self.assertTrue(bucket.acquire(True, 1))
+        self.assertFalse(bucket.acquire(True, 1))
+        mock_sleep.assert_not_called()
+
+    def test_refill(self):
+        bucket = TokenBucket(rate=1000, burst=2, reserve=0)
+        self.assertTrue(bucket.acquire(False, 0))
+        self.assertTrue(bucket.acquire(False, 0))
+        time.sleep(0.01)
+        self.assertTrue(bucket.acquire(False, 0))
+
+
+class TestPriorityRoutes(unittest.TestCase):
+
+    def test_priority_routes(self):
+        for path in ("/aggregates", "/api/system_status/soe", "/strings", "/influx",
+                     "/csv", "/json", "/vitals", "/control/reserve"):
+            self.assertTrue(is_priority_route(path), path)
+        for path in ("/api/status", "/tedapi/config", "/pw/power", "/csv/v2"):
+            self.assertFalse(is_priority_route(path), path)
+
+
+def request_func(return_value):
+    """Stand-in for a pypowerwall request method that records its calls."""
+    def request(*args):
+        request.calls.append(args)
+        return return_value
+    request.calls = []
+    return request
+
+
+class TestBudgetedCalls(unittest.TestCase):
+
+    def setUp(self):
+        self.bucket = TokenBucket(rate=0.001, burst=2, reserve=1)
+        self.patches = [
+            patch('proxy.server.upstream_budget', self.bucket),
+            patch('proxy.server.graceful_degradation', True),
+            patch('proxy.server.degradation_cache_ttl_seconds', 30),
+            patch('proxy.server.cache_max_bytes', 0),
+            patch('proxy.server._last_good_responses', OrderedDict()),
+            patch.dict('proxy.server._degradation_cache_stats',
+                       {"bytes": 0, "evictions": 0, "expired": 0}),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        server._response_local.priority = True
+        server._response_local.throttled = False
+
+    def _powerwall(self, fetch):
+        powerwall = Mock(tedapi=False)
+        powerwall.client._fetch = fetch
+        budget_gateway_requests(powerwall)
+        return powerwall
+
+    def test_gateway_request_skipped_when_throttled(self):
+        server._response_local.priority = False
+        server._response_local.throttled = False
+        fetch = request_func({"ok": 1})
+        powerwall = self._powerwall(fetch)
+        self.assertEqual(safe_pw_call(powerwall.client._fetch, "/api/status"), {"ok": 1})
+        self.assertIsNone(safe_pw_call(powerwall.client._fetch, "/api/status"))
+        self.assertEqual(len(fetch.calls), 1)
+        self.assertTrue(server._response_local.throttled)
+
+    def test_cache_hits_are_free(self):
+        server._response_local.priority = False
+        self.assertEqual(safe_pw_call(Mock(return_value={"ok": 1})), {"ok": 1})
+        self.assertEqual(safe_pw_call(Mock(return_value={"ok": 1})), {"ok": 1})
+        self.assertEqual(self.bucket.status()["other_calls"], 0)
+        self.assertFalse(getattr(server._response_local, "throttled", False))
+
+    def test_wrappers_installed_once(self):
+        fetch = request_func({"ok": 1})
+        powerwall = self._powerwall(fetch)
+        budget_gateway_requests(powerwall)
+        powerwall.client._fetch("/api/status")
+        self.assertEqual(self.bucket.status()["priority_calls"], 1)
+
+    def test_tedapi_requests_budgeted(self):
+        server._response_local.priority = False
+        powerwall = Mock()
+        post = request_func(b"pb")
+        powerwall.tedapi._post_tedapi = post
+        powerwall.client = None
+        budget_gateway_requests(powerwall)
+        self.assertEqual(powerwall.tedapi._post_tedapi(b"q"), b"pb")
+        self.assertIsNone(powerwall.tedapi._post_tedapi(b"q"))
+        self.assertEqual(post.calls, [(b"q",)])
+
+    def test_call_route_serves_last_good_response(self):
+        fetch = request_func('{"site": "fresh"}')
+        powerwall = self._powerwall(fetch)
+        func = Mock(side_effect=lambda path, query: safe_pw_call(powerwall.client._fetch, path))
+        get_route = Route("/api/site_info", func)
+        self.assertEqual(call_route(get_route, "/api/site_info", ""), '{"site": "fresh"}')
+        # Budget now at the reserve - a non-priority route gets the cached response
+        self.assertEqual(call_route(get_route, "/api/site_info", ""), '{"site": "fresh"}')
+        self.assertEqual(func.call_count, 2)
+        self.assertEqual(len(fetch.calls), 1)
+        self.assertEqual(self.bucket.status()["throttled"], 1)
+
+    def test_call_route_last_good_keyed_by_path(self):
+        get_route = Route("/api/site_info", lambda path, query: '{"site": 1}')
+        for query in ("ts=1", "ts=2", ""):
+            call_route(get_route, "/api/site_info", query)
+        self.assertEqual(list(server._last_good_responses), ["route:/api/site_info"])
+        # Routes that read the query keep one response per query
+        get_route = Route("/batch", lambda path, query: '{"routes": {}}', query=True)
+        call_route(get_route, "/batch", "routes=/soe")
+        call_route(get_route, "/batch", "routes=/freq")
+        self.assertIn("route:/batch?routes=/soe", server._last_good_responses)
+        self.assertIn("route:/batch?routes=/freq", server._last_good_responses)
+
+    def test_call_route_cache_key_serves_performance_entry(self):
+        fetch = request_func('{"temp": 20}')
+        powerwall = self._powerwall(fetch)
+
+        def func(path, query):
+            return cached_route_handler(
+                "/test", lambda: safe_pw_call(powerwall.client._fetch, path) or '{"temp": null}')
+        get_route = Route("/test", func, cache_key="/test")
+        with patch('proxy.server.cache_expire', 0), \
+             patch.dict('proxy.server._performance_cache', clear=True):
+            self.assertEqual(call_route(get_route, "/test", ""), '{"temp": 20}')
+            # Refused - the partial result is not cached over the last complete entry
+            self.assertEqual(call_route(get_route, "/test", ""), '{"temp": 20}')
+            self.assertEqual(server._performance_cache["/test"].data, '{"temp": 20}')
+        self.assertEqual(len(fetch.calls), 1)
+        self.assertEqual(self.bucket.status()["throttled"], 1)
+        self.assertEqual(len(server._last_good_responses), 0)
+
+    def test_call_route_priority_spends_reserve(self):
+        fetch = request_func('{"a": 1}')
+        powerwall = self._powerwall(fetch)
+        get_route = Route("/aggregates", lambda path, query: safe_pw_call(powerwall.client._fetch, path))
+        call_route(get_route, "/aggregates", "")
+        call_route(get_route, "/aggregates", "")
+        self.assertEqual(len(fetch.calls), 2)
+
+    def test_call_route_restores_thread_state(self):
+        server._response_local.priority = False
+        get_route = Route("/aggregates", lambda path, query: server._response_local.priority)
+        self.assertTrue(call_route(get_route, "/aggregates", ""))
+        self.assertFalse(server._response_local.priority)
+
+    def test_stats_report_budget(self):
+        with patch('proxy.server.pw') as mock_pw:
+            mock_pw.site_name.return_value = "Home"
+            mock_pw.cloudmode = False
+            mock_pw.fleetapi = False
+            stats = server.json.loads(server.route_stats("/stats", ""))
+        self.assertEqual(stats["rate_limit"]["burst"], 2)
+        self.assertEqual(stats["rate_limit"]["reserve"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+"""Tests for the proxy GET route registry.
+
+Covers:
+- exact routes resolve through the dict, prefix routes longest-first
+- DISABLED overrides ALLOWLIST, explicit routes override both
+- unmatched paths fall through to static/passthrough (None)
+- matching with a query string follows the former do_GET chain: only ALLOWLIST,
+  DISABLED and /batch match exactly, prefix routes still match
+- /pw/ is matched against the request target before PROXY_BASE_URL is stripped
+"""
+import json
+import unittest
+from unittest.mock import patch
+
+import proxy.server as server
+from proxy.server import Route, register_route, resolve_request, resolve_route
+from proxy.tests.test_csv_endpoints import BaseDoGetTest, common_patches
+
+
+class TestResolveRoute(unittest.TestCase):
+    """resolve_route() / register_route()"""
+
+    def test_exact_route(self):
+        self.assertIs(resolve_route("/vitals").func, server.route_vitals)
+        self.assertIs(resolve_route("/api/meters/aggregates").func, server.route_aggregates)
+
+    def test_prefix_route(self):
+        self.assertIs(resolve_route("/csv/v2").func, server.route_csv)
+        self.assertIs(resolve_route("/control/reserve").func, server.route_control_reserve)
+        self.assertIs(resolve_route("/pw/battery").func, server.route_pw)
+
+    def test_exact_beats_prefix(self):
+        self.assertIs(resolve_route("/fans").func, server.route_fans)
+        self.assertIs(resolve_route("/fans/pw").func, server.route_fans_pw)
+
+    def test_content_type(self):
+        self.assertEqual(resolve_route("/csv").content_type, "text/plain; charset=utf-8")
+        self.assertEqual(resolve_route("/help").content_type, "text/html")
+        self.assertEqual(resolve_route("/soe").content_type, "application/json")
+
+    def test_allowlist_and_disabled(self):
+        self.assertIs(resolve_route("/api/sitemaster").func, server.route_allowlist)
+        for path in server.DISABLED:
+            self.assertIs(resolve_route(path).func, server.route_disabled)
+
+    def test_explicit_route_overrides_allowlist(self):
+        self.assertIn("/api/troubleshooting/problems", server.ALLOWLIST)
+        self.assertIs(resolve_route("/api/troubleshooting/problems").func,
+                      server.route_troubleshooting_problems)
+
+    def test_unmatched_path(self):
+        self.assertIsNone(resolve_route("/index.html"))
+        self.assertIsNone(resolve_route("/viz-static/app.js"))
+
+    def test_register_replaces_existing(self):
+        with patch.dict('proxy.server._routes'), \
+             patch('proxy.server._prefix_routes', list(server._prefix_routes)):
+            register_route(Route("/vitals", server.route_version))
+            register_route(Route("/csv", server.route_version, prefix=True))
+            self.assertIs(resolve_route("/vitals").func, server.route_version)
+            self.assertIs(resolve_route("/csv/v2").func, server.route_version)
+            self.assertEqual(sum(r.path == "/csv" for r in server._prefix_routes), 1)
+
+
+class TestResolveRequest(unittest.TestCase):
+    """resolve_request() keeps the matching of the former do_GET chain."""
+
+    def test_split_path_and_query(self):
+        get_route, path, query = resolve_request("/csv/v2?headers")
+        self.assertIs(get_route.func, server.route_csv)
+        self.assertEqual((path, query), ("/csv/v2", "headers"))
+
+    def test_exact_route_with_query_falls_through(self):
+        self.assertIsNone(resolve_request("/soe?ts=1")[0])
+        self.assertIsNone(resolve_request("/aggregates?")[0])
+        self.assertIsNone(resolve_request("/fans?x=1")[0])
+
+    def test_query_routes(self):
+        self.assertIs(resolve_request("/api/sitemaster?x=1")[0].func, server.route_allowlist)
+        self.assertIs(resolve_request("/api/customer/registration?x=1")[0].func,
+                      server.route_disabled)
+        self.assertIs(resolve_request("/batch?routes=/soe")[0].func, server.route_batch)
+        # The explicit route only matches without a query string, ALLOWLIST with one
+        self.assertIs(resolve_request("/api/troubleshooting/problems?x=1")[0].func,
+                      server.route_allowlist)
+
+    def test_pw_matched_before_base_url(self):
+        self.assertIs(resolve_request("/pw/level", "/pw/level")[0].func, server.route_pw)
+        # PROXY_BASE_URL=/proxy/ - /proxy/pw/level is not a /pw/ request
+        self.assertIsNone(resolve_request("/pw/level", "/proxy/pw/level")[0])
+        self.assertIs(resolve_request("/csv", "/proxy/csv")[0].func, server.route_csv)
+
+    def test_sub_routes_ignore_query(self):
+        self.assertEqual(json.loads(server.route_pw("/pw/level", "x=1")),
+                         {"error": "Invalid Request"})
+        with patch('proxy.server.pw') as mock_pw:
+            self.assertIn("Use /tedapi/config", server.route_tedapi("/tedapi/config", "x=1"))
+            mock_pw.tedapi.get_config.assert_not_called()
+
+
+class TestRouterDispatch(BaseDoGetTest):
+    """do_GET dispatch through the registry."""
+
+    @common_patches
+    @patch('proxy.server.pw')
+    def test_exact_route_with_query_not_dispatched(self, _proxystats_lock, mock_pw):
+        mock_pw.cloudmode = True
+        mock_pw.authmode = "token"
+        with patch.object(resolve_route("/soe"), 'func') as mock_soe:
+            self.handler.path = "/soe?ts=123"
+            self.handler.do_GET()
+        mock_soe.assert_not_called()
+        self.assertEqual(self.get_written_text(), "Not Found")
+
+    @common_patches
+    def test_exact_route_without_query(self, _proxystats_lock):
+        with patch.object(resolve_route("/soe"), 'func', return_value='{"percentage": 50}'):
+            self.handler.path = "/soe"
+            self.handler.do_GET()
+        self.assertEqual(self.get_written_json(), {"percentage": 50})
+
+
+if __name__ == "__main__":
+    unittest.main()
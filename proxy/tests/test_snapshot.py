@@ -0,0 +1,150 @@
+"""Tests for the per-tick snapshot shared by /pod, /freq, /json and /csv.
+
+Covers:
+- all four routes render from one set of pypowerwall calls per tick
+- fields are fetched on first use only (/csv never fetches vitals)
+- a second render of the same route, or an expired snapshot, starts a new tick
+- the routes agree with each other within a tick
+- failed or degraded fields are not memoized, so the next reader retries
+"""
+import json
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+import proxy.server as server
+from proxy.server import TickSnapshot, tick_snapshot
+
+
+class SnapshotTestBase(unittest.TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.mock_pw = Mock()
+        self.level = 50.0
+        self.status_fails = False
+        self.calls = []
+
+        def fake_pw_call(func, *args, **kwargs):
+            self.calls.append(func)
+            if func is self.mock_pw.level:
+                return self.level
+            if func is self.mock_pw.grid_status:
+                return 1 if args == ("numeric",) else "UP"
+            if func is self.mock_pw.get_reserve:
+                return 20.0
+            if func is self.mock_pw.get_time_remaining:
+                return 10.0
+            if func is self.mock_pw.system_status:
+                return None if self.status_fails else {
+                    "nominal_full_pack_energy": 13500,
+                    "nominal_energy_remaining": 6750,
+                    "battery_blocks": [{"PackageSerialNumber": "SN001", "f_out": 60.0}],
+                }
+            if func is self.mock_pw.vitals:
+                return {"TEPINV--1": {"PINV_Fout": 59.9}, "TEPOD--1": {"POD_nom_energy_remaining": 6700}}
+            if func is self.mock_pw.strings:
+                return {"A": {"Voltage": 300}}
+            return None
+
+        aggregates = {
+            "site": {"instant_power": 100},
+            "solar": {"instant_power": 500},
+            "battery": {"instant_power": -200},
+            "load": {"instant_power": 400},
+        }
+        self.patches = [
+            patch('proxy.server.pw', self.mock_pw),
+            patch('proxy.server.safe_pw_call', side_effect=fake_pw_call),
+            patch('proxy.server.safe_endpoint_call', return_value=aggregates),
+            patch('proxy.server.prefetch_enabled', False),
+            patch('proxy.server.cache_expire', 5),
+            patch('proxy.server.neg_solar', True),
+            patch.dict('proxy.server._performance_cache', {}, clear=True),
+            patch.dict('proxy.server._tick', {"snapshot": None}),
+            patch.dict('proxy.server._tick_stats', {"snapshots": 0, "shared": 0, "retried": 0}),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        super().tearDown()
+
+    def render(self, path):
+        route = server.resolve_route(path)
+        return route.func(path, "")
+
+
+class TestTickSnapshot(SnapshotTestBase):
+
+    def test_routes_share_one_tick(self):
+        pod = json.loads(self.render("/pod"))
+        freq = json.loads(self.render("/freq"))
+        data = json.loads(self.render("/json"))
+        csv = self.render("/csv")
+        # One call per field across all four routes
+        self.assertEqual(self.calls.count(self.mock_pw.system_status), 1)
+        self.assertEqual(self.calls.count(self.mock_pw.vitals), 1)
+        self.assertEqual(self.calls.count(self.mock_pw.get_reserve), 1)
+        self.assertEqual(self.calls.count(self.mock_pw.level), 1)
+        server.safe_endpoint_call.assert_called_once()
+        self.assertEqual(server._tick_stats, {"snapshots": 1, "shared": 3, "retried": 0})
+        # ... and the routes agree
+        self.assertEqual(pod["backup_reserve_percent"], data["reserve"])
+        self.assertEqual(freq["PW1_PackageSerialNumber"], pod["PW1_PackageSerialNumber"])
+        self.assertEqual(freq["grid_status"], data["grid_status"])
+        self.assertEqual(csv, "100.00,400.00,500.00,-200.00,50.00\n")
+        self.assertEqual(data["soe"], 50.0)
+
+    def test_fields_fetched_on_first_use(self):
+        self.render("/csv")
+        self.assertNotIn(self.mock_pw.vitals, self.calls)
+        self.assertNotIn(self.mock_pw.system_status, self.calls)
+
+    def test_same_route_starts_new_tick(self):
+        self.render("/csv")
+        self.level = 75.0
+        del server._performance_cache["/csv"]
+        self.assertEqual(self.render("/csv"), "100.00,400.00,500.00,-200.00,75.00\n")
+        self.assertEqual(server._tick_stats["snapshots"], 2)
+
+    def test_expired_snapshot_replaced(self):
+        first = tick_snapshot("/pod")
+        first.timestamp = time.time() - 10
+        self.assertIsNot(tick_snapshot("/freq"), first)
+
+    def test_field_memoized(self):
+        snapshot = TickSnapshot()
+        self.assertIs(snapshot.get("blocks"), snapshot.get("blocks"))
+        self.assertEqual(snapshot.get("blocks")[0]["f_out"], 60.0)
+        self.assertIsNone(snapshot.get("blocks")[0]["p_out"])
+        self.assertEqual(self.calls, [self.mock_pw.system_status])
+
+
+    def test_failed_field_retried(self):
+        snapshot = TickSnapshot()
+        self.status_fails = True
+        self.assertEqual(snapshot.get("system_status"), {})
+        self.assertEqual(snapshot.get("blocks"), [])
+        self.status_fails = False
+        self.assertEqual(snapshot.get("blocks")[0]["f_out"], 60.0)
+        self.assertIs(snapshot.get("blocks"), snapshot.get("blocks"))
+        self.assertEqual(server._tick_stats["retried"], 3)
+
+    def test_degraded_aggregates_not_memoized(self):
+        snapshot = TickSnapshot()
+
+        def stale_aggregates(*args, **kwargs):
+            server._response_local.degraded = True
+            return {"site": {"instant_power": 1}}
+
+        with patch('proxy.server.safe_endpoint_call', side_effect=stale_aggregates):
+            self.assertEqual(snapshot.get("power")["grid"], 1)
+        self.assertEqual(snapshot.get("power")["grid"], 100)
+        self.assertIs(snapshot.get("aggregates"), snapshot.get("aggregates"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,230 @@
+"""Tests for the in-memory static asset cache (proxy/transform.StaticAssetCache).
+
+Covers:
+- assets are indexed, loaded and compressed at startup, then served from memory
+- startup loading stops at the memory cap
+- mtime changes reload the asset
+- gzip variants only for compressible types above the size threshold
+- LRU eviction under the memory cap
+- files outside web_root are never indexed
+- do_GET serves the precompressed variant when accepted
+- the rendered index.html is memoized on its inputs
+"""
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import proxy.server as server
+from proxy.server import render_index_page
+from proxy.transform import StaticAssetCache, content_type, get_static
+from proxy.tests.test_csv_endpoints import BaseDoGetTest, common_patches
+
+APP_JS = b"var powerflow = 1;\n" * 200
+
+
+def write_asset(web_root, rel, data):
+    with open(os.path.join(web_root, rel), "wb") as f:
+        f.write(data)
+
+
+def make_web_root():
+    """Temporary web root with a few assets."""
+    web_root = tempfile.mkdtemp()
+    os.makedirs(os.path.join(web_root, "viz-static"))
+    write_asset(web_root, "viz-static/app.js", APP_JS)
+    write_asset(web_root, "viz-static/logo.png", b"\x89PNG" + b"\x00" * 2000)
+    write_asset(web_root, "small.css", b"body {}")
+    return web_root
+
+
+class TestStaticAssetCache(unittest.TestCase):
+
+    def setUp(self):
+        self.web_root = make_web_root()
+
+    def tearDown(self):
+        shutil.rmtree(self.web_root)
+
+    def write(self, rel, data):
+        write_asset(self.web_root, rel, data)
+
+    def test_index_and_hit(self):
+        cache = StaticAssetCache(self.web_root)
+        self.assertEqual(cache.stats()["indexed"], 3)
+        self.assertEqual(cache.stats()["entries"], 3)
+        self.assertTrue(cache.cached("/viz-static/app.js"))
+        asset = cache.get("/viz-static/app.js?v=1")
+        self.assertEqual(asset.content, APP_JS)
+        self.assertEqual(asset.ftype, "application/javascript")
+        self.assertIs(cache.get("/viz-static/app.js"), asset)
+        self.assertEqual((cache.hits, cache.misses), (2, 0))
+
+    def test_preload_stops_at_cap(self):
+        sizes = StaticAssetCache(self.web_root)
+        cap = sizes.get("/viz-static/logo.png").nbytes() + sizes.get("/small.css").nbytes()
+        cache = StaticAssetCache(self.web_root, max_bytes=cap)
+        # app.js would exceed the cap and is skipped
+        self.assertEqual(list(cache._assets), ["/small.css", "/viz-static/logo.png"])
+        self.assertEqual(cache.evictions, 0)
+        # Not preloaded - loaded on first request, served without caching
+        self.assertEqual(cache.get("/viz-static/app.js").content, APP_JS)
+        self.assertEqual(cache.misses, 1)
+
+    def test_unknown_path(self):
+        cache = StaticAssetCache(self.web_root)
+        self.assertIsNone(cache.get("/missing.js"))
+        self.assertIsNone(cache.get("/../etc/passwd"))
+
+    def test_mtime_change_reloads(self):
+        cache = StaticAssetCache(self.web_root)
+        cache.get("/small.css")
+        self.write("small.css", b"body { color: red; }")
+        st = os.stat(os.path.join(self.web_root, "small.css"))
+        os.utime(os.path.join(self.web_root, "small.css"),
+                 ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+        self.assertEqual(cache.get("/small.css").content, b"body { color: red; }")
+
+    def test_variants(self):
+        cache = StaticAssetCache(self.web_root, compress_level=1)
+        js = cache.get("/viz-static/app.js")
+        self.assertEqual(gzip.decompress(js.variants["gzip"]), APP_JS)
+        self.assertEqual(js.variants["gzip"], gzip.compress(APP_JS, compresslevel=1, mtime=0))
+        # Already compressed image and tiny file are served as-is
+        self.assertEqual(cache.get("/viz-static/logo.png").variants, {})
+        self.assertEqual(cache.get("/small.css").variants, {})
+
+    def test_lru_eviction(self):
+        self.write("other.css", b"a{}")
+        sizes = StaticAssetCache(self.web_root)
+        cap = sizes.get("/viz-static/logo.png").nbytes() + sizes.get("/small.css").nbytes()
+        cache = StaticAssetCache(self.web_root, max_bytes=cap)
+        cache.build_index()  # Start empty
+        cache.get("/small.css")
+        cache.get("/viz-static/logo.png")
+        cache.get("/other.css")  # evicts least recently used /small.css
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(list(cache._assets), ["/viz-static/logo.png", "/other.css"])
+        self.assertLessEqual(cache.stats()["size_bytes"], cap)
+        # Larger than the whole cap - served but never cached
+        self.assertEqual(cache.get("/viz-static/app.js").content, APP_JS)
+        self.assertNotIn("/viz-static/app.js", cache._assets)
+
+    def test_symlink_outside_root_not_indexed(self):
+        outside = tempfile.NamedTemporaryFile(delete=False)
+        outside.close()
+        try:
+            os.symlink(outside.name, os.path.join(self.web_root, "leak.txt"))
+            cache = StaticAssetCache(self.web_root)
+            self.assertIsNone(cache.get("/leak.txt"))
+        finally:
+            os.unlink(outside.name)
+
+    def test_content_type_matches_get_static(self):
+        self.assertEqual(content_type("A.JS"), "application/javascript")
+        self.assertEqual(content_type("LICENSE"), "text/plain")
+        _, ftype = get_static(self.web_root, "/viz-static/logo.png")
+        self.assertEqual(ftype, "image/png")
+
+
+class TestStaticDoGet(BaseDoGetTest):
+    """do_GET serves cached static assets and their precompressed variants."""
+
+    def setUp(self):
+        super().setUp()
+        self.web_root = make_web_root()
+        self.cache = StaticAssetCache(self.web_root)
+
+    def tearDown(self):
+        shutil.rmtree(self.web_root)
+
+    def get_sent_headers(self):
+        return {c[0][0]: c[0][1] for c in self.handler.send_header.call_args_list}
+
+    @common_patches
+    @patch('proxy.server.pw')
+    def test_gzip_variant_served(self, _proxystats_lock, mock_pw):
+        mock_pw.authmode = "token"
+        self.handler.headers = {"Accept-Encoding": "gzip, deflate"}
+        self.handler.path = "/viz-static/app.js"
+        with patch('proxy.server.static_assets', self.cache):
+            self.handler.do_GET()
+        headers = self.get_sent_headers()
+        self.assertEqual(headers["Content-Encoding"], "gzip")
+        self.assertEqual(headers["Vary"], "Accept-Encoding")
+        written = self.handler.wfile.write.call_args[0][0]
+        self.assertEqual(gzip.decompress(written), APP_JS)
+
+    @common_patches
+    @patch('proxy.server.pw')
+    def test_identity_served(self, _proxystats_lock, mock_pw):
+        mock_pw.authmode = "token"
+        self.handler.path = "/viz-static/app.js"
+        with patch('proxy.server.static_assets', self.cache):
+            self.handler.do_GET()
+        self.assertNotIn("Content-Encoding", self.get_sent_headers())
+        self.assertEqual(self.handler.wfile.write.call_args[0][0], APP_JS)
+
+
+class TestIndexPage(unittest.TestCase):
+    """render_index_page() memoizes the substituted page."""
+
+    TEMPLATE = (b"<html><body>{VERSION} {HASH} {STYLE} {ASSET_PREFIX} "
+                b"{API_BASE_URL}</body></html>")
+
+    def setUp(self):
+        self.web_root = make_web_root()
+        write_asset(self.web_root, "index.html", self.TEMPLATE)
+        self.patches = [
+            patch('proxy.server.web_root', self.web_root),
+            patch('proxy.server.style', "clear.js"),
+            patch('proxy.server.api_base_url', "/"),
+            patch.dict('proxy.server._index_page',
+                       {"key": None, "content": None, "renders": 0, "hits": 0}),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        shutil.rmtree(self.web_root)
+
+    def test_substitutions(self):
+        page, ftype = render_index_page({"version": "25.10.1", "git_hash": "abc"})
+        self.assertEqual(ftype, "text/html")
+        self.assertEqual(
+            page,
+            b"<html><body>25.10.1 abc /viz-static/clear.js /viz-static/ /api</body></html>",
+        )
+
+    def test_memoized_until_inputs_change(self):
+        status = {"version": "25.10.1", "git_hash": "abc"}
+        with patch('proxy.server.get_static', wraps=server.get_static) as mock_get_static:
+            first, _ = render_index_page(status)
+            self.assertIs(render_index_page(dict(status))[0], first)
+            self.assertEqual(mock_get_static.call_count, 1)
+            # Firmware upgrade re-renders
+            upgraded, _ = render_index_page({"version": "25.12.0", "git_hash": "def"})
+            self.assertIn(b"25.12.0", upgraded)
+            with patch('proxy.server.style', "black.js"):
+                self.assertIn(b"black.js", render_index_page(status)[0])
+            self.assertEqual(mock_get_static.call_count, 3)
+        self.assertEqual(server._index_page["hits"], 1)
+
+    def test_missing_status_fields(self):
+        page, _ = render_index_page({"version": None})
+        self.assertTrue(page.startswith(b"<html><body>  /viz-static/"))
+
+    def test_style_injection_memoized(self):
+        write_asset(self.web_root, "clear.js", b"")
+        with patch('proxy.server.inject_js', return_value="<html></html>") as mock_inject:
+            render_index_page({})
+            render_index_page({})
+        mock_inject.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,248 @@
+"""Tests for the Server-Sent Events endpoints (/stream/aggregates, /stream/vitals).
+
+Covers:
+- events are serialized once and only published when the snapshot changes
+- subscribers receive the latest event, then only newer ones
+- Last-Event-ID skips the event a reconnecting client already has
+- the threaded handler and the asyncio engine stream over real sockets
+- subscribers beyond PW_STREAM_MAX_CLIENTS are rejected with 503
+"""
+import asyncio
+import http.client
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import proxy.server as server
+from proxy.server import (
+    Handler,
+    ThreadingHTTPServer,
+    _CacheEntry,
+    publish_stream_event,
+    refresh_streams,
+    start_async_server,
+    stream_start_seq,
+    subscribe_stream,
+    unsubscribe_stream,
+    wait_stream_event,
+)
+
+
+def fresh_streams():
+    return {
+        route_path: {"seq": 0, "id": None, "event": None, "subscribers": 0}
+        for route_path in server.STREAM_ROUTES.values()
+    }
+
+
+class StreamTestBase(unittest.TestCase):
+    """Fresh stream state; the stream thread is never started - tests call refresh_streams()."""
+
+    def setUp(self):
+        super().setUp()
+        self.aggregates = '{"site": {"instant_power": 100}}'
+        self.patches = [
+            patch('proxy.server.api_base_url', ''),
+            patch('proxy.server._stream_thread', object()),
+            patch('proxy.server.stream_max_clients', 2),
+            patch.dict('proxy.server._streams', fresh_streams()),
+            patch.dict('proxy.server._stream_stats', {"events": 0, "unchanged": 0, "rejected": 0}),
+            patch('proxy.server._stream_async_waiters', set()),
+            patch.dict('proxy.server._performance_cache', {}, clear=True),
+            patch.object(server.resolve_route("/aggregates"), 'func',
+                         side_effect=lambda path, query: self.aggregates),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        super().tearDown()
+
+    def wait_for_subscribers(self, count):
+        deadline = time.time() + 5
+        while server._streams["/aggregates"]["subscribers"] != count and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(server._streams["/aggregates"]["subscribers"], count)
+
+
+class TestStreamHub(StreamTestBase):
+
+    def test_publish_only_on_change(self):
+        entry = _CacheEntry('{"a": 1}', time.time())
+        self.assertTrue(publish_stream_event("/aggregates", entry))
+        self.assertFalse(publish_stream_event("/aggregates", _CacheEntry('{"a": 1}', time.time())))
+        self.assertEqual(server._stream_stats, {"events": 1, "unchanged": 1, "rejected": 0})
+        event = server._streams["/aggregates"]["event"]
+        self.assertEqual(
+            event,
+            b"event: aggregates\nid: %s\ndata: {\"a\": 1}\n\n" % entry.etag.strip('"').encode(),
+        )
+
+    def test_multiline_payload(self):
+        publish_stream_event("/vitals", _CacheEntry('{\n"a": 1\n}', time.time()))
+        self.assertTrue(server._streams["/vitals"]["event"].endswith(b"data: {\ndata: \"a\": 1\ndata: }\n\n"))
+
+    def test_wait_for_newer_event(self):
+        self.assertEqual(wait_stream_event("/aggregates", 0, 0.01), (0, None))
+        publish_stream_event("/aggregates", _CacheEntry('{"a": 1}', time.time()))
+        seq, event = wait_stream_event("/aggregates", 0, 0.01)
+        self.assertEqual(seq, 1)
+        self.assertIn(b'data: {"a": 1}', event)
+        self.assertEqual(wait_stream_event("/aggregates", seq, 0.01), (1, None))
+
+    def test_refresh_only_active_routes(self):
+        refresh_streams()
+        self.assertEqual(server._stream_stats["events"], 0)
+        self.assertTrue(subscribe_stream("/aggregates"))
+        refresh_streams()
+        refresh_streams()  # unchanged snapshot
+        self.assertEqual(server._stream_stats["events"], 1)
+        self.assertEqual(server._stream_stats["unchanged"], 1)
+        unsubscribe_stream("/aggregates")
+
+    def test_refresh_reuses_cache_entry(self):
+        server.cache_performance_response("/aggregates", self.aggregates)
+        self.aggregates = server._performance_cache["/aggregates"].data
+        subscribe_stream("/aggregates")
+        refresh_streams()
+        unsubscribe_stream("/aggregates")
+        self.assertEqual(server._streams["/aggregates"]["id"],
+                         server._performance_cache["/aggregates"].etag.strip('"'))
+
+    def test_last_event_id(self):
+        publish_stream_event("/aggregates", _CacheEntry('{"a": 1}', time.time()))
+        current = server._streams["/aggregates"]["id"]
+        self.assertEqual(stream_start_seq("/aggregates", current), 1)
+        self.assertEqual(stream_start_seq("/aggregates", "stale"), 0)
+        self.assertEqual(stream_start_seq("/aggregates", None), 0)
+
+    def test_closed_loop_waiter_dropped(self):
+        loop = asyncio.new_event_loop()
+        loop.close()
+        server._stream_async_waiters.add((loop, asyncio.Event()))
+        publish_stream_event("/aggregates", _CacheEntry('{"a": 1}', time.time()))
+        self.assertEqual(server._stream_async_waiters, set())
+
+    def test_client_cap(self):
+        self.assertTrue(subscribe_stream("/aggregates"))
+        self.assertTrue(subscribe_stream("/vitals"))
+        self.assertFalse(subscribe_stream("/aggregates"))
+        self.assertEqual(server._stream_stats["rejected"], 1)
+
+
+class StreamSocketTests:
+    """Shared real-socket tests - subclasses provide self.port."""
+
+    def open_stream(self, path="/stream/aggregates"):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        conn.request("GET", path)
+        response = conn.getresponse()
+        self.addCleanup(conn.close)
+        return response
+
+    def read_event(self, response):
+        lines = []
+        while True:
+            line = response.fp.readline()
+            if line == b"\n":
+                if lines:
+                    return b"".join(lines)
+                continue
+            lines.append(line)
+
+    def test_stream_pushes_changes(self):
+        response = self.open_stream()
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.getheader("Content-type"), "text/event-stream")
+        self.assertEqual(self.read_event(response), b"retry: 3000\n")
+        self.wait_for_subscribers(1)
+        refresh_streams()
+        self.assertIn(b'data: {"site": {"instant_power": 100}}', self.read_event(response))
+        self.aggregates = '{"site": {"instant_power": 250}}'
+        refresh_streams()
+        self.assertIn(b'data: {"site": {"instant_power": 250}}', self.read_event(response))
+
+    def test_new_subscriber_gets_latest(self):
+        publish_stream_event("/aggregates", _CacheEntry(self.aggregates, time.time()))
+        response = self.open_stream()
+        self.read_event(response)  # retry
+        self.assertIn(b"event: aggregates", self.read_event(response))
+
+    def test_over_cap_rejected(self):
+        with patch('proxy.server.stream_max_clients', 0):
+            response = self.open_stream()
+            self.assertEqual(response.status, 503)
+            self.assertIn(b"Too many stream clients", response.read())
+
+    def test_disconnect_unsubscribes(self):
+        response = self.open_stream()
+        self.read_event(response)
+        self.wait_for_subscribers(1)
+        response.close()
+        # The handler notices on its next write
+        with patch('proxy.server.STREAM_HEARTBEAT', 0.05):
+            for _ in range(3):
+                publish_stream_event("/aggregates", _CacheEntry(str(time.time()), time.time()))
+                time.sleep(0.05)
+            self.wait_for_subscribers(0)
+
+
+class TestThreadedStream(StreamSocketTests, StreamTestBase):
+
+    def setUp(self):
+        super().setUp()
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        self.port = self.httpd.server_address[1]
+
+    def tearDown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        super().tearDown()
+
+
+class TestAsyncStream(StreamSocketTests, StreamTestBase):
+
+    def setUp(self):
+        super().setUp()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.async_server = asyncio.run_coroutine_threadsafe(
+            start_async_server("127.0.0.1", 0, self.executor), self.loop
+        ).result(5)
+        self.port = self.async_server.sockets[0].getsockname()[1]
+
+    def tearDown(self):
+        self.async_server.close()
+        asyncio.run_coroutine_threadsafe(self.async_server.wait_closed(), self.loop).result(5)
+        asyncio.run_coroutine_threadsafe(self.cancel_streams(), self.loop).result(5)
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(5)
+        self.loop.close()
+        self.executor.shutdown()
+        super().tearDown()
+
+    @staticmethod
+    async def cancel_streams():
+        """Streams only end on a failed write - cancel the ones still open."""
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def test_no_executor_thread_used(self):
+        with patch('proxy.server._run_handler') as mock_run:
+            response = self.open_stream()
+            self.read_event(response)
+        mock_run.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,201 @@
+"""Tests for warm restart snapshots (PW_WARM_RESTART=yes).
+
+Covers:
+- save_warm_snapshot() / load_warm_snapshot() / restore_warm_snapshot() round trip
+- old, corrupt and other-version files are ignored
+- cached_route_handler() serves restored snapshots until the backend connects
+- WarmStartPowerwall answers every call with None, DIN and config from the file
+- restored data is dropped after PW_WARM_RESTART_MAX_AGE and responses are flagged
+"""
+import gzip
+import json
+import os
+import stat
+import tempfile
+import threading
+import time
+import unittest
+from collections import OrderedDict
+from unittest.mock import Mock, patch
+
+import proxy.server as server
+from proxy.server import (
+    WarmStartPowerwall,
+    _CacheEntry,
+    cached_route_handler,
+    load_warm_snapshot,
+    restore_warm_snapshot,
+    save_warm_snapshot,
+)
+
+
+class WarmRestartTestBase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, ".powerwall.warm")
+        self.patches = [
+            patch('proxy.server.graceful_degradation', True),
+            patch('proxy.server.degradation_cache_ttl_seconds', 30),
+            patch('proxy.server.cache_max_bytes', 0),
+            patch('proxy.server._last_good_responses', OrderedDict()),
+            patch.dict('proxy.server._degradation_cache_stats',
+                       {"bytes": 0, "evictions": 0, "expired": 0}),
+            patch.dict('proxy.server._performance_cache', {}, clear=True),
+            patch('proxy.server.pw', Mock(tedapi=None)),
+            patch('proxy.server._warm_saved', time.time() - 1),
+            patch('proxy.server.warm_restart_max_age', 30),
+            patch.dict('proxy.server._warm_stats', {"served": 0, "expired": False}),
+        ]
+        for p in self.patches:
+            p.start()
+
+    def tearDown(self):
+        for p in reversed(self.patches):
+            p.stop()
+        self.tmpdir.cleanup()
+
+
+class TestWarmSnapshotFile(WarmRestartTestBase):
+
+    def test_round_trip_keeps_timestamps(self):
+        filled = time.time() - 4
+        server.cache_response("/aggregates", {"site": {"instant_power": 10}})
+        server._performance_cache["/pod"] = _CacheEntry('{"PW1_soe": 50}', filled)
+        self.assertGreater(save_warm_snapshot(self.path), 0)
+
+        server._last_good_responses.clear()
+        server._degradation_cache_stats["bytes"] = 0
+        server._performance_cache.clear()
+        snapshot = load_warm_snapshot(self.path)
+        self.assertEqual(restore_warm_snapshot(snapshot), 2)
+        self.assertEqual(server.get_cached_response("/aggregates"), {"site": {"instant_power": 10}})
+        self.assertEqual(server._performance_cache["/pod"].data, '{"PW1_soe": 50}')
+        self.assertAlmostEqual(server._performance_cache["/pod"].timestamp, filled, places=3)
+
+    def test_file_is_private_and_written_atomically(self):
+        save_warm_snapshot(self.path)
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+        self.assertFalse(os.path.exists(self.path + ".tmp"))
+
+    def test_unserializable_entries_skipped(self):
+        server.cache_response("/bad", {"raw": b"\x00"})
+        server.cache_response("/good", {"ok": 1})
+        save_warm_snapshot(self.path)
+        endpoints = [item[0] for item in load_warm_snapshot(self.path)["degradation"]]
+        self.assertEqual(endpoints, ["/good"])
+
+    def test_tedapi_din_and_config_saved(self):
+        tedapi = Mock(din="1232100-00-E--TG123", pw3=True, pwcache={"config": {"vin": "x"}})
+        with patch('proxy.server.pw', Mock(tedapi=tedapi)):
+            save_warm_snapshot(self.path)
+        saved = load_warm_snapshot(self.path)["tedapi"]
+        self.assertEqual(saved, {"din": "1232100-00-E--TG123", "pw3": True, "config": {"vin": "x"}})
+
+    def test_old_snapshot_ignored(self):
+        save_warm_snapshot(self.path)
+        with patch('proxy.server.time.time', return_value=time.time() + 60):
+            self.assertIsNone(load_warm_snapshot(self.path))
+
+    def test_expired_entries_not_restored(self):
+        snapshot = {"degradation": [["/soe", '{"percentage": 50}', time.time() - 60]],
+                    "performance": [["/pod", "{}", time.time() - 60]]}
+        self.assertEqual(restore_warm_snapshot(snapshot), 0)
+
+    def test_corrupt_and_foreign_files_ignored(self):
+        with open(self.path, "wb") as f:
+            f.write(b"not gzip")
+        self.assertIsNone(load_warm_snapshot(self.path))
+        with open(self.path, "wb") as f:
+            f.write(gzip.compress(json.dumps({"version": 99, "saved": time.time()}).encode()))
+        self.assertIsNone(load_warm_snapshot(self.path))
+        self.assertIsNone(load_warm_snapshot(self.path + ".missing"))
+
+
+class TestWarmStart(WarmRestartTestBase):
+
+    def test_restored_snapshot_served_while_connecting(self):
+        server._performance_cache["/freq"] = _CacheEntry('{"f": 60}', time.time() - 20)
+        generator = Mock(return_value='{"f": 0}')
+        with patch('proxy.server._backend_ready', threading.Event()):
+            self.assertEqual(cached_route_handler("/freq", generator), '{"f": 60}')
+        generator.assert_not_called()
+        # Once connected, entries past PW_CACHE_EXPIRE are regenerated as usual
+        self.assertEqual(cached_route_handler("/freq", generator), '{"f": 0}')
+
+    def test_stand_in_backend(self):
+        stand_in = WarmStartPowerwall({
+            "tedapi_mode": "full",
+            "tedapi": {"din": "1232100-00-E--TG123", "pw3": False, "config": {"vin": "x"}},
+        })
+        with patch('proxy.server._backend_ready', threading.Event()):
+            self.assertIsNone(stand_in.poll("/api/meters/aggregates"))
+            self.assertIsNone(stand_in.level())
+            self.assertEqual(stand_in.din(), "1232100-00-E--TG123")
+            self.assertEqual(stand_in.tedapi.get_config(), {"vin": "x"})
+            self.assertIsNone(stand_in.tedapi.get_status())
+            self.assertIsNone(stand_in.client)
+            self.assertFalse(stand_in.cloudmode)
+            # Past PW_WARM_RESTART_MAX_AGE the snapshot is no longer served
+            with patch('proxy.server.warm_restart_max_age', 0):
+                self.assertIsNone(stand_in.din())
+                self.assertIsNone(stand_in.tedapi.get_config())
+
+    def test_warm_restart_age(self):
+        with patch('proxy.server._backend_ready', threading.Event()):
+            self.assertAlmostEqual(server.warm_restart_age(), 1, delta=0.5)
+            with patch('proxy.server.warm_restart_max_age', 1):
+                self.assertIsNone(server.warm_restart_age())
+        # Connected - not serving the snapshot
+        self.assertIsNone(server.warm_restart_age())
+
+    def test_expiry_drops_restored_entries(self):
+        saved = server._warm_saved
+        server._last_good_responses["/soe:json"] = ('{"percentage": 50}', saved - 5, 50)
+        server._degradation_cache_stats["bytes"] = 50
+        server._performance_cache["/freq"] = _CacheEntry('{"f": 60}', saved - 5)
+        server._performance_cache["/pod"] = _CacheEntry('{"p": 1}', saved + 0.5)
+        with patch('proxy.server._backend_ready', threading.Event()):
+            server.expire_warm_restart()
+            self.assertIsNone(server.safe_endpoint_call("/soe", Mock(return_value=None)))
+        self.assertEqual(list(server._performance_cache), ["/pod"])
+        self.assertEqual(server._degradation_cache_stats["bytes"], 0)
+        self.assertTrue(server._warm_stats["expired"])
+
+    def test_expiry_after_connect_keeps_entries(self):
+        server._performance_cache["/freq"] = _CacheEntry('{"f": 60}', server._warm_saved - 5)
+        server.expire_warm_restart()
+        self.assertIn("/freq", server._performance_cache)
+        self.assertFalse(server._warm_stats["expired"])
+
+    def test_responses_flagged_while_serving_snapshot(self):
+        handler = server.Handler.__new__(server.Handler)
+        handler.headers = {}
+        handler.send_response = Mock()
+        handler.send_header = Mock()
+        handler.end_headers = Mock()
+        handler.wfile = Mock()
+        with patch('proxy.server._backend_ready', threading.Event()):
+            handler.send_api_response('{"f": 60}', "application/json")
+        headers = dict(call.args for call in handler.send_header.call_args_list)
+        self.assertEqual(headers["X-Warm-Restart"], "1")
+        self.assertEqual(server._warm_stats["served"], 1)
+        handler.send_header.reset_mock()
+        handler.send_api_response('{"f": 60}', "application/json")
+        self.assertNotIn("X-Warm-Restart", dict(call.args for call in handler.send_header.call_args_list))
+
+    def test_degradation_cache_answers_during_connect(self):
+        server._last_good_responses["/soe:json"] = ('{"percentage": 50}', time.time() - 5, 50)
+        with patch('proxy.server.pw', WarmStartPowerwall({})):
+            result = server.safe_endpoint_call("/soe", server.pw.poll, "/api/system_status/soe")
+        self.assertEqual(result, '{"percentage": 50}')
+
+    def test_null_poll_does_not_replace_restored_entry(self):
+        server._last_good_responses["/soe:json"] = ('{"percentage": 50}', time.time() - 5, 50)
+        result = server.safe_endpoint_call("/soe", Mock(return_value="null"), "/api/system_status/soe")
+        self.assertEqual(result, '{"percentage": 50}')
+        self.assertEqual(server._last_good_responses["/soe:json"][0], '{"percentage": 50}')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+"""Tests for the bounded worker pool (PW_MAX_WORKERS).
+
+Covers:
+- requests are served by the fixed pool
+- connections beyond the queue are shed with 503 + Retry-After
+- pool status is reported in /stats and /health
+"""
+import http.client
+import threading
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+import proxy.server as server
+from proxy.server import Handler, WorkerPoolHTTPServer
+from proxy.tests.test_csv_endpoints import BaseDoGetTest, standard_test_patches
+
+
+class TestWorkerPool(unittest.TestCase):
+    """Real sockets against a one-worker pool with a one-slot queue."""
+
+    def setUp(self):
+        self.release = threading.Event()
+
+        def slow_version(path, query):
+            self.release.wait(5)
+            return '{"version": "25.10.1"}'
+
+        self.route_patch = patch.object(server.resolve_route("/version"), 'func', slow_version)
+        self.route_patch.start()
+        self.httpd = WorkerPoolHTTPServer(("127.0.0.1", 0), Handler, 1, 1)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+        self.port = self.httpd.server_address[1]
+
+    def tearDown(self):
+        self.release.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.route_patch.stop()
+
+    def start_request(self):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        conn.request("GET", "/version")
+        return conn
+
+    def wait_for(self, key, value):
+        deadline = time.time() + 5
+        while self.httpd.pool_status()[key] != value and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(self.httpd.pool_status()[key], value)
+
+    def test_overflow_is_shed_with_503(self):
+        busy = self.start_request()
+        self.wait_for("busy", 1)
+        queued = self.start_request()
+        self.wait_for("queue_depth", 1)
+
+        shed = self.start_request()
+        response = shed.getresponse()
+        self.assertEqual(response.status, 503)
+        self.assertEqual(response.getheader("Retry-After"), "1")
+        self.assertIn(b"overloaded", response.read())
+        self.assertEqual(self.httpd.pool_status()["shed"], 1)
+
+        # Busy and queued requests still complete once the gateway answers
+        self.release.set()
+        for conn in (busy, queued):
+            response = conn.getresponse()
+            self.assertEqual(response.status, 200)
+            self.assertEqual(response.read(), b'{"version": "25.10.1"}')
+            conn.close()
+        shed.close()
+        self.wait_for("handled", 2)
+        status = self.httpd.pool_status()
+        self.assertEqual(status["workers"], 1)
+        self.assertEqual(status["peak_queue_depth"], 1)
+
+
+class TestWorkerPoolStatus(BaseDoGetTest):
+    """/health reports the worker pool when one is active."""
+
+    def test_health_includes_worker_pool(self):
+        pool = Mock()
+        pool.pool_status.return_value = {"workers": 4, "queue_depth": 2, "shed": 7}
+        with standard_test_patches(), \
+             patch('proxy.server.worker_pool', pool), \
+             patch('proxy.server.pw') as mock_pw, \
+             patch('proxy.server.get_transport_health', return_value={}):
+            mock_pw.cloudmode = False
+            mock_pw.fleetapi = False
+            self.handler.path = "/health"
+            self.handler.do_GET()
+        self.assertEqual(self.get_written_json()["worker_pool"]["shed"], 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,211 @@
+"""Tests for multi-process workers sharing one gateway poller (PW_WORKERS).
+
+Covers:
+- SharedSnapshots publish / read round trip through the shared mmap
+- readers keep the previous generation while a publish is in progress
+- publish_worker_snapshots() only publishes fresh entries of registered routes
+- WorkerProcesses request and per-URI counters, merged into /stats
+- the poller reports the client address of relayed requests
+- WorkerProcesses launcher process forking and stopping the workers
+- create_server(reuse_port=True) lets several servers accept on one port
+"""
+import os
+import signal
+import socket
+import time
+import unittest
+from unittest.mock import patch
+
+from proxy.server import (
+    SharedSnapshots,
+    WorkerProcesses,
+    Handler,
+    _CacheEntry,
+    create_server,
+    proxystats,
+    proxystats_with_workers,
+    publish_worker_snapshots,
+)
+
+
+class TestSharedSnapshots(unittest.TestCase):
+
+    def test_round_trip(self):
+        shared = SharedSnapshots(4096)
+        self.assertEqual(shared.entries(), {})
+        now = time.time()
+        self.assertGreater(shared.publish({"/freq": ('{"f": 60}', now)}), 0)
+        entry = shared.get("/freq", 5)
+        self.assertEqual(entry.data, '{"f": 60}')
+        self.assertEqual(entry.timestamp, now)
+        self.assertEqual(entry.etag, _CacheEntry('{"f": 60}', now).etag)
+        self.assertIsNone(shared.get("/pod", 5))
+
+    def test_expired_entry_not_served(self):
+        shared = SharedSnapshots(4096)
+        shared.publish({"/freq": ('{"f": 60}', time.time() - 10)})
+        self.assertIsNone(shared.get("/freq", 5))
+
+    def test_unchanged_entries_reused(self):
+        shared = SharedSnapshots(4096)
+        now = time.time()
+        shared.publish({"/freq": ("{}", now), "/pod": ("{}", now)})
+        freq = shared.get("/freq", 5)
+        shared.publish({"/freq": ("{}", now), "/pod": ('{"a": 1}', now + 1)})
+        self.assertIs(shared.get("/freq", 5), freq)
+        self.assertEqual(shared.get("/pod", 5).data, '{"a": 1}')
+        self.assertEqual(shared.status()["generation"], 4)
+
+    def test_publish_in_progress_serves_previous_generation(self):
+        shared = SharedSnapshots(4096)
+        shared.publish({"/freq": ("{}", time.time())})
+        shared.get("/freq", 5)
+        # Writer stopped half way: odd generation, payload overwritten
+        SharedSnapshots.HEADER.pack_into(shared._map, 0, 3, 0)
+        shared._map[16:20] = b"junk"
+        with patch('proxy.server.time.sleep'):
+            self.assertEqual(shared.get("/freq", 5).data, "{}")
+
+    def test_oversize_payload_not_published(self):
+        shared = SharedSnapshots(64)
+        self.assertIsNone(shared.publish({"/vitals": ("x" * 100, time.time())}))
+        self.assertEqual(shared.status()["oversize"], 1)
+        self.assertEqual(shared.entries(), {})
+
+
+class TestPublishWorkerSnapshots(unittest.TestCase):
+
+    def test_only_fresh_route_entries_published(self):
+        shared = SharedSnapshots(4096)
+        now = time.time()
+        cache = {
+            "/freq": _CacheEntry('{"f": 60}', now),
+            "/pod": _CacheEntry("{}", now - 60),
+            "batch:/freq,/pod": _CacheEntry("{}", now),
+        }
+        with patch('proxy.server.shared_snapshots', shared), \
+                patch.dict('proxy.server._performance_cache', cache, clear=True):
+            publish_worker_snapshots()
+        self.assertEqual(list(shared.entries()), ["/freq"])
+
+
+class TestWorkerProcesses(unittest.TestCase):
+
+    def test_counters(self):
+        processes = WorkerProcesses(2, target=None)
+        processes.count_request(0, relayed=False)
+        processes.count_request(0, relayed=False)
+        processes.count_request(1, relayed=True)
+        status = processes.status()
+        self.assertEqual(status["served"], 2)
+        self.assertEqual(status["relayed"], 1)
+        self.assertEqual([p["relayed"] for p in status["processes"]], [0, 1])
+
+    def test_uri_counters(self):
+        processes = WorkerProcesses(2, target=None, uris=["/aggregates", "/pod"])
+        processes.count_request(0, relayed=False, uri="/aggregates")
+        processes.count_request(1, relayed=False, uri="/aggregates")
+        processes.count_request(1, relayed=False, uri="/csv")
+        self.assertEqual(processes.uri_counts(), {"/aggregates": 2})
+        self.assertEqual(processes.status()["served"], 3)
+        processes.clear_uri_counts()
+        processes.count_request(0, relayed=False, uri="/pod")
+        self.assertEqual(processes.uri_counts(), {"/pod": 1})
+
+    def test_stats_include_worker_requests(self):
+        processes = WorkerProcesses(1, target=None, uris=["/aggregates"])
+        processes.count_request(0, relayed=False, uri="/aggregates")
+        with patch('proxy.server.worker_processes', processes), \
+                patch.dict('proxy.server.proxystats', {"gets": 5, "uri": {"/aggregates": 1, "/api/status": 4}}):
+            stats = proxystats_with_workers()
+            self.assertEqual(stats["gets"], 6)
+            self.assertEqual(stats["uri"], {"/aggregates": 2, "/api/status": 4})
+            # proxystats itself only counts the poller's requests
+            self.assertEqual(proxystats["uri"]["/aggregates"], 1)
+
+    def test_stop_ignores_missing_processes(self):
+        processes = WorkerProcesses(1, target=None)
+        processes.stop()
+        self.assertTrue(processes.stopping)
+
+    @unittest.skipUnless(hasattr(os, "fork"), "os.fork() not available")
+    def test_launcher_forks_and_stops_workers(self):
+        processes = WorkerProcesses(2, target=lambda slot, poller_port: _sleeping_worker(processes))
+        processes.start()
+        try:
+            processes.serve(8675)
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline and None in [p["pid"] for p in processes.status()["processes"]]:
+                time.sleep(0.01)
+            pids = [p["pid"] for p in processes.status()["processes"]]
+            self.assertNotIn(None, pids)
+        finally:
+            processes.stop()
+        # The launcher exited and took its workers with it
+        with self.assertRaises(ChildProcessError):
+            os.waitpid(processes.launcher, os.WNOHANG)
+        for pid in pids:
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline and _alive(pid):
+                time.sleep(0.01)
+            self.assertFalse(_alive(pid))
+
+
+def _sleeping_worker(processes):
+    # Die on SIGTERM without running Python code (the test process has threads whose
+    # locks a forked worker must not touch) or, like run_worker, once the launcher is gone
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    deadline = time.monotonic() + 30
+    while os.getppid() == processes.launcher and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def _alive(pid):
+    """True while pid runs - an exited worker may linger as a zombie until init reaps it."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except OSError:
+        pass
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    return True
+
+
+class TestRelayedClientAddress(unittest.TestCase):
+
+    def _handler(self, client, forwarded):
+        handler = Handler.__new__(Handler)
+        handler.client_address = (client, 50000)
+        handler.headers = {"X-Forwarded-For": forwarded} if forwarded else {}
+        return handler
+
+    def test_poller_reports_forwarded_client(self):
+        with patch('proxy.server._poller_port', 40000), patch('proxy.server._worker_slot', None):
+            self.assertEqual(self._handler("127.0.0.1", "10.0.0.7").address_string(), "10.0.0.7")
+            self.assertEqual(self._handler("127.0.0.1", None).address_string(), "127.0.0.1")
+            # Only loopback relays are trusted
+            self.assertEqual(self._handler("10.0.0.8", "10.0.0.7").address_string(), "10.0.0.8")
+
+    def test_header_ignored_without_workers(self):
+        with patch('proxy.server._poller_port', None):
+            self.assertEqual(self._handler("127.0.0.1", "10.0.0.7").address_string(), "127.0.0.1")
+
+
+@unittest.skipUnless(hasattr(socket, "SO_REUSEPORT"), "SO_REUSEPORT not available")
+class TestReusePort(unittest.TestCase):
+
+    def test_servers_share_port(self):
+        with patch('proxy.server.max_workers', 0):
+            first = create_server(("127.0.0.1", 0), reuse_port=True)
+            try:
+                second = create_server(("127.0.0.1", first.server_address[1]), reuse_port=True)
+                second.server_close()
+            finally:
+                first.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,16 @@
+import gzip
 import os
 import logging
+import threading
+from collections import OrderedDict
 
 from bs4 import BeautifulSoup as Soup
 
+try:
+    import brotli  # Optional - adds "br" precompressed static asset variants
+except ImportError:
+    brotli = None
+
 logging.basicConfig(
     format="%(asctime)s [%(name)s] [%(levelname)s] %(message)s",
     datefmt="%m/%d/%Y %I:%M:%S %p",
@@ -14,6 +22,43 @@ else:
     logger.setLevel(logging.INFO)
 
 
+CONTENT_TYPES = {
+    ".js": "application/javascript",
+    ".css": "text/css",
+    ".png": "image/png",
+    ".html": "text/html",
+    ".otf": "font/opentype",
+    ".woff": "font/woff",
+    ".woff2": "font/woff2",
+    ".ttf": "font/ttf",
+    ".svg": "image/svg+xml",
+    ".eot": "application/vnd.ms-fontobject",
+    ".json": "application/json",
+    ".xml": "application/xml",
+}
+
+# Content types worth precompressing (images and woff/woff2 are already compressed)
+COMPRESSIBLE_TYPES = {
+    "application/javascript",
+    "text/css",
+    "text/html",
+    "font/opentype",
+    "font/ttf",
+    "image/svg+xml",
+    "application/vnd.ms-fontobject",
+    "application/json",
+    "application/xml",
+    "text/plain",
+}
+
+# Files smaller than this are served uncompressed - not worth the variant overhead
+COMPRESS_MIN_BYTES = 1024
+
+
+def content_type(fpath):
+    return CONTENT_TYPES.get(os.path.splitext(fpath)[1].lower(), "text/plain")
+
+
 def get_static(web_root, fpath):
     if fpath.split("?")[0] == "/":
         fpath = "index.html"
@@ -29,39 +74,162 @@ def get_static(web_root, fpath):
         return None, None
 
     if os.path.exists(freq):
-        if freq.lower().endswith(".js"):
-            ftype = "application/javascript"
-        elif freq.lower().endswith(".css"):
-            ftype = "text/css"
-        elif freq.lower().endswith(".png"):
-            ftype = "image/png"
-        elif freq.lower().endswith(".html"):
-            ftype = "text/html"
-        elif freq.lower().endswith(".otf"):
-            ftype = "font/opentype"
-        elif freq.lower().endswith(".woff"):
-            ftype = "font/woff"
-        elif freq.lower().endswith(".woff2"):
-            ftype = "font/woff2"
-        elif freq.lower().endswith(".ttf"):
-            ftype = "font/ttf"
-        elif freq.lower().endswith(".svg"):
-            ftype = "image/svg+xml"
-        elif freq.lower().endswith(".eot"):
-            ftype = "application/vnd.ms-fontobject"
-        elif freq.lower().endswith(".json"):
-            ftype = "application/json"
-        elif freq.lower().endswith(".xml"):
-            ftype = "application/xml"
-        else:
-            ftype = "text/plain"
-
+        ftype = content_type(freq)
         with open(freq, "rb") as f:
             return f.read(), ftype
 
     return None, None
 
 
+class StaticAsset:
+    """A cached web_root file: content type, bytes and precompressed variants."""
+
+    __slots__ = ("ftype", "mtime", "size", "content", "variants")
+
+    def __init__(self, ftype, mtime, size, content, variants):
+        self.ftype = ftype
+        self.mtime = mtime
+        self.size = size
+        self.content = content
+        self.variants = variants  # content-coding ("br", "gzip") -> compressed bytes
+
+    def nbytes(self):
+        return len(self.content) + sum(len(v) for v in self.variants.values())
+
+
+class StaticAssetCache:
+    """
+    In-memory cache of the files under web_root.
+
+    The servable files are indexed and loaded once at startup, with gzip/brotli
+    variants compressed at compress_level, so lookups need no realpath/exists
+    calls and requests never compress. Assets are revalidated against the file
+    mtime with a single os.stat() per hit and reloaded when they change. With
+    max_bytes set, startup stops loading assets once the cap is reached (the
+    rest load on first request) and least recently used assets are evicted to
+    stay under it.
+    """
+
+    def __init__(self, web_root, max_bytes=0, compress_level=6):
+        self.web_root = os.path.realpath(web_root)
+        self.max_bytes = max_bytes  # 0 = no cap
+        self.compress_level = compress_level  # gzip level / brotli quality
+        self._index = {}  # request path -> file path
+        self._assets = OrderedDict()  # request path -> StaticAsset, LRU order
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.build_index()
+        self.preload()
+
+    def build_index(self):
+        index = {}
+        for dirpath, _dirnames, filenames in os.walk(self.web_root):
+            for filename in filenames:
+                freq = os.path.join(dirpath, filename)
+                real_path = os.path.realpath(freq)
+                # Skip symlinks pointing outside web_root
+                if not real_path.startswith(self.web_root + os.sep):
+                    continue
+                rel = os.path.relpath(freq, self.web_root).replace(os.sep, "/")
+                index["/" + rel] = freq
+        with self._lock:
+            self._index = index
+            self._assets.clear()
+            self._bytes = 0
+        logger.debug("Indexed {} static assets in {}".format(len(index), self.web_root))
+
+    def preload(self):
+        """Load and compress every indexed asset, skipping those that would exceed max_bytes."""
+        for fpath, freq in sorted(self._index.items()):
+            try:
+                asset = self._load(freq, os.stat(freq))
+            except OSError:
+                continue
+            if asset is None:
+                continue
+            with self._lock:
+                full = self.max_bytes and self._bytes + asset.nbytes() > self.max_bytes
+            if not full:
+                self._store(fpath, asset)
+        logger.debug("Loaded {} static assets ({} bytes)".format(len(self._assets), self._bytes))
+
+    def get(self, fpath):
+        """Return the StaticAsset for a request path, None if it is not an indexed file."""
+        fpath = fpath.split("?")[0]
+        if fpath == "/":
+            fpath = "/index.html"
+        freq = self._index.get(fpath)
+        if freq is None:
+            return None
+        try:
+            st = os.stat(freq)
+        except OSError:
+            return None
+        with self._lock:
+            asset = self._assets.get(fpath)
+            if asset is not None and asset.mtime == st.st_mtime_ns and asset.size == st.st_size:
+                self._assets.move_to_end(fpath)
+                self.hits += 1
+                return asset
+            self.misses += 1
+        asset = self._load(freq, st)
+        if asset is not None:
+            self._store(fpath, asset)
+        return asset
+
+    def cached(self, fpath):
+        """True if the asset for a request path is already held in memory."""
+        fpath = fpath.split("?")[0]
+        with self._lock:
+            return fpath in self._assets
+
+    def _load(self, freq, st):
+        try:
+            with open(freq, "rb") as f:
+                content = f.read()
+        except OSError as exc:
+            logger.debug("Unable to read static asset {}: {}".format(freq, exc))
+            return None
+        ftype = content_type(freq)
+        variants = {}
+        if ftype in COMPRESSIBLE_TYPES and len(content) >= COMPRESS_MIN_BYTES:
+            if brotli is not None:
+                variants["br"] = brotli.compress(content, quality=self.compress_level)
+            variants["gzip"] = gzip.compress(content, compresslevel=self.compress_level, mtime=0)
+        return StaticAsset(ftype, st.st_mtime_ns, st.st_size, content, variants)
+
+    def _store(self, fpath, asset):
+        nbytes = asset.nbytes()
+        if self.max_bytes and nbytes > self.max_bytes:
+            return  # Larger than the whole cache - serve without caching
+        with self._lock:
+            old = self._assets.pop(fpath, None)
+            if old is not None:
+                self._bytes -= old.nbytes()
+            self._assets[fpath] = asset
+            self._bytes += nbytes
+            while self.max_bytes and self._bytes > self.max_bytes:
+                _, evicted = self._assets.popitem(last=False)
+                self._bytes -= evicted.nbytes()
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "indexed": len(self._index),
+                "entries": len(self._assets),
+                "size_bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "brotli": brotli is not None,
+            }
+
+
 def inject_js(htmlsrc, *args):
     soup = Soup(htmlsrc, "html.parser")
 
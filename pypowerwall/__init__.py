@@ -17,7 +17,8 @@
 
  Classes
     Powerwall(host, password, email, timezone, pwcacheexpire, timeout, poolmaxsize, 
-        cloudmode, siteid, authpath, authmode, cachefile, fleetapi, auto_select, retry_modes, gw_pwd)
+        cloudmode, siteid, authpath, authmode, cachefile, fleetapi, auto_select, retry_modes, gw_pwd,
+        pwcachettl)
 
  Parameters
     host                      # Hostname or IP of the Tesla gateway (optionally host:port for 
@@ -40,6 +41,8 @@
                                 indefinitely until a connection succeeds (daemon use)
     gw_pwd = None             # TEG Gateway password (used for local mode access to tedapi)
     wifi_host = None          # Optional WiFi TEDAPI host for v1r follower fallback
+    pwcachettl = None         # Dict of API -> cache timeout in seconds, e.g. {"/api/status": 300}
+                                (local mode; slow-changing APIs default to minutes or hours)
     
  Functions 
     poll(api, jsonformat, raw, force)   # Return data from Powerwall api (JSON string if jsonformat=True, bypass cache force=True)
@@ -63,6 +66,7 @@
     alerts()                  # Return array of Alerts from devices
     system_status(json)       # Returns the system status
     battery_blocks(json)      # Returns battery specific information merged from system_status() and vitals()
+    snapshot(include, json)   # Return several metrics fetched together, with per-field timings
     grid_status(type)         # Return the power grid status, type ="string" (default), "json", or "numeric"
                               #     - "string": "UP", "DOWN", "SYNCING"
                               #     - "numeric": -1 (Syncing), 0 (DOWN), 1 (UP)
@@ -82,6 +86,7 @@
     This module requires the following modules: requests, protobuf, teslapy
     pip install requests protobuf teslapy
 """
+import copy
 import json
 import logging
 import os.path
@@ -89,7 +94,7 @@ import sys
 import time
 from typing import Optional, Union
 
-version_tuple = (0, 16, 2)
+version_tuple = (0, 16, 3)
 version = __version__ = '%d.%d.%d' % version_tuple
 __author__ = 'jasonacox'
 
@@ -104,6 +109,7 @@ from pypowerwall.fleetapi.pypowerwall_fleetapi import PyPowerwallFleetAPI
 from pypowerwall.local.pypowerwall_local import PyPowerwallLocal
 from pypowerwall.pypowerwall_base import PyPowerwallBase, parse_version
 from pypowerwall.regex import EMAIL_REGEX, HOST_REGEX, IPV4_6_REGEX
+from pypowerwall.snapshot import SNAPSHOT_FIELDS, PowerwallSnapshot, SnapshotClient
 from pypowerwall.tedapi.api_version import TEDAPIApiVersion
 from pypowerwall.tedapi.pypowerwall_tedapi import PyPowerwallTEDAPI
 
@@ -133,7 +139,8 @@ class Powerwall(object):
                  timezone="America/Los_Angeles", pwcacheexpire=5, timeout=5, poolmaxsize=10,
                  cloudmode=False, siteid=None, authpath="", authmode="cookie", cachefile=".powerwall",
                  fleetapi=False, auto_select=False, retry_modes=False, gw_pwd=None,
-                 rsa_key_path=None, wifi_host=None, tedapi_api_version=TEDAPIApiVersion.V2024_06):
+                 rsa_key_path=None, wifi_host=None, tedapi_api_version=TEDAPIApiVersion.V2024_06,
+                 pwcachettl=None):
         """
         Represents a Tesla Energy Gateway Powerwall device.
 
@@ -160,6 +167,9 @@ class Powerwall(object):
             gw_pwd       = Full gateway password from QR sticker; used for TEDAPI (mode 4)
                            and auto-derived (last 5 chars) for v1r login (mode 5)
             rsa_key_path = Path to RSA-4096 private key PEM for v1r LAN TEDapi access
+            pwcachettl   = Dict of API -> seconds to expire cached entries, overriding
+                           pwcacheexpire and the local mode defaults for slow-changing APIs
+                           (e.g. {"/api/status": 300}) - local mode only
         """
 
         # Attributes
@@ -173,6 +183,7 @@ class Powerwall(object):
         self.auth = {}  # caches auth cookies
         self.token = None  # caches bearer token
         self.pwcacheexpire = pwcacheexpire  # seconds to expire cache
+        self.pwcachettl = pwcachettl  # per-API seconds to expire cache (local mode)
         self.cloudmode = cloudmode  # cloud mode or local mode (default)
         self.siteid = siteid  # siteid for cloud mode
         self.authpath = os.path.expanduser(authpath)  # path to auth and site cache files
@@ -311,7 +322,7 @@ class Powerwall(object):
                         self.tedapi_mode = "hybrid"
                         self.client = PyPowerwallLocal(self.host, self.password, self.email, self.timezone, self.timeout,
                                                        self.pwcacheexpire, self.poolmaxsize, self.authmode, self.cachefile,
-                                                       self.gw_pwd)
+                                                       self.gw_pwd, pwcachettl=self.pwcachettl)
                     self.client.authenticate()
                     self.cloudmode = self.fleetapi = False
                     self.tedapi = self.client.tedapi
@@ -387,6 +398,9 @@ class Powerwall(object):
             raw         = If True, send raw data back (useful for binary responses, has no meaning in Cloud mode)
             recursive   = If True, this is a recursive call and do not allow additional recursive calls
             force       = If True, bypass the cache and make the API call to the gateway, has no meaning in Cloud mode
+
+        In local and TEDAPI mode cached payloads are shared read-only views (ReadOnlyDict /
+        ReadOnlyList) - copy them, e.g. dict(payload), before making changes.
         """
         if self._no_client():
             return None
@@ -485,24 +499,24 @@ class Powerwall(object):
         v: dict = self.vitals() or {}
         for device in v:
             if device.split('--')[0] == 'PVAC':
-                # Check for PVS data
+                # Merge the PVS string data into a copy - vitals may be a shared, read-only cache
+                pvac = dict(v[device])
                 look = "PVS" + str(device)[4:]
                 if look in v:
-                    # Inject the PVS string data into the dictionary
                     for ee in v[look]:
                         if 'String' in ee:
-                            v[device][ee] = v[look][ee]
+                            pvac[ee] = v[look][ee]
                 if verbose:
                     result[device] = {}
                     # PVAC_Pout may be missing depending on firmware - default to None
-                    result[device]['PVAC_Pout'] = v[device].get('PVAC_Pout')
-                    for e in v[device]:
+                    result[device]['PVAC_Pout'] = pvac.get('PVAC_Pout')
+                    for e in pvac:
                         if 'PVAC_PVCurrent' in e or 'PVAC_PVMeasuredPower' in e or \
                                 'PVAC_PVMeasuredVoltage' in e or 'PVAC_PvState' in e or \
                                 'PVS_String' in e:
-                            result[device][e] = v[device][e]
+                            result[device][e] = pvac[e]
                 else:  # simplified results
-                    for e in v[device]:
+                    for e in pvac:
                         if 'PVAC_PVCurrent' in e or 'PVAC_PVMeasuredPower' in e or \
                                 'PVAC_PVMeasuredVoltage' in e or 'PVAC_PvState' in e or \
                                 'PVS_String' in e:
@@ -523,7 +537,7 @@ class Powerwall(object):
                                 idxname = 'Unknown'
                             if name not in result:
                                 result[name] = {}
-                            result[name][idxname] = v[device][e]
+                            result[name][idxname] = pvac[e]
                         # if
                     # for
                     deviceidx += 1
@@ -980,6 +994,43 @@ class Powerwall(object):
         else:
             return result
 
+    def snapshot(self, include=None, jsonformat=False) -> Optional[Union[PowerwallSnapshot, str]]:
+        """
+        Fetch several metrics as one consistent point-in-time view
+
+        Every underlying API (and vitals) is requested from the backend at most once,
+        so e.g. temps(), strings(), alerts() and battery data share one vitals payload
+        and power() and grid_status() are read from the same responses.
+
+        Args:
+            include    = List of fields to fetch (default all): level, power, grid_status,
+                         reserve, system_status, vitals, strings, temps, alerts
+            jsonformat = If True, return JSON format otherwise return a PowerwallSnapshot
+
+        Returns:
+            PowerwallSnapshot with the included fields filled in, the seconds each
+            took in timings and the backend calls made in requests
+        """
+        include = list(SNAPSHOT_FIELDS) if include is None else list(include)
+        unknown = [name for name in include if name not in SNAPSHOT_FIELDS]
+        if unknown:
+            raise ValueError(f"Invalid snapshot field(s): {', '.join(unknown)} - "
+                             f"valid fields are {', '.join(SNAPSHOT_FIELDS)}")
+        if self._no_client():
+            return None
+        # Run the regular methods on a copy whose client answers repeated calls from the first
+        view = copy.copy(self)
+        view.client = SnapshotClient(self.client)
+        result = PowerwallSnapshot()
+        for name in include:
+            start = time.perf_counter()
+            setattr(result, name, SNAPSHOT_FIELDS[name](view))
+            result.timings[name] = time.perf_counter() - start
+        result.requests = view.client.requests
+        if jsonformat:
+            return json.dumps(result.to_dict(), indent=4, sort_keys=True)
+        return result
+
     def get_time_remaining(self) -> Optional[float]:
         """
         Get the backup time remaining on the battery
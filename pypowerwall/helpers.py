@@ -13,6 +13,10 @@
  Functions
     lookup(data, keylist)                       # None-safe nested dictionary lookup
     not_implemented_mock_data_factory(log, mode) # Build a per-backend mock-data decorator
+    freeze(data)                                # Read-only copy of a payload for caching
+
+ Classes
+    ReadOnlyDict, ReadOnlyList                  # dict / list that refuse changes
 """
 import functools
 
@@ -62,3 +66,58 @@ def not_implemented_mock_data_factory(logger, mode, warned_once):
         return wrapper
 
     return not_implemented_mock_data
+
+
+def _read_only(self, *args, **kwargs):
+    raise TypeError(f"{type(self).__name__} is read-only - copy it (dict(x) / list(x)) to make changes")
+
+
+class ReadOnlyDict(dict):
+    """
+    A dict that refuses changes, for cached payloads shared between callers.
+
+    Still a dict, so isinstance() checks and json.dumps() work unchanged.
+    copy() returns a plain (shallow) dict.
+    """
+    __slots__ = ()
+    __setitem__ = __delitem__ = __ior__ = _read_only
+    clear = pop = popitem = setdefault = update = _read_only
+
+    def copy(self):
+        return dict(self)
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+
+class ReadOnlyList(list):
+    """
+    A list that refuses changes, for cached payloads shared between callers.
+
+    Still a list, so isinstance() checks and json.dumps() work unchanged.
+    copy() returns a plain (shallow) list.
+    """
+    __slots__ = ()
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _read_only
+    append = extend = insert = remove = pop = clear = sort = reverse = _read_only
+
+    def copy(self):
+        return list(self)
+
+    def __reduce__(self):
+        return type(self), (list(self),)
+
+
+def freeze(data):
+    """
+    Return a read-only copy of data: nested dicts and lists become ReadOnlyDict
+    and ReadOnlyList, other values are returned as is. Already frozen containers
+    are not copied again.
+    """
+    if isinstance(data, (ReadOnlyDict, ReadOnlyList)):
+        return data
+    if isinstance(data, dict):
+        return ReadOnlyDict((key, freeze(value)) for key, value in data.items())
+    if isinstance(data, list):
+        return ReadOnlyList(freeze(value) for value in data)
+    return data
@@ -1,6 +1,7 @@
 import json
 import logging
 import os
+import threading
 import time
 from typing import Union, Tuple, Optional, Any
 
@@ -9,6 +10,8 @@ from requests import Response
 
 import pypowerwall.local.tesla_pb2 as tesla_pb2
 
+from pypowerwall.api_lock import acquire_with_exponential_backoff
+from pypowerwall.helpers import freeze
 from pypowerwall.local.exceptions import LoginError
 from pypowerwall.pypowerwall_base import PyPowerwallBase, parse_version
 from pypowerwall.tedapi import TEDAPI, GW_IP
@@ -20,11 +23,33 @@ log = logging.getLogger(__name__)
 # pwcache[key] = None to force a re-fetch, so None always means "cache miss".
 _NEG_CACHE = object()
 
+# Default cache TTLs (seconds) for gateway APIs that change far slower than the live
+# meter data. Every other API uses pwcacheexpire. /api/status carries up_time_seconds,
+# so uptime() lags by up to its TTL.
+DEFAULT_CACHE_TTLS = {
+    "/api/status": 60,
+    "/api/site_info": 3600,
+    "/api/site_info/site_name": 3600,
+    "/api/site_info/grid_codes": 3600,
+    "/api/solars": 3600,
+    "/api/solars/brands": 86400,
+    "/api/customer": 3600,
+    "/api/customer/registration": 3600,
+    "/api/installer": 3600,
+    "/api/networks": 600,
+    "/api/system/networks": 600,
+    "/api/system/update/status": 600,
+    "/api/meters": 600,
+    "/api/synchrometer/ct_voltage_references": 3600,
+    "/api/auth/toggle/supported": 3600,
+}
+
 
 class PyPowerwallLocal(PyPowerwallBase):
 
     def __init__(self, host: str, password: str, email: str, timezone: str, timeout: Union[int, Tuple[int, int]],
-                 pwcacheexpire: int, poolmaxsize: int, authmode: str, cachefile: str, gw_pw: str = None):
+                 pwcacheexpire: int, poolmaxsize: int, authmode: str, cachefile: str, gw_pw: str = None,
+                 pwcachettl: Optional[dict] = None):
         super().__init__(email)
         self.host = host
         self.password = password
@@ -36,7 +61,20 @@ class PyPowerwallLocal(PyPowerwallBase):
         self.session = None
         self.pwcachetime = {}  # holds the cached data timestamps for api
         self.pwcacheexpire = pwcacheexpire  # seconds to expire cache
+        # api -> seconds to expire cache, for APIs that do not use pwcacheexpire. The
+        # defaults never cache for less than pwcacheexpire; pwcachettl entries are exact.
+        self.pwcachettl = {api: max(ttl, pwcacheexpire) for api, ttl in DEFAULT_CACHE_TTLS.items()}
+        self.pwcachettl.update(pwcachettl or {})
         self.pwcache = {}  # holds the cached data for api
+        self._poll_lock = threading.Lock()  # guards the per-URI locks and counters below
+        self._poll_locks = {}  # api -> lock held by the thread requesting it from the gateway
+        self._poll_flights = {}  # api -> (completed requests, last payload) for waiters
+        self._poll_stats = {"hits": 0, "misses": 0, "coalesced": 0, "negative_hits": 0, "lock_timeouts": 0}
+        self._poll_requests = {}  # api -> requests sent to the gateway
+        self._vitals_lock = threading.Lock()  # one thread decodes a new vitals payload
+        self._vitals_stream = None  # vitals protobuf bytes behind _vitals_output
+        self._vitals_output = None  # decoded (read-only) vitals for _vitals_stream
+        self._vitals_stats = {"hits": 0, "decodes": 0}
         self.pwcooldown = 0  # rate limit cooldown time - pause api calls
         self.vitals_api = True  # vitals api is available for local mode
         self.gw_pw = gw_pw  # Powerwall Gateway password for TEDAPI
@@ -148,128 +186,205 @@ class PyPowerwallLocal(PyPowerwallBase):
         if isinstance(self.session, requests.Session):
             self.session.close()
 
+    def _cache_lookup(self, api: str) -> Tuple[bool, Optional[Union[dict, list, str, bytes]]]:
+        """
+        Look up a fresh cache entry for api.
+
+        Returns:
+            (True, payload) on a hit - payload is None for a negative cache hit -
+            or (False, None) if the gateway has to be asked
+        """
+        payload = self.pwcache.get(api)
+        cachetime = self.pwcachetime.get(api)
+        if payload is None or cachetime is None:
+            return False, None
+        if time.perf_counter() - cachetime >= self.pwcachettl.get(api, self.pwcacheexpire):
+            return False, None
+        if payload is _NEG_CACHE:
+            # Negative cache hit - endpoint recently failed (404/403/503);
+            # suppress re-requests until the entry expires (force overrides)
+            log.debug(' -- local: Returning cached error (None) for %s' % api)
+            self._count_poll("negative_hits")
+            return True, None
+        if not payload:
+            # Empty payloads are re-requested
+            return False, None
+        log.debug(' -- local: Returning cached %s' % api)
+        self._count_poll("hits")
+        return True, payload
+
+    def _count_poll(self, counter: str, api: Optional[str] = None):
+        with self._poll_lock:
+            self._poll_stats[counter] += 1
+            if api is not None:
+                self._poll_requests[api] = self._poll_requests.get(api, 0) + 1
+
+    def get_poll_stats(self) -> dict:
+        """
+        Cache counters for poll(): hits, misses (requests sent to the gateway), coalesced
+        (callers that waited for another thread's request to the same URI instead of
+        sending their own), negative_hits, lock_timeouts, plus gateway requests per URI.
+        Also reports the vitals() decode counters (vitals_hits, vitals_decodes).
+        """
+        with self._poll_lock:
+            stats = dict(self._poll_stats, requests=dict(self._poll_requests))
+        with self._vitals_lock:
+            stats.update(("vitals_" + key, value) for key, value in self._vitals_stats.items())
+        return stats
+
     def poll(self, api: str, force: bool = False,
              recursive: bool = False, raw: bool = False) -> Optional[Union[dict, list, str, bytes]]:
+        """
+        Query the Powerwall API, serving fresh responses from the cache.
 
-        # Query powerwall and return payload
+        Concurrent cache misses for the same URI are single-flight: one thread asks the
+        gateway while the others wait on the URI's lock and return its payload.
+        """
+        # Check cache BEFORE acquiring lock
+        if not force:
+            hit, payload = self._cache_lookup(api)
+            if hit:
+                return payload
+
+        with self._poll_lock:
+            lock = self._poll_locks.get(api)
+            if lock is None:
+                lock = self._poll_locks[api] = threading.Lock()
+            flight, _ = self._poll_flights.get(api, (0, None))
+
+        # Only acquire lock if we need to make an API call
+        if not acquire_with_exponential_backoff(lock, self._poll_lock_timeout()):
+            log.error('Timeout waiting for API lock - unable to fetch %s - returning cached data if available' % api)
+            self._count_poll("lock_timeouts")
+            payload = self.pwcache.get(api)
+            return None if payload is _NEG_CACHE else payload
+        try:
+            # Double-check after acquiring lock (another thread might have fetched it)
+            completed, payload = self._poll_flights.get(api, (0, None))
+            if completed != flight:
+                log.debug(' -- local: Returning payload fetched while waiting for %s' % api)
+                self._count_poll("coalesced")
+                return payload
+            if not force:
+                hit, payload = self._cache_lookup(api)
+                if hit:
+                    return payload
+            self._count_poll("misses", api)
+            payload = self._fetch(api, recursive, raw)
+            self._poll_flights[api] = (completed + 1, payload)
+            return payload
+        finally:
+            lock.release()
+
+    def _poll_lock_timeout(self) -> float:
+        # Longest a waiter blocks on another thread's request: the request timeout,
+        # twice over to cover the session refresh and retry after a 401/403
+        timeout = sum(self.timeout) if isinstance(self.timeout, tuple) else self.timeout
+        return 2 * timeout + 1
+
+    def _fetch(self, api: str, recursive: bool = False,
+               raw: bool = False) -> Optional[Union[dict, list, str, bytes]]:
+        """Request api from the Powerwall and cache the response (the poll() cache miss path)."""
         payload = None
-        # Check cache
-        if self.pwcache.get(api) is not None and self.pwcachetime.get(api) is not None:
-            # is it expired?
-            if time.perf_counter() - self.pwcachetime[api] < self.pwcacheexpire:
-                if self.pwcache[api] is _NEG_CACHE:
-                    # Negative cache hit - endpoint recently failed (404/403/503);
-                    # suppress re-requests until the entry expires (force overrides)
-                    if not force:
-                        log.debug(' -- local: Returning cached error (None) for %s' % api)
-                        return None
-                else:
-                    payload = self.pwcache[api]
-                    log.debug(' -- local: Returning cached %s' % api)
-                    # We do the override here to ensure that we cache the force entry
-
-        if not payload or force:
-            if self.pwcooldown > time.perf_counter():
-                # Rate limited - return None
-                log.debug('Rate limit cooldown period - Pausing API calls')
+        if self.pwcooldown > time.perf_counter():
+            # Rate limited - return None
+            log.debug('Rate limit cooldown period - Pausing API calls')
+            return None
+        if api == '/api/devices/vitals':
+            if not self.vitals_api:
+                # Vitals API is not available
                 return None
-            if api == '/api/devices/vitals':
-                if not self.vitals_api:
-                    # Vitals API is not available
-                    return None
-                # Always want the raw stream output from the vitals call; protobuf binary payload
-                raw = True
+            # Always want the raw stream output from the vitals call; protobuf binary payload
+            raw = True
 
-            log.debug(' -- local: Request Powerwall for %s' % api)
-            url = "https://%s%s" % (self.host, api)
-            try:
-                if self.authmode == "token":
-                    r: Response = self.session.get(url, headers=self.auth, verify=False, timeout=self.timeout,
-                                                   stream=raw)
+        log.debug(' -- local: Request Powerwall for %s' % api)
+        url = "https://%s%s" % (self.host, api)
+        try:
+            if self.authmode == "token":
+                r: Response = self.session.get(url, headers=self.auth, verify=False, timeout=self.timeout,
+                                               stream=raw)
+            else:
+                r: Response = self.session.get(url, cookies=self.auth, verify=False, timeout=self.timeout,
+                                               stream=raw)
+        except requests.exceptions.Timeout:
+            log.error('Timeout waiting for Powerwall API %s - check network connectivity to %s' % (api, self.host))
+            return None
+        except requests.exceptions.ConnectionError as exc:
+            log.error('Unable to connect to Powerwall at %s - %s - check that the gateway is reachable and powered on' % (self.host, exc))
+            return None
+        except Exception as exc:
+            log.error(f'Unexpected error connecting to Powerwall at {url}: {exc}')
+            return None
+        if r.status_code == 404:
+            # API not found or no longer supported
+            log.error('404 Powerwall API not found at %s' % url)
+            if api == '/api/devices/vitals':
+                # Check Powerwall Firmware version
+                version = self.version(int_value=True)
+                if version is not None and version >= 23440:
+                    # Vitals API not available for Firmware >= 23.44.0
+                    self.vitals_api = False
+                    log.error('Firmware %s detected - Does not support vitals API - disabling.' % version)
+                    # Cache and increase cache TTL by 10 minutes
+            self.pwcachetime[api] = time.perf_counter() + 600
+            self.pwcache[api] = _NEG_CACHE
+            return None
+        elif r.status_code == 429:
+            # Rate limited - Switch to cooldown mode for 5 minutes
+            self.pwcooldown = time.perf_counter() + 300
+            log.error('429 Rate limited by Powerwall API at %s - Activating 5 minute cooldown' % url)
+            return None
+        elif r.status_code == 401 or r.status_code == 403:
+            # Session Expired - Try to get a new one unless we already tried
+            log.debug('Session Expired - Trying to get a new one')
+            if not recursive:
+                if raw:
+                    # Drain the stream before retrying
+                    # noinspection PyUnusedLocal
+                    payload = r.raw.data
+                self._get_session()
+                return self._fetch(api, raw=raw, recursive=True)
+            else:
+                if r.status_code == 401:
+                    log.error('Unable to establish session with Powerwall at %s - check password' % url)
                 else:
-                    r: Response = self.session.get(url, cookies=self.auth, verify=False, timeout=self.timeout,
-                                                   stream=raw)
-            except requests.exceptions.Timeout:
-                log.error('Timeout waiting for Powerwall API %s - check network connectivity to %s' % (api, self.host))
-                return None
-            except requests.exceptions.ConnectionError as exc:
-                log.error('Unable to connect to Powerwall at %s - %s - check that the gateway is reachable and powered on' % (self.host, exc))
-                return None
-            except Exception as exc:
-                log.error(f'Unexpected error connecting to Powerwall at {url}: {exc}')
-                return None
-            if r.status_code == 404:
-                # API not found or no longer supported
-                log.error('404 Powerwall API not found at %s' % url)
-                if api == '/api/devices/vitals':
-                    # Check Powerwall Firmware version
-                    version = self.version(int_value=True)
-                    if version is not None and version >= 23440:
-                        # Vitals API not available for Firmware >= 23.44.0
-                        self.vitals_api = False
-                        log.error('Firmware %s detected - Does not support vitals API - disabling.' % version)
-                        # Cache and increase cache TTL by 10 minutes
+                    log.error('403 Unauthorized by Powerwall API at %s - Endpoint disabled in this firmware or '
+                              'user lacks permission' % url)
                 self.pwcachetime[api] = time.perf_counter() + 600
                 self.pwcache[api] = _NEG_CACHE
                 return None
-            elif r.status_code == 429:
-                # Rate limited - Switch to cooldown mode for 5 minutes
-                self.pwcooldown = time.perf_counter() + 300
-                log.error('429 Rate limited by Powerwall API at %s - Activating 5 minute cooldown' % url)
+        elif 400 <= r.status_code < 500:
+            log.error('Unhandled HTTP response code %s at %s' % (r.status_code, url))
+            return None
+        elif r.status_code == 503:
+            log.error('503 Service Unavailable at %s - Activating 5 minute API cooldown' % url)
+            self.pwcachetime[api] = time.perf_counter() + 300
+            self.pwcache[api] = _NEG_CACHE
+            return None
+        elif r.status_code >= 500:
+            log.error('Server-side problem at Powerwall API (status code %s) at %s' % (r.status_code, url))
+            return None
+
+        if raw:
+            payload = r.raw.data
+        else:
+            payload = r.text
+            if not payload:
+                log.debug(f"Empty response from Powerwall at {url}")
                 return None
-            elif r.status_code == 401 or r.status_code == 403:
-                # Session Expired - Try to get a new one unless we already tried
-                log.debug('Session Expired - Trying to get a new one')
-                if not recursive:
-                    if raw:
-                        # Drain the stream before retrying
-                        # noinspection PyUnusedLocal
-                        payload = r.raw.data
-                    self._get_session()
-                    return self.poll(api, raw=raw, recursive=True)
-                else:
-                    if r.status_code == 401:
-                        log.error('Unable to establish session with Powerwall at %s - check password' % url)
-                    else:
-                        log.error('403 Unauthorized by Powerwall API at %s - Endpoint disabled in this firmware or '
-                                  'user lacks permission' % url)
-                    self.pwcachetime[api] = time.perf_counter() + 600
-                    self.pwcache[api] = _NEG_CACHE
+            elif 'application/json' in r.headers.get('Content-Type', ''):
+                try:
+                    # Cached payloads are shared by every caller - hand out read-only views
+                    payload = freeze(json.loads(payload))
+                except Exception as exc:
+                    log.error(f"Unable to parse payload '{payload}' as JSON, even though it was supposed to "
+                              f"be a json: {exc}")
                     return None
-            elif 400 <= r.status_code < 500:
-                log.error('Unhandled HTTP response code %s at %s' % (r.status_code, url))
-                return None
-            elif r.status_code == 503:
-                log.error('503 Service Unavailable at %s - Activating 5 minute API cooldown' % url)
-                self.pwcachetime[api] = time.perf_counter() + 300
-                self.pwcache[api] = _NEG_CACHE
-                return None
-            elif r.status_code >= 500:
-                log.error('Server-side problem at Powerwall API (status code %s) at %s' % (r.status_code, url))
-                return None
-
-            if raw:
-                payload = r.raw.data
             else:
-                payload = r.text
-                if not payload:
-                    log.debug(f"Empty response from Powerwall at {url}")
-                    return None
-                elif 'application/json' in r.headers.get('Content-Type', ''):
-                    try:
-                        payload = json.loads(payload)
-                    except Exception as exc:
-                        log.error(f"Unable to parse payload '{payload}' as JSON, even though it was supposed to "
-                                  f"be a json: {exc}")
-                        return None
-                else:
-                    log.debug(f"Non-json response from Powerwall at {url}: '{payload}', serving as is.")
-            self.pwcache[api] = payload
-            self.pwcachetime[api] = time.perf_counter()
-            return payload
-        else:
-            # should be already a dict in cache, so just return it
-            return payload
+                log.debug(f"Non-json response from Powerwall at {url}: '{payload}', serving as is.")
+        self.pwcache[api] = payload
+        self.pwcachetime[api] = time.perf_counter()
+        return payload
 
     def post(self, api: str, payload: Optional[dict], din: Optional[str],
              recursive: bool = False, raw: bool = False) -> Optional[Union[dict, list, str, bytes]]:
@@ -383,6 +498,13 @@ class PyPowerwallLocal(PyPowerwallBase):
                 return None
 
     def vitals(self) -> Optional[dict]:
+        """
+        Device vitals keyed by DIN.
+
+        In local mode the decoded protobuf is memoized until poll() returns different
+        bytes, so temps(), alerts(), strings() and battery_blocks() share one decode.
+        The result is read-only (see pypowerwall.helpers.freeze) - copy it to change it.
+        """
         # Check for TEDAPI mode
         if self.tedapi:
             return self.tedapi.vitals()
@@ -390,7 +512,18 @@ class PyPowerwallLocal(PyPowerwallBase):
         stream = self.poll('/api/devices/vitals')
         if not stream:
             return None
-
+        with self._vitals_lock:
+            # Cached bytes come back as the same object, so this is usually an identity check
+            if stream == self._vitals_stream:
+                self._vitals_stats["hits"] += 1
+                return self._vitals_output
+            self._vitals_stats["decodes"] += 1
+            self._vitals_output = freeze(self._decode_vitals(stream))
+            self._vitals_stream = stream
+            return self._vitals_output
+
+    @staticmethod
+    def _decode_vitals(stream: bytes) -> dict:
         # Protobuf payload processing
         pb = tesla_pb2.DevicesWithVitals()
         pb.ParseFromString(stream)
@@ -0,0 +1,98 @@
+# pyPowerWall Module - Snapshot
+# -*- coding: utf-8 -*-
+"""
+ Python module to interface with Tesla Solar Powerwall Gateway
+
+ Author: Jason A. Cox
+ For more information see https://github.com/jasonacox/pypowerwall
+
+ Point-in-time view of several Powerwall metrics, see Powerwall.snapshot().
+ The fields are filled by the regular Powerwall methods running against a
+ SnapshotClient, which asks the backend for each API (and vitals) once and
+ answers every later call in the same snapshot from that first result.
+
+ Classes
+    PowerwallSnapshot         # Typed result of Powerwall.snapshot() with per-field timings
+    SnapshotClient            # Backend wrapper that fetches each API at most once
+"""
+import time
+from dataclasses import dataclass, field, fields
+from typing import Any, Dict, List, Optional
+
+from pypowerwall.pypowerwall_base import PyPowerwallBase
+
+# Snapshot field -> Powerwall method that fills it
+SNAPSHOT_FIELDS = {
+    "level": lambda pw: pw.level(),
+    "power": lambda pw: pw.power(),
+    "grid_status": lambda pw: pw.grid_status(),
+    "reserve": lambda pw: pw.get_reserve(),
+    "system_status": lambda pw: pw.system_status(),
+    "vitals": lambda pw: pw.vitals(),
+    "strings": lambda pw: pw.strings(),
+    "temps": lambda pw: pw.temps(),
+    "alerts": lambda pw: pw.alerts(),
+}
+
+
+@dataclass
+class PowerwallSnapshot:
+    """
+    Powerwall metrics fetched together by Powerwall.snapshot().
+
+    Fields that were not included stay None. timings holds the seconds each
+    included field took - fields sharing data with an earlier one are nearly
+    free - and requests lists the backend calls made, in order.
+    """
+    timestamp: float = field(default_factory=time.time)
+    level: Optional[float] = None
+    power: Optional[dict] = None
+    grid_status: Optional[str] = None
+    reserve: Optional[float] = None
+    system_status: Optional[dict] = None
+    vitals: Optional[dict] = None
+    strings: Optional[dict] = None
+    temps: Optional[dict] = None
+    alerts: Optional[list] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+    requests: List[str] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the snapshot as a dictionary (values are not copied)."""
+        return {f.name: getattr(self, f.name) for f in fields(self)}
+
+
+class SnapshotClient:
+    """
+    Wraps a backend client for one snapshot: poll() and vitals() ask the backend
+    once per API and return the same result to every later caller, so all fields
+    are derived from one consistent set of payloads. Anything else is passed
+    through to the backend.
+    """
+
+    def __init__(self, client: PyPowerwallBase):
+        self.client = client
+        self.requests = []  # backend calls made, in order
+        self._results = {}
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+    def _once(self, key, name, func, *args):
+        if key not in self._results:
+            self.requests.append(name)
+            self._results[key] = func(*args)
+        return self._results[key]
+
+    def poll(self, api: str, force: bool = False, recursive: bool = False, raw: bool = False):
+        return self._once(("poll", api, raw), api, self.client.poll, api, force, recursive, raw)
+
+    def vitals(self):
+        return self._once(("vitals",), "vitals", self.client.vitals)
+
+    def get_time_remaining(self):
+        return self._once(("get_time_remaining",), "get_time_remaining", self.client.get_time_remaining)
+
+    # Parsed from the memoized poll() above instead of the backend's own
+    power = PyPowerwallBase.power
+    fetchpower = PyPowerwallBase.fetchpower
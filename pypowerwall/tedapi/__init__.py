@@ -69,7 +69,7 @@ from urllib3.exceptions import InsecureRequestWarning
 
 from pypowerwall import __version__
 from pypowerwall.api_lock import acquire_lock_with_backoff
-from pypowerwall.helpers import lookup
+from pypowerwall.helpers import freeze, lookup
 
 from .protobuf.V2024_06 import tedapi_pb2
 from .protobuf.V2024_06 import tedapi_combined_pb2 as combined_pb2
@@ -363,7 +363,7 @@ class TEDAPI:
                                 if 'battery_blocks' not in data:
                                     data["battery_blocks"] = []
                                 self.pwcachetime["config"] = time.time()
-                                self.pwcache["config"] = data
+                                self.pwcache["config"] = data = freeze(data)
                         except Exception as e:
                             log.error(f"get_config WiFi fallback error: {e}")
                             data = None
@@ -373,7 +373,7 @@ class TEDAPI:
                             if data:
                                 log.debug(f"Configuration (v1r): {data}")
                                 self.pwcachetime["config"] = time.time()
-                                self.pwcache["config"] = data
+                                self.pwcache["config"] = data = freeze(data)
                         except Exception as e:
                             log.error(f"Error fetching config via v1r: {e}")
                             data = None
@@ -411,7 +411,7 @@ class TEDAPI:
                             data["battery_blocks"] = []
                         log.debug(f"Configuration: {data}")
                         self.pwcachetime["config"] = time.time()
-                        self.pwcache["config"] = data
+                        self.pwcache["config"] = data = freeze(data)
                     except Exception as e:
                         log.error(f"Error fetching config: {e}")
                         data = None
@@ -674,7 +674,7 @@ class TEDAPI:
                         data = {}
                     log.debug(f"Status: {data}")
                     self.pwcachetime["status"] = time.time()
-                    self.pwcache["status"] = data
+                    self.pwcache["status"] = data = freeze(data)
                 except Exception as e:
                     log.error(f"Error fetching status: {e}")
                     data = None
@@ -754,7 +754,7 @@ class TEDAPI:
                         data = {}
                     log.debug(f"Status: {data}")
                     self.pwcachetime["controller"] = time.time()
-                    self.pwcache["controller"] = data
+                    self.pwcache["controller"] = data = freeze(data)
                 except Exception as e:
                     log.error(f"Error fetching controller data: {e}")
                     data = None
@@ -920,7 +920,7 @@ class TEDAPI:
                     components = json.loads(payload)
                     log.debug(f"Components: {components}")
                     self.pwcachetime["components"] = time.time()
-                    self.pwcache["components"] = components
+                    self.pwcache["components"] = components = freeze(components)
                 except Exception as e:
                     log.error(f"Error fetching components: {e}")
                     components = None
@@ -1243,7 +1243,7 @@ class TEDAPI:
                         data = {}
                     log.debug(f"Configuration: {data}")
                     self.pwcachetime[din] = time.time()
-                    self.pwcache[din] = data
+                    self.pwcache[din] = data = freeze(data)
                 except Exception as e:
                     log.error(f"Error fetching device: {e}")
                     data = None
@@ -1456,7 +1456,7 @@ class TEDAPI:
                 # Seed the config cache with the probe result so the probe is
                 # not a wasted fetch — the first get_config() after connect
                 # will be served from cache.
-                self.pwcache["config"] = probe
+                self.pwcache["config"] = freeze(probe)
                 self.pwcachetime["config"] = time.time()
             else:
                 if self.v1r_transport.pending_verification:
@@ -1917,7 +1917,8 @@ class TEDAPI:
                 meter_config[device_serial] = {
                     "type": meter.get('type'),
                     "location": [location] * 4,
-                    "cts": cts,
+                    # Copy - later meters on this device flag their CTs here, not in the config
+                    "cts": list(cts),
                     "inverted": meter.get('inverted'),
                     "connection": meter.get('connection'),
                     "real_power_scale_factor": meter.get('real_power_scale_factor', 1)
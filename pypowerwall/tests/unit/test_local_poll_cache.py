@@ -0,0 +1,158 @@
+"""Tests for the single-flight cache in PyPowerwallLocal.poll():
+- concurrent cache misses for one URI send a single request to the gateway,
+  the waiting threads return the leader's payload (also when it failed)
+- hit, miss, coalesced and negative-hit counters (get_poll_stats)
+- the 401 session refresh retry does not deadlock on the URI lock
+- cached JSON payloads are read-only
+"""
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from pypowerwall.local.pypowerwall_local import PyPowerwallLocal
+
+
+def _make_client():
+    client = PyPowerwallLocal(host='127.0.0.1', password='password', email='test@example.com',
+                              timezone='UTC', timeout=5, pwcacheexpire=5, poolmaxsize=0,
+                              authmode='cookie', cachefile='unused', gw_pw=None)
+    client.session = MagicMock()
+    client.auth = {'AuthCookie': 'cookie', 'UserRecord': 'record'}
+    return client
+
+
+def _response(status_code=200, payload='{"site": {"instant_power": 10}}'):
+    response = MagicMock()
+    response.status_code = status_code
+    response.text = payload
+    response.headers = {'Content-Type': 'application/json'}
+    return response
+
+
+def _poll_concurrently(client, api, threads=8):
+    started = threading.Barrier(threads)
+    results = []
+
+    def worker():
+        started.wait()
+        results.append(client.poll(api))
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join(5)
+    return results
+
+
+def _slow(response):
+    def get(*args, **kwargs):
+        time.sleep(0.2)
+        return response
+    return get
+
+
+def test_concurrent_misses_send_one_request():
+    client = _make_client()
+    client.session.get.side_effect = _slow(_response())
+
+    results = _poll_concurrently(client, '/api/meters/aggregates')
+
+    assert client.session.get.call_count == 1
+    assert results == [{'site': {'instant_power': 10}}] * 8
+    stats = client.get_poll_stats()
+    assert stats['misses'] == 1
+    assert stats['coalesced'] == 7
+    assert stats['requests'] == {'/api/meters/aggregates': 1}
+
+
+def test_waiters_share_failed_request():
+    client = _make_client()
+    client.session.get.side_effect = _slow(_response(status_code=500))
+
+    results = _poll_concurrently(client, '/api/system_status')
+
+    assert client.session.get.call_count == 1
+    assert results == [None] * 8
+
+
+def test_hit_and_negative_hit_counters():
+    client = _make_client()
+    client.session.get.return_value = _response()
+    client.poll('/api/meters/aggregates')
+    client.poll('/api/meters/aggregates')
+
+    client.session.get.return_value = _response(status_code=503)
+    client.poll('/api/system_status')
+    assert client.poll('/api/system_status') is None
+
+    stats = client.get_poll_stats()
+    assert stats['hits'] == 1
+    assert stats['negative_hits'] == 1
+    assert stats['misses'] == 2
+
+
+def test_cached_payload_is_read_only():
+    client = _make_client()
+    client.session.get.return_value = _response()
+    payload = client.poll('/api/meters/aggregates')
+    with pytest.raises(TypeError):
+        payload['site']['instant_power'] = 0
+    assert client.poll('/api/meters/aggregates') is payload
+    assert payload == {'site': {'instant_power': 10}}
+
+
+def test_force_bypasses_cache():
+    client = _make_client()
+    client.session.get.return_value = _response()
+    client.poll('/api/meters/aggregates')
+    client.poll('/api/meters/aggregates', force=True)
+    assert client.session.get.call_count == 2
+
+
+def test_session_refresh_retry_does_not_deadlock():
+    client = _make_client()
+    client.session.get.side_effect = [_response(status_code=401), _response()]
+    with patch.object(client, '_get_session'):
+        assert client.poll('/api/meters/aggregates') == {'site': {'instant_power': 10}}
+    assert client.get_poll_stats()['misses'] == 1
+
+
+def test_lock_timeout_returns_cached_payload():
+    client = _make_client()
+    client.pwcache['/api/status'] = {'version': '24.4.0'}
+    client.pwcachetime['/api/status'] = time.perf_counter() - 60
+    lock = client._poll_locks['/api/status'] = threading.Lock()
+    lock.acquire()
+    with patch.object(client, '_poll_lock_timeout', return_value=0.01):
+        assert client.poll('/api/status') == {'version': '24.4.0'}
+    client.session.get.assert_not_called()
+    assert client.get_poll_stats()['lock_timeouts'] == 1
+
+
+def test_slow_changing_api_uses_longer_ttl():
+    client = _make_client()
+    client.session.get.return_value = _response(payload='{"site_name": "Home"}')
+    client.poll('/api/site_info')
+    client.pwcachetime['/api/site_info'] -= 60
+    client.poll('/api/site_info')
+    assert client.session.get.call_count == 1
+
+    client.poll('/api/meters/aggregates')
+    client.pwcachetime['/api/meters/aggregates'] -= 6
+    client.poll('/api/meters/aggregates')
+    assert client.session.get.call_count == 3
+
+
+def test_cache_ttl_overrides():
+    client = PyPowerwallLocal(host='127.0.0.1', password='password', email='test@example.com',
+                              timezone='UTC', timeout=5, pwcacheexpire=120, poolmaxsize=0,
+                              authmode='cookie', cachefile='unused', gw_pw=None,
+                              pwcachettl={'/api/site_info': 10, '/api/meters/aggregates': 2})
+    # Defaults never undercut pwcacheexpire, explicit entries are exact
+    assert client.pwcachettl['/api/status'] == 120
+    assert client.pwcachettl['/api/solars'] == 3600
+    assert client.pwcachettl['/api/site_info'] == 10
+    assert client.pwcachettl['/api/meters/aggregates'] == 2
@@ -0,0 +1,86 @@
+"""Tests for the memoized vitals decode in PyPowerwallLocal.vitals():
+- cached protobuf bytes are decoded once and shared by every caller
+- new bytes from the gateway are decoded again
+- the decoded vitals are read-only and strings() does not write into them
+"""
+import json
+from unittest.mock import patch
+
+import pytest
+
+import pypowerwall.local.tesla_pb2 as tesla_pb2
+from pypowerwall import Powerwall
+from pypowerwall.local.pypowerwall_local import PyPowerwallLocal
+
+
+def _make_client():
+    return PyPowerwallLocal(host='127.0.0.1', password='password', email='test@example.com',
+                            timezone='UTC', timeout=5, pwcacheexpire=5, poolmaxsize=0,
+                            authmode='cookie', cachefile='unused', gw_pw=None)
+
+
+def _vitals_stream(current=1.5):
+    pb = tesla_pb2.DevicesWithVitals()
+    pvac = pb.devices.add()
+    pvac.device.device.din.value = 'PVAC--1--A'
+    vital = pvac.vitals.add()
+    vital.name = 'PVAC_PVCurrent_A'
+    vital.floatValue = current
+    pvac.alerts.append('PVAC_a001_inv_L1_HW_overcurrent')
+    pvs = pb.devices.add()
+    pvs.device.device.din.value = 'PVS--1--A'
+    vital = pvs.vitals.add()
+    vital.name = 'PVS_StringA_Connected'
+    vital.boolValue = True
+    return pb.SerializeToString()
+
+
+def test_cached_payload_decoded_once():
+    client = _make_client()
+    stream = _vitals_stream()
+    with patch.object(client, 'poll', return_value=stream) as poll:
+        first = client.vitals()
+        assert client.vitals() is first
+        assert poll.call_count == 2
+    assert first['PVAC--1--A']['PVAC_PVCurrent_A'] == 1.5
+    assert first['PVAC--1--A']['alerts'] == ['PVAC_a001_inv_L1_HW_overcurrent']
+    stats = client.get_poll_stats()
+    assert stats['vitals_decodes'] == 1
+    assert stats['vitals_hits'] == 1
+
+
+def test_new_payload_decoded_again():
+    client = _make_client()
+    with patch.object(client, 'poll', return_value=_vitals_stream(1.5)):
+        first = client.vitals()
+    with patch.object(client, 'poll', return_value=_vitals_stream(2.5)):
+        second = client.vitals()
+    assert second is not first
+    assert second['PVAC--1--A']['PVAC_PVCurrent_A'] == 2.5
+    assert client.get_poll_stats()['vitals_decodes'] == 2
+
+
+def test_missing_payload_returns_none():
+    client = _make_client()
+    with patch.object(client, 'poll', return_value=None):
+        assert client.vitals() is None
+
+
+def test_vitals_are_read_only():
+    client = _make_client()
+    with patch.object(client, 'poll', return_value=_vitals_stream()):
+        vitals = client.vitals()
+    with pytest.raises(TypeError):
+        vitals['PVAC--1--A']['PVAC_PVCurrent_A'] = 0
+    with pytest.raises(TypeError):
+        vitals['PVAC--1--A']['alerts'].append('Injected')
+    assert json.loads(json.dumps(vitals))['PVS--1--A'] == {'PVS_StringA_Connected': True}
+
+
+def test_strings_does_not_modify_vitals():
+    pw = Powerwall(host='', password='', email='test@example.com', cloudmode=True, siteid=None)
+    pw.client = _make_client()
+    with patch.object(pw.client, 'poll', return_value=_vitals_stream()):
+        assert pw.strings() == {'A': {'Current': 1.5, 'Connected': True}}
+        assert pw.strings(verbose=True)['PVAC--1--A']['PVS_StringA_Connected'] is True
+        assert 'PVS_StringA_Connected' not in pw.vitals()['PVAC--1--A']
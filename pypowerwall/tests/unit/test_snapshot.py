@@ -0,0 +1,111 @@
+"""Tests for Powerwall.snapshot():
+- each underlying API and vitals is requested from the backend once
+- fields match the individual methods, unlisted fields stay None
+- per-field timings and the backend requests are reported
+"""
+import json
+
+import pytest
+
+from pypowerwall import Powerwall, PowerwallSnapshot
+from pypowerwall.pypowerwall_base import PyPowerwallBase
+
+
+class CountingClient(PyPowerwallBase):
+    def __init__(self):
+        super().__init__(email='test@example.com')
+        self.calls = []
+        self._poll_map = {
+            '/api/meters/aggregates': {
+                'site': {'instant_power': 1000},
+                'solar': {'instant_power': 2000},
+                'battery': {'instant_power': -500},
+                'load': {'instant_power': 1500},
+            },
+            '/api/system_status/soe': {'percentage': 50},
+            '/api/system_status/grid_status': {'grid_status': 'SystemGridConnected'},
+            '/api/system_status': {'battery_blocks': [], 'system_island_state': 'SystemGridConnected'},
+            '/api/operation': {'backup_reserve_percent': 24, 'real_mode': 'self_consumption'},
+        }
+        self._vitals = {
+            'TETHC--X--SN123': {'THC_AmbientTemp': 25.5, 'alerts': ['ThermalFault']},
+            'PVAC--X--SN456': {'PVAC_PVCurrent_A': 1.5},
+        }
+
+    def authenticate(self):
+        return True
+
+    def close_session(self):
+        return True
+
+    def poll(self, api, force=False, recursive=False, raw=False):
+        self.calls.append(api)
+        return self._poll_map.get(api)
+
+    def post(self, api, payload, din, recursive=False, raw=False):
+        return None
+
+    def vitals(self):
+        self.calls.append('vitals')
+        return self._vitals
+
+    def get_time_remaining(self):
+        return None
+
+
+@pytest.fixture(name="pw")
+def fixture_powerwall():
+    inst = Powerwall(host='', password='', email='test@example.com', cloudmode=True, siteid=None)
+    inst.client = CountingClient()
+    return inst
+
+
+def test_each_api_fetched_once(pw):
+    snapshot = pw.snapshot()
+    assert isinstance(snapshot, PowerwallSnapshot)
+    assert sorted(pw.client.calls) == sorted(set(pw.client.calls))
+    assert pw.client.calls.count('vitals') == 1
+    assert snapshot.requests == pw.client.calls
+
+
+def test_fields_match_individual_methods(pw):
+    snapshot = pw.snapshot()
+    assert snapshot.level == pw.level()
+    assert snapshot.power == pw.power()
+    assert snapshot.grid_status == 'UP'
+    assert snapshot.reserve == pw.get_reserve()
+    assert snapshot.system_status == pw.system_status()
+    assert snapshot.temps == {'TETHC--X--SN123': 25.5}
+    assert snapshot.strings == pw.strings()
+    assert sorted(snapshot.alerts) == sorted(pw.alerts())
+
+
+def test_include_subset(pw):
+    snapshot = pw.snapshot(include=['level', 'power'])
+    assert snapshot.level == 50
+    assert snapshot.vitals is None
+    assert set(snapshot.timings) == {'level', 'power'}
+    assert all(seconds >= 0 for seconds in snapshot.timings.values())
+    assert 'vitals' not in pw.client.calls
+
+
+def test_snapshots_do_not_share_results(pw):
+    pw.snapshot(include=['level'])
+    pw.client._poll_map['/api/system_status/soe'] = {'percentage': 60}
+    assert pw.snapshot(include=['level']).level == 60
+
+
+def test_jsonformat(pw):
+    data = json.loads(pw.snapshot(include=['grid_status'], jsonformat=True))
+    assert data['grid_status'] == 'UP'
+    assert data['requests'] == ['/api/system_status/grid_status']
+
+
+def test_invalid_field(pw):
+    with pytest.raises(ValueError):
+        pw.snapshot(include=['level', 'bogus'])
+
+
+def test_no_client_returns_none(pw):
+    pw.client = None
+    assert pw.snapshot() is None
@@ -2,9 +2,13 @@
 - available_blocks read control.batteryBlocks from config instead of status (always 0)
 - get_blocks() returning None crashed get_api_system_status()
 - PINV_GridState was looked up in the THC entry instead of the PINV entry
+- derive_meter_config() flagged CTs in the cached config's cts list
 """
 from unittest.mock import MagicMock, patch
 
+import pytest
+
+from pypowerwall.helpers import freeze
 from pypowerwall.tedapi import TEDAPI
 from pypowerwall.tedapi.pypowerwall_tedapi import PyPowerwallTEDAPI
 
@@ -367,3 +371,35 @@ class TestVitalsPhantomBlocks:
         vitals = ted.vitals()
         assert 'TEMSA--MSAPN--MSASN' in vitals
         assert 'TESLA--MSASN' in vitals
+
+
+class TestCachedPayloadsReadOnly:
+    """Cached TEDAPI payloads are shared read-only views; derived data is built
+    in new objects instead of being written into them."""
+
+    def _make_ted(self):
+        with patch.object(TEDAPI, 'connect', return_value=True):
+            ted = TEDAPI(gw_pwd='password')
+        return ted
+
+    def test_meter_config_does_not_modify_config(self):
+        ted = self._make_ted()
+        meter = {'type': 'neurio_w2_tcp', 'connection': {'device_serial': 'VAH123'}}
+        config = freeze({'meters': [
+            dict(meter, cts=[True, False, False, False], location='site'),
+            dict(meter, cts=[False, True, False, False], location='solar'),
+        ]})
+        meter_config = ted.derive_meter_config(config)
+        assert meter_config['VAH123']['cts'] == [True, True, False, False]
+        assert meter_config['VAH123']['location'] == ['site', 'solar', 'site', 'site']
+        assert config['meters'][0]['cts'] == [True, False, False, False]
+
+    def test_fetched_status_is_read_only(self):
+        ted = self._make_ted()
+        ted.din = 'GW--123'
+        with patch.object(ted, '_post_tedapi', return_value=b'response'), \
+                patch.object(ted, '_parse_response', return_value='{"control": {"alerts": {"active": []}}}'):
+            status = ted.get_status(force=True)
+        assert ted.get_status() is status
+        with pytest.raises(TypeError):
+            status['control']['alerts']['active'].append('Injected')